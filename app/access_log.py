@@ -0,0 +1,140 @@
+"""Non-blocking access log.
+
+Request handlers only push a small tuple onto a bounded in-memory queue;
+a background thread formats the entries as JSON lines and writes them in
+batches to stdout or a file. When the queue is full the entry is dropped
+and counted rather than making the request wait, and ``sample_rate`` can
+log only a fraction of requests. API keys are never written; entries
+carry a short fingerprint instead.
+
+Configured with ``MOVIE_DB_ACCESS_LOG`` (``-`` for stdout, a file path or
+``off``) and ``MOVIE_DB_ACCESS_LOG_SAMPLE`` (0.0 to 1.0).
+``benchmarks/access_log.py`` measures the latency logging adds.
+"""
+import hashlib
+import json
+import os
+import queue
+import random
+import sys
+import threading
+from datetime import datetime, timezone
+from typing import Optional, TextIO, Union
+
+_STOP = object()
+
+
+def redact_key(api_key: str) -> str:
+    """Stable, non-reversible fingerprint to tell keys apart in the log."""
+    return "key:" + hashlib.blake2b(api_key.encode(), digest_size=6).hexdigest()
+
+
+class AccessLog:
+    def __init__(
+        self,
+        destination: Union[str, TextIO, None] = "-",
+        sample_rate: float = 1.0,
+        capacity: int = 10_000,
+        batch_size: int = 512,
+        flush_interval: float = 0.5,
+    ):
+        if not 0.0 <= sample_rate <= 1.0:
+            raise ValueError("Sample rate must be between 0 and 1")
+        self.destination = destination
+        self.sample_rate = sample_rate
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.written = 0
+        self.dropped = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=capacity)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.destination is not None and self.sample_rate > 0
+
+    def record(self, method: str, path: str, user_agent: str, api_key: str):
+        """Queue one entry; never blocks the caller."""
+        if not self.enabled:
+            return
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return
+        try:
+            self._queue.put_nowait((
+                datetime.now(timezone.utc),
+                method,
+                path,
+                user_agent,
+                redact_key(api_key),
+            ))
+        except queue.Full:
+            self.dropped += 1
+
+    def start(self):
+        if not self.enabled or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="access-log", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        # ``destination`` is "-" for stdout, a path, or an open text stream
+        owned = isinstance(self.destination, str) and self.destination != "-"
+        if owned:
+            output = open(self.destination, "a", buffering=1 << 16)
+        else:
+            output = sys.stdout if self.destination == "-" else self.destination
+        stopping = False
+        try:
+            while not stopping:
+                try:
+                    batch = [self._queue.get(timeout=self.flush_interval)]
+                except queue.Empty:
+                    continue
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+
+                lines = []
+                for entry in batch:
+                    if entry is _STOP:
+                        stopping = True
+                        continue
+                    timestamp, method, path, user_agent, key = entry
+                    lines.append(json.dumps({
+                        "time": timestamp.isoformat(),
+                        "method": method,
+                        "path": path,
+                        "user_agent": user_agent,
+                        "api_key": key,
+                    }) + "\n")
+                output.write("".join(lines))
+                output.flush()
+                self.written += len(lines)
+        finally:
+            if owned:
+                output.close()
+
+    def close(self):
+        """Write out everything queued so far and stop the writer."""
+        if self._thread is None:
+            return
+        # Blocks only if the queue is full, which the writer is draining
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._thread = None
+
+    def stats(self) -> dict[str, int]:
+        return {"queued": self._queue.qsize(), "written": self.written, "dropped": self.dropped}
+
+
+def create_access_log() -> AccessLog:
+    destination = os.environ.get("MOVIE_DB_ACCESS_LOG", "-")
+    return AccessLog(
+        destination=None if destination == "off" else destination,
+        sample_rate=float(os.environ.get("MOVIE_DB_ACCESS_LOG_SAMPLE", "1.0")),
+    )
+
+
+access_log = create_access_log()
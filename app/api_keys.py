@@ -0,0 +1,230 @@
+"""API key registry with salted hashes, scopes and cached verification.
+
+Keys are issued as ``<key id><secret>``. The first ``KEY_ID_LENGTH``
+characters are a public id used to find the key's record; the key itself is
+only stored as a salted PBKDF2 hash. Each key belongs to a tenant, carries
+scopes (read, write, admin) and may expire.
+
+Hashing is deliberately slow, so successful verifications are cached in a
+bounded TTL cache keyed by a BLAKE2 digest of the presented key; only a
+cache miss pays for PBKDF2 (off the event loop). Revoking a key evicts its
+cache entries at once.
+
+Keys are persisted as JSON lines in ``MOVIE_DB_API_KEYS`` when it is set.
+``MOVIE_DB_ADMIN_KEY`` registers a bootstrap key with every scope. If no
+key is configured at all the old development key is registered so local
+setups keep working; revoke it once real keys exist.
+"""
+import asyncio
+import hashlib
+import hmac
+import os
+import secrets
+import time
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+from .schemas.api_keys import ApiKey, ApiKeyCreate, ApiKeyCreated, ApiKeyScope
+
+KEY_ID_LENGTH = 8
+HASH_ITERATIONS = 100_000
+DEVELOPMENT_KEY = "your-secret-key"
+
+
+class StoredApiKey(ApiKey):
+    salt: str
+    key_hash: str
+    iterations: int = HASH_ITERATIONS
+
+
+def _hash(api_key: str, salt: bytes, iterations: int) -> bytes:
+    return hashlib.pbkdf2_hmac("sha256", api_key.encode(), salt, iterations)
+
+
+def _digest(api_key: str) -> bytes:
+    return hashlib.blake2b(api_key.encode(), digest_size=16).digest()
+
+
+class VerificationCache:
+    """LRU of key digest -> key id for recently verified keys."""
+
+    def __init__(self, max_entries: int = 10_000, ttl: float = 60.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[bytes, tuple[str, float]] = OrderedDict()
+        self._digests_by_key: dict[str, set[bytes]] = {}
+
+    def get(self, digest: bytes) -> Optional[str]:
+        entry = self._entries.get(digest)
+        if entry is None:
+            return None
+        key_id, expires = entry
+        if expires <= time.monotonic():
+            self._remove(digest)
+            return None
+        self._entries.move_to_end(digest)
+        return key_id
+
+    def put(self, digest: bytes, key_id: str):
+        self._remove(digest)
+        self._entries[digest] = (key_id, time.monotonic() + self.ttl)
+        self._digests_by_key.setdefault(key_id, set()).add(digest)
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, digest: bytes):
+        entry = self._entries.pop(digest, None)
+        if entry is None:
+            return
+        digests = self._digests_by_key[entry[0]]
+        digests.discard(digest)
+        if not digests:
+            del self._digests_by_key[entry[0]]
+
+    def evict_key(self, key_id: str):
+        for digest in self._digests_by_key.pop(key_id, ()):
+            del self._entries[digest]
+
+    def clear(self):
+        self._entries.clear()
+        self._digests_by_key.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class ApiKeyRegistry:
+    def __init__(self, path: Optional[str] = None, cache_ttl: float = 60.0, cache_size: int = 10_000):
+        self.path = Path(path) if path else None
+        self.keys: dict[str, StoredApiKey] = {}
+        # Bootstrap keys registered from the environment are never written out
+        self._unsaved: set[str] = set()
+        self.cache = VerificationCache(max_entries=cache_size, ttl=cache_ttl)
+
+    # Storage
+
+    def load(self):
+        if self.path is None or not self.path.exists():
+            return
+        with open(self.path, "rb") as stored:
+            for line in stored:
+                if line.strip():
+                    key = StoredApiKey.model_validate_json(line)
+                    self.keys[key.key_id] = key
+
+    def _save(self):
+        if self.path is None:
+            return
+        temporary = self.path.with_name(self.path.name + ".tmp")
+        with open(temporary, "w") as stored:
+            for key in self.keys.values():
+                if key.key_id not in self._unsaved:
+                    stored.write(key.model_dump_json() + "\n")
+            stored.flush()
+            os.fsync(stored.fileno())
+        os.replace(temporary, self.path)
+
+    # Management
+
+    def register(
+        self,
+        api_key: str,
+        tenant: str,
+        scopes: list[ApiKeyScope],
+        expires_at: Optional[datetime] = None,
+        persist: bool = True,
+    ) -> ApiKey:
+        """Add an existing plaintext key to the registry."""
+        if len(api_key) <= KEY_ID_LENGTH:
+            raise ValueError(f"API keys must be longer than {KEY_ID_LENGTH} characters")
+        key_id = api_key[:KEY_ID_LENGTH]
+        if key_id in self.keys:
+            raise ValueError("An API key with this id already exists")
+        settings = ApiKeyCreate(tenant=tenant, scopes=scopes, expires_at=expires_at)
+        salt = secrets.token_bytes(16)
+        stored = StoredApiKey(
+            key_id=key_id,
+            salt=salt.hex(),
+            key_hash=_hash(api_key, salt, HASH_ITERATIONS).hex(),
+            **settings.model_dump()
+        )
+        self.keys[key_id] = stored
+        if persist:
+            self._save()
+        else:
+            self._unsaved.add(key_id)
+        return ApiKey(**stored.model_dump())
+
+    def create(self, settings: ApiKeyCreate) -> ApiKeyCreated:
+        """Issue a new random key; the plaintext is only returned here."""
+        while True:
+            api_key = secrets.token_hex(KEY_ID_LENGTH // 2) + secrets.token_urlsafe(32)
+            if api_key[:KEY_ID_LENGTH] not in self.keys:
+                break
+        key = self.register(api_key, settings.tenant, settings.scopes, settings.expires_at)
+        return ApiKeyCreated(api_key=api_key, **key.model_dump())
+
+    def revoke(self, key_id: str) -> bool:
+        if self.keys.pop(key_id, None) is None:
+            return False
+        self._unsaved.discard(key_id)
+        self.cache.evict_key(key_id)
+        self._save()
+        return True
+
+    def list_keys(self, tenant: Optional[str] = None) -> list[ApiKey]:
+        return [
+            ApiKey(**key.model_dump())
+            for key in self.keys.values()
+            if tenant is None or key.tenant == tenant
+        ]
+
+    # Verification
+
+    @staticmethod
+    def _matches(key: StoredApiKey, api_key: str) -> bool:
+        expected = bytes.fromhex(key.key_hash)
+        return hmac.compare_digest(_hash(api_key, bytes.fromhex(key.salt), key.iterations), expected)
+
+    async def verify(self, api_key: str) -> Optional[StoredApiKey]:
+        """Return the key's record if ``api_key`` is valid and unexpired."""
+        digest = _digest(api_key)
+        key_id = self.cache.get(digest)
+        if key_id is not None:
+            key = self.keys.get(key_id)
+        else:
+            key = self.keys.get(api_key[:KEY_ID_LENGTH])
+            if key is None:
+                return None
+            if not await asyncio.to_thread(self._matches, key, api_key):
+                return None
+            # The key may have been revoked while it was being hashed
+            if self.keys.get(key.key_id) is not key:
+                return None
+            self.cache.put(digest, key.key_id)
+
+        if key is None:
+            return None
+        if key.expires_at is not None and key.expires_at <= datetime.utcnow():
+            return None
+        return key
+
+
+def create_registry() -> ApiKeyRegistry:
+    registry = ApiKeyRegistry(
+        path=os.environ.get("MOVIE_DB_API_KEYS"),
+        cache_ttl=float(os.environ.get("MOVIE_DB_API_KEY_CACHE_TTL", "60")),
+    )
+    registry.load()
+    every_scope = list(ApiKeyScope)
+    admin_key = os.environ.get("MOVIE_DB_ADMIN_KEY")
+    if admin_key and admin_key[:KEY_ID_LENGTH] not in registry.keys:
+        registry.register(admin_key, "admin", every_scope, persist=False)
+    if not registry.keys:
+        registry.register(DEVELOPMENT_KEY, "development", every_scope, persist=False)
+    return registry
+
+
+api_keys = create_registry()
@@ -0,0 +1,337 @@
+"""Column-wise storage for the two largest tables.
+
+``MovieTable`` and ``ViewingHistoryTable`` behave like the ``dict[int, model]``
+tables on ``DummyDatabase`` but keep each field in a typed ``array`` indexed
+by row id, instead of one Pydantic instance (plus two ``datetime`` objects)
+per row. Low-cardinality strings such as genres are interned into a shared
+pool and stored as small integers; models are only built when a row is read.
+
+Ids are used directly as array slots, which suits the dense, increasing ids
+the API hands out. Rows that cannot be packed losslessly (for example
+timezone-aware timestamps) are kept as models in an overflow dict.
+"""
+from array import array
+from datetime import date, datetime, timedelta
+from typing import Iterator, Optional
+
+from .schemas.movies import Movie
+from .schemas.viewing_history import ViewingHistory, ViewingStatus
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+# Values of the ``present`` column
+_EMPTY, _PACKED, _OVERFLOW = 0, 1, 2
+
+_MISSING = object()
+
+
+def _to_micros(value: datetime) -> int:
+    return (value - _EPOCH) // _MICROSECOND
+
+
+def _from_micros(value: int) -> datetime:
+    return _EPOCH + timedelta(microseconds=value)
+
+
+class StringPool:
+    """Interns repeated strings and hands out small integer codes."""
+
+    def __init__(self):
+        self.strings: list[str] = []
+        self.codes: dict[str, int] = {}
+
+    def code(self, value: str) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.strings)
+            self.strings.append(value)
+        return code
+
+
+class ColumnarTable:
+    """Mapping of id -> model stored as typed columns.
+
+    Subclasses list their numeric columns in ``columns`` (name -> array
+    typecode) and their object columns in ``object_columns``, and implement
+    ``_pack``/``_unpack``.
+    """
+
+    columns: dict[str, str] = {}
+    object_columns: tuple[str, ...] = ()
+
+    def __init__(self):
+        self.present = bytearray()
+        self.arrays = {name: array(typecode) for name, typecode in self.columns.items()}
+        self.objects = {name: [] for name in self.object_columns}
+        self.overflow: dict[int, object] = {}
+        self._count = 0
+
+    # Packing, implemented by subclasses
+
+    def _pack(self, row) -> Optional[tuple[dict, dict]]:
+        """Split a model into (numeric values, object values), or ``None``."""
+        raise NotImplementedError
+
+    def _unpack(self, slot: int):
+        raise NotImplementedError
+
+    # Storage
+
+    def _grow(self, slot: int):
+        size = len(self.present)
+        if slot < size:
+            return
+        new_size = max(slot + 1, size + size // 2, 16)
+        extra = new_size - size
+        self.present.extend(bytes(extra))
+        for values in self.arrays.values():
+            values.frombytes(bytes(extra * values.itemsize))
+        for values in self.objects.values():
+            values.extend([None] * extra)
+
+    def __setitem__(self, row_id: int, row):
+        if row_id < 0:
+            raise KeyError(row_id)
+        self._grow(row_id)
+        if self.present[row_id] == _EMPTY:
+            self._count += 1
+        else:
+            self._clear(row_id)
+
+        packed = self._pack(row)
+        if packed is None:
+            self.present[row_id] = _OVERFLOW
+            self.overflow[row_id] = row
+            return
+        numbers, objects = packed
+        for name, value in numbers.items():
+            self.arrays[name][row_id] = value
+        for name, value in objects.items():
+            self.objects[name][row_id] = value
+        self.present[row_id] = _PACKED
+
+    def _clear(self, slot: int):
+        self.overflow.pop(slot, None)
+        for values in self.objects.values():
+            values[slot] = None
+
+    def __getitem__(self, row_id: int):
+        state = self.present[row_id] if 0 <= row_id < len(self.present) else _EMPTY
+        if state == _PACKED:
+            return self._unpack(row_id)
+        if state == _OVERFLOW:
+            return self.overflow[row_id]
+        raise KeyError(row_id)
+
+    def get(self, row_id: int, default=None):
+        try:
+            return self[row_id]
+        except KeyError:
+            return default
+
+    def pop(self, row_id: int, default=_MISSING):
+        try:
+            row = self[row_id]
+        except KeyError:
+            if default is _MISSING:
+                raise
+            return default
+        self._clear(row_id)
+        self.present[row_id] = _EMPTY
+        self._count -= 1
+        return row
+
+    def __delitem__(self, row_id: int):
+        self.pop(row_id)
+
+    def __contains__(self, row_id) -> bool:
+        return isinstance(row_id, int) and 0 <= row_id < len(self.present) and self.present[row_id] != _EMPTY
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __bool__(self) -> bool:
+        return self._count > 0
+
+    def keys(self) -> Iterator[int]:
+        present = self.present
+        return (slot for slot in range(len(present)) if present[slot] != _EMPTY)
+
+    __iter__ = keys
+
+    def values(self) -> Iterator:
+        return (self[row_id] for row_id in self.keys())
+
+    def items(self) -> Iterator[tuple]:
+        return ((row_id, self[row_id]) for row_id in self.keys())
+
+    def copy(self):
+        """Point-in-time copy; numeric columns are copied as raw memory."""
+        clone = object.__new__(type(self))
+        clone.__dict__.update(self.__dict__)
+        clone.present = bytearray(self.present)
+        clone.arrays = {name: array(values.typecode, values) for name, values in self.arrays.items()}
+        clone.objects = {name: list(values) for name, values in self.objects.items()}
+        clone.overflow = dict(self.overflow)
+        return clone
+
+    def memory_bytes(self) -> int:
+        """Bytes held by the column buffers (excluding string objects)."""
+        total = len(self.present)
+        total += sum(len(values) * values.itemsize for values in self.arrays.values())
+        total += sum(len(values) * 8 for values in self.objects.values())
+        return total
+
+
+class MovieTable(ColumnarTable):
+    columns = {
+        "director_id": "q",
+        "runtime_minutes": "H",
+        "release_date": "i",
+        "imdb_number": "I",
+        "imdb_digits": "B",
+        "genre": "I",
+        "created_at": "q",
+        "updated_at": "q",
+    }
+    object_columns = ("title", "description")
+
+    def __init__(self):
+        super().__init__()
+        self.genres = StringPool()
+
+    def _pack(self, movie: Movie):
+        if movie.created_at.tzinfo or movie.updated_at.tzinfo:
+            return None
+        if not 0 <= movie.runtime_minutes <= 0xFFFF:
+            return None
+        digits = movie.imdb_id[2:]
+        if not movie.imdb_id.startswith("tt") or not digits.isdigit() or int(digits) > 0xFFFFFFFF:
+            return None
+        return (
+            {
+                "director_id": movie.director_id,
+                "runtime_minutes": movie.runtime_minutes,
+                "release_date": movie.release_date.toordinal(),
+                "imdb_number": int(digits),
+                "imdb_digits": len(digits),
+                "genre": self.genres.code(movie.genre),
+                "created_at": _to_micros(movie.created_at),
+                "updated_at": _to_micros(movie.updated_at),
+            },
+            {"title": movie.title, "description": movie.description},
+        )
+
+    def _unpack(self, slot: int) -> Movie:
+        arrays, objects = self.arrays, self.objects
+        return Movie.model_construct(
+            created_at=_from_micros(arrays["created_at"][slot]),
+            updated_at=_from_micros(arrays["updated_at"][slot]),
+            title=objects["title"][slot],
+            description=objects["description"][slot],
+            imdb_id="tt%0*d" % (arrays["imdb_digits"][slot], arrays["imdb_number"][slot]),
+            release_date=date.fromordinal(arrays["release_date"][slot]),
+            genre=self.genres.strings[arrays["genre"][slot]],
+            director_id=arrays["director_id"][slot],
+            runtime_minutes=arrays["runtime_minutes"][slot],
+            id=slot,
+        )
+
+
+_STATUSES = list(ViewingStatus)
+_STATUS_CODES = {status: code for code, status in enumerate(_STATUSES)}
+
+# Bits of the ``flags`` column
+_MINUTE_INT, _MINUTE_TEXT, _HAS_RUNTIME = 1, 2, 4
+
+
+class ViewingHistoryTable(ColumnarTable):
+    columns = {
+        "movie_id": "q",
+        "status": "B",
+        "flags": "B",
+        "current_minute": "q",
+        "runtime_minutes": "q",
+        "created_at": "q",
+        "updated_at": "q",
+        # 0 for no viewer, otherwise 1 + the viewer's code in ``viewers``
+        "viewer": "I",
+    }
+
+    def __init__(self):
+        super().__init__()
+        # A viewer has an entry per movie watched, so their ids are pooled
+        self.viewers = StringPool()
+        # Rarely set fields are kept sparsely, by slot
+        self.minute_text: dict[int, str] = {}
+        self.notes: dict[int, str] = {}
+
+    def _pack(self, history: ViewingHistory):
+        if history.created_at.tzinfo or history.updated_at.tzinfo:
+            return None
+        flags, minute, runtime = 0, 0, 0
+        if isinstance(history.current_minute, bool):
+            return None
+        if isinstance(history.current_minute, int):
+            flags |= _MINUTE_INT
+            minute = history.current_minute
+        elif isinstance(history.current_minute, str):
+            flags |= _MINUTE_TEXT
+        if history.runtime_minutes is not None:
+            flags |= _HAS_RUNTIME
+            runtime = history.runtime_minutes
+        if not (-2**63 <= minute < 2**63 and -2**63 <= runtime < 2**63):
+            return None
+
+        slot = history.id
+        if flags & _MINUTE_TEXT:
+            self.minute_text[slot] = history.current_minute
+        if history.notes is not None:
+            self.notes[slot] = history.notes
+        return (
+            {
+                "movie_id": history.movie_id,
+                "status": _STATUS_CODES[history.status],
+                "flags": flags,
+                "current_minute": minute,
+                "runtime_minutes": runtime,
+                "created_at": _to_micros(history.created_at),
+                "updated_at": _to_micros(history.updated_at),
+                "viewer": 0 if history.viewer_id is None else 1 + self.viewers.code(history.viewer_id),
+            },
+            {},
+        )
+
+    def _clear(self, slot: int):
+        super()._clear(slot)
+        self.minute_text.pop(slot, None)
+        self.notes.pop(slot, None)
+
+    def _unpack(self, slot: int) -> ViewingHistory:
+        arrays = self.arrays
+        flags = arrays["flags"][slot]
+        if flags & _MINUTE_INT:
+            current_minute = arrays["current_minute"][slot]
+        elif flags & _MINUTE_TEXT:
+            current_minute = self.minute_text[slot]
+        else:
+            current_minute = None
+        viewer = arrays["viewer"][slot]
+        return ViewingHistory.model_construct(
+            created_at=_from_micros(arrays["created_at"][slot]),
+            updated_at=_from_micros(arrays["updated_at"][slot]),
+            movie_id=arrays["movie_id"][slot],
+            status=_STATUSES[arrays["status"][slot]],
+            current_minute=current_minute,
+            runtime_minutes=arrays["runtime_minutes"][slot] if flags & _HAS_RUNTIME else None,
+            notes=self.notes.get(slot),
+            viewer_id=self.viewers.strings[viewer - 1] if viewer else None,
+            id=slot,
+        )
+
+    def copy(self):
+        clone = super().copy()
+        clone.minute_text = dict(self.minute_text)
+        clone.notes = dict(self.notes)
+        return clone
@@ -0,0 +1,166 @@
+"""Gzip compression of responses, negotiated with ``Accept-Encoding``.
+
+``CompressionMiddleware`` compresses JSON, NDJSON and text responses for
+clients that accept gzip. Bodies smaller than ``minimum_size`` are sent as
+they are, since compressing them costs more CPU than it saves bandwidth.
+Streamed responses (the exports) are compressed chunk by chunk and flushed
+after every chunk, so the client still receives rows as they are produced.
+
+Cached responses carry their compressed form with them (see
+``CacheEntry.gzipped``): a popular page is compressed once, not on every
+request. Those responses arrive with ``Content-Encoding`` already set and
+the middleware leaves them alone.
+
+Configured with ``MOVIE_DB_GZIP_LEVEL`` (1-9, 0 turns compression off;
+default 6) and ``MOVIE_DB_GZIP_MIN_SIZE`` (bytes, default 1024).
+``benchmarks/compression.py`` reports the bytes saved and the CPU cost.
+"""
+import gzip
+import os
+import zlib
+from functools import lru_cache
+from typing import Optional
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Content types worth compressing; everything we send is one of these
+_COMPRESSIBLE = ("application/json", "application/x-ndjson", "text/")
+_NO_BODY = (204, 304)
+
+
+@lru_cache(maxsize=64)
+def _accepts_gzip(accept_encoding: str) -> bool:
+    """Whether an ``Accept-Encoding`` value allows gzip (honouring ``q=0``)."""
+    for coding in accept_encoding.lower().split(","):
+        name, _, params = coding.partition(";")
+        name = name.strip()
+        if name not in ("gzip", "x-gzip", "*"):
+            continue
+        quality = params.strip()
+        if quality.startswith("q="):
+            try:
+                return float(quality[2:]) > 0
+            except ValueError:
+                return False
+        return True
+    return False
+
+
+class Compression:
+    def __init__(self, level: int = 6, minimum_size: int = 1024):
+        if not 0 <= level <= 9:
+            raise ValueError("Compression level must be between 0 and 9")
+        self.level = level
+        self.minimum_size = minimum_size
+
+    @property
+    def enabled(self) -> bool:
+        return self.level > 0
+
+    def accepts(self, accept_encoding: Optional[str]) -> bool:
+        return self.enabled and bool(accept_encoding) and _accepts_gzip(accept_encoding)
+
+    def worth_compressing(self, body: bytes) -> bool:
+        return len(body) >= self.minimum_size
+
+    def compress(self, body: bytes) -> bytes:
+        # A fixed mtime keeps the output, and so cached copies, deterministic
+        return gzip.compress(body, compresslevel=self.level, mtime=0)
+
+    def compressor(self):
+        """Incremental gzip stream for bodies sent in several chunks."""
+        return zlib.compressobj(self.level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+
+def create_compression() -> Compression:
+    return Compression(
+        level=int(os.environ.get("MOVIE_DB_GZIP_LEVEL", "6")),
+        minimum_size=int(os.environ.get("MOVIE_DB_GZIP_MIN_SIZE", "1024")),
+    )
+
+
+compression = create_compression()
+
+
+def _header(scope: Scope, name: bytes) -> Optional[str]:
+    for key, value in scope["headers"]:
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+def weak_etag(etag: str) -> str:
+    # The compressed bytes differ, so a strong validator would be wrong
+    return etag if etag.startswith("W/") else "W/" + etag
+
+
+class CompressionMiddleware:
+    def __init__(self, app: ASGIApp, settings: Compression = compression):
+        self.app = app
+        self.settings = settings
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not self.settings.accepts(_header(scope, b"accept-encoding")):
+            await self.app(scope, receive, send)
+            return
+        await _CompressingResponder(self.settings, send).run(self.app, scope, receive)
+
+
+class _CompressingResponder:
+    def __init__(self, settings: Compression, send: Send):
+        self.settings = settings
+        self.send = send
+        self.start: Optional[Message] = None
+        self.compressor = None
+        self.passthrough = False
+
+    async def run(self, app: ASGIApp, scope: Scope, receive: Receive):
+        await app(scope, receive, self.send_compressed)
+
+    async def send_compressed(self, message: Message):
+        kind = message["type"]
+        if kind == "http.response.start":
+            # Held back until the first body chunk shows whether to compress
+            self.start = message
+            return
+        if kind != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.start is None:
+            # Later chunks of a compressed stream
+            flush = zlib.Z_SYNC_FLUSH if more_body else zlib.Z_FINISH
+            data = self.compressor.compress(body) + self.compressor.flush(flush)
+            await self.send({"type": kind, "body": data, "more_body": more_body})
+            return
+
+        start, self.start = self.start, None
+        headers = MutableHeaders(raw=start["headers"])
+        if (
+            start["status"] in _NO_BODY
+            or "content-encoding" in headers
+            or not headers.get("content-type", "").startswith(_COMPRESSIBLE)
+            or (not more_body and not self.settings.worth_compressing(body))
+        ):
+            self.passthrough = True
+            await self.send(start)
+            await self.send(message)
+            return
+
+        headers["Content-Encoding"] = "gzip"
+        headers.add_vary_header("Accept-Encoding")
+        if "etag" in headers:
+            headers["ETag"] = weak_etag(headers["etag"])
+        if more_body:
+            if "content-length" in headers:
+                del headers["Content-Length"]
+            self.compressor = self.settings.compressor()
+            data = self.compressor.compress(body) + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+        else:
+            data = self.settings.compress(body)
+            headers["Content-Length"] = str(len(data))
+        await self.send(start)
+        await self.send({"type": kind, "body": data, "more_body": more_body})
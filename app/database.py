@@ -1,15 +1,536 @@
+import asyncio
+from bisect import bisect_left, bisect_right
+from typing import Awaitable, Callable, Iterable, Iterator, Optional
+
+from .columnar import MovieTable, ViewingHistoryTable
+from .mvcc import Snapshot, VersionLog
+from .query import COLUMN_KEYS, MovieQuery, OrderedIndex, plan
 from .schemas.directors import Director
 from .schemas.movies import Movie
 from .schemas.reviews import Review
 from .schemas.watchlists import WatchList
 from .schemas.viewing_history import ViewingHistory
 
+
+class SortedIdSet:
+    """Set of ids kept in ascending order, so index hits come back in id order.
+
+    Deleting from the middle of a long list moves everything after it, so
+    discarded ids are only marked and dropped together, in one pass, by
+    the next read.
+    """
+
+    __slots__ = ("_ids", "_gone")
+
+    def __init__(self, ids: Iterable[int] = ()):
+        self._ids = sorted(set(ids))
+        # Discarded ids still in ``_ids``; None until there are any, as most
+        # sets are small index buckets
+        self._gone: Optional[set[int]] = None
+
+    def add(self, item_id: int):
+        ids = self._ids
+        # Ids are allocated in increasing order, so appending is the common case
+        if not ids or ids[-1] < item_id:
+            ids.append(item_id)
+            return
+        if self._gone and item_id in self._gone:
+            # Still in the list
+            self._gone.discard(item_id)
+            return
+        position = bisect_left(ids, item_id)
+        if position == len(ids) or ids[position] != item_id:
+            ids.insert(position, item_id)
+
+    def discard(self, item_id: int):
+        ids = self._ids
+        position = bisect_left(ids, item_id)
+        if position < len(ids) and ids[position] == item_id:
+            if self._gone is None:
+                self._gone = set()
+            self._gone.add(item_id)
+
+    def _live(self) -> list[int]:
+        gone = self._gone
+        if gone:
+            ids, kept, start = self._ids, [], 0
+            for item_id in sorted(gone):
+                position = bisect_left(ids, item_id, start)
+                kept += ids[start:position]
+                start = position + 1
+            kept += ids[start:]
+            # A new list, so iterators already running keep the old one
+            self._ids = kept
+            self._gone = None
+        return self._ids
+
+    def position_after(self, item_id: Optional[int]) -> int:
+        """Index of the first id greater than ``item_id`` (0 for ``None``)."""
+        if item_id is None:
+            return 0
+        return bisect_right(self._live(), item_id)
+
+    def slice_after(self, item_id: Optional[int], skip: int, count: int) -> list[int]:
+        start = self.position_after(item_id) + skip
+        return self._live()[start : start + count]
+
+    def iter_after(self, item_id: Optional[int]) -> Iterator[int]:
+        start = self.position_after(item_id)
+        ids = self._live()
+        for position in range(start, len(ids)):
+            yield ids[position]
+
+    def iter_before(self, item_id: Optional[int]) -> Iterator[int]:
+        """Ids smaller than ``item_id`` (all for ``None``), in descending order."""
+        ids = self._live()
+        stop = len(ids) if item_id is None else bisect_left(ids, item_id)
+        for position in range(stop - 1, -1, -1):
+            yield ids[position]
+
+    def __contains__(self, item_id: int) -> bool:
+        ids = self._ids
+        position = bisect_left(ids, item_id)
+        return position < len(ids) and ids[position] == item_id and not (self._gone and item_id in self._gone)
+
+    def __getitem__(self, index):
+        return self._live()[index]
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._live())
+
+    def __len__(self) -> int:
+        return len(self._ids) - (len(self._gone) if self._gone else 0)
+
+
+_EMPTY = SortedIdSet()
+
+
+def _index_add(index: dict, key, item_id: int):
+    bucket = index.get(key)
+    if bucket is None:
+        bucket = index[key] = SortedIdSet()
+    bucket.add(item_id)
+
+
+def _index_discard(index: dict, key, item_id: int):
+    bucket = index.get(key)
+    if bucket is None:
+        return
+    bucket.discard(item_id)
+    if not bucket:
+        del index[key]
+
+
+ID_BLOCK_SIZE = 32
+
+
+class IdSequence:
+    """Monotonic ids for one table, handed out from reserved blocks.
+
+    ``reserve(count)`` durably reserves ``count`` consecutive ids in the
+    store and returns the first; ids are then served from the block in
+    O(1) without touching the store. Ids left in a block when the process
+    exits are skipped, never reused, so ids increase but may have gaps.
+    Each process reserves its own blocks: ids are unique across workers
+    sharing a store and increasing within each worker.
+    """
+
+    def __init__(self, reserve: Callable[[int], Awaitable[int]], block_size: int = ID_BLOCK_SIZE):
+        self._reserve = reserve
+        self.block_size = block_size
+        self._next = 0
+        self._limit = 0
+        self._lock = asyncio.Lock()
+
+    async def allocate(self, count: int = 1) -> range:
+        # No await between the check and the bump, so concurrent requests
+        # on the event loop never get the same id
+        if self._limit - self._next >= count:
+            first = self._next
+            self._next += count
+            return range(first, first + count)
+
+        async with self._lock:
+            if count > self.block_size:
+                # Bulk inserts get their own exact block; what is left of the
+                # current one is dropped so later ids still come after it
+                first = await self._reserve(count)
+                self._next = self._limit
+                return range(first, first + count)
+            if self._limit - self._next < count:
+                first = await self._reserve(self.block_size)
+                self._next, self._limit = first, first + self.block_size
+            first = self._next
+            self._next += count
+            return range(first, first + count)
+
+
+class Sequences:
+    """One ``IdSequence`` per table, reserving blocks through ``reserve(table, count)``."""
+
+    def __init__(self, reserve: Callable[[str, int], Awaitable[int]], block_size: int = ID_BLOCK_SIZE):
+        self._reserve = reserve
+        self.block_size = block_size
+        self._sequences: dict[str, IdSequence] = {}
+
+    async def allocate(self, table: str, count: int = 1) -> range:
+        sequence = self._sequences.get(table)
+        if sequence is None:
+            async def reserve(count: int) -> int:
+                return await self._reserve(table, count)
+            sequence = self._sequences[table] = IdSequence(reserve, self.block_size)
+        return await sequence.allocate(count)
+
+
 class DummyDatabase:
-    directors: dict[int, Director] = {}
-    movies: dict[int, Movie] = {}
-    reviews: dict[int, Review] = {}
-    watchlists: dict[int, WatchList] = {}
-    viewing_history: dict[int, ViewingHistory] = {}
+    # Set by Persistence.open() when a data directory is configured
+    persistence = None
+
+    directors: dict[int, Director]
+    movies: dict[int, Movie]
+    reviews: dict[int, Review]
+    watchlists: dict[int, WatchList]
+    viewing_history: dict[int, ViewingHistory]
+
+    # Secondary indexes, kept in sync by the add_*/remove_* methods below
+    movies_by_director: dict[int, SortedIdSet]
+    movies_by_genre: dict[str, SortedIdSet]
+    reviews_by_movie: dict[int, SortedIdSet]
+    history_by_movie: dict[int, SortedIdSet]
+    watchlists_by_movie: dict[int, SortedIdSet]
+    # Movie ids by release date and by runtime, for ranges and sorting
+    movie_orders: dict[str, OrderedIndex]
+
+    # Primary keys of every table in id order, used to seek pages by cursor
+    ordered_ids: dict[str, SortedIdSet]
+
+    # Next unreserved id per table; only ever grows
+    next_ids: dict[str, int]
+
+    # Encoded JSON of each row, kept only when encode_rows is switched on
+    # (the fast serialization mode)
+    encode_rows = False
+    encoded: dict[str, dict[int, bytes]]
+
+    # Published versions and the undo entries pinned readers need
+    # (app/mvcc.py); insert() and delete() each publish one version
+    versions: VersionLog
+
+    # Set by the shared-mode owner (app/repositories/shared.py): table ->
+    # {id: row before its first change}, for every row changed, cascades
+    # included, since the owner last took the dict
+    changed_rows: Optional[dict[str, dict]] = None
+
+    def __init__(self):
+        # Each instance is a separate, empty store: the app serves ``db``
+        # below, benchmarks and tests build their own
+        self.directors = {}
+        self.movies = {}
+        self.reviews = {}
+        self.watchlists = {}
+        self.viewing_history = {}
+        self.movies_by_director = {}
+        self.movies_by_genre = {}
+        self.reviews_by_movie = {}
+        self.history_by_movie = {}
+        self.watchlists_by_movie = {}
+        self.movie_orders = {column: OrderedIndex() for column in COLUMN_KEYS}
+        self.ordered_ids = {table: SortedIdSet() for table in _TABLES}
+        self.next_ids = {table: 1 for table in _TABLES}
+        self.encoded = {table: {} for table in _TABLES}
+        self.versions = VersionLog()
+
+    # Write hooks
+
+    def _before_change(self, table: str, row_id: int):
+        if self.versions.pinned:
+            self.versions.record(table, row_id, getattr(self, table).get(row_id))
+        changed = self.changed_rows
+        if changed is not None and row_id not in changed[table]:
+            changed[table][row_id] = getattr(self, table).get(row_id)
+
+    def _after_put(self, table: str, row):
+        if row.id >= self.next_ids[table]:
+            self.next_ids[table] = row.id + 1
+        if self.encode_rows:
+            self.encoded[table][row.id] = row.__pydantic_serializer__.to_json(row)
+        if self.persistence is not None:
+            self.persistence.log_put(self, table, row)
+
+    def _after_delete(self, table: str, row_id: int):
+        self.encoded[table].pop(row_id, None)
+        if self.persistence is not None:
+            self.persistence.log_delete(self, table, row_id)
+
+    def row_json(self, table: str, row_id: int) -> bytes:
+        """Encoded JSON of a row, encoding it now if it is not cached yet."""
+        encoded = self.encoded[table].get(row_id)
+        if encoded is None:
+            row = getattr(self, table)[row_id]
+            encoded = row.__pydantic_serializer__.to_json(row)
+            if self.encode_rows:
+                self.encoded[table][row_id] = encoded
+        return encoded
+
+    # Id sequences
+
+    def reserve_ids(self, table: str, count: int) -> int:
+        """Reserve ``count`` consecutive new ids in ``table``; returns the first."""
+        first = self.next_ids[table]
+        self.next_ids[table] = first + count
+        if self.persistence is not None:
+            self.persistence.log_sequence(self, table, first + count)
+        return first
+
+    def restore_sequence(self, table: str, next_id: int):
+        self.next_ids[table] = max(self.next_ids[table], next_id)
+
+    # Persistence
+
+    async def commit(self):
+        """Wait until the writes made so far are durable, if persistence is on."""
+        if self.persistence is not None:
+            await self.persistence.commit()
+
+    def capture_tables(self) -> dict:
+        """Point-in-time copies of every table, for a snapshot."""
+        return {table: getattr(self, table).copy() for table in _TABLES}
+
+    def restore_row(self, table: str, data: dict):
+        """Insert a row read back from a snapshot or log without logging it."""
+        model = _TABLES[table][0]
+        persistence, self.persistence = self.persistence, None
+        try:
+            self.insert(table, model.model_validate(data))
+        finally:
+            self.persistence = persistence
+
+    def drop_row(self, table: str, row_id: int):
+        persistence, self.persistence = self.persistence, None
+        try:
+            if row_id in getattr(self, table):
+                self.delete(table, row_id)
+        finally:
+            self.persistence = persistence
+
+    # Generic access by table name
+
+    def insert(self, table: str, row):
+        with self.versions.write():
+            getattr(self, _TABLES[table][1])(row)
+
+    def delete(self, table: str, row_id: int):
+        with self.versions.write():
+            return getattr(self, _TABLES[table][2])(row_id)
+
+    def delete_many(self, table: str, row_ids: Iterable[int]) -> list:
+        """Delete the rows of ``row_ids`` that exist, as one version."""
+        rows = getattr(self, table)
+        present = [row_id for row_id in dict.fromkeys(row_ids) if row_id in rows]
+        with self.versions.write():
+            if table == "movies":
+                return self.remove_movies(present)
+            remove = getattr(self, _TABLES[table][2])
+            return [remove(row_id) for row_id in present]
+
+    # Consistent reads
+
+    def snapshot(self) -> Snapshot:
+        """Pin the current version; release the snapshot when done reading."""
+        return Snapshot(self, self.versions.pin())
+
+    # Storage layout
+
+    def use_compact_storage(self):
+        """Keep movies and viewing history in columnar tables (app/columnar.py).
+
+        Must be called before any rows are loaded.
+        """
+        if self.movies or self.viewing_history:
+            raise RuntimeError("Compact storage must be enabled on an empty database")
+        self.movies = MovieTable()
+        self.viewing_history = ViewingHistoryTable()
+
+    # Directors
+
+    def add_director(self, director: Director):
+        self._before_change("directors", director.id)
+        self.directors[director.id] = director
+        self.ordered_ids["directors"].add(director.id)
+        self._after_put("directors", director)
+
+    def remove_director(self, director_id: int) -> Director:
+        self._before_change("directors", director_id)
+        director = self.directors.pop(director_id)
+        self.ordered_ids["directors"].discard(director_id)
+        self._after_delete("directors", director_id)
+        return director
+
+    def director_has_movies(self, director_id: int) -> bool:
+        return director_id in self.movies_by_director
+
+    # Movies
+
+    def add_movie(self, movie: Movie):
+        self._before_change("movies", movie.id)
+        previous = self.movies.get(movie.id)
+        if previous is not None:
+            _index_discard(self.movies_by_director, previous.director_id, movie.id)
+            _index_discard(self.movies_by_genre, previous.genre.casefold(), movie.id)
+        self.movies[movie.id] = movie
+        self.ordered_ids["movies"].add(movie.id)
+        _index_add(self.movies_by_director, movie.director_id, movie.id)
+        _index_add(self.movies_by_genre, movie.genre.casefold(), movie.id)
+        for column, key in COLUMN_KEYS.items():
+            self.movie_orders[column].add(key(movie), movie.id)
+        self._after_put("movies", movie)
+
+    def remove_movie(self, movie_id: int) -> Movie:
+        """Delete a movie together with its reviews, history and watchlist entries."""
+        return self.remove_movies([movie_id])[0]
+
+    def remove_movies(self, movie_ids: Iterable[int]) -> list[Movie]:
+        """Delete several movies with one cascade pass over their dependents.
+
+        A watchlist holding more than one of them is rewritten only once.
+        """
+        doomed = list(dict.fromkeys(movie_ids))
+        removed = set(doomed)
+        watchlist_ids = set()
+        for movie_id in doomed:
+            for review_id in list(self.reviews_by_movie.get(movie_id, _EMPTY)):
+                self.remove_review(review_id)
+            for history_id in list(self.history_by_movie.get(movie_id, _EMPTY)):
+                self.remove_history(history_id)
+            watchlist_ids.update(self.watchlists_by_movie.get(movie_id, _EMPTY))
+
+        # Watchlists are replaced rather than edited in place, so snapshots
+        # and pinned readers keep the version they started with
+        for list_id in sorted(watchlist_ids):
+            watchlist = self.watchlists[list_id]
+            movie_ids = [other for other in watchlist.movie_ids if other not in removed]
+            self.add_watchlist(watchlist.model_copy(update={"movie_ids": movie_ids}))
+
+        movies = []
+        for movie_id in doomed:
+            self._before_change("movies", movie_id)
+            movie = self.movies.pop(movie_id)
+            self.ordered_ids["movies"].discard(movie_id)
+            _index_discard(self.movies_by_director, movie.director_id, movie_id)
+            _index_discard(self.movies_by_genre, movie.genre.casefold(), movie_id)
+            for index in self.movie_orders.values():
+                index.discard(movie_id)
+            self._after_delete("movies", movie_id)
+            movies.append(movie)
+        return movies
+
+    def movie_ids(
+        self,
+        query: MovieQuery = MovieQuery(),
+        after: Optional[int] = None,
+        after_key: Optional[int] = None,
+        limit: Optional[int] = None,
+    ) -> Iterable[int]:
+        """Movie ids matching ``query``, in its order (see ``app/query.py``).
+
+        A single sorted set is returned as is so pagination can seek into it;
+        anything else yields the ids past the cursor lazily.
+        """
+        buckets = []
+        if query.genre:
+            buckets.append(self.movies_by_genre.get(query.genre.casefold(), _EMPTY))
+        if query.director_id:
+            buckets.append(self.movies_by_director.get(query.director_id, _EMPTY))
+        return plan(query, self.ordered_ids["movies"], buckets, self.movie_orders, after, after_key, limit)
+
+    def movie_key(self, column: str, movie_id: int) -> Optional[int]:
+        """Sort key of a movie in the ``column`` order."""
+        return self.movie_orders[column].key(movie_id)
+
+    # Reviews
+
+    def add_review(self, review: Review):
+        self._before_change("reviews", review.id)
+        previous = self.reviews.get(review.id)
+        if previous is not None:
+            _index_discard(self.reviews_by_movie, previous.movie_id, review.id)
+        self.reviews[review.id] = review
+        self.ordered_ids["reviews"].add(review.id)
+        _index_add(self.reviews_by_movie, review.movie_id, review.id)
+        self._after_put("reviews", review)
+
+    def remove_review(self, review_id: int) -> Review:
+        self._before_change("reviews", review_id)
+        review = self.reviews.pop(review_id)
+        self.ordered_ids["reviews"].discard(review_id)
+        _index_discard(self.reviews_by_movie, review.movie_id, review_id)
+        self._after_delete("reviews", review_id)
+        return review
+
+    def reviews_for_movie(self, movie_id: int) -> list[Review]:
+        return [
+            self.reviews[review_id]
+            for review_id in self.reviews_by_movie.get(movie_id, _EMPTY)
+        ]
+
+    # Watchlists
+
+    def add_watchlist(self, watchlist: WatchList):
+        self._before_change("watchlists", watchlist.id)
+        previous = self.watchlists.get(watchlist.id)
+        if previous is not None:
+            for movie_id in previous.movie_ids:
+                _index_discard(self.watchlists_by_movie, movie_id, watchlist.id)
+        self.watchlists[watchlist.id] = watchlist
+        self.ordered_ids["watchlists"].add(watchlist.id)
+        for movie_id in watchlist.movie_ids:
+            _index_add(self.watchlists_by_movie, movie_id, watchlist.id)
+        self._after_put("watchlists", watchlist)
+
+    def remove_watchlist(self, list_id: int) -> WatchList:
+        self._before_change("watchlists", list_id)
+        watchlist = self.watchlists.pop(list_id)
+        self.ordered_ids["watchlists"].discard(list_id)
+        for movie_id in watchlist.movie_ids:
+            _index_discard(self.watchlists_by_movie, movie_id, list_id)
+        self._after_delete("watchlists", list_id)
+        return watchlist
+
+    # Viewing history
+
+    def add_history(self, history: ViewingHistory):
+        self._before_change("viewing_history", history.id)
+        previous = self.viewing_history.get(history.id)
+        if previous is not None:
+            _index_discard(self.history_by_movie, previous.movie_id, history.id)
+        self.viewing_history[history.id] = history
+        self.ordered_ids["viewing_history"].add(history.id)
+        _index_add(self.history_by_movie, history.movie_id, history.id)
+        self._after_put("viewing_history", history)
+
+    def remove_history(self, history_id: int) -> ViewingHistory:
+        self._before_change("viewing_history", history_id)
+        history = self.viewing_history.pop(history_id)
+        self.ordered_ids["viewing_history"].discard(history_id)
+        _index_discard(self.history_by_movie, history.movie_id, history_id)
+        self._after_delete("viewing_history", history_id)
+        return history
+
+    def history_for_movie(self, movie_id: int) -> list[ViewingHistory]:
+        return [
+            self.viewing_history[history_id]
+            for history_id in self.history_by_movie.get(movie_id, _EMPTY)
+        ]
+
+
+# Table name -> (model, insert method, delete method), used to replay rows
+_TABLES = {
+    "directors": (Director, "add_director", "remove_director"),
+    "movies": (Movie, "add_movie", "remove_movie"),
+    "reviews": (Review, "add_review", "remove_review"),
+    "watchlists": (WatchList, "add_watchlist", "remove_watchlist"),
+    "viewing_history": (ViewingHistory, "add_history", "remove_history"),
+}
 
 
-db = DummyDatabase() 
\ No newline at end of file
+db = DummyDatabase()
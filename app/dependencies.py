@@ -1,27 +1,82 @@
-from fastapi import Header, HTTPException, status
-from .database import db
+import hmac
+import os
+from typing import Optional
 
-async def verify_api_key(
-    api_key: str = Header(...),
-    user_agent: str = Header(...)
-):
-    if api_key != "your-secret-key":
+from fastapi import Depends, Header, HTTPException, Request, status
+from .access_log import access_log
+from .api_keys import api_keys, StoredApiKey
+from .repositories import create_repository
+from .schemas.api_keys import ApiKeyScope
+
+repository = create_repository()
+
+# Scope a key needs for each HTTP method; anything else needs write
+_READ_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+async def _check_api_key(
+    request: Request,
+    api_key: str,
+    user_agent: str,
+    scope: ApiKeyScope
+) -> StoredApiKey:
+    key = await api_keys.verify(api_key)
+    if key is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid API key"
         )
-    print(f"Request from: {user_agent} with API key: {api_key}")
-    return api_key
+    if scope not in key.scopes:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"API key lacks the '{scope.value}' scope"
+        )
+    access_log.record(request.method, request.url.path, user_agent, api_key)
+    return key
+
+async def verify_api_key(
+    request: Request,
+    api_key: str = Header(...),
+    user_agent: str = Header(...)
+) -> StoredApiKey:
+    scope = ApiKeyScope.READ if request.method in _READ_METHODS else ApiKeyScope.WRITE
+    return await _check_api_key(request, api_key, user_agent, scope)
+
+async def verify_read_key(
+    request: Request,
+    api_key: str = Header(...),
+    user_agent: str = Header(...)
+) -> StoredApiKey:
+    # For POST endpoints that only read, such as the batch lookups
+    return await _check_api_key(request, api_key, user_agent, ApiKeyScope.READ)
 
 async def verify_admin_role(
-    role: str = Header(...),
-):
-    if role != "admin":
+    key: StoredApiKey = Depends(verify_api_key),
+) -> StoredApiKey:
+    if ApiKeyScope.ADMIN not in key.scopes:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Admin access required"
         )
-    return role
+    return key
+
+async def verify_metrics_token(authorization: Optional[str] = Header(None)):
+    # Scrapers send no API key; MOVIE_DB_METRICS_TOKEN, when set, is
+    # expected as a bearer token instead
+    token = os.environ.get("MOVIE_DB_METRICS_TOKEN")
+    if token and not hmac.compare_digest((authorization or "").encode(), f"Bearer {token}".encode()):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid metrics token",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
 
-def get_db():
-    return db 
\ No newline at end of file
+async def get_db(request: Request):
+    # Every read in a read request comes from one version of the data.
+    # Writes check their references against the live tables instead: the
+    # snapshot is taken before authentication, which may await, so other
+    # requests can write in between
+    if request.method not in _READ_METHODS:
+        yield repository
+        return
+    async with repository.snapshot():
+        yield repository
\ No newline at end of file
@@ -0,0 +1,67 @@
+"""Background jobs started by requests, such as bulk deletes.
+
+A request registers a job and returns its id at once; the work runs as a
+task on the event loop and records progress on the ``Job`` model that
+``GET /jobs/{id}`` returns. Jobs live in the memory of the worker that
+started them, and only the most recent finished ones are kept.
+"""
+import asyncio
+from collections import OrderedDict
+from datetime import datetime
+from typing import Awaitable, Callable, Optional
+
+from .schemas.jobs import BulkDeleteResult, Job, JobStatus
+
+
+class JobRegistry:
+    def __init__(self, max_finished: int = 1000):
+        self.max_finished = max_finished
+        self._jobs: OrderedDict[int, Job] = OrderedDict()
+        self._tasks: set[asyncio.Task] = set()
+        self._next_id = 1
+
+    def start(
+        self,
+        job_type: str,
+        total: int,
+        run: Callable[[Job], Awaitable[BulkDeleteResult]],
+    ) -> Job:
+        """Register a job and run ``run(job)`` in the background."""
+        job = Job(id=self._next_id, type=job_type, total=total)
+        self._next_id += 1
+        self._jobs[job.id] = job
+        task = asyncio.create_task(self._run(job, run))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    async def _run(self, job: Job, run):
+        job.status = JobStatus.RUNNING
+        try:
+            job.result = await run(job)
+            job.status = JobStatus.COMPLETED
+        except Exception as e:
+            job.error = f"{type(e).__name__}: {e}"
+            job.status = JobStatus.FAILED
+        finally:
+            job.finished_at = datetime.utcnow()
+            self._prune()
+
+    def _prune(self):
+        finished = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished_at is not None
+        ]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id: int) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    async def close(self):
+        """Let running jobs finish; each of their batches is one write."""
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+jobs = JobRegistry()
@@ -1,14 +1,47 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from .routers import directors_router, movies_router, reviews_router, watchlists_router, viewing_history_router
+from .access_log import access_log
+from .compression import CompressionMiddleware
+from .dependencies import repository
+from .jobs import jobs
+from .metrics import InstrumentedRoute
+from .progress import progress_buffer
+from .ratings import rating_stats
+from .recommendations import similar_movies
+from .routers import (
+    directors_router, movies_router, reviews_router, watchlists_router, viewing_history_router,
+    search_router, api_keys_router, jobs_router, metrics_router
+)
+from .search import search_index
 from .schemas import Movie, Director, Review, WatchList
 
-app = FastAPI(title="Movie Database API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    access_log.start()
+    await repository.open()
+    await repository.watch(rating_stats, search_index, progress_buffer, similar_movies)
+    progress_buffer.start(repository)
+    similar_movies.start()
+    yield
+    await similar_movies.close()
+    await progress_buffer.close()
+    await jobs.close()
+    await repository.close()
+    access_log.close()
+
+app = FastAPI(title="Movie Database API", lifespan=lifespan)
+app.router.route_class = InstrumentedRoute
+app.add_middleware(CompressionMiddleware)
 
 app.include_router(directors_router)
 app.include_router(movies_router)
 app.include_router(reviews_router)
 app.include_router(watchlists_router)
 app.include_router(viewing_history_router)
+app.include_router(search_router)
+app.include_router(api_keys_router)
+app.include_router(jobs_router)
+app.include_router(metrics_router)
 
 @app.get("/")
 async def root():
@@ -20,6 +53,9 @@ async def root():
             "movies": "/movies",
             "reviews": "/reviews",
             "watchlists": "/watchlists",
-            "viewing_history": "/viewing-history"
+            "viewing_history": "/viewing-history",
+            "search": "/search",
+            "jobs": "/jobs",
+            "metrics": "/metrics"
         }
     } 
\ No newline at end of file
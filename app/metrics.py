@@ -0,0 +1,216 @@
+"""Per-route latency histograms and request counters, in Prometheus format.
+
+Routes are built with ``InstrumentedRoute`` (the ``route_class`` of every
+router). Each request is timed in three phases:
+
+* ``dependencies``: resolving the dependencies (API key check, pagination,
+  database snapshot, cached response lookup) and parsing the body;
+* ``handler``: the endpoint function itself;
+* ``serialization``: validating and encoding what the endpoint returned.
+
+plus ``total``, the three together. Time spent streaming a
+``StreamingResponse`` body (the exports) happens after the route returns and
+is not included. Requests are also counted by status code, and the ones
+that fail (status 400 and up) once more as errors.
+
+Recording costs a few ``perf_counter`` calls and one bisect per phase, all
+on the event loop, so nothing is locked. The numbers are per process: with
+several workers, scrape each one. ``GET /metrics`` takes no API key; set
+``MOVIE_DB_METRICS_TOKEN`` to have scrapers send it as a bearer token.
+"""
+import asyncio
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextvars import ContextVar
+from typing import Callable, Iterable, Optional
+
+from fastapi import HTTPException, Request, Response
+from fastapi.exceptions import RequestValidationError
+from fastapi.routing import APIRoute
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Upper bounds in seconds, from a cached read up to a whole-table export
+BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+    0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+PHASES = ("dependencies", "handler", "serialization", "total")
+
+# [endpoint started, endpoint finished] for the request being handled
+_marks: ContextVar[Optional[list]] = ContextVar("metrics_marks", default=None)
+
+
+class Histogram:
+    def __init__(self, bounds: tuple = BUCKETS):
+        self.bounds = bounds
+        # Per bucket, not cumulative; the last one is +Inf
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class RouteMetrics:
+    __slots__ = ("phases", "statuses")
+
+    def __init__(self):
+        self.phases = {phase: Histogram() for phase in PHASES}
+        self.statuses: Counter[int] = Counter()
+
+    def record(self, started: float, marks: list, finished: float, status_code: int):
+        entered, left = marks
+        phases = self.phases
+        if entered is None:
+            # Failed before the endpoint ran (bad key, invalid body)
+            phases["dependencies"].observe(finished - started)
+        else:
+            phases["dependencies"].observe(entered - started)
+            if left is None:
+                phases["handler"].observe(finished - entered)
+            else:
+                phases["handler"].observe(left - entered)
+                phases["serialization"].observe(finished - left)
+        phases["total"].observe(finished - started)
+        self.statuses[status_code] += 1
+
+
+class Metrics:
+    """Registry of every instrumented route, rendered by ``render()``."""
+
+    def __init__(self):
+        # (method, route path) -> RouteMetrics
+        self.routes: dict[tuple[str, str], RouteMetrics] = {}
+
+    def route(self, method: str, path: str) -> RouteMetrics:
+        route = self.routes.get((method, path))
+        if route is None:
+            route = self.routes[(method, path)] = RouteMetrics()
+        return route
+
+    def render(self, gauges: Iterable[tuple[str, str, dict, float]] = ()) -> str:
+        """The exposition text; ``gauges`` adds ``(name, help, labels, value)`` samples."""
+        lines: list[str] = []
+        routes = sorted(self.routes.items())
+
+        _header(lines, "movie_db_request_duration_seconds", "histogram",
+                "Request latency by route and phase.")
+        for (method, path), route in routes:
+            for phase in PHASES:
+                histogram = route.phases[phase]
+                if not histogram.count:
+                    continue
+                labels = _labels(method=method, route=path, phase=phase)
+                cumulative = 0
+                for bound, count in zip(histogram.bounds, histogram.counts):
+                    cumulative += count
+                    lines.append(
+                        f'movie_db_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}'
+                    )
+                lines.append(f'movie_db_request_duration_seconds_bucket{{{labels},le="+Inf"}} {histogram.count}')
+                lines.append(f"movie_db_request_duration_seconds_sum{{{labels}}} {histogram.sum!r}")
+                lines.append(f"movie_db_request_duration_seconds_count{{{labels}}} {histogram.count}")
+
+        _header(lines, "movie_db_requests_total", "counter", "Requests by route and status code.")
+        for (method, path), route in routes:
+            for status_code, count in sorted(route.statuses.items()):
+                lines.append(
+                    f"movie_db_requests_total{{{_labels(method=method, route=path, status=status_code)}}} {count}"
+                )
+
+        _header(lines, "movie_db_request_errors_total", "counter",
+                "Requests answered with status 400 or more, by route and status code.")
+        for (method, path), route in routes:
+            for status_code, count in sorted(route.statuses.items()):
+                if status_code >= 400:
+                    lines.append(
+                        f"movie_db_request_errors_total{{{_labels(method=method, route=path, status=status_code)}}} {count}"
+                    )
+
+        described = set()
+        for name, description, labels, value in gauges:
+            if name not in described:
+                described.add(name)
+                kind = "counter" if name.endswith("_total") else "gauge"
+                _header(lines, name, kind, description)
+            sample = f"{name}{{{_labels(**labels)}}}" if labels else name
+            lines.append(f"{sample} {value}")
+        lines.append("")
+        return "\n".join(lines)
+
+
+def _header(lines: list[str], name: str, kind: str, description: str):
+    lines.append(f"# HELP {name} {description}")
+    lines.append(f"# TYPE {name} {kind}")
+
+
+def _labels(**labels) -> str:
+    return ",".join(f'{key}="{_escape(str(value))}"' for key, value in labels.items())
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+metrics = Metrics()
+
+
+def _timed_endpoint(call: Callable) -> Callable:
+    """Wrap an endpoint so the request's marks record when it ran."""
+    if asyncio.iscoroutinefunction(call):
+        async def endpoint(**values):
+            marks = _marks.get()
+            if marks is not None:
+                marks[0] = time.perf_counter()
+            result = await call(**values)
+            if marks is not None:
+                marks[1] = time.perf_counter()
+            return result
+    else:
+        # Run in a worker thread, which gets a copy of the request's context
+        def endpoint(**values):
+            marks = _marks.get()
+            if marks is not None:
+                marks[0] = time.perf_counter()
+            result = call(**values)
+            if marks is not None:
+                marks[1] = time.perf_counter()
+            return result
+    return endpoint
+
+
+class InstrumentedRoute(APIRoute):
+    """``APIRoute`` that records its requests in ``metrics``."""
+
+    def get_route_handler(self) -> Callable:
+        self.dependant.call = _timed_endpoint(self.dependant.call)
+        handler = super().get_route_handler()
+        method = ",".join(sorted(self.methods))
+        route_metrics = metrics.route(method, self.path_format)
+
+        async def instrumented(request: Request) -> Response:
+            marks = [None, None]
+            token = _marks.set(marks)
+            started = time.perf_counter()
+            status_code = 500
+            try:
+                response = await handler(request)
+                status_code = response.status_code
+                return response
+            except HTTPException as e:
+                status_code = e.status_code
+                raise
+            except RequestValidationError:
+                status_code = 422
+                raise
+            finally:
+                finished = time.perf_counter()
+                _marks.reset(token)
+                route_metrics.record(started, marks, finished, status_code)
+
+        return instrumented
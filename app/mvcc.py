@@ -0,0 +1,327 @@
+"""Multi-version reads for the in-memory store.
+
+``DummyDatabase`` keeps only the latest version of each row in its tables.
+Every write (including a whole cascade, or a bulk chunk) runs inside
+``VersionLog.write()`` and publishes one new version when it finishes.
+A reader pins the version current when it starts with
+``DummyDatabase.snapshot()`` and keeps seeing exactly that state, however
+many writes land while it waits on I/O.
+
+While at least one reader is pinned, a write first saves the row it is
+about to replace or delete (an undo entry tagged with the version being
+written). A snapshot at version ``v`` reads a row from its first undo entry
+newer than ``v`` if there is one, and from the live table otherwise. Undo
+entries are dropped as soon as no pinned reader is older than them, so
+memory is only held for as long as a slow reader needs it. Readers never
+take a lock and never wait for writers; writers never wait for readers.
+
+When nothing has been written since a snapshot was taken, its reads go
+straight to the live tables, so the common case costs nothing extra.
+"""
+from collections import Counter, deque
+from contextlib import contextmanager
+from heapq import merge
+from itertools import islice
+from typing import Iterable, Iterator, Optional
+
+from .query import COLUMN_KEYS, MovieQuery
+
+
+class VersionLog:
+    """Published version number, pinned readers and undo entries."""
+
+    def __init__(self):
+        self.version = 0
+        self._depth = 0
+        # Pinned version -> number of readers holding it
+        self._pins: Counter[int] = Counter()
+        # table -> row id -> [(version written, row before that write)],
+        # oldest first; a previous value of None means the row did not exist
+        self._undo: dict[str, dict[int, list[tuple[int, object]]]] = {}
+        # (version written, table, row id) for every undo entry, oldest first
+        self._order: deque[tuple[int, str, int]] = deque()
+
+    @contextmanager
+    def write(self):
+        """Group the changes made in this block into one new version."""
+        self._depth += 1
+        try:
+            yield
+        finally:
+            self._depth -= 1
+            if self._depth == 0:
+                self.version += 1
+
+    @property
+    def pinned(self) -> bool:
+        return bool(self._pins)
+
+    def record(self, table: str, row_id: int, previous):
+        """Save ``previous``, the row as it is before the write in progress."""
+        written = self.version + 1
+        entries = self._undo.setdefault(table, {}).setdefault(row_id, [])
+        # Only the state before the first change in a version matters
+        if entries and entries[-1][0] == written:
+            return
+        entries.append((written, previous))
+        self._order.append((written, table, row_id))
+
+    def pin(self, version: Optional[int] = None) -> int:
+        """Register a reader of ``version`` (the current one by default).
+
+        An older version can only be pinned while another reader still
+        holds it, so its undo entries are guaranteed to be there.
+        """
+        if version is None:
+            version = self.version
+        self._pins[version] += 1
+        return version
+
+    def unpin(self, version: int):
+        self._pins[version] -= 1
+        if not self._pins[version]:
+            del self._pins[version]
+            self._reclaim()
+
+    def _reclaim(self):
+        # An entry written at version w is only read by snapshots older than w
+        oldest = min(self._pins) if self._pins else None
+        order = self._order
+        while order and (oldest is None or order[0][0] <= oldest):
+            _, table, row_id = order.popleft()
+            rows = self._undo[table]
+            entries = rows[row_id]
+            del entries[0]
+            if not entries:
+                del rows[row_id]
+
+    def before(self, table: str, row_id: int, version: int):
+        """The undo entry giving the row at ``version``, if it changed since."""
+        entries = self._undo.get(table, {}).get(row_id)
+        if entries:
+            for written, previous in entries:
+                if written > version:
+                    return entries, previous
+        return None, None
+
+    def changed_since(self, table: str, version: int) -> list[int]:
+        """Sorted ids of the rows written to in ``table`` after ``version``."""
+        return sorted(
+            row_id for row_id, entries in self._undo.get(table, {}).items()
+            if entries[-1][0] > version
+        )
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "version": self.version,
+            "readers": sum(self._pins.values()),
+            "undo_entries": len(self._order),
+        }
+
+
+class Snapshot:
+    """Read-only view of a ``DummyDatabase`` as of one version.
+
+    Offers the read methods of ``DummyDatabase`` that the repository uses.
+    ``advance()`` moves the view to the latest version, so a request sees
+    its own writes; ``release()`` must be called when the reader is done.
+    """
+
+    def __init__(self, database, version: int):
+        self.database = database
+        self.log: VersionLog = database.versions
+        self.version = version
+        self.released = False
+        self._changed: dict[str, list[int]] = {}
+        self._changed_at = -1
+
+    @property
+    def current(self) -> bool:
+        """Nothing has been written since this snapshot was taken."""
+        return self.version == self.log.version
+
+    def advance(self):
+        if self.current:
+            return
+        self.log.unpin(self.version)
+        self.version = self.log.pin()
+        self._changed_at = -1
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            self.log.unpin(self.version)
+
+    def pin_again(self) -> "Snapshot":
+        """Another handle on the same version, released separately."""
+        return Snapshot(self.database, self.log.pin(self.version))
+
+    def __enter__(self) -> "Snapshot":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+    # Rows changed since this version
+
+    def _changed_ids(self, table: str) -> list[int]:
+        if self._changed_at != self.log.version:
+            self._changed = {}
+            self._changed_at = self.log.version
+        changed = self._changed.get(table)
+        if changed is None:
+            changed = self._changed[table] = self.log.changed_since(table, self.version)
+        return changed
+
+    def _changed_after(self, table: str, after: Optional[int]) -> list[int]:
+        changed = self._changed_ids(table)
+        if after is None:
+            return changed
+        return [row_id for row_id in changed if row_id > after]
+
+    # Reads
+
+    def get(self, table: str, row_id: int):
+        entries, previous = self.log.before(table, row_id, self.version)
+        if entries is not None:
+            return previous
+        return getattr(self.database, table).get(row_id)
+
+    def row_json(self, table: str, row_id: int) -> Optional[bytes]:
+        entries, previous = self.log.before(table, row_id, self.version)
+        if entries is None:
+            if row_id not in getattr(self.database, table):
+                return None
+            return self.database.row_json(table, row_id)
+        if previous is None:
+            return None
+        return previous.__pydantic_serializer__.to_json(previous)
+
+    def ids_after(self, table: str, after: Optional[int] = None) -> Iterable[int]:
+        """Ids of ``table`` greater than ``after``, in order.
+
+        Like ``DummyDatabase.movie_ids``: the live sorted set is returned
+        while the snapshot is current, a positioned iterator otherwise.
+        """
+        if self.current:
+            return self.database.ordered_ids[table]
+        return self._merge(table, self.database.ordered_ids[table].iter_after(after), after, None)
+
+    def movie_ids(
+        self,
+        query: MovieQuery = MovieQuery(),
+        after: Optional[int] = None,
+        after_key: Optional[int] = None,
+        limit: Optional[int] = None,
+    ) -> Iterable[int]:
+        live = self.database.movie_ids(query, after, after_key, limit)
+        if self.current:
+            return live
+        if hasattr(live, "iter_after"):
+            live = live.iter_after(after)
+        column, descending = query.order
+        if column == "id" and not descending:
+            return self._merge("movies", live, after, query.matches)
+
+        # Changed rows are placed by their key as of this version; ids left
+        # unchanged still have the key the live index gives them
+        changed_ids = self._changed_ids("movies")
+        if not changed_ids:
+            return live
+        changed = set(changed_ids)
+        keys = {}
+        for movie_id in changed_ids:
+            movie = self.get("movies", movie_id)
+            if movie is not None and query.matches(movie):
+                keys[movie_id] = None if column == "id" else COLUMN_KEYS[column](movie)
+        if column == "id":
+            def sort_key(movie_id):
+                return movie_id
+            position = after
+        else:
+            live_key = self.database.movie_orders[column].key
+
+            def sort_key(movie_id):
+                return (keys[movie_id] if movie_id in keys else live_key(movie_id), movie_id)
+            position = None if after is None else (after_key, after)
+        then = sorted(keys, key=sort_key, reverse=descending)
+        if position is not None:
+            then = [
+                movie_id for movie_id in then
+                if (sort_key(movie_id) < position if descending else sort_key(movie_id) > position)
+            ]
+        unchanged = (movie_id for movie_id in live if movie_id not in changed)
+        return merge(unchanged, then, key=sort_key, reverse=descending)
+
+    def movie_key(self, column: str, movie_id: int) -> Optional[int]:
+        """Sort key of a movie in the ``column`` order, as of this version."""
+        entries, previous = self.log.before("movies", movie_id, self.version)
+        if entries is None:
+            return self.database.movie_key(column, movie_id)
+        return None if previous is None else COLUMN_KEYS[column](previous)
+
+    def _merge(self, table: str, live: Iterator[int], after, matches) -> Iterator[int]:
+        """Live ids untouched since this version, plus changed rows as they were."""
+        changed_ids = self._changed_after(table, after)
+        if not changed_ids:
+            return live
+        changed = set(changed_ids)
+        unchanged = (row_id for row_id in live if row_id not in changed)
+        then = []
+        for row_id in changed_ids:
+            row = self.get(table, row_id)
+            if row is not None and (matches is None or matches(row)):
+                then.append(row_id)
+        return merge(unchanged, then)
+
+    def count(self, table: str) -> int:
+        rows = getattr(self.database, table)
+        total = len(rows)
+        if self.current:
+            return total
+        for row_id in self._changed_ids(table):
+            total += (self.get(table, row_id) is not None) - (row_id in rows)
+        return total
+
+    def max_id(self, table: str) -> int:
+        ordered = self.database.ordered_ids[table]
+        if self.current:
+            return ordered[-1] if ordered else 0
+        changed_ids = self._changed_ids(table)
+        changed = set(changed_ids)
+        best = 0
+        for position in range(len(ordered) - 1, -1, -1):
+            if ordered[position] not in changed:
+                best = ordered[position]
+                break
+        for row_id in reversed(changed_ids):
+            if row_id <= best:
+                break
+            if self.get(table, row_id) is not None:
+                return row_id
+        return best
+
+    def director_has_movies(self, director_id: int) -> bool:
+        return next(iter(self.movie_ids(MovieQuery(director_id=director_id))), None) is not None
+
+    def history_for_movie(self, movie_id: int) -> list:
+        if self.current:
+            return self.database.history_for_movie(movie_id)
+        return self._rows_for_movie("viewing_history", self.database.history_by_movie, movie_id)
+
+    def reviews_for_movie(self, movie_id: int) -> list:
+        if self.current:
+            return self.database.reviews_for_movie(movie_id)
+        return self._rows_for_movie("reviews", self.database.reviews_by_movie, movie_id)
+
+    def _rows_for_movie(self, table: str, index: dict, movie_id: int) -> list:
+        live = index.get(movie_id)
+        live = iter(live) if live is not None else iter(())
+        row_ids = self._merge(table, live, None, lambda row: row.movie_id == movie_id)
+        return [self.get(table, row_id) for row_id in row_ids]
+
+    def slice_ids(self, ids: Iterable[int], after: Optional[int], count: int) -> list[int]:
+        """Up to ``count`` ids after ``after`` from an ``ids_after``/``movie_ids`` result."""
+        if hasattr(ids, "slice_after"):
+            return ids.slice_after(after, 0, count)
+        return list(islice(ids, count))
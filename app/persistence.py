@@ -0,0 +1,360 @@
+"""Write-ahead log and snapshots for the in-memory store.
+
+Every create and delete on ``DummyDatabase`` is appended to a log segment
+(``wal-<first lsn>.log``) as one checksummed JSON line. From time to time a
+snapshot of all tables is written in the background (``snapshot.jsonl``) and
+the segments it covers are removed. At startup the snapshot is loaded and
+the log tail after it is replayed.
+
+Durability modes, selected with ``MOVIE_DB_DURABILITY``:
+
+``fsync``
+    Each record is written and fsynced on its own before the request
+    returns. Nothing acknowledged is ever lost; throughput is bounded by
+    the disk's fsync latency.
+``group`` (default)
+    Group commit: the writer thread drains every record queued while the
+    previous fsync was running and makes them durable with a single fsync.
+    Requests still wait until their record is on disk, but concurrent
+    writers share the cost.
+``async``
+    Records are written in batches and fsynced every ``fsync_interval``
+    seconds; requests do not wait. A crash can lose up to that interval of
+    acknowledged writes.
+
+``benchmarks/wal_throughput.py`` measures write throughput for each mode.
+"""
+import asyncio
+import json
+import os
+import queue
+import threading
+import time
+import zlib
+from collections import deque
+from pathlib import Path
+from typing import Optional
+
+DURABILITY_MODES = ("fsync", "group", "async")
+
+SNAPSHOT_FILE = "snapshot.jsonl"
+
+_STOP = object()
+
+
+def _encode(record: dict) -> bytes:
+    data = record.get("data")
+    if hasattr(data, "model_dump"):
+        # Rows are dumped on the writer thread; stored models are immutable
+        record = {**record, "data": data.model_dump(mode="json")}
+    body = json.dumps(record, separators=(",", ":")).encode()
+    return b"%08x %s\n" % (zlib.crc32(body), body)
+
+
+def _decode(line: bytes) -> Optional[dict]:
+    """Parse one log line, or return ``None`` if it is torn or corrupt."""
+    checksum, _, body = line.rstrip(b"\n").partition(b" ")
+    try:
+        if int(checksum, 16) != zlib.crc32(body):
+            return None
+        return json.loads(body)
+    except ValueError:
+        return None
+
+
+def _fsync_directory(directory: Path):
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class WriteAheadLog:
+    def __init__(
+        self,
+        directory: Path,
+        mode: str = "group",
+        max_batch: int = 1024,
+        fsync_interval: float = 0.05,
+    ):
+        if mode not in DURABILITY_MODES:
+            raise ValueError(f"Unknown durability mode: {mode}")
+        self.directory = Path(directory)
+        self.mode = mode
+        self.max_batch = max_batch
+        self.fsync_interval = fsync_interval
+
+        self.last_lsn = 0
+        self.durable_lsn = 0
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._waiters: deque[tuple[int, asyncio.Future]] = deque()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._file = None
+        self._thread: Optional[threading.Thread] = None
+        self._flushed = threading.Condition()
+        self.on_rotate = None
+
+    # Segments
+
+    def segments(self) -> list[tuple[int, Path]]:
+        found = []
+        for path in self.directory.glob("wal-*.log"):
+            found.append((int(path.stem[4:]), path))
+        return sorted(found)
+
+    def _open_segment(self, first_lsn: int):
+        if self._file is not None:
+            self._file.close()
+        # Anything already in a segment starting past the last good record is
+        # a torn tail from a crash, so the segment is always started empty
+        self._file = open(self.directory / f"wal-{first_lsn:020d}.log", "wb")
+        _fsync_directory(self.directory)
+
+    # Writer side
+
+    def start(self, last_lsn: int):
+        self.last_lsn = self.durable_lsn = last_lsn
+        try:
+            self._loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._loop = None
+        self._open_segment(last_lsn + 1)
+        self._thread = threading.Thread(target=self._run, name="wal-writer", daemon=True)
+        self._thread.start()
+
+    def append(self, record: dict) -> int:
+        self.last_lsn += 1
+        record["lsn"] = self.last_lsn
+        self._queue.put(record)
+        return self.last_lsn
+
+    def rotate(self, payload=None):
+        """Start a new segment after the last appended record.
+
+        ``on_rotate(first_lsn, payload)`` is called from the writer thread
+        once the old segment is closed.
+        """
+        self._queue.put(("rotate", self.last_lsn + 1, payload))
+
+    def _run(self):
+        last_fsync = time.monotonic()
+        written_lsn = None
+        stopping = False
+        while not stopping:
+            timeout = self.fsync_interval if self.mode == "async" else None
+            try:
+                batch = [self._queue.get(timeout=timeout)]
+            except queue.Empty:
+                batch = []
+
+            if self.mode != "fsync":
+                while len(batch) < self.max_batch:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+
+            lines = []
+            for item in batch:
+                if item is _STOP:
+                    stopping = True
+                elif isinstance(item, tuple):
+                    self._write(lines)
+                    lines = []
+                    self._sync()
+                    _, first_lsn, payload = item
+                    self._open_segment(first_lsn)
+                    if self.on_rotate is not None:
+                        self.on_rotate(first_lsn, payload)
+                else:
+                    lines.append(_encode(item))
+                    written_lsn = item["lsn"]
+            self._write(lines)
+
+            now = time.monotonic()
+            if self.mode != "async" or stopping or now - last_fsync >= self.fsync_interval:
+                self._sync()
+                last_fsync = now
+                if written_lsn is not None:
+                    self._mark_durable(written_lsn)
+                    written_lsn = None
+            if stopping:
+                self._mark_durable(self.last_lsn)
+
+        self._file.close()
+
+    def _write(self, lines: list[bytes]):
+        if lines:
+            self._file.write(b"".join(lines))
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def _mark_durable(self, lsn: int):
+        with self._flushed:
+            self.durable_lsn = max(self.durable_lsn, lsn)
+            self._flushed.notify_all()
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._release_waiters)
+
+    def _release_waiters(self):
+        while self._waiters and self._waiters[0][0] <= self.durable_lsn:
+            _, future = self._waiters.popleft()
+            if not future.done():
+                future.set_result(None)
+
+    # Caller side
+
+    async def wait(self, lsn: int):
+        """Wait until ``lsn`` is durable (returns at once in async mode)."""
+        if self.mode == "async" or lsn <= self.durable_lsn or self._loop is None:
+            return
+        future = self._loop.create_future()
+        self._waiters.append((lsn, future))
+        await future
+
+    def flush(self):
+        """Block until everything appended so far is durable."""
+        target = self.last_lsn
+        with self._flushed:
+            self._flushed.wait_for(lambda: self.durable_lsn >= target)
+
+    def close(self):
+        if self._thread is None:
+            return
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._thread = None
+
+
+class Persistence:
+    """Binds a ``WriteAheadLog`` and snapshots to a ``DummyDatabase``."""
+
+    def __init__(
+        self,
+        directory,
+        mode: str = "group",
+        snapshot_every: int = 50_000,
+        **log_options,
+    ):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.snapshot_every = snapshot_every
+        self.wal = WriteAheadLog(self.directory, mode=mode, **log_options)
+        self.wal.on_rotate = self._start_snapshot
+        self._records_since_snapshot = 0
+        self._snapshot_running = False
+        self._snapshot_thread: Optional[threading.Thread] = None
+
+    def open(self, db):
+        """Replay the snapshot and log tail into ``db`` and start logging."""
+        last_lsn = self._load_snapshot(db)
+        for _, path in self.wal.segments():
+            with open(path, "rb") as segment:
+                for line in segment:
+                    record = _decode(line)
+                    if record is None:
+                        break
+                    if record["lsn"] <= last_lsn:
+                        continue
+                    self._apply(db, record)
+                    last_lsn = record["lsn"]
+        self.wal.start(last_lsn)
+        db.persistence = self
+
+    def _load_snapshot(self, db) -> int:
+        path = self.directory / SNAPSHOT_FILE
+        if not path.exists():
+            return 0
+        with open(path, "rb") as snapshot:
+            header = json.loads(snapshot.readline())
+            for table, next_id in header.get("sequences", {}).items():
+                db.restore_sequence(table, next_id)
+            for line in snapshot:
+                row = json.loads(line)
+                db.restore_row(row["table"], row["data"])
+        return header["lsn"]
+
+    def _apply(self, db, record: dict):
+        if record["op"] == "put":
+            db.restore_row(record["table"], record["data"])
+        elif record["op"] == "sequence":
+            db.restore_sequence(record["table"], record["next"])
+        else:
+            db.drop_row(record["table"], record["id"])
+
+    # Logging
+
+    def log_put(self, db, table: str, row) -> int:
+        lsn = self.wal.append({"op": "put", "table": table, "data": row})
+        self._after_append(db)
+        return lsn
+
+    def log_delete(self, db, table: str, row_id: int) -> int:
+        lsn = self.wal.append({"op": "delete", "table": table, "id": row_id})
+        self._after_append(db)
+        return lsn
+
+    def log_sequence(self, db, table: str, next_id: int) -> int:
+        lsn = self.wal.append({"op": "sequence", "table": table, "next": next_id})
+        self._after_append(db)
+        return lsn
+
+    def _after_append(self, db):
+        self._records_since_snapshot += 1
+        if self._records_since_snapshot >= self.snapshot_every and not self._snapshot_running:
+            self.snapshot(db)
+
+    async def commit(self):
+        await self.wal.wait(self.wal.last_lsn)
+
+    # Snapshots
+
+    def snapshot(self, db):
+        """Capture the current rows and write them out in the background.
+
+        Stored models are never mutated in place, so a shallow copy of each
+        table is a consistent point-in-time view.
+        """
+        self._snapshot_running = True
+        self._records_since_snapshot = 0
+        tables = db.capture_tables()
+        self.wal.rotate((self.wal.last_lsn, tables, dict(db.next_ids)))
+
+    def _start_snapshot(self, first_lsn: int, payload):
+        self._snapshot_thread = threading.Thread(
+            target=self._write_snapshot,
+            args=payload,
+            name="snapshot-writer",
+            daemon=True,
+        )
+        self._snapshot_thread.start()
+
+    def _write_snapshot(self, lsn: int, tables: dict, sequences: dict):
+        try:
+            temporary = self.directory / (SNAPSHOT_FILE + ".tmp")
+            with open(temporary, "wb") as snapshot:
+                header = {"lsn": lsn, "sequences": sequences}
+                snapshot.write(json.dumps(header).encode() + b"\n")
+                for table, rows in tables.items():
+                    for row in rows.values():
+                        line = {"table": table, "data": row.model_dump(mode="json")}
+                        snapshot.write(json.dumps(line, separators=(",", ":")).encode() + b"\n")
+                snapshot.flush()
+                os.fsync(snapshot.fileno())
+            os.replace(temporary, self.directory / SNAPSHOT_FILE)
+            _fsync_directory(self.directory)
+
+            # Segments that start at or before the snapshot lsn are fully covered
+            for first_lsn, path in self.wal.segments():
+                if first_lsn <= lsn:
+                    path.unlink()
+        finally:
+            self._snapshot_running = False
+
+    def close(self):
+        self.wal.close()
+        if self._snapshot_thread is not None:
+            self._snapshot_thread.join()
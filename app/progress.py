@@ -0,0 +1,262 @@
+"""Coalescing buffer for playback progress reports.
+
+Players report their position every few seconds through
+``PUT /viewing-history/progress``. Each (viewer, movie) owns one viewing
+history entry, updated in place: reports are merged into that entry in
+memory, so only the latest ``status`` and ``current_minute`` are kept,
+and the merged entries are written to the store every ``flush_interval``
+seconds with one ``insert_many`` (sooner once ``max_pending`` entries are
+waiting). Ten reports of the same position cost one row write, and the
+table grows with viewers and movies rather than with reports.
+
+Reads of a movie's history apply the waiting entries on top of the stored
+ones (``overlay``), so they see the latest position before it is written.
+Reports not yet written when the process dies are lost, at most
+``flush_interval`` seconds of progress. The buffer is per process: with
+several workers, send a viewer's reports to the same one, or two workers
+may each create an entry for the same (viewer, movie).
+
+The buffer is a repository listener: it learns which entry belongs to
+which (viewer, movie) from the stored history at startup and follows later
+writes and deletes. Configured with ``MOVIE_DB_PROGRESS_FLUSH_INTERVAL``
+(seconds, default 2) and ``MOVIE_DB_PROGRESS_MAX_PENDING`` (default
+10000). ``benchmarks/progress.py`` measures the writes and memory saved.
+"""
+import asyncio
+import os
+from datetime import datetime
+from typing import Optional
+
+from .schemas.viewing_history import ViewingHistory, ViewingProgress, ViewingStatus
+from .utils.cache import response_cache
+
+# Entries written per insert_many
+FLUSH_BATCH = 1000
+
+
+class ProgressBuffer:
+    def __init__(self, flush_interval: float = 2.0, max_pending: int = 10_000):
+        if flush_interval <= 0:
+            raise ValueError("Flush interval must be positive")
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        # (viewer, movie) -> id of its entry, and the viewers of each movie
+        self.entries: dict[tuple[str, int], int] = {}
+        self.viewers_by_movie: dict[int, set[str]] = {}
+        # movie -> entry id -> merged entry; being written while in ``flushing``
+        self.pending: dict[int, dict[int, ViewingHistory]] = {}
+        self.flushing: dict[int, dict[int, ViewingHistory]] = {}
+        self.pending_count = 0
+        self.received = 0
+        self.written = 0
+        self.flushes = 0
+        self._repository = None
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._lock = asyncio.Lock()
+
+    def _remember(self, key: tuple[str, int], entry_id: int):
+        self.entries[key] = entry_id
+        self.viewers_by_movie.setdefault(key[1], set()).add(key[0])
+
+    def _forget(self, key: tuple[str, int]):
+        self.entries.pop(key, None)
+        viewers = self.viewers_by_movie.get(key[1])
+        if viewers is not None:
+            viewers.discard(key[0])
+            if not viewers:
+                del self.viewers_by_movie[key[1]]
+
+    def _unstage(self, movie_id: int, entry_id: int):
+        for staged in (self.pending, self.flushing):
+            entries = staged.get(movie_id)
+            if entries is not None and entries.pop(entry_id, None) is not None:
+                if staged is self.pending:
+                    self.pending_count -= 1
+                if not entries:
+                    del staged[movie_id]
+
+    def _staged(self, movie_id: int, entry_id: int) -> Optional[ViewingHistory]:
+        entry = self.pending.get(movie_id, {}).get(entry_id)
+        if entry is None:
+            entry = self.flushing.get(movie_id, {}).get(entry_id)
+        return entry
+
+    async def _current(self, db, key: tuple[str, int]) -> ViewingHistory:
+        """The latest entry of ``key``: waiting, stored, or a new one."""
+        viewer_id, movie_id = key
+        entry_id = self.entries.get(key)
+        if entry_id is not None:
+            entry = self._staged(movie_id, entry_id) or await db.get("viewing_history", entry_id)
+            if entry is not None:
+                return entry
+        # Two first reports for a viewer must not allocate two entries
+        async with self._lock:
+            entry_id = self.entries.get(key)
+            if entry_id is None:
+                entry_id = await db.next_id("viewing_history")
+                self._remember(key, entry_id)
+            return self._staged(movie_id, entry_id) or ViewingHistory(
+                id=entry_id, viewer_id=viewer_id, movie_id=movie_id, status=ViewingStatus.NOT_STARTED
+            )
+
+    async def update(self, db, progress: ViewingProgress) -> ViewingHistory:
+        """Merge a report into its entry and queue the entry for writing."""
+        key = (progress.viewer_id, progress.movie_id)
+        current = await self._current(db, key)
+        changes = {
+            "status": progress.status,
+            "current_minute": progress.current_minute,
+            "updated_at": datetime.utcnow(),
+        }
+        if progress.runtime_minutes is not None:
+            changes["runtime_minutes"] = progress.runtime_minutes
+        entry = current.model_copy(update=changes)
+
+        entries = self.pending.setdefault(entry.movie_id, {})
+        if entry.id not in entries:
+            self.pending_count += 1
+        entries[entry.id] = entry
+        self.received += 1
+        if self.pending_count >= self.max_pending and self._wake is not None:
+            self._wake.set()
+        return entry
+
+    def staged(self, movie_id: int) -> bool:
+        return movie_id in self.pending or movie_id in self.flushing
+
+    def overlay(self, movie_id: int, history: list) -> list:
+        """A movie's stored ``history`` with its waiting entries applied."""
+        staged = {**self.flushing.get(movie_id, {}), **self.pending.get(movie_id, {})}
+        if not staged:
+            return history
+        merged = [staged.pop(entry.id, entry) for entry in history]
+        if staged:
+            # Entries not written yet
+            merged.extend(staged.values())
+            merged.sort(key=lambda entry: entry.id)
+        return merged
+
+    async def flush(self) -> int:
+        """Write every waiting entry; returns how many were written."""
+        if not self.pending or self._repository is None:
+            return 0
+        self.flushing, self.pending = self.pending, {}
+        self.pending_count = 0
+        written = 0
+        try:
+            with response_cache.writing("viewing_history"):
+                while self.flushing:
+                    # Whole movies, about FLUSH_BATCH entries at a time
+                    movie_ids, size = [], 0
+                    for movie_id, entries in self.flushing.items():
+                        if movie_ids and size + len(entries) > FLUSH_BATCH:
+                            break
+                        movie_ids.append(movie_id)
+                        size += len(entries)
+                    # A movie deleted meanwhile takes its entries with it:
+                    # ``on_delete`` drops them, and each batch checks again
+                    present = await self._repository.existing_ids("movies", movie_ids)
+                    rows = [
+                        entry
+                        for movie_id in movie_ids if movie_id in present
+                        for entry in self.flushing.get(movie_id, {}).values()
+                    ]
+                    if rows:
+                        await self._repository.insert_many("viewing_history", rows)
+                    for movie_id in movie_ids:
+                        self.flushing.pop(movie_id, None)
+                    written += len(rows)
+                    self.written += len(rows)
+        except Exception:
+            # Keep the entries not written for the next flush, unless newer
+            # ones replaced them
+            for movie_id, entries in self.flushing.items():
+                for entry_id, entry in entries.items():
+                    waiting = self.pending.setdefault(movie_id, {})
+                    if entry_id not in waiting:
+                        waiting[entry_id] = entry
+                        self.pending_count += 1
+            raise
+        finally:
+            self.flushing = {}
+        self.flushes += 1
+        return written
+
+    def start(self, repository):
+        if self._task is not None:
+            return
+        self._repository = repository
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush()
+            except Exception:
+                # Retried on the next interval
+                pass
+
+    async def close(self):
+        """Stop the flush loop and write what is still waiting."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await self.flush()
+        self._repository = None
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "pending": self.pending_count,
+            "received": self.received,
+            "written": self.written,
+            "flushes": self.flushes,
+        }
+
+    # Repository listener
+
+    async def rebuild(self, db):
+        self.entries.clear()
+        self.viewers_by_movie.clear()
+        async for entry in db.iter_rows("viewing_history"):
+            if entry.viewer_id is not None:
+                self._remember((entry.viewer_id, entry.movie_id), entry.id)
+
+    def on_put(self, table: str, rows: list):
+        if table == "viewing_history":
+            for entry in rows:
+                if entry.viewer_id is not None:
+                    self._remember((entry.viewer_id, entry.movie_id), entry.id)
+
+    def on_delete(self, table: str, row):
+        if table == "viewing_history":
+            if row.viewer_id is not None and self.entries.get((row.viewer_id, row.movie_id)) == row.id:
+                self._forget((row.viewer_id, row.movie_id))
+            self._unstage(row.movie_id, row.id)
+        elif table == "movies":
+            # Its history goes with it
+            for viewer_id in list(self.viewers_by_movie.get(row.id, ())):
+                self._forget((viewer_id, row.id))
+            self.pending_count -= len(self.pending.pop(row.id, {}))
+            self.flushing.pop(row.id, None)
+
+
+def create_progress_buffer() -> ProgressBuffer:
+    return ProgressBuffer(
+        flush_interval=float(os.environ.get("MOVIE_DB_PROGRESS_FLUSH_INTERVAL", "2")),
+        max_pending=int(os.environ.get("MOVIE_DB_PROGRESS_MAX_PENDING", "10000")),
+    )
+
+
+progress_buffer = create_progress_buffer()
@@ -0,0 +1,368 @@
+"""Filters, orders and query planning for the movie list.
+
+``GET /movies/`` narrows movies by genre and director (equality) and by
+``release_date`` and ``runtime_minutes`` ranges, and orders them by id
+(the default), ``release_date`` or ``runtime_minutes``, descending with a
+leading ``-``. Ties are broken by id, so every order is total and a
+cursor, the (key, id) of the last row sent, can resume it.
+
+Equality filters use the sorted id buckets of ``DummyDatabase``; ranges
+and orders use an ``OrderedIndex`` per column, kept up to date on every
+insert and delete like the buckets. No request sorts the table. ``plan``
+starts from one index and probes the remaining filters id by id, either:
+
+* walking an index already in the requested order (the smallest bucket,
+  or every id, for id orders; the sort column's index otherwise), which
+  stops as soon as the page is full and resumes from a cursor with a
+  bisect; or
+* collecting the ids of the most selective filter and sorting only the
+  ones that pass, which wins when few rows match and the walk would step
+  over many to fill a page.
+
+It picks whichever touches fewer rows, estimating the matches as if the
+filters were independent.
+"""
+import math
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date
+from itertools import islice, repeat
+from typing import Callable, Iterable, Iterator, NamedTuple, Optional
+
+# An index entry is ``key << KEY_SHIFT | id``: entries sort by (key, id)
+# as plain integers, with room for ids below 2**40 and keys below 2**23
+KEY_SHIFT = 40
+ID_MASK = (1 << KEY_SHIFT) - 1
+
+# Range-filterable and sortable columns -> integer key of a movie
+COLUMN_KEYS = {
+    "release_date": lambda movie: movie.release_date.toordinal(),
+    "runtime_minutes": lambda movie: movie.runtime_minutes,
+}
+SORTS = ("id", *COLUMN_KEYS)
+
+
+def entry(key: int, item_id: int) -> int:
+    return key << KEY_SHIFT | item_id
+
+
+def _ordinal(value: Optional[date]) -> Optional[int]:
+    return None if value is None else value.toordinal()
+
+
+class MovieQuery(NamedTuple):
+    genre: Optional[str] = None
+    director_id: Optional[int] = None
+    released_from: Optional[date] = None
+    released_to: Optional[date] = None
+    min_runtime: Optional[int] = None
+    max_runtime: Optional[int] = None
+    sort: str = "id"
+
+    @property
+    def order(self) -> tuple[str, bool]:
+        """``(column, descending)`` of ``sort``."""
+        return self.sort.lstrip("-"), self.sort.startswith("-")
+
+    def ranges(self) -> dict[str, tuple[Optional[int], Optional[int]]]:
+        """Inclusive key bounds of each range-filtered column."""
+        ranges = {}
+        if self.released_from is not None or self.released_to is not None:
+            ranges["release_date"] = (_ordinal(self.released_from), _ordinal(self.released_to))
+        if self.min_runtime is not None or self.max_runtime is not None:
+            ranges["runtime_minutes"] = (self.min_runtime, self.max_runtime)
+        return ranges
+
+    def matches(self, movie) -> bool:
+        if self.genre and movie.genre.casefold() != self.genre.casefold():
+            return False
+        if self.director_id and movie.director_id != self.director_id:
+            return False
+        for column, (low, high) in self.ranges().items():
+            key = COLUMN_KEYS[column](movie)
+            if (low is not None and key < low) or (high is not None and key > high):
+                return False
+        return True
+
+
+def entry_bounds(low: Optional[int], high: Optional[int]) -> tuple[Optional[int], Optional[int]]:
+    """Entries ``lo <= entry < hi`` holding the keys ``low`` to ``high``."""
+    return (
+        None if low is None else entry(low, 0),
+        None if high is None else entry(high + 1, 0),
+    )
+
+
+class OrderedIndex:
+    """Ids ordered by an integer key, then by id.
+
+    Entries (see ``entry``) are kept sorted in int64 blocks of at most
+    ``2 * load`` entries, with the last entry of each block in ``maxes``:
+    finding a block is a bisect, and inserting or deleting moves at most
+    one block's entries, so loading rows in key order or at random costs
+    the same. A key range is two bisects, and an ordered walk from a cursor
+    a bisect and a scan. ``keys`` maps an id back to its key (-1 for none),
+    indexed by id like the columnar tables, so other filters probe an id's
+    key without fetching its row.
+    """
+
+    __slots__ = ("load", "blocks", "maxes", "keys", "size")
+
+    def __init__(self, load: int = 1000):
+        self.load = load
+        self.blocks: list[array] = []
+        self.maxes: list[int] = []
+        self.keys = array("q")
+        self.size = 0
+
+    def add(self, key: int, item_id: int):
+        self.discard(item_id)
+        packed = entry(key, item_id)
+        blocks, maxes = self.blocks, self.maxes
+        if not blocks:
+            blocks.append(array("q", [packed]))
+            maxes.append(packed)
+        else:
+            number = min(bisect_left(maxes, packed), len(blocks) - 1)
+            block = blocks[number]
+            # Mostly new ids with recent dates, so appending is common
+            if block[-1] < packed:
+                block.append(packed)
+                maxes[number] = packed
+            else:
+                block.insert(bisect_left(block, packed), packed)
+            if len(block) > 2 * self.load:
+                blocks.insert(number + 1, block[self.load:])
+                del block[self.load:]
+                maxes.insert(number, block[-1])
+        self.size += 1
+        keys = self.keys
+        if item_id >= len(keys):
+            keys.extend(repeat(-1, item_id + 1 - len(keys)))
+        keys[item_id] = key
+
+    def discard(self, item_id: int):
+        key = self.key(item_id)
+        if key is None:
+            return
+        packed = entry(key, item_id)
+        number = bisect_left(self.maxes, packed)
+        block = self.blocks[number]
+        del block[bisect_left(block, packed)]
+        if block:
+            self.maxes[number] = block[-1]
+        else:
+            del self.blocks[number], self.maxes[number]
+        self.size -= 1
+        self.keys[item_id] = -1
+
+    def key(self, item_id: int) -> Optional[int]:
+        keys = self.keys
+        if 0 <= item_id < len(keys) and keys[item_id] >= 0:
+            return keys[item_id]
+        return None
+
+    def _rank(self, packed: Optional[int]) -> int:
+        """Number of entries below ``packed`` (all of them for ``None``)."""
+        if packed is None:
+            return self.size
+        number = bisect_left(self.maxes, packed)
+        if number == len(self.blocks):
+            return self.size
+        return sum(map(len, self.blocks[:number])) + bisect_left(self.blocks[number], packed)
+
+    def count(self, low: Optional[int] = None, high: Optional[int] = None) -> int:
+        """Number of ids with ``low <= key <= high``."""
+        lo, hi = entry_bounds(low, high)
+        return max(0, self._rank(hi) - (0 if lo is None else self._rank(lo)))
+
+    def walk(
+        self,
+        low: Optional[int] = None,
+        high: Optional[int] = None,
+        position: Optional[int] = None,
+        descending: bool = False,
+    ) -> Iterator[int]:
+        """Ids with ``low <= key <= high`` in order, past the entry ``position``."""
+        lo, hi = entry_bounds(low, high)
+        blocks, maxes = self.blocks, self.maxes
+        if not blocks:
+            return
+        # Whole slices of a block are unpacked at once, in C
+        unpack = ID_MASK.__and__
+        if descending:
+            if position is not None:
+                hi = position if hi is None else min(hi, position)
+            number = len(blocks) - 1 if hi is None else min(bisect_left(maxes, hi), len(blocks) - 1)
+            stop = len(blocks[number]) if hi is None else bisect_left(blocks[number], hi)
+            for number in range(number, -1, -1):
+                block = blocks[number]
+                start = 0 if lo is None or block[0] >= lo else bisect_left(block, lo, 0, stop)
+                yield from map(unpack, reversed(block[start:stop]))
+                if start:
+                    return
+                if number:
+                    stop = len(blocks[number - 1])
+        else:
+            if position is not None:
+                lo = position + 1 if lo is None else max(lo, position + 1)
+            number = 0 if lo is None else bisect_left(maxes, lo)
+            if number == len(blocks):
+                return
+            start = 0 if lo is None else bisect_left(blocks[number], lo)
+            for block in islice(blocks, number, None):
+                stop = len(block) if hi is None or block[-1] < hi else bisect_left(block, hi, start)
+                yield from map(unpack, block[start:stop])
+                if stop < len(block):
+                    return
+                start = 0
+
+    def probe(self, low: Optional[int], high: Optional[int]) -> Callable[[int], bool]:
+        """Test of whether an id's key is within ``low <= key <= high``."""
+        return probe_keys(self.keys, low, high)
+
+    def entries(self) -> array:
+        """Every entry in order, as one array."""
+        flat = array("q")
+        for block in self.blocks:
+            flat.extend(block)
+        return flat
+
+    def __len__(self) -> int:
+        return self.size
+
+
+def probe_keys(keys, low: Optional[int], high: Optional[int]) -> Callable[[int], bool]:
+    """Test of whether an id's key in ``keys`` is within ``low <= key <= high``."""
+    # Missing ids have key -1, below any bound
+    low = 0 if low is None else low
+    high = (1 << 62) if high is None else high
+    size = len(keys)
+
+    def test(item_id: int) -> bool:
+        return item_id < size and low <= keys[item_id] <= high
+    return test
+
+
+class _Bucket:
+    """Equality filter: a sorted id set."""
+
+    __slots__ = ("ids", "test")
+
+    def __init__(self, ids):
+        self.ids = ids
+        self.test = ids.__contains__
+
+    def rows(self) -> Iterable[int]:
+        return self.ids
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+
+class _Range:
+    """Range filter: a key range of an ordered index."""
+
+    __slots__ = ("index", "low", "high", "size", "test")
+
+    def __init__(self, index, low: Optional[int], high: Optional[int]):
+        self.index, self.low, self.high = index, low, high
+        self.size = index.count(low, high)
+        self.test = index.probe(low, high)
+
+    def rows(self) -> Iterable[int]:
+        return self.index.walk(self.low, self.high)
+
+    def __len__(self) -> int:
+        return self.size
+
+
+def plan(
+    query: MovieQuery,
+    ids,
+    buckets: list,
+    indexes: dict,
+    after: Optional[int] = None,
+    after_key: Optional[int] = None,
+    limit: Optional[int] = None,
+) -> Iterable[int]:
+    """Ids of the movies matching ``query``, in its order, past the cursor.
+
+    ``ids`` holds every movie id in order, ``buckets`` the sorted id sets of
+    the genre and director filters and ``indexes`` the ``OrderedIndex``, or
+    a read-only view of one, of each column in ``COLUMN_KEYS``. ``after``
+    and ``after_key`` are the id and sort key of the last row already sent;
+    ``limit`` is how many ids the caller wants, ``None`` for all of them. A sorted id set is returned
+    as is when it is the whole answer, so pagination can seek into it;
+    anything else comes back as an iterator already past the cursor.
+    """
+    column, descending = query.order
+    keyed = column != "id"
+    if keyed and after is not None and after_key is None:
+        raise ValueError("Invalid cursor")
+    position = after if not keyed or after is None else entry(after_key, after)
+
+    filters = [_Bucket(bucket) for bucket in buckets]
+    filters += [_Range(indexes[name], low, high) for name, (low, high) in query.ranges().items()]
+    filters.sort(key=len)
+    if filters and not len(filters[0]):
+        return iter(())
+
+    if keyed:
+        index = indexes[column]
+        own = next((f for f in filters if isinstance(f, _Range) and f.index is index), None)
+        low, high = (own.low, own.high) if own is not None else (None, None)
+        walked = len(own) if own is not None else len(index)
+        probes = [f for f in filters if f is not own]
+
+        def walk():
+            return index.walk(low, high, position, descending)
+    else:
+        # The smallest bucket, since filters are sorted by size
+        bucket = next((f for f in filters if isinstance(f, _Bucket)), None)
+        source = ids if bucket is None else bucket.ids
+        walked = len(source)
+        probes = [f for f in filters if f is not bucket]
+        if not probes and not descending:
+            return source
+
+        def walk():
+            return source.iter_before(position) if descending else source.iter_after(position)
+
+    if probes:
+        # Matches expected, as if the filters were independent
+        total = max(len(ids), 1)
+        expected = float(total)
+        for f in filters:
+            expected *= len(f) / total
+        walk_cost = walked if limit is None else min(walked, limit * walked / max(expected, 1.0))
+        collect_cost = len(filters[0]) + expected * math.log2(expected + 2)
+        if collect_cost < walk_cost:
+            return _collect(filters, indexes[column] if keyed else None, position, descending)
+        return _passing(walk(), probes)
+    return walk()
+
+
+def _passing(item_ids: Iterable[int], filters: list) -> Iterator[int]:
+    """The ids of ``item_ids`` that pass every filter, most selective tested first."""
+    for f in filters:
+        item_ids = filter(f.test, item_ids)
+    return iter(item_ids)
+
+
+def _collect(filters: list, index, position, descending: bool) -> Iterator[int]:
+    """Ids passing every filter, from the smallest, sorted past ``position``."""
+    matched = list(_passing(filters[0].rows(), filters[1:]))
+    if index is None:
+        found = sorted(matched)
+    else:
+        key = index.key
+        found = sorted(entry(key(item_id), item_id) for item_id in matched)
+    if descending:
+        stop = len(found) if position is None else bisect_left(found, position)
+        ordered = reversed(found[:stop])
+    else:
+        ordered = iter(found[0 if position is None else bisect_right(found, position):])
+    if index is None:
+        return ordered
+    return (packed & ID_MASK for packed in ordered)
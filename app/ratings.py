@@ -0,0 +1,240 @@
+"""Running rating aggregates and top-rated leaderboards.
+
+Review writes update these incrementally, so rating stats and leaderboards
+are served without rescanning reviews. Numeric ratings (1-5) feed the
+average and histogram; text ratings are only counted. The aggregates are
+rebuilt from the store once at startup and then follow every write as a
+repository listener (see ``Repository.watch``).
+
+Leaderboards are tiered by review count: tier ``k`` ranks the movies with
+at least ``2 ** k`` numeric ratings. A ``min_reviews`` query walks the
+highest tier at or below it, so it only skips movies with fewer than
+``min_reviews`` but at least half as many ratings, however many movies
+have only a handful. A movie with ``n`` ratings is on ``log2(n) + 1``
+tiers, and each tier is a blocked sorted list, so a review write costs a
+few bisects and short block shifts.
+"""
+import sys
+from bisect import bisect_left, insort
+from itertools import chain
+from typing import Iterator, Optional
+
+from .schemas.ratings import RatingStats
+from .schemas.reviews import Review
+
+
+class MovieRatings:
+    __slots__ = ("movie_id", "genre", "count", "total", "histogram", "text_count", "rank_key")
+
+    def __init__(self, movie_id: int, genre: str):
+        self.movie_id = movie_id
+        self.genre = genre
+        self.count = 0
+        self.total = 0
+        self.histogram = [0, 0, 0, 0, 0]
+        self.text_count = 0
+        self.rank_key: Optional[tuple] = None
+
+    @property
+    def average(self) -> Optional[float]:
+        return self.total / self.count if self.count else None
+
+
+class RankedList:
+    """Rank keys ordered best first: highest average, then most reviews, then id.
+
+    Keys are ``(-average, -count, movie id)`` kept in sorted blocks of up to
+    ``2 * load`` keys, so adding or removing one shifts a single block.
+    """
+
+    def __init__(self, load: int = 500):
+        self.load = load
+        self._blocks: list[list[tuple]] = []
+        # Last key of each block
+        self._maxes: list[tuple] = []
+        self._size = 0
+
+    def add(self, key: tuple):
+        blocks, maxes = self._blocks, self._maxes
+        self._size += 1
+        if not blocks:
+            blocks.append([key])
+            maxes.append(key)
+            return
+        number = bisect_left(maxes, key)
+        if number == len(blocks):
+            number -= 1
+            blocks[number].append(key)
+            maxes[number] = key
+        else:
+            insort(blocks[number], key)
+        block = blocks[number]
+        if len(block) > 2 * self.load:
+            blocks.insert(number + 1, block[self.load:])
+            del block[self.load:]
+            maxes.insert(number, block[-1])
+
+    def remove(self, key: tuple):
+        blocks, maxes = self._blocks, self._maxes
+        number = bisect_left(maxes, key)
+        if number == len(blocks):
+            return
+        block = blocks[number]
+        position = bisect_left(block, key)
+        if position == len(block) or block[position] != key:
+            return
+        del block[position]
+        self._size -= 1
+        if not block:
+            del blocks[number]
+            del maxes[number]
+        else:
+            maxes[number] = block[-1]
+
+    def __iter__(self) -> Iterator[tuple]:
+        return chain.from_iterable(self._blocks)
+
+    def __len__(self) -> int:
+        return self._size
+
+
+def _tiers(count: int) -> int:
+    """Number of leaderboard tiers a movie with ``count`` ratings is on."""
+    return count.bit_length()
+
+
+class RatingAggregates:
+    def __init__(self):
+        self.movies: dict[int, MovieRatings] = {}
+        # Genre of every movie, so a review can be ranked without a lookup
+        self.genres: dict[int, str] = {}
+        # Leaderboard tiers, overall and per genre (see the module docstring)
+        self.ranked: list[RankedList] = []
+        self.ranked_by_genre: dict[str, list[RankedList]] = {}
+
+    def clear(self):
+        self.__init__()
+
+    def _unrank(self, entry: MovieRatings):
+        if entry.rank_key is None:
+            return
+        tiers = _tiers(-entry.rank_key[1])
+        genre_ranked = self.ranked_by_genre[entry.genre]
+        for ranked in (self.ranked, genre_ranked):
+            for tier in range(tiers):
+                ranked[tier].remove(entry.rank_key)
+            while ranked and not ranked[-1]:
+                ranked.pop()
+        if not genre_ranked:
+            del self.ranked_by_genre[entry.genre]
+        entry.rank_key = None
+
+    def _rank(self, entry: MovieRatings):
+        if not entry.count:
+            return
+        entry.rank_key = (-entry.average, -entry.count, entry.movie_id)
+        tiers = _tiers(entry.count)
+        for ranked in (self.ranked, self.ranked_by_genre.setdefault(entry.genre, [])):
+            while len(ranked) < tiers:
+                ranked.append(RankedList())
+            for tier in range(tiers):
+                ranked[tier].add(entry.rank_key)
+
+    def add_review(self, review: Review, genre: str):
+        entry = self.movies.get(review.movie_id)
+        if entry is None:
+            entry = self.movies[review.movie_id] = MovieRatings(review.movie_id, genre.casefold())
+        if isinstance(review.rating, int):
+            self._unrank(entry)
+            entry.count += 1
+            entry.total += review.rating
+            entry.histogram[review.rating - 1] += 1
+            self._rank(entry)
+        else:
+            entry.text_count += 1
+
+    def remove_review(self, review: Review):
+        entry = self.movies.get(review.movie_id)
+        if entry is None:
+            return
+        if isinstance(review.rating, int):
+            self._unrank(entry)
+            entry.count -= 1
+            entry.total -= review.rating
+            entry.histogram[review.rating - 1] -= 1
+            self._rank(entry)
+        else:
+            entry.text_count -= 1
+        if not entry.count and not entry.text_count:
+            del self.movies[review.movie_id]
+
+    def remove_movie(self, movie_id: int):
+        entry = self.movies.pop(movie_id, None)
+        if entry is not None:
+            self._unrank(entry)
+
+    # Repository listener
+
+    def on_put(self, table: str, rows: list):
+        if table == "movies":
+            for movie in rows:
+                self.genres[movie.id] = sys.intern(movie.genre.casefold())
+        elif table == "reviews":
+            for review in rows:
+                genre = self.genres.get(review.movie_id)
+                if genre is not None:
+                    self.add_review(review, genre)
+
+    def on_delete(self, table: str, row):
+        if table == "reviews":
+            self.remove_review(row)
+        elif table == "movies":
+            # Its reviews go with it
+            self.genres.pop(row.id, None)
+            self.remove_movie(row.id)
+
+    def stats(self, movie_id: int) -> Optional[MovieRatings]:
+        return self.movies.get(movie_id)
+
+    def summary(self, movie_id: int) -> RatingStats:
+        """Rating stats of a movie as the API returns them; zeros without reviews."""
+        entry = self.movies.get(movie_id)
+        if entry is None:
+            return RatingStats(
+                movie_id=movie_id,
+                review_count=0,
+                histogram={stars: 0 for stars in range(1, 6)},
+                text_rating_count=0
+            )
+        return RatingStats(
+            movie_id=movie_id,
+            review_count=entry.count,
+            average_rating=entry.average,
+            histogram={stars: entry.histogram[stars - 1] for stars in range(1, 6)},
+            text_rating_count=entry.text_count
+        )
+
+    def top(self, genre: Optional[str] = None, min_reviews: int = 1, limit: int = 10) -> list[MovieRatings]:
+        """Best rated movies with at least ``min_reviews`` numeric ratings."""
+        tiers = self.ranked if not genre else self.ranked_by_genre.get(genre.casefold(), ())
+        tier = _tiers(max(min_reviews, 1)) - 1
+        if tier >= len(tiers):
+            return []
+        found = []
+        for _, negated_count, movie_id in tiers[tier]:
+            if -negated_count >= min_reviews:
+                found.append(self.movies[movie_id])
+                if len(found) == limit:
+                    break
+        return found
+
+    async def rebuild(self, db):
+        """Recompute every aggregate from the reviews in ``db``."""
+        self.clear()
+        async for movie in db.iter_rows("movies"):
+            self.on_put("movies", [movie])
+        async for review in db.iter_rows("reviews"):
+            self.on_put("reviews", [review])
+
+
+rating_stats = RatingAggregates()
@@ -0,0 +1,246 @@
+"""Similar movies, from watch list co-occurrence plus director and genre.
+
+Two movies are similar when people put them on the same watch lists. The
+movie x movie co-occurrence matrix is the product of the sparse movie x
+watch list incidence matrix with its transpose, so only the incidence is
+stored (each watch list's movies, and the watch lists holding each movie)
+and a movie's row of the product is summed on demand: one C-level
+``Counter.update`` over the movies of the lists holding it. The few movies
+on more than ``max_lists`` lists use their newest ones, which bounds the
+cost of a row. A neighbour's score is the cosine of the two movies' watch
+list sets, plus ``director_weight`` for the same director and
+``genre_weight`` for the same genre; movies by the same director in the
+same genre are candidates even without a shared list.
+
+The best ``top_k`` neighbours of every movie are precomputed, so a request
+is a lookup. Adding or deleting a watch list changes the rows of exactly
+the movies on it: those are marked dirty and recomputed by a background
+task, in slices of ``slice_seconds`` so requests keep being served. Until
+then, and for neighbours whose only change is their popularity, requests
+see the previous lists. A movie not computed yet (just created, or
+before the startup pass reaches it) is computed when first requested.
+
+Follows writes as a repository listener (see ``Repository.watch``).
+Configured with ``MOVIE_DB_SIMILAR_TOP_K`` (default 20).
+``benchmarks/similar.py`` measures build time and query latency.
+"""
+import asyncio
+import heapq
+import math
+import os
+import sys
+import time
+from array import array
+from bisect import bisect_left, insort
+from collections import Counter
+from itertools import chain, islice
+from typing import Iterable, Optional
+
+
+_UNKNOWN = (None, None)
+
+
+class SimilarMovies:
+    director_weight = 0.2
+    genre_weight = 0.1
+    # Lists summed for a movie's row; the most popular movies use their newest
+    max_lists = 500
+
+    def __init__(self, top_k: int = 20, slice_seconds: float = 0.005):
+        self.top_k = top_k
+        self.slice_seconds = slice_seconds
+        # The incidence matrix, by row and by column (list ids in order)
+        self.lists: dict[int, array] = {}
+        self.lists_by_movie: dict[int, array] = {}
+        # movie -> (director, casefolded genre), and its ids in order
+        self.movies: dict[int, tuple[int, str]] = {}
+        self.peers: dict[tuple[int, str], list[int]] = {}
+        # movie -> its top list, packed as [neighbour, score, shared lists, ...]
+        self.top: dict[int, array] = {}
+        self.dirty: set[int] = set()
+        self.refreshed = 0
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+
+    def clear(self):
+        self.lists.clear()
+        self.lists_by_movie.clear()
+        self.movies.clear()
+        self.peers.clear()
+        self.top.clear()
+        self.dirty.clear()
+
+    def _mark(self, movie_ids: Iterable[int]):
+        self.dirty.update(movie_ids)
+        if self._wake is not None and self.dirty:
+            self._wake.set()
+
+    # Updates
+
+    def add_list(self, list_id: int, movie_ids: Iterable[int]):
+        self.remove_list(list_id)
+        movies = array("q", dict.fromkeys(movie_ids))
+        if not movies:
+            return
+        self.lists[list_id] = movies
+        for movie_id in movies:
+            holding = self.lists_by_movie.get(movie_id)
+            if holding is None:
+                holding = self.lists_by_movie[movie_id] = array("q")
+            insort(holding, list_id)
+        self._mark(movies)
+
+    def remove_list(self, list_id: int):
+        movies = self.lists.pop(list_id, None)
+        if movies is None:
+            return
+        for movie_id in movies:
+            holding = self.lists_by_movie[movie_id]
+            del holding[bisect_left(holding, list_id)]
+            if not holding:
+                del self.lists_by_movie[movie_id]
+        self._mark(movies)
+
+    def add_movie(self, movie_id: int, director_id: int, genre: str):
+        self.remove_movie(movie_id, keep_lists=True)
+        entry = self.movies[movie_id] = (director_id, sys.intern(genre.casefold()))
+        insort(self.peers.setdefault(entry, []), movie_id)
+        # Its peers pick it up when they are next recomputed
+        self._mark((movie_id,))
+
+    def remove_movie(self, movie_id: int, keep_lists: bool = False):
+        entry = self.movies.pop(movie_id, None)
+        if entry is not None:
+            peers = self.peers[entry]
+            del peers[bisect_left(peers, movie_id)]
+            if not peers:
+                del self.peers[entry]
+        if keep_lists:
+            return
+        self.top.pop(movie_id, None)
+        self.dirty.discard(movie_id)
+        # Deleting a movie takes it off every watch list
+        for list_id in self.lists_by_movie.pop(movie_id, ()):
+            movies = self.lists[list_id]
+            movies.remove(movie_id)
+            if not movies:
+                del self.lists[list_id]
+            self._mark(movies)
+
+    # Scoring
+
+    def neighbours(self, movie_id: int) -> list[tuple[int, float, int]]:
+        """Best ``top_k`` neighbours of a movie, computed from the matrix."""
+        holding = self.lists_by_movie.get(movie_id, ())
+        shared = Counter()
+        # Row ``movie_id`` of incidence x incidence^T
+        shared.update(chain.from_iterable(map(self.lists.__getitem__, holding[-self.max_lists:])))
+        shared.pop(movie_id, None)
+        director, genre = entry = self.movies.get(movie_id, _UNKNOWN)
+        # Without shared lists peers tie on score, and the lowest ids win
+        for peer in islice(self.peers.get(entry, ()), self.top_k + 1):
+            if peer != movie_id:
+                shared[peer] += 0
+
+        lists_by_movie, movies, max_lists = self.lists_by_movie, self.movies, self.max_lists
+        director_weight, genre_weight = self.director_weight, self.genre_weight
+        norm = math.sqrt(min(len(holding), max_lists))
+        scored = []
+        for other, count in shared.items():
+            score = count / (norm * math.sqrt(min(len(lists_by_movie[other]), max_lists))) if count else 0.0
+            other_director, other_genre = movies.get(other, _UNKNOWN)
+            if director is not None:
+                if other_director == director:
+                    score += director_weight
+                if other_genre == genre:
+                    score += genre_weight
+            scored.append((score, count, -other))
+        return [
+            (-negated, score, count)
+            for score, count, negated in heapq.nlargest(self.top_k, scored)
+        ]
+
+    def refresh(self, movie_id: int):
+        self.dirty.discard(movie_id)
+        if movie_id in self.movies or movie_id in self.lists_by_movie:
+            self.top[movie_id] = array("d", chain.from_iterable(self.neighbours(movie_id)))
+        else:
+            self.top.pop(movie_id, None)
+        self.refreshed += 1
+
+    def similar(self, movie_id: int, limit: int = 10) -> list[tuple[int, float, int]]:
+        """``(movie, score, shared watch lists)`` for the best ``limit`` neighbours."""
+        top = self.top.get(movie_id)
+        if top is None:
+            self.refresh(movie_id)
+            top = self.top.get(movie_id, ())
+        return [
+            (int(top[position]), top[position + 1], int(top[position + 2]))
+            for position in range(0, min(len(top), 3 * limit), 3)
+        ]
+
+    # Background refresh
+
+    def start(self):
+        if self._task is not None:
+            return
+        self._wake = asyncio.Event()
+        if self.dirty:
+            self._wake.set()
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await self._wake.wait()
+            self._wake.clear()
+            while self.dirty:
+                deadline = time.perf_counter() + self.slice_seconds
+                while self.dirty and time.perf_counter() < deadline:
+                    self.refresh(self.dirty.pop())
+                # Let requests in between slices
+                await asyncio.sleep(0)
+
+    async def close(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self._wake = None
+
+    def stats(self) -> dict[str, int]:
+        return {"computed": len(self.top), "dirty": len(self.dirty), "refreshed": self.refreshed}
+
+    # Repository listener
+
+    def on_put(self, table: str, rows: list):
+        if table == "movies":
+            for movie in rows:
+                self.add_movie(movie.id, movie.director_id, movie.genre)
+        elif table == "watchlists":
+            for watchlist in rows:
+                self.add_list(watchlist.id, watchlist.movie_ids)
+
+    def on_delete(self, table: str, row):
+        if table == "movies":
+            self.remove_movie(row.id)
+        elif table == "watchlists":
+            self.remove_list(row.id)
+
+    async def rebuild(self, db):
+        """Load the matrix from ``db``; the top lists follow in the background."""
+        self.clear()
+        async for movie in db.iter_rows("movies"):
+            self.add_movie(movie.id, movie.director_id, movie.genre)
+        async for watchlist in db.iter_rows("watchlists"):
+            self.add_list(watchlist.id, watchlist.movie_ids)
+
+
+def create_similar_movies() -> SimilarMovies:
+    return SimilarMovies(top_k=int(os.environ.get("MOVIE_DB_SIMILAR_TOP_K", "20")))
+
+
+similar_movies = create_similar_movies()
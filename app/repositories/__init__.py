@@ -0,0 +1,65 @@
+import os
+import tempfile
+from pathlib import Path
+
+from ..database import db
+from .base import MODELS, Repository
+from .memory import MemoryRepository
+from .shared import SharedOwnerRepository, SharedReaderRepository, open_shared_repository
+from .sqlite import SQLiteRepository
+
+
+def _default_shared_dir() -> Path:
+    shm = Path("/dev/shm")
+    return (shm if shm.is_dir() else Path(tempfile.gettempdir())) / "movie-db"
+
+
+def create_repository() -> Repository:
+    """Build the backend selected by ``MOVIE_DB_BACKEND`` (memory, sqlite or shared).
+
+    ``MOVIE_DB_FAST_JSON=1`` turns on the fast serialization mode and
+    ``MOVIE_DB_COMPACT=1`` the columnar layout of the memory store.
+
+    ``shared`` is for running several workers: one of them keeps the memory
+    store (with the same persistence settings) and the others read its
+    snapshots from ``MOVIE_DB_SHARED_DIR``, by default on ``/dev/shm``.
+    ``MOVIE_DB_SHARED_PUBLISH_INTERVAL`` bounds how long, in seconds, other
+    workers may lag behind a write.
+    """
+    backend = os.environ.get("MOVIE_DB_BACKEND", "memory")
+    fast_json = os.environ.get("MOVIE_DB_FAST_JSON") == "1"
+    if backend in ("memory", "shared"):
+        if os.environ.get("MOVIE_DB_COMPACT") == "1":
+            db.use_compact_storage()
+        options = dict(
+            data_dir=os.environ.get("MOVIE_DB_DATA_DIR"),
+            durability=os.environ.get("MOVIE_DB_DURABILITY", "group"),
+            snapshot_every=int(os.environ.get("MOVIE_DB_SNAPSHOT_EVERY", "50000")),
+            fast_json=fast_json,
+        )
+        if backend == "memory":
+            return MemoryRepository(db, **options)
+        return open_shared_repository(
+            db,
+            os.environ.get("MOVIE_DB_SHARED_DIR") or _default_shared_dir(),
+            publish_interval=float(os.environ.get("MOVIE_DB_SHARED_PUBLISH_INTERVAL", "0.02")),
+            **options,
+        )
+    if backend == "sqlite":
+        return SQLiteRepository(
+            os.environ.get("MOVIE_DB_SQLITE_PATH", "movie_database.sqlite3"),
+            pool_size=int(os.environ.get("MOVIE_DB_SQLITE_POOL_SIZE", "4")),
+            fast_json=fast_json,
+        )
+    raise ValueError(f"Unknown storage backend: {backend}")
+
+
+__all__ = [
+    "MODELS",
+    "Repository",
+    "MemoryRepository",
+    "SharedOwnerRepository",
+    "SharedReaderRepository",
+    "SQLiteRepository",
+    "create_repository",
+]
@@ -0,0 +1,203 @@
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+from ..database import ID_BLOCK_SIZE, Sequences
+from ..query import MovieQuery
+from ..schemas.directors import Director
+from ..schemas.movies import Movie
+from ..schemas.reviews import Review
+from ..schemas.watchlists import WatchList
+from ..schemas.viewing_history import ViewingHistory
+from ..utils.pagination import PageParams
+
+MODELS = {
+    "directors": Director,
+    "movies": Movie,
+    "reviews": Review,
+    "watchlists": WatchList,
+    "viewing_history": ViewingHistory,
+}
+
+
+class Repository(ABC):
+    """Storage backend the routers talk to.
+
+    Tables are addressed by name (see ``MODELS``) and rows are the schema
+    models. Deleting a movie also deletes its reviews and viewing history
+    and removes it from every watchlist.
+
+    The ``*_json`` reads return each row already encoded as the JSON its
+    model serializes to; they back the fast serialization mode.
+    """
+
+    # Whether routers should answer reads from the *_json methods
+    fast_json: bool = False
+
+    # Ids are handed out from blocks of this size reserved with reserve_ids
+    id_block_size: int = ID_BLOCK_SIZE
+    _sequences: Optional[Sequences] = None
+
+    # Objects kept up to date with every write, registered with watch()
+    listeners: tuple = ()
+
+    async def open(self):
+        pass
+
+    async def close(self):
+        pass
+
+    @asynccontextmanager
+    async def snapshot(self):
+        """Serve every read made in this block from one version of the data.
+
+        ``get_db`` wraps each GET request in it, so a read never sees another
+        request's write half applied, even across awaits. Writes made in the
+        block move it to the newest version, so a request reads its own
+        writes. Backends without versioned reads serve the latest data.
+        """
+        yield self
+
+    def stats(self) -> dict[str, int]:
+        """Backend-specific numbers exposed by ``GET /metrics``."""
+        return {}
+
+    async def watch(self, *listeners):
+        """Rebuild each listener from the stored rows, then keep it current.
+
+        Listeners are in-memory views derived from the data (rating
+        aggregates, the search index). They implement ``rebuild(repository)``,
+        ``on_put(table, rows)`` and ``on_delete(table, row)``, which are
+        called right after every write; deleting a movie is reported once,
+        for the movie, not for each cascaded row.
+        """
+        for listener in listeners:
+            await listener.rebuild(self)
+        self.listeners = self.listeners + listeners
+
+    def _notify_put(self, table: str, rows: list):
+        for listener in self.listeners:
+            listener.on_put(table, rows)
+
+    def _notify_delete(self, table: str, row):
+        for listener in self.listeners:
+            listener.on_delete(table, row)
+
+    @abstractmethod
+    async def get(self, table: str, row_id: int):
+        """Return the row with ``row_id``, or ``None``."""
+
+    @abstractmethod
+    async def get_json(self, table: str, row_id: int) -> Optional[bytes]:
+        ...
+
+    async def exists(self, table: str, row_id: int) -> bool:
+        return await self.get(table, row_id) is not None
+
+    @abstractmethod
+    async def list_rows(self, table: str, page: PageParams) -> list:
+        ...
+
+    @abstractmethod
+    async def list_rows_json(self, table: str, page: PageParams) -> list[bytes]:
+        ...
+
+    @abstractmethod
+    async def list_movies(self, page: PageParams, query: MovieQuery = MovieQuery()) -> list[Movie]:
+        """A page of the movies matching ``query``, in its order.
+
+        Cursors for orders other than by id carry the sort key of the last
+        row, so the next page resumes from an index seek.
+        """
+
+    @abstractmethod
+    async def list_movies_json(self, page: PageParams, query: MovieQuery = MovieQuery()) -> list[bytes]:
+        ...
+
+    @abstractmethod
+    def iter_rows(self, table: str) -> AsyncIterator:
+        """Yield every row of ``table`` in id order, for exports.
+
+        Rows come from a view taken when iteration starts and are read in
+        chunks, so memory does not grow with the table.
+        """
+
+    @abstractmethod
+    def iter_movies(self, query: MovieQuery = MovieQuery()) -> AsyncIterator[Movie]:
+        ...
+
+    @abstractmethod
+    async def count(self, table: str) -> int:
+        ...
+
+    @abstractmethod
+    async def max_id(self, table: str) -> int:
+        """Largest id in ``table``, or 0 when it is empty."""
+
+    @abstractmethod
+    async def reserve_ids(self, table: str, count: int) -> int:
+        """Reserve ``count`` consecutive unused ids and return the first.
+
+        Reserved ids are never returned again, including after a restart.
+        """
+
+    async def allocate_ids(self, table: str, count: int = 1) -> range:
+        """New, increasing ids for ``count`` rows about to be inserted."""
+        if self._sequences is None:
+            self._sequences = Sequences(self.reserve_ids, self.id_block_size)
+        return await self._sequences.allocate(table, count)
+
+    async def next_id(self, table: str) -> int:
+        return (await self.allocate_ids(table))[0]
+
+    @abstractmethod
+    async def existing_ids(self, table: str, ids) -> set[int]:
+        """The subset of ``ids`` present in ``table``."""
+
+    @abstractmethod
+    async def get_many(self, table: str, ids) -> dict:
+        """Rows of ``table`` among ``ids`` by id, in one lookup; missing ids are left out."""
+
+    @abstractmethod
+    async def insert(self, table: str, row):
+        ...
+
+    @abstractmethod
+    async def insert_many(self, table: str, rows: list):
+        """Insert a chunk of rows as one write."""
+
+    @abstractmethod
+    async def delete(self, table: str, row_id: int):
+        ...
+
+    @abstractmethod
+    async def delete_many(self, table: str, row_ids: list[int]) -> list[int]:
+        """Delete the rows among ``row_ids`` that exist, as one write.
+
+        Deleting movies cascades in one merged pass over their dependents.
+        Returns the ids that were deleted.
+        """
+
+    @abstractmethod
+    async def delete_directors_without_movies(self, director_ids: list[int]) -> list[int]:
+        """Delete the directors among ``director_ids`` that have no movies.
+
+        The check and the delete are one write, so a movie added meanwhile
+        keeps its director. Returns the ids that were deleted.
+        """
+
+    @abstractmethod
+    async def director_has_movies(self, director_id: int) -> bool:
+        ...
+
+    @abstractmethod
+    async def history_for_movie(self, movie_id: int) -> list[ViewingHistory]:
+        ...
+
+    @abstractmethod
+    async def history_for_movie_json(self, movie_id: int) -> list[bytes]:
+        ...
+
+    @abstractmethod
+    async def reviews_for_movies(self, movie_ids) -> dict[int, list[Review]]:
+        """The reviews of each of ``movie_ids`` in id order, in one lookup."""
@@ -0,0 +1,285 @@
+import asyncio
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from ..database import DummyDatabase
+from ..mvcc import Snapshot
+from ..persistence import Persistence
+from ..query import MovieQuery
+from ..utils.filters import movie_cursor
+from .base import Repository
+
+
+EXPORT_CHUNK_SIZE = 1000
+
+
+class MemoryRepository(Repository):
+    """Dict-backed store, optionally persisted with a write-ahead log."""
+
+    def __init__(
+        self,
+        database: DummyDatabase,
+        data_dir: Optional[str] = None,
+        durability: str = "group",
+        snapshot_every: int = 50_000,
+        fast_json: bool = False,
+    ):
+        self.database = database
+        self.fast_json = fast_json
+        database.encode_rows = fast_json
+        self.data_dir = data_dir
+        self.durability = durability
+        self.snapshot_every = snapshot_every
+        self.persistence: Optional[Persistence] = None
+        # (task, snapshot) of the request being served, see snapshot()
+        self._snapshot: ContextVar[Optional[tuple]] = ContextVar("snapshot", default=None)
+
+    async def open(self):
+        if self.data_dir:
+            self.persistence = Persistence(
+                self.data_dir,
+                mode=self.durability,
+                snapshot_every=self.snapshot_every,
+            )
+            self.persistence.open(self.database)
+
+    async def close(self):
+        if self.persistence is not None:
+            self.persistence.close()
+            self.database.persistence = None
+            self.persistence = None
+
+    # Consistent reads
+
+    @asynccontextmanager
+    async def snapshot(self):
+        if self._request_snapshot() is not None:
+            yield self
+            return
+        snapshot = self.database.snapshot()
+        token = self._snapshot.set((asyncio.current_task(), snapshot))
+        try:
+            yield self
+        finally:
+            snapshot.release()
+            self._snapshot.reset(token)
+
+    def _request_snapshot(self) -> Optional[Snapshot]:
+        # Tasks started by a request inherit its context but not its snapshot
+        held = self._snapshot.get()
+        if held is None or held[0] is not asyncio.current_task() or held[1].released:
+            return None
+        return held[1]
+
+    def _stale(self) -> Optional[Snapshot]:
+        """The request's snapshot, if writes have landed since it was taken.
+
+        Reads go straight to the live tables otherwise, which is the same
+        data.
+        """
+        snapshot = self._request_snapshot()
+        if snapshot is None or snapshot.current:
+            return None
+        return snapshot
+
+    def _advance(self):
+        snapshot = self._request_snapshot()
+        if snapshot is not None:
+            snapshot.advance()
+
+    # Reads
+
+    async def get(self, table, row_id):
+        snapshot = self._stale()
+        if snapshot is not None:
+            return snapshot.get(table, row_id)
+        return getattr(self.database, table).get(row_id)
+
+    async def get_json(self, table, row_id):
+        snapshot = self._stale()
+        if snapshot is not None:
+            return snapshot.row_json(table, row_id)
+        if row_id not in getattr(self.database, table):
+            return None
+        return self.database.row_json(table, row_id)
+
+    async def exists(self, table, row_id):
+        snapshot = self._stale()
+        if snapshot is not None:
+            return snapshot.get(table, row_id) is not None
+        return row_id in getattr(self.database, table)
+
+    async def list_rows(self, table, page):
+        snapshot = self._stale()
+        if snapshot is not None:
+            row_ids = page.take(snapshot.ids_after(table, page.after))
+            return [snapshot.get(table, row_id) for row_id in row_ids]
+        rows = getattr(self.database, table)
+        return [rows[row_id] for row_id in page.take(self.database.ordered_ids[table])]
+
+    async def list_rows_json(self, table, page):
+        snapshot = self._stale()
+        source = snapshot or self.database
+        if snapshot is not None:
+            row_ids = page.take(snapshot.ids_after(table, page.after))
+        else:
+            row_ids = page.take(self.database.ordered_ids[table])
+        return [source.row_json(table, row_id) for row_id in row_ids]
+
+    async def list_movies(self, page, query=MovieQuery()):
+        snapshot = self._stale()
+        movie_ids = self._movie_ids(snapshot, page, query)
+        if snapshot is not None:
+            return [snapshot.get("movies", movie_id) for movie_id in movie_ids]
+        return [self.database.movies[movie_id] for movie_id in movie_ids]
+
+    async def list_movies_json(self, page, query=MovieQuery()):
+        snapshot = self._stale()
+        movie_ids = self._movie_ids(snapshot, page, query)
+        source = snapshot or self.database
+        return [source.row_json("movies", movie_id) for movie_id in movie_ids]
+
+    def _movie_ids(self, snapshot, page, query):
+        source = snapshot or self.database
+        movie_ids = source.movie_ids(
+            query,
+            after=page.after,
+            after_key=page.after_key,
+            limit=page.skip + page.limit + 1
+        )
+        return page.take(movie_ids, cursor=movie_cursor(query, source.movie_key))
+
+    async def iter_rows(self, table):
+        def ids_after(snapshot, after):
+            return snapshot.ids_after(table, after)
+        async for row in self._iter_chunks(table, ids_after):
+            yield row
+
+    async def iter_movies(self, query=MovieQuery()):
+        column = query.order[0]
+
+        def ids_after(snapshot, after):
+            # Chunks of a sorted walk resume from the last row's key
+            after_key = None
+            if after is not None and column != "id":
+                after_key = snapshot.movie_key(column, after)
+            return snapshot.movie_ids(query, after, after_key, EXPORT_CHUNK_SIZE)
+        async for row in self._iter_chunks("movies", ids_after):
+            yield row
+
+    async def _iter_chunks(self, table, ids_after):
+        """Walk ``table`` by keyset in fixed-size chunks.
+
+        The walk pins the version current when it starts (the request's,
+        if it runs inside one), so rows written meanwhile neither show up
+        nor go missing; the event loop gets control back between chunks.
+        """
+        request = self._request_snapshot()
+        if request is not None:
+            snapshot = request.pin_again()
+        else:
+            snapshot = self.database.snapshot()
+        with snapshot:
+            after = None
+            while True:
+                chunk = snapshot.slice_ids(ids_after(snapshot, after), after, EXPORT_CHUNK_SIZE)
+                if not chunk:
+                    return
+                for row_id in chunk:
+                    yield snapshot.get(table, row_id)
+                after = chunk[-1]
+                await asyncio.sleep(0)
+
+    def stats(self):
+        # Published version, pinned readers and undo entries held for them
+        return self.database.versions.stats()
+
+    async def count(self, table):
+        snapshot = self._stale()
+        if snapshot is not None:
+            return snapshot.count(table)
+        return len(getattr(self.database, table))
+
+    async def max_id(self, table):
+        snapshot = self._stale()
+        if snapshot is not None:
+            return snapshot.max_id(table)
+        ids = self.database.ordered_ids[table]
+        return ids[-1] if ids else 0
+
+    async def reserve_ids(self, table, count):
+        # Logged to the WAL ahead of the rows that use the ids, so it is
+        # durable whenever any of them is
+        return self.database.reserve_ids(table, count)
+
+    async def existing_ids(self, table, ids):
+        snapshot = self._stale()
+        if snapshot is not None:
+            return {row_id for row_id in ids if snapshot.get(table, row_id) is not None}
+        rows = getattr(self.database, table)
+        return {row_id for row_id in ids if row_id in rows}
+
+    async def get_many(self, table, ids):
+        snapshot = self._stale()
+        if snapshot is not None:
+            found = {row_id: snapshot.get(table, row_id) for row_id in ids}
+            return {row_id: row for row_id, row in found.items() if row is not None}
+        rows = getattr(self.database, table)
+        return {row_id: rows[row_id] for row_id in ids if row_id in rows}
+
+    # Writes
+
+    async def insert(self, table, row):
+        self.database.insert(table, row)
+        self._advance()
+        self._notify_put(table, [row])
+        await self.database.commit()
+
+    async def insert_many(self, table, rows):
+        # Published as one version, so readers see all of the chunk or none
+        with self.database.versions.write():
+            for row in rows:
+                self.database.insert(table, row)
+        self._advance()
+        self._notify_put(table, rows)
+        await self.database.commit()
+
+    async def delete(self, table, row_id):
+        row = self.database.delete(table, row_id)
+        self._advance()
+        self._notify_delete(table, row)
+        await self.database.commit()
+
+    async def delete_many(self, table, row_ids):
+        rows = self.database.delete_many(table, row_ids)
+        self._advance()
+        for row in rows:
+            self._notify_delete(table, row)
+        await self.database.commit()
+        return [row.id for row in rows]
+
+    async def delete_directors_without_movies(self, director_ids):
+        database = self.database
+        return await self.delete_many("directors", [
+            director_id for director_id in director_ids
+            if not database.director_has_movies(director_id)
+        ])
+
+    async def director_has_movies(self, director_id):
+        return (self._stale() or self.database).director_has_movies(director_id)
+
+    async def history_for_movie(self, movie_id):
+        return (self._stale() or self.database).history_for_movie(movie_id)
+
+    async def history_for_movie_json(self, movie_id):
+        snapshot = self._stale()
+        source = snapshot or self.database
+        return [
+            source.row_json("viewing_history", history.id)
+            for history in source.history_for_movie(movie_id)
+        ]
+
+    async def reviews_for_movies(self, movie_ids):
+        source = self._stale() or self.database
+        return {movie_id: source.reviews_for_movie(movie_id) for movie_id in movie_ids}
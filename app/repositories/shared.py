@@ -0,0 +1,652 @@
+import asyncio
+import fcntl
+from collections import deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from itertools import islice
+from pathlib import Path
+from typing import Optional
+
+from ..database import DummyDatabase
+from ..query import MovieQuery, plan
+from ..shared_store import (
+    LOCK_FILE, SOCKET_FILE, TABLES, SnapshotView, VersionPointer, base_path, capture_changes,
+    database_contents, read_message, snapshot_path, write_base, write_delta, write_message
+)
+from ..utils.cache import response_cache
+from ..utils.filters import movie_cursor
+from .base import MODELS, Repository
+from .memory import EXPORT_CHUNK_SIZE, MemoryRepository
+
+# Seconds a reader waits for the owner to publish a first snapshot
+STARTUP_TIMEOUT = 30.0
+
+# Tables whose cached responses a delete can change
+DELETE_CASCADES = {"movies": ("movies", "reviews", "watchlists", "viewing_history")}
+
+
+def _no_changes() -> dict[str, dict]:
+    return {table: {} for table in TABLES}
+
+
+class SharedOwnerRepository(MemoryRepository):
+    """The worker that owns the data in shared mode.
+
+    Serves its own requests from memory like ``MemoryRepository``, applies
+    writes forwarded by reader workers, and publishes a new snapshot (see
+    ``app/shared_store.py``) at most every ``publish_interval`` seconds
+    while writes keep coming. Every applied write is also sent to
+    subscribed readers so their listeners stay current.
+
+    A snapshot is a delta over the last base: publishing costs O(rows
+    changed since that base), whatever the size of the store. Once
+    ``compact_after`` rows have changed, the latest snapshot is written out
+    as a new base in a background thread while publishing goes on.
+    """
+
+    def __init__(
+        self,
+        database: DummyDatabase,
+        directory: Path,
+        lock_file,
+        publish_interval: float = 0.02,
+        keep_versions: int = 3,
+        compact_after: int = 4096,
+        **options,
+    ):
+        super().__init__(database, **options)
+        # Snapshots are assembled from the cached JSON of each row
+        database.encode_rows = True
+        self.directory = directory
+        self.publish_interval = publish_interval
+        self.keep_versions = keep_versions
+        self.compact_after = compact_after
+        self._lock_file = lock_file
+        # Number of writes applied so far; snapshots and events carry it
+        self.seq = 0
+        self.published_seq = 0
+        self.version = 0
+        # Version of the base the next delta is written over
+        self.base_version = 0
+        # Rows changed since that base: table -> {id: row in the base, or
+        # None}; and since the base being compacted, while that runs
+        self._since_base = _no_changes()
+        self._since_compaction: Optional[dict[str, dict]] = None
+        self._compactor: Optional[asyncio.Task] = None
+        # Version that last changed each table, for readers' response caches
+        self._table_versions: dict[str, int] = {}
+        # (version, base version) of the snapshots still on disk, oldest first
+        self._on_disk: deque[tuple[int, int]] = deque()
+        self._pointer: Optional[VersionPointer] = None
+        self._published: Optional[asyncio.Condition] = None
+        self._dirty: Optional[asyncio.Event] = None
+        self._publisher: Optional[asyncio.Task] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._subscribers: set[asyncio.StreamWriter] = set()
+        self._connections: set[asyncio.StreamWriter] = set()
+
+    async def open(self):
+        await super().open()
+        self._published = asyncio.Condition()
+        self._dirty = asyncio.Event()
+        self._pointer = VersionPointer(self.directory, create=True)
+        self.version = self._pointer.read()
+        # The first base is written from memory, off the loop; nothing
+        # writes before open() returns
+        self.database.changed_rows = _no_changes()
+        self.base_version = self.version + 1
+        await asyncio.to_thread(
+            write_base,
+            base_path(self.directory, self.base_version),
+            self.base_version,
+            self.seq,
+            database_contents(self.database),
+        )
+        self._table_versions = dict.fromkeys(TABLES, self.base_version)
+        await self._publish()
+        self._remove_stale_files()
+        self._publisher = asyncio.create_task(self._publish_loop())
+
+        socket_path = self.directory / SOCKET_FILE
+        socket_path.unlink(missing_ok=True)
+        self._server = await asyncio.start_unix_server(self._serve, path=str(socket_path))
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            for writer in list(self._connections):
+                writer.close()
+            await self._server.wait_closed()
+            self._server = None
+        for task in (self._publisher, self._compactor):
+            if task is not None:
+                task.cancel()
+        self._publisher = self._compactor = None
+        self.database.changed_rows = None
+        await super().close()
+        if self._pointer is not None:
+            self._pointer.close()
+            self._pointer = None
+        (self.directory / SOCKET_FILE).unlink(missing_ok=True)
+
+    # Change tracking
+
+    def _notify_put(self, table, rows):
+        super()._notify_put(table, rows)
+        self._changed({
+            "event": "put",
+            "table": table,
+            "rows": [row.model_dump(mode="json") for row in rows] if self._subscribers else None,
+        })
+
+    def _notify_delete(self, table, row):
+        super()._notify_delete(table, row)
+        self._changed({
+            "event": "delete",
+            "table": table,
+            "row": row.model_dump(mode="json") if self._subscribers else None,
+        })
+
+    def _changed(self, event: dict):
+        # Runs right after the in-memory change, before any await, so a
+        # snapshot captured later on the loop always matches its seq
+        self.seq += 1
+        event["seq"] = self.seq
+        for writer in list(self._subscribers):
+            if writer.is_closing():
+                self._subscribers.discard(writer)
+            else:
+                write_message(writer, event)
+        if self._dirty is not None:
+            self._dirty.set()
+
+    # Publishing
+
+    async def _publish_loop(self):
+        while True:
+            await self._dirty.wait()
+            # Let a burst of writes land in the same snapshot
+            await asyncio.sleep(self.publish_interval)
+            self._dirty.clear()
+            await self._publish()
+
+    async def _publish(self):
+        # A compaction finishing during the write below moves base_version on
+        seq, base = self.seq, self.base_version
+        fresh, self.database.changed_rows = self.database.changed_rows, _no_changes()
+        version = self.version + 1
+        for table, rows in fresh.items():
+            if not rows:
+                continue
+            self._table_versions[table] = version
+            for changes in (self._since_base, self._since_compaction):
+                if changes is not None:
+                    for row_id, row in rows.items():
+                        changes[table].setdefault(row_id, row)
+        captured = capture_changes(self.database, self._since_base)
+        path = snapshot_path(self.directory, version)
+        await asyncio.to_thread(
+            write_delta, path, version, seq, base, dict(self._table_versions), captured
+        )
+
+        self.version = version
+        self._pointer.write(version)
+        self._on_disk.append((version, base))
+        while len(self._on_disk) > self.keep_versions:
+            # Readers that still have them mapped keep their view
+            old, old_base = self._on_disk.popleft()
+            snapshot_path(self.directory, old).unlink(missing_ok=True)
+            if old_base != self._on_disk[0][1]:
+                base_path(self.directory, old_base).unlink(missing_ok=True)
+
+        if self._compactor is None and sum(map(len, self._since_base.values())) >= self.compact_after:
+            self._since_compaction = _no_changes()
+            self._compactor = asyncio.create_task(self._compact(SnapshotView(path)))
+
+        async with self._published:
+            self.published_seq = seq
+            self._published.notify_all()
+
+    async def _compact(self, view: SnapshotView):
+        """Write ``view`` out as a new base, from its files, off the loop."""
+        try:
+            await asyncio.to_thread(
+                write_base, base_path(self.directory, view.version), view.version, view.seq, view.contents()
+            )
+            self.base_version = view.version
+            self._since_base = self._since_compaction
+            # Publish over the new base, compacting again if writes piled up
+            self._dirty.set()
+        finally:
+            self._since_compaction = None
+            self._compactor = None
+
+    async def wait_compacted(self):
+        """Wait until the latest snapshot is over a base no compaction is replacing."""
+        while self._compactor is not None or self._on_disk[-1][1] != self.base_version:
+            await asyncio.sleep(max(self.publish_interval, 0.001))
+
+    def _remove_stale_files(self):
+        # Left behind by an earlier owner
+        for path in self.directory.glob("*.bin*"):
+            prefix, _, rest = path.name.partition("-")
+            if prefix in ("base", "snapshot") and int(rest[:12]) < self.base_version:
+                path.unlink(missing_ok=True)
+
+    async def _wait_published(self, seq: int):
+        async with self._published:
+            await self._published.wait_for(lambda: self.published_seq >= seq)
+
+    # Requests from reader workers
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._connections.add(writer)
+        try:
+            while True:
+                message = await read_message(reader)
+                if message is None:
+                    break
+                if message["op"] == "subscribe":
+                    write_message(writer, {"id": message["id"], "seq": self.seq})
+                    self._subscribers.add(writer)
+                else:
+                    # Requests run concurrently; each reply waits for the
+                    # snapshot that makes the write visible to readers
+                    asyncio.create_task(self._handle(message, writer))
+        finally:
+            self._subscribers.discard(writer)
+            self._connections.discard(writer)
+            writer.close()
+
+    async def _handle(self, message: dict, writer: asyncio.StreamWriter):
+        reply = {"id": message["id"]}
+        try:
+            op, table = message["op"], message["table"]
+            if op == "reserve_ids":
+                reply["result"] = await self.reserve_ids(table, message["count"])
+            elif op == "insert_many":
+                rows = [MODELS[table].model_validate(row) for row in message["rows"]]
+                await self.insert_many(table, rows)
+                # The routers only bump the cache for this worker's writes
+                response_cache.bump(table)
+                await self._wait_published(self.seq)
+            elif op == "delete":
+                await self.delete(table, message["row_id"])
+                response_cache.bump(*DELETE_CASCADES.get(table, (table,)))
+                await self._wait_published(self.seq)
+            elif op == "delete_many":
+                reply["result"] = await self.delete_many(table, message["row_ids"])
+                response_cache.bump(*DELETE_CASCADES.get(table, (table,)))
+                await self._wait_published(self.seq)
+            elif op == "delete_directors_without_movies":
+                reply["result"] = await self.delete_directors_without_movies(message["row_ids"])
+                response_cache.bump(table)
+                await self._wait_published(self.seq)
+            else:
+                raise ValueError(f"Unknown operation: {op}")
+        except Exception as e:
+            reply["error"] = f"{type(e).__name__}: {e}"
+        if not writer.is_closing():
+            write_message(writer, reply)
+
+
+class SharedReaderRepository(Repository):
+    """A worker that reads the owner's snapshots and forwards its writes.
+
+    Reads come straight from the latest mapped snapshot. Writes are sent to
+    the owner and return once a snapshot containing them is published, so
+    a worker always reads its own writes; other workers' writes show up
+    within the owner's publish interval.
+    """
+
+    def __init__(self, directory: Path, fast_json: bool = False):
+        self.directory = directory
+        self.fast_json = fast_json
+        self._pointer: Optional[VersionPointer] = None
+        self._current: Optional[SnapshotView] = None
+        # Snapshot held still while listeners are rebuilt (see watch)
+        self._pinned: Optional[SnapshotView] = None
+        # [task, snapshot] of the request being served, mapped on first read
+        self._request_view: ContextVar[Optional[list]] = ContextVar("snapshot_view", default=None)
+        self._requests: Optional[tuple[asyncio.StreamReader, asyncio.StreamWriter]] = None
+        self._responses: Optional[asyncio.Task] = None
+        self._pending: dict[int, asyncio.Future] = {}
+        self._next_request = 0
+        self._connecting = asyncio.Lock()
+        self._events: Optional[asyncio.Task] = None
+        self._buffered: Optional[list[dict]] = []
+
+    async def open(self):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + STARTUP_TIMEOUT
+        while True:
+            try:
+                self._pointer = VersionPointer(self.directory)
+                if self._pointer.read() > 0:
+                    break
+            except (FileNotFoundError, ValueError):
+                pass
+            if loop.time() > deadline:
+                raise RuntimeError("No snapshot was published by the owner worker")
+            await asyncio.sleep(0.05)
+
+        # Subscribe before reading the snapshot, so no change falls between
+        reader, writer = await asyncio.open_unix_connection(str(self.directory / SOCKET_FILE))
+        write_message(writer, {"id": 0, "op": "subscribe"})
+        subscribed_seq = (await read_message(reader))["seq"]
+        self._events = asyncio.create_task(self._follow(reader, writer))
+        while self._view().seq < subscribed_seq:
+            await asyncio.sleep(0.005)
+
+    async def close(self):
+        for task in (self._events, self._responses):
+            if task is not None:
+                task.cancel()
+        if self._requests is not None:
+            self._requests[1].close()
+            self._requests = None
+        self._current = self._pinned = None
+        if self._pointer is not None:
+            self._pointer.close()
+            self._pointer = None
+
+    # Snapshots
+
+    @asynccontextmanager
+    async def snapshot(self):
+        # Snapshot files are immutable, so holding on to the view is enough
+        if self._held_view() is not None:
+            yield self
+            return
+        token = self._request_view.set([asyncio.current_task(), None])
+        try:
+            yield self
+        finally:
+            self._request_view.reset(token)
+
+    def _view(self) -> SnapshotView:
+        if self._pinned is not None:
+            return self._pinned
+        held = self._held_view()
+        if held is None:
+            return self._latest()
+        if held[1] is None:
+            held[1] = self._latest()
+        return held[1]
+
+    def _held_view(self) -> Optional[list]:
+        # Tasks started by a request inherit its context but not its snapshot
+        held = self._request_view.get()
+        if held is None or held[0] is not asyncio.current_task():
+            return None
+        return held
+
+    def _advance(self):
+        # The owner has published the write by now; the next read maps it
+        held = self._held_view()
+        if held is not None:
+            held[1] = None
+
+    def _latest(self) -> SnapshotView:
+        while True:
+            version = self._pointer.read()
+            current = self._current
+            if current is not None and current.version == version:
+                return current
+            try:
+                latest = SnapshotView(snapshot_path(self.directory, version), previous=current)
+            except FileNotFoundError:
+                # Superseded and removed before it could be mapped; the
+                # pointer has moved on already
+                continue
+            # Other workers' writes never go through this worker's routers,
+            # so cached responses of the tables that changed are dropped
+            if current is None:
+                response_cache.bump(*TABLES)
+            else:
+                changed = [
+                    table for table in TABLES
+                    if latest.table_versions.get(table) != current.table_versions.get(table)
+                ]
+                if changed:
+                    response_cache.bump(*changed)
+            self._current = latest
+            return latest
+
+    async def watch(self, *listeners):
+        # Rebuild from one snapshot, then replay the changes made after it
+        self._pinned = self._view()
+        try:
+            for listener in listeners:
+                await listener.rebuild(self)
+        finally:
+            pinned_seq = self._pinned.seq
+            self._pinned = None
+        self.listeners = self.listeners + listeners
+        buffered, self._buffered = self._buffered, None
+        for event in buffered:
+            if event["seq"] > pinned_seq:
+                self._apply(event)
+
+    async def _follow(self, reader, writer):
+        try:
+            while True:
+                event = await read_message(reader)
+                if event is None:
+                    break
+                if self._buffered is not None:
+                    self._buffered.append(event)
+                else:
+                    self._apply(event)
+        finally:
+            writer.close()
+
+    def _apply(self, event: dict):
+        model = MODELS[event["table"]]
+        if event["event"] == "put":
+            self._notify_put(event["table"], [model.model_validate(row) for row in event["rows"]])
+        else:
+            self._notify_delete(event["table"], model.model_validate(event["row"]))
+
+    # Reads
+
+    async def get(self, table, row_id):
+        data = await self.get_json(table, row_id)
+        return None if data is None else MODELS[table].model_validate_json(data)
+
+    async def get_json(self, table, row_id):
+        return self._view().tables[table].row_json(row_id)
+
+    async def exists(self, table, row_id):
+        return row_id in self._view().tables[table].ids
+
+    async def list_rows(self, table, page):
+        rows = await self.list_rows_json(table, page)
+        return [MODELS[table].model_validate_json(data) for data in rows]
+
+    async def list_rows_json(self, table, page):
+        rows = self._view().tables[table]
+        return [rows.row_json(row_id) for row_id in page.take(rows.ids)]
+
+    async def list_movies(self, page, query=MovieQuery()):
+        rows = await self.list_movies_json(page, query)
+        return [MODELS["movies"].model_validate_json(data) for data in rows]
+
+    async def list_movies_json(self, page, query=MovieQuery()):
+        view = self._view()
+        movie_ids = self._movie_ids(view, query, page.after, page.after_key, page.skip + page.limit + 1)
+        movie_ids = page.take(movie_ids, cursor=movie_cursor(query, view.movie_key))
+        movies = view.tables["movies"]
+        return [movies.row_json(movie_id) for movie_id in movie_ids]
+
+    @staticmethod
+    def _movie_ids(view: SnapshotView, query, after, after_key, limit):
+        """Same lookup as ``DummyDatabase.movie_ids``, over a snapshot."""
+        buckets = []
+        if query.genre:
+            buckets.append(view.indexes["movies_by_genre"].get(query.genre.casefold()))
+        if query.director_id:
+            buckets.append(view.indexes["movies_by_director"].get(query.director_id))
+        return plan(query, view.tables["movies"].ids, buckets, view.orders, after, after_key, limit)
+
+    async def iter_rows(self, table):
+        view = self._view()
+        async for row in self._iter_chunks(view, table, iter(view.tables[table].ids)):
+            yield row
+
+    async def iter_movies(self, query=MovieQuery()):
+        view = self._view()
+        movie_ids = iter(self._movie_ids(view, query, None, None, None))
+        async for row in self._iter_chunks(view, "movies", movie_ids):
+            yield row
+
+    @staticmethod
+    async def _iter_chunks(view, table, ids):
+        # The snapshot never changes, so the walk is consistent throughout
+        rows, model = view.tables[table], MODELS[table]
+        while True:
+            chunk = list(islice(ids, EXPORT_CHUNK_SIZE))
+            if not chunk:
+                return
+            for row_id in chunk:
+                yield model.model_validate_json(rows.row_json(row_id))
+            await asyncio.sleep(0)
+
+    async def count(self, table):
+        return len(self._view().tables[table])
+
+    async def max_id(self, table):
+        ids = self._view().tables[table].ids
+        return ids[-1] if len(ids) else 0
+
+    async def existing_ids(self, table, ids):
+        present = self._view().tables[table].ids
+        return {row_id for row_id in ids if row_id in present}
+
+    async def get_many(self, table, ids):
+        rows = self._view().tables[table]
+        model = MODELS[table]
+        found = {}
+        for row_id in ids:
+            data = rows.row_json(row_id)
+            if data is not None:
+                found[row_id] = model.model_validate_json(data)
+        return found
+
+    async def director_has_movies(self, director_id):
+        return director_id in self._view().indexes["movies_by_director"]
+
+    async def history_for_movie(self, movie_id):
+        rows = await self.history_for_movie_json(movie_id)
+        return [MODELS["viewing_history"].model_validate_json(data) for data in rows]
+
+    async def history_for_movie_json(self, movie_id):
+        view = self._view()
+        history = view.tables["viewing_history"]
+        return [
+            history.row_json(history_id)
+            for history_id in view.indexes["history_by_movie"].get(movie_id)
+        ]
+
+    async def reviews_for_movies(self, movie_ids):
+        view = self._view()
+        reviews = view.tables["reviews"]
+        index = view.indexes["reviews_by_movie"]
+        model = MODELS["reviews"]
+        return {
+            movie_id: [
+                model.model_validate_json(reviews.row_json(review_id))
+                for review_id in index.get(movie_id)
+            ]
+            for movie_id in movie_ids
+        }
+
+    # Writes, forwarded to the owner
+
+    async def _connect(self):
+        async with self._connecting:
+            if self._requests is not None and not self._requests[1].is_closing():
+                return
+            self._requests = await asyncio.open_unix_connection(str(self.directory / SOCKET_FILE))
+            self._responses = asyncio.create_task(self._read_responses(*self._requests))
+
+    async def _read_responses(self, reader, writer):
+        try:
+            while True:
+                message = await read_message(reader)
+                if message is None:
+                    break
+                future = self._pending.pop(message["id"], None)
+                if future is not None and not future.done():
+                    future.set_result(message)
+        finally:
+            writer.close()
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("Lost the connection to the owner worker"))
+            self._pending.clear()
+
+    async def _call(self, op: str, **arguments):
+        if self._requests is None or self._requests[1].is_closing():
+            await self._connect()
+        self._next_request += 1
+        request_id = self._next_request
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        writer = self._requests[1]
+        write_message(writer, {"id": request_id, "op": op, **arguments})
+        await writer.drain()
+        reply = await future
+        if "error" in reply:
+            raise RuntimeError(f"Owner worker failed to {op}: {reply['error']}")
+        return reply.get("result")
+
+    async def reserve_ids(self, table, count):
+        return await self._call("reserve_ids", table=table, count=count)
+
+    async def insert(self, table, row):
+        await self.insert_many(table, [row])
+
+    async def insert_many(self, table, rows):
+        await self._call(
+            "insert_many",
+            table=table,
+            rows=[row.model_dump(mode="json") for row in rows]
+        )
+        self._advance()
+
+    async def delete(self, table, row_id):
+        await self._call("delete", table=table, row_id=row_id)
+        self._advance()
+
+    async def delete_many(self, table, row_ids):
+        deleted = await self._call("delete_many", table=table, row_ids=list(row_ids))
+        self._advance()
+        return deleted
+
+    async def delete_directors_without_movies(self, director_ids):
+        deleted = await self._call(
+            "delete_directors_without_movies",
+            table="directors",
+            row_ids=list(director_ids)
+        )
+        self._advance()
+        return deleted
+
+
+def open_shared_repository(database: DummyDatabase, directory, **options) -> Repository:
+    """Elect this process owner or reader of the shared store in ``directory``.
+
+    The first worker to take the lock file becomes the owner and holds it
+    for its lifetime; if it exits, the next worker started takes over.
+    ``options`` configure the owner.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    lock_file = open(directory / LOCK_FILE, "a+b")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock_file.close()
+        return SharedReaderRepository(directory, fast_json=options.get("fast_json", False))
+    return SharedOwnerRepository(database, directory, lock_file, **options)
@@ -0,0 +1,488 @@
+import asyncio
+import json
+import queue
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import date
+from operator import itemgetter
+from typing import Optional
+
+from ..query import MovieQuery
+from ..schemas.watchlists import WatchList
+from ..utils.filters import movie_cursor
+from .base import MODELS, Repository
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS directors (id INTEGER PRIMARY KEY, data TEXT NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS movies ("
+    " id INTEGER PRIMARY KEY, director_id INTEGER NOT NULL,"
+    " genre_key TEXT NOT NULL, release_date TEXT, runtime_minutes INTEGER, data TEXT NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS movies_director ON movies (director_id)",
+    "CREATE INDEX IF NOT EXISTS movies_genre ON movies (genre_key)",
+    # Entries of an index are ordered by (column, rowid), so sorted pages
+    # resume from a seek
+    "CREATE INDEX IF NOT EXISTS movies_release_date ON movies (release_date)",
+    "CREATE INDEX IF NOT EXISTS movies_runtime ON movies (runtime_minutes)",
+    "CREATE TABLE IF NOT EXISTS reviews ("
+    " id INTEGER PRIMARY KEY, movie_id INTEGER NOT NULL, data TEXT NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS reviews_movie ON reviews (movie_id)",
+    "CREATE TABLE IF NOT EXISTS watchlists (id INTEGER PRIMARY KEY, data TEXT NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS watchlist_movies ("
+    " movie_id INTEGER NOT NULL, watchlist_id INTEGER NOT NULL,"
+    " PRIMARY KEY (movie_id, watchlist_id)) WITHOUT ROWID",
+    "CREATE INDEX IF NOT EXISTS watchlist_movies_list ON watchlist_movies (watchlist_id)",
+    "CREATE TABLE IF NOT EXISTS viewing_history ("
+    " id INTEGER PRIMARY KEY, movie_id INTEGER NOT NULL, data TEXT NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS viewing_history_movie ON viewing_history (movie_id)",
+    "CREATE TABLE IF NOT EXISTS sequences (name TEXT PRIMARY KEY, next_id INTEGER NOT NULL)",
+)
+
+# Table -> indexed columns stored next to the JSON document, and how to
+# compute them from a row
+_COLUMNS = {
+    "directors": ((), lambda row: ()),
+    "movies": (
+        ("director_id", "genre_key", "release_date", "runtime_minutes"),
+        lambda row: (row.director_id, row.genre.casefold(), row.release_date.isoformat(), row.runtime_minutes),
+    ),
+    "reviews": (("movie_id",), lambda row: (row.movie_id,)),
+    "watchlists": ((), lambda row: ()),
+    "viewing_history": (("movie_id",), lambda row: (row.movie_id,)),
+}
+
+
+# Columns added after their table was first created -> how to fill them in
+# from the stored JSON of rows already there
+_ADDED_COLUMNS = {
+    "movies": (
+        ("release_date", "TEXT", "json_extract(data, '$.release_date')"),
+        ("runtime_minutes", "INTEGER", "json_extract(data, '$.runtime_minutes')"),
+    ),
+}
+
+# Sortable movie column -> (cursor key to column value, column value to cursor key)
+_MOVIE_KEYS = {
+    "release_date": (
+        lambda key: date.fromordinal(key).isoformat(),
+        lambda value: date.fromisoformat(value).toordinal(),
+    ),
+    "runtime_minutes": (lambda key: key, lambda value: value),
+}
+
+
+def _insert_sql(table: str) -> str:
+    columns = ("id",) + _COLUMNS[table][0] + ("data",)
+    placeholders = ", ".join("?" for _ in columns)
+    return f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}) VALUES ({placeholders})"
+
+
+# Statements are built once so every call hits sqlite3's per-connection
+# prepared statement cache
+_INSERT = {table: _insert_sql(table) for table in MODELS}
+_GET = {table: f"SELECT data FROM {table} WHERE id = ?" for table in MODELS}
+_PAGE = {
+    table: f"SELECT id, data FROM {table} WHERE id > ? ORDER BY id LIMIT ? OFFSET ?"
+    for table in MODELS
+}
+_SCAN = {table: f"SELECT data FROM {table} ORDER BY id" for table in MODELS}
+_COUNT = {table: f"SELECT COUNT(*) FROM {table}" for table in MODELS}
+_MAX_ID = {table: f"SELECT COALESCE(MAX(id), 0) FROM {table}" for table in MODELS}
+_DELETE = {table: f"DELETE FROM {table} WHERE id = ?" for table in MODELS}
+# Id lists are bound as one JSON array parameter
+_IDS = "SELECT value FROM json_each(?)"
+
+
+def _movie_query_sql(query: MovieQuery, after: Optional[int] = None, after_key: Optional[int] = None):
+    """``WHERE`` clause, ``ORDER BY`` clause and parameters of a movie query."""
+    conditions, params = [], []
+    if query.genre:
+        conditions.append("genre_key = ?")
+        params.append(query.genre.casefold())
+    if query.director_id:
+        conditions.append("director_id = ?")
+        params.append(query.director_id)
+    for column, bound, value in (
+        ("release_date", ">=", query.released_from),
+        ("release_date", "<=", query.released_to),
+        ("runtime_minutes", ">=", query.min_runtime),
+        ("runtime_minutes", "<=", query.max_runtime),
+    ):
+        if value is not None:
+            conditions.append(f"{column} {bound} ?")
+            params.append(value.isoformat() if isinstance(value, date) else value)
+
+    column, descending = query.order
+    direction = " DESC" if descending else ""
+    if after is not None:
+        beyond = "<" if descending else ">"
+        if column == "id":
+            conditions.append(f"id {beyond} ?")
+            params.append(after)
+        else:
+            conditions.append(f"({column}, id) {beyond} (?, ?)")
+            params += [_MOVIE_KEYS[column][0](after_key), after]
+    order = f"id{direction}" if column == "id" else f"{column}{direction}, id{direction}"
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+    return where, f" ORDER BY {order}", params
+
+
+@contextmanager
+def _transaction(connection: sqlite3.Connection):
+    connection.execute("BEGIN IMMEDIATE")
+    try:
+        yield
+    except BaseException:
+        connection.execute("ROLLBACK")
+        raise
+    connection.execute("COMMIT")
+
+
+class SQLiteRepository(Repository):
+    """SQLite store in WAL mode, queried from a thread pool.
+
+    Each worker thread borrows a connection from a fixed pool, so the event
+    loop never blocks on disk I/O and readers run alongside the single
+    writer that SQLite allows. Exports stream from connections of their
+    own (see ``_scan``).
+    """
+
+    def __init__(self, path: str, pool_size: int = 4, fast_json: bool = False):
+        self.path = path
+        self.pool_size = pool_size
+        self.fast_json = fast_json
+        self._pool: queue.SimpleQueue = queue.SimpleQueue()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(
+            self.path,
+            check_same_thread=False,
+            isolation_level=None,
+            cached_statements=128,
+        )
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute("PRAGMA busy_timeout=5000")
+        return connection
+
+    async def open(self):
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.pool_size,
+            thread_name_prefix="sqlite"
+        )
+        for _ in range(self.pool_size):
+            self._pool.put(self._connect())
+        await self._run(self._create_schema)
+
+    async def close(self):
+        if self._executor is None:
+            return
+        self._executor.shutdown(wait=True)
+        self._executor = None
+        while not self._pool.empty():
+            self._pool.get().close()
+
+    async def _run(self, function, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._call, function, args)
+
+    def _call(self, function, args):
+        connection = self._pool.get()
+        try:
+            return function(connection, *args)
+        finally:
+            self._pool.put(connection)
+
+    @staticmethod
+    def _create_schema(connection):
+        with _transaction(connection):
+            for table, columns in _ADDED_COLUMNS.items():
+                present = {row[1] for row in connection.execute(f"PRAGMA table_info({table})")}
+                # No columns means the table is new and created below
+                for name, kind, fill in columns if present else ():
+                    if name not in present:
+                        connection.execute(f"ALTER TABLE {table} ADD COLUMN {name} {kind}")
+                        connection.execute(f"UPDATE {table} SET {name} = {fill}")
+            for statement in _SCHEMA:
+                connection.execute(statement)
+
+    # Reads
+
+    # Rows are stored as the JSON their model serializes to, so the *_json
+    # reads hand back the stored column without decoding it
+
+    async def get(self, table, row_id):
+        data = await self.get_json(table, row_id)
+        return None if data is None else MODELS[table].model_validate_json(data)
+
+    async def get_json(self, table, row_id):
+        def query(connection):
+            row = connection.execute(_GET[table], (row_id,)).fetchone()
+            return None if row is None else row[0].encode()
+        return await self._run(query)
+
+    async def list_rows(self, table, page):
+        rows = await self.list_rows_json(table, page)
+        return [MODELS[table].model_validate_json(data) for data in rows]
+
+    async def list_rows_json(self, table, page):
+        def query(connection):
+            return connection.execute(
+                _PAGE[table],
+                (page.after or 0, page.limit + 1, page.skip)
+            ).fetchall()
+        rows = page.finish(await self._run(query), key=itemgetter(0))
+        return [data.encode() for _, data in rows]
+
+    async def list_movies(self, page, query=MovieQuery()):
+        rows = await self.list_movies_json(page, query)
+        return [MODELS["movies"].model_validate_json(data) for data in rows]
+
+    async def list_movies_json(self, page, query=MovieQuery()):
+        column = query.order[0]
+        where, order, params = _movie_query_sql(query, page.after, page.after_key)
+        sql = f"SELECT id, {column}, data FROM movies{where}{order} LIMIT ? OFFSET ?"
+        params += [page.limit + 1, page.skip]
+
+        def query_page(connection):
+            return connection.execute(sql, params).fetchall()
+        window = await self._run(query_page)
+        keys = {}
+        if column != "id":
+            keys = {movie_id: _MOVIE_KEYS[column][1](value) for movie_id, value, _ in window}
+        rows = page.finish(
+            window,
+            key=itemgetter(0),
+            cursor=movie_cursor(query, lambda _, movie_id: keys.get(movie_id))
+        )
+        return [data.encode() for _, _, data in rows]
+
+    async def iter_rows(self, table):
+        async for data in self._scan(_SCAN[table], ()):
+            yield MODELS[table].model_validate_json(data)
+
+    async def iter_movies(self, query=MovieQuery()):
+        where, order, params = _movie_query_sql(query)
+        async for data in self._scan(f"SELECT data FROM movies{where}{order}", params):
+            yield MODELS["movies"].model_validate_json(data)
+
+    async def _scan(self, sql, params, chunk_size: int = 500):
+        """Stream one column of a query from a single read transaction.
+
+        In WAL mode the transaction sees one consistent snapshot for its
+        whole lifetime without blocking writers. The scan reads from a
+        connection of its own rather than one of the pool: the executor has
+        exactly as many threads as the pool has connections, so ``_call``
+        never waits for a connection, however many exports are running.
+        """
+        loop = asyncio.get_running_loop()
+        connection = await loop.run_in_executor(self._executor, self._connect)
+        try:
+            def start():
+                connection.execute("BEGIN")
+                return connection.execute(sql, params)
+            cursor = await loop.run_in_executor(self._executor, start)
+            while True:
+                rows = await loop.run_in_executor(self._executor, cursor.fetchmany, chunk_size)
+                if not rows:
+                    break
+                for (data,) in rows:
+                    yield data
+        finally:
+            def finish():
+                if connection.in_transaction:
+                    connection.execute("COMMIT")
+                connection.close()
+            await loop.run_in_executor(self._executor, finish)
+
+    async def count(self, table):
+        def query(connection):
+            return connection.execute(_COUNT[table]).fetchone()[0]
+        return await self._run(query)
+
+    async def max_id(self, table):
+        def query(connection):
+            return connection.execute(_MAX_ID[table]).fetchone()[0]
+        return await self._run(query)
+
+    async def reserve_ids(self, table, count):
+        # BEGIN IMMEDIATE takes SQLite's write lock, so workers in other
+        # processes sharing the file never reserve overlapping blocks
+        def write(connection):
+            with _transaction(connection):
+                row = connection.execute(
+                    "SELECT next_id FROM sequences WHERE name = ?", (table,)
+                ).fetchone()
+                first = connection.execute(_MAX_ID[table]).fetchone()[0] + 1
+                if row is not None:
+                    first = max(first, row[0])
+                connection.execute(
+                    "INSERT OR REPLACE INTO sequences (name, next_id) VALUES (?, ?)",
+                    (table, first + count)
+                )
+                return first
+        return await self._run(write)
+
+    async def existing_ids(self, table, ids):
+        ids = list(ids)
+
+        def query(connection):
+            found = set()
+            # Stay under SQLite's bound-parameter limit
+            for start in range(0, len(ids), 500):
+                chunk = ids[start : start + 500]
+                placeholders = ", ".join("?" for _ in chunk)
+                found.update(
+                    row_id for (row_id,) in connection.execute(
+                        f"SELECT id FROM {table} WHERE id IN ({placeholders})", chunk
+                    )
+                )
+            return found
+        return await self._run(query)
+
+    async def director_has_movies(self, director_id):
+        def query(connection):
+            return connection.execute(
+                "SELECT 1 FROM movies WHERE director_id = ? LIMIT 1", (director_id,)
+            ).fetchone() is not None
+        return await self._run(query)
+
+    async def get_many(self, table, ids):
+        ids = json.dumps(list(ids))
+
+        def query(connection):
+            return connection.execute(
+                f"SELECT id, data FROM {table} WHERE id IN ({_IDS})", (ids,)
+            ).fetchall()
+        model = MODELS[table]
+        return {row_id: model.model_validate_json(data) for row_id, data in await self._run(query)}
+
+    async def history_for_movie(self, movie_id):
+        rows = await self.history_for_movie_json(movie_id)
+        return [MODELS["viewing_history"].model_validate_json(data) for data in rows]
+
+    async def history_for_movie_json(self, movie_id):
+        def query(connection):
+            return connection.execute(
+                "SELECT data FROM viewing_history WHERE movie_id = ? ORDER BY id",
+                (movie_id,)
+            ).fetchall()
+        return [data.encode() for (data,) in await self._run(query)]
+
+    async def reviews_for_movies(self, movie_ids):
+        movie_ids = list(movie_ids)
+        json_ids = json.dumps(movie_ids)
+
+        def query(connection):
+            return connection.execute(
+                f"SELECT movie_id, data FROM reviews WHERE movie_id IN ({_IDS}) ORDER BY id",
+                (json_ids,)
+            ).fetchall()
+        found = {movie_id: [] for movie_id in movie_ids}
+        for movie_id, data in await self._run(query):
+            found[movie_id].append(MODELS["reviews"].model_validate_json(data))
+        return found
+
+    # Writes
+
+    async def insert(self, table, row):
+        await self.insert_many(table, [row])
+
+    async def insert_many(self, table, rows):
+        values = [
+            (row.id,) + _COLUMNS[table][1](row) + (row.model_dump_json(),)
+            for row in rows
+        ]
+
+        def write(connection):
+            with _transaction(connection):
+                if table == "watchlists":
+                    for row in rows:
+                        connection.execute(
+                            "DELETE FROM watchlist_movies WHERE watchlist_id = ?", (row.id,)
+                        )
+                        connection.executemany(
+                            "INSERT INTO watchlist_movies (movie_id, watchlist_id) VALUES (?, ?)",
+                            [(movie_id, row.id) for movie_id in row.movie_ids]
+                        )
+                connection.executemany(_INSERT[table], values)
+        await self._run(write)
+        self._notify_put(table, rows)
+
+    async def delete(self, table, row_id):
+        row = await self.get(table, row_id) if self.listeners else None
+
+        def write(connection):
+            with _transaction(connection):
+                if table == "movies":
+                    self._delete_movies_dependents(connection, json.dumps([row_id]))
+                elif table == "watchlists":
+                    connection.execute(
+                        "DELETE FROM watchlist_movies WHERE watchlist_id = ?", (row_id,)
+                    )
+                connection.execute(_DELETE[table], (row_id,))
+        await self._run(write)
+        if row is not None:
+            self._notify_delete(table, row)
+
+    async def delete_many(self, table, row_ids):
+        ids = json.dumps(list(dict.fromkeys(row_ids)))
+
+        def write(connection):
+            with _transaction(connection):
+                rows = connection.execute(
+                    f"SELECT id, data FROM {table} WHERE id IN ({_IDS}) ORDER BY id", (ids,)
+                ).fetchall()
+                present = json.dumps([row_id for row_id, _ in rows])
+                if table == "movies":
+                    self._delete_movies_dependents(connection, present)
+                elif table == "watchlists":
+                    connection.execute(
+                        f"DELETE FROM watchlist_movies WHERE watchlist_id IN ({_IDS})", (present,)
+                    )
+                connection.execute(f"DELETE FROM {table} WHERE id IN ({_IDS})", (present,))
+                return rows
+        rows = await self._run(write)
+        if self.listeners:
+            for _, data in rows:
+                self._notify_delete(table, MODELS[table].model_validate_json(data))
+        return [row_id for row_id, _ in rows]
+
+    async def delete_directors_without_movies(self, director_ids):
+        ids = json.dumps(list(dict.fromkeys(director_ids)))
+
+        def write(connection):
+            with _transaction(connection):
+                return connection.execute(
+                    f"DELETE FROM directors WHERE id IN ({_IDS})"
+                    " AND NOT EXISTS (SELECT 1 FROM movies WHERE director_id = directors.id)"
+                    " RETURNING id, data",
+                    (ids,)
+                ).fetchall()
+        rows = sorted(await self._run(write))
+        if self.listeners:
+            for _, data in rows:
+                self._notify_delete("directors", MODELS["directors"].model_validate_json(data))
+        return [row_id for row_id, _ in rows]
+
+    @staticmethod
+    def _delete_movies_dependents(connection, movie_ids: str):
+        """Delete reviews, history and watchlist entries of a JSON array of movies."""
+        connection.execute(f"DELETE FROM reviews WHERE movie_id IN ({_IDS})", (movie_ids,))
+        connection.execute(f"DELETE FROM viewing_history WHERE movie_id IN ({_IDS})", (movie_ids,))
+
+        removed = set(json.loads(movie_ids))
+        watchlists = connection.execute(
+            "SELECT data FROM watchlists WHERE id IN ("
+            f" SELECT DISTINCT watchlist_id FROM watchlist_movies WHERE movie_id IN ({_IDS}))",
+            (movie_ids,)
+        ).fetchall()
+        for (data,) in watchlists:
+            watchlist = WatchList.model_validate_json(data)
+            watchlist.movie_ids = [other for other in watchlist.movie_ids if other not in removed]
+            connection.execute(
+                "UPDATE watchlists SET data = ? WHERE id = ?",
+                (watchlist.model_dump_json(), watchlist.id)
+            )
+        connection.execute(f"DELETE FROM watchlist_movies WHERE movie_id IN ({_IDS})", (movie_ids,))
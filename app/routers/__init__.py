@@ -3,11 +3,19 @@ from .movies import router as movies_router
 from .reviews import router as reviews_router
 from .watchlists import router as watchlists_router
 from .viewing_history import router as viewing_history_router
+from .search import router as search_router
+from .api_keys import router as api_keys_router
+from .jobs import router as jobs_router
+from .metrics import router as metrics_router
 
 __all__ = [
     "directors_router",
     "movies_router",
     "reviews_router",
     "watchlists_router",
-    "viewing_history_router"
+    "viewing_history_router",
+    "search_router",
+    "api_keys_router",
+    "jobs_router",
+    "metrics_router"
 ]
@@ -0,0 +1,52 @@
+from fastapi import APIRouter, HTTPException, status, Depends
+from typing import List, Optional
+from ..api_keys import api_keys
+from ..schemas.api_keys import ApiKey, ApiKeyCreate, ApiKeyCreated
+from ..metrics import InstrumentedRoute
+from ..dependencies import verify_admin_role
+
+router = APIRouter(
+    prefix="/api-keys",
+    tags=["api-keys"],
+    route_class=InstrumentedRoute
+)
+
+@router.get("/", response_model=List[ApiKey])
+async def read_api_keys(
+    tenant: Optional[str] = None,
+    _: str = Depends(verify_admin_role)
+):
+    try:
+        return api_keys.list_keys(tenant)
+    
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error")
+
+@router.post("/", response_model=ApiKeyCreated, status_code=status.HTTP_201_CREATED)
+async def create_api_key(
+    settings: ApiKeyCreate,
+    _: str = Depends(verify_admin_role)
+):
+    """Issue a key. The full key is only returned in this response."""
+    try:
+        return api_keys.create(settings)
+    
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error")
+
+@router.delete("/{key_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def revoke_api_key(
+    key_id: str,
+    _: str = Depends(verify_admin_role)
+):
+    """Revoke a key; it stops working immediately."""
+    try:
+        if not api_keys.revoke(key_id):
+            raise KeyError("API key not found")
+    
+    except KeyError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error")
\ No newline at end of file
@@ -1,30 +1,93 @@
-from fastapi import APIRouter, HTTPException, status, Depends
-from typing import List
+from fastapi import APIRouter, HTTPException, Query, Request, status, Depends
+from typing import List, Optional
 from ..schemas.directors import Director, DirectorCreate
-from ..dependencies import get_db, verify_api_key, verify_admin_role
-from ..utils.pagination import pagination
+from ..schemas.batch import BatchGet, BatchResult
+from ..schemas.bulk import BulkImportResult
+from ..schemas.jobs import BulkDelete, Job
+from ..metrics import InstrumentedRoute
+from ..dependencies import get_db, verify_api_key, verify_admin_role, verify_read_key
+from ..jobs import jobs
+from ..utils.batch import batch_ids, batch_response
+from ..utils.bulk import bulk_delete, bulk_import
+from ..utils.cache import response_cache
+from ..utils.export import export_response
+from ..utils.fast_json import json_array, json_response
+from ..utils.fields import FieldSelection, project_json
+from ..utils.pagination import PageParams, pagination
 
 router = APIRouter(
     prefix="/directors",
-    tags=["directors"]
+    tags=["directors"],
+    route_class=InstrumentedRoute
 )
 
 @router.get("/", response_model=List[Director])
 async def read_directors(
-    pagination_params: tuple[int, int] = Depends(pagination),
+    pagination_params: PageParams = Depends(pagination),
+    fields: Optional[set[str]] = Depends(FieldSelection(Director)),
     db=Depends(get_db),
     _: str = Depends(verify_api_key)
 ):
     try:
-        skip, limit = pagination_params
-        directors = list(db.directors.values())
-        return directors[skip : skip + limit]
+        if fields is not None:
+            directors = await db.list_rows("directors", pagination_params)
+            return json_response(project_json(directors, fields), pagination_params.response)
+        
+        if db.fast_json:
+            rows = await db.list_rows_json("directors", pagination_params)
+            return json_response(json_array(rows), pagination_params.response)
+        
+        return await db.list_rows("directors", pagination_params)
     
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error")
 
+@router.get("/export")
+async def export_directors(
+    export_format: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"),
+    db=Depends(get_db),
+    _: str = Depends(verify_api_key)
+):
+    """Stream every director as NDJSON or CSV."""
+    try:
+        return export_response(db.iter_rows("directors"), Director, export_format, "directors")
+    
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error")
+
+@router.get("/batch", response_model=BatchResult[Director])
+async def read_directors_batch(
+    ids: List[int] = Depends(batch_ids),
+    fields: Optional[set[str]] = Depends(FieldSelection(Director)),
+    db=Depends(get_db),
+    _: str = Depends(verify_api_key)
+):
+    """Up to 1000 directors by id (`ids=1,2,3`), in the order requested.
+
+    Ids with no director are listed in `missing`.
+    """
+    try:
+        return await batch_response(db, "directors", Director, ids, fields)
+    
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error")
+
+@router.post("/batch", response_model=BatchResult[Director])
+async def read_directors_batch_by_body(
+    request: BatchGet,
+    fields: Optional[set[str]] = Depends(FieldSelection(Director)),
+    db=Depends(get_db),
+    _: str = Depends(verify_read_key)
+):
+    """`GET /directors/batch` with the ids in the body, for long lists; needs only the read scope."""
+    try:
+        return await batch_response(db, "directors", Director, request.ids, fields)
+    
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error")
+
 @router.post("/", response_model=Director, status_code=status.HTTP_201_CREATED)
 async def create_director(
     director: DirectorCreate, 
@@ -33,12 +96,12 @@ async def create_director(
     __: str = Depends(verify_admin_role)
 ):
     try:
-        new_id = max(db.directors.keys() or (0,)) + 1
         new_director = Director(
-            id=new_id,
+            id=await db.next_id("directors"),
             **director.dict()
         )
-        db.directors[new_id] = new_director
+        with response_cache.writing("directors"):
+            await db.insert("directors", new_director)
         return new_director
     
     except ValueError as e:
@@ -46,6 +109,22 @@ async def create_director(
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error")
 
+@router.post("/bulk", response_model=BulkImportResult)
+async def bulk_create_directors(
+    request: Request,
+    db=Depends(get_db),
+    _: str = Depends(verify_api_key),
+    __: str = Depends(verify_admin_role)
+):
+    """Import directors from an NDJSON body, one `DirectorCreate` object per line."""
+    try:
+        with response_cache.writing("directors"):
+            result = await bulk_import(request.stream(), db, "directors", DirectorCreate, Director)
+        return result
+    
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error")
+
 @router.delete("/{director_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_director(
     director_id: int, 
@@ -54,20 +133,38 @@ async def delete_director(
     __: str = Depends(verify_admin_role)
 ):
     try:
-        if director_id not in db.directors:
+        # Checked and deleted in one step, so no movie can slip in between
+        with response_cache.writing("directors"):
+            deleted = await db.delete_directors_without_movies([director_id])
+        if deleted:
+            return
+        if not await db.exists("directors", director_id):
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Director not found")
-        
-        # Check if director has any movies
-        director_movies = [movie for movie in db.movies.values() if movie.director_id == director_id]
-        if director_movies:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Cannot delete director with existing movies"
-            )
-        
-        db.directors.pop(director_id)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cannot delete director with existing movies"
+        )
         
     except HTTPException as e:
         raise e
     except Exception as e:
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error") 
\ No newline at end of file
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error")
+
+@router.delete("/", response_model=Job, status_code=status.HTTP_202_ACCEPTED)
+async def bulk_delete_directors(
+    request: BulkDelete,
+    db=Depends(get_db),
+    _: str = Depends(verify_api_key),
+    __: str = Depends(verify_admin_role)
+):
+    """Delete many directors in a background job. Directors that still have
+    movies when their batch is deleted are kept and listed as rejected."""
+    try:
+        return jobs.start("delete_directors", len(request.ids), lambda job: bulk_delete(
+            db, "directors", request.ids, job,
+            tables=("directors",),
+            delete=db.delete_directors_without_movies
+        ))
+    
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error")
@@ -0,0 +1,28 @@
+from fastapi import APIRouter, HTTPException, status, Depends
+from ..jobs import jobs
+from ..schemas.jobs import Job
+from ..metrics import InstrumentedRoute
+from ..dependencies import verify_api_key
+
+router = APIRouter(
+    prefix="/jobs",
+    tags=["jobs"],
+    route_class=InstrumentedRoute
+)
+
+@router.get("/{job_id}", response_model=Job)
+async def read_job(
+    job_id: int,
+    _: str = Depends(verify_api_key)
+):
+    """Progress of a background job, and its result once it has finished."""
+    try:
+        job = jobs.get(job_id)
+        if job is None:
+            raise KeyError("Job not found")
+        return job
+    
+    except KeyError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error")
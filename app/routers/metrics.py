@@ -0,0 +1,60 @@
+from fastapi import APIRouter, HTTPException, Response, status, Depends
+from ..access_log import access_log
+from ..dependencies import get_db, verify_metrics_token
+from ..metrics import CONTENT_TYPE, InstrumentedRoute, metrics
+from ..progress import progress_buffer
+from ..recommendations import similar_movies
+from ..repositories.base import MODELS
+from ..utils.cache import response_cache
+
+router = APIRouter(
+    tags=["metrics"],
+    route_class=InstrumentedRoute
+)
+
+@router.get("/metrics", response_class=Response)
+async def read_metrics(
+    db=Depends(get_db),
+    _: None = Depends(verify_metrics_token)
+):
+    """Request latencies, counters and store sizes in Prometheus text format.
+
+    Needs no API key, so Prometheus can scrape it as is. Set
+    `MOVIE_DB_METRICS_TOKEN` to require `Authorization: Bearer <token>`."""
+    try:
+        gauges = []
+        for table in MODELS:
+            gauges.append((
+                "movie_db_table_rows", "Rows in each table.", {"table": table}, await db.count(table)
+            ))
+        cache = response_cache.stats()
+        gauges += [
+            ("movie_db_response_cache_entries", "Responses held in the cache.", {}, cache["entries"]),
+            ("movie_db_response_cache_hits_total", "Requests answered from the cache.", {}, cache["hits"]),
+            ("movie_db_response_cache_misses_total", "Cacheable requests that missed.", {}, cache["misses"]),
+        ]
+        log = access_log.stats()
+        gauges += [
+            ("movie_db_access_log_queued", "Access log entries waiting to be written.", {}, log["queued"]),
+            ("movie_db_access_log_written_total", "Access log entries written.", {}, log["written"]),
+            ("movie_db_access_log_dropped_total", "Access log entries dropped on a full queue.", {}, log["dropped"]),
+        ]
+        progress = progress_buffer.stats()
+        gauges += [
+            ("movie_db_progress_pending", "Viewing progress entries waiting to be written.", {}, progress["pending"]),
+            ("movie_db_progress_received_total", "Viewing progress reports received.", {}, progress["received"]),
+            ("movie_db_progress_written_total", "Viewing progress entries written to the store.", {}, progress["written"]),
+            ("movie_db_progress_flushes_total", "Writes of waiting viewing progress entries.", {}, progress["flushes"]),
+        ]
+        similar = similar_movies.stats()
+        gauges += [
+            ("movie_db_similar_computed", "Movies with precomputed similar movies.", {}, similar["computed"]),
+            ("movie_db_similar_dirty", "Movies whose similar movies await recomputing.", {}, similar["dirty"]),
+            ("movie_db_similar_refreshed_total", "Similar movie lists computed.", {}, similar["refreshed"]),
+        ]
+        for name, value in db.stats().items():
+            gauges.append((f"movie_db_store_{name}", "Reported by the storage backend.", {}, value))
+        return Response(content=metrics.render(gauges), media_type=CONTENT_TYPE)
+    
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error")
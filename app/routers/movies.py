@@ -1,34 +1,79 @@
-from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi import APIRouter, HTTPException, Query, Request, status, Depends
+from pydantic_core import to_json
 from typing import List, Optional
 from ..schemas.movies import Movie, MovieCreate
-from ..dependencies import get_db, verify_api_key
-from ..utils.pagination import pagination
+from ..schemas.batch import BatchGet, BatchResult
+from ..schemas.bulk import BulkImportResult
+from ..schemas.jobs import BulkDelete, Job
+from ..schemas.ratings import RatingStats, TopRatedMovie
+from ..schemas.recommendations import SimilarMovie
+from ..metrics import InstrumentedRoute
+from ..query import MovieQuery
+from ..dependencies import get_db, verify_api_key, verify_admin_role, verify_read_key
+from ..jobs import jobs
+from ..ratings import rating_stats
+from ..recommendations import similar_movies
+from ..utils.batch import batch_ids, batch_response
+from ..utils.bulk import bulk_delete, bulk_import
+from ..utils.cache import CacheLookup, CachedResponse, response_cache
+from ..utils.export import export_response
+from ..utils.filters import movie_query
+from ..utils.fields import MOVIE_INCLUDES, FieldSelection, Inclusion, shape_movies
+from ..utils.fast_json import json_array
+from ..utils.pagination import PageParams, pagination
 
 router = APIRouter(
     prefix="/movies",
-    tags=["movies"]
+    tags=["movies"],
+    route_class=InstrumentedRoute
 )
 
 @router.get("/", response_model=List[Movie])
 async def read_movies(
-    genre: Optional[str] = None,
-    director_id: Optional[int] = None,
-    pagination_params: tuple[int, int] = Depends(pagination),
+    query: MovieQuery = Depends(movie_query),
+    pagination_params: PageParams = Depends(pagination),
+    fields: Optional[set[str]] = Depends(FieldSelection(Movie)),
+    include: tuple[str, ...] = Depends(Inclusion(*MOVIE_INCLUDES)),
+    cache: CacheLookup = Depends(CachedResponse(
+        List[Movie], "movies", includes=MOVIE_INCLUDES, filters={"director_id": ("directors",)}
+    )),
     db=Depends(get_db),
     _: str = Depends(verify_api_key)
 ):
+    """List movies, optionally filtered by genre, director, release date or runtime.
+
+    `sort` orders them by `id` (the default), `release_date` or
+    `runtime_minutes`, descending with a leading `-`; ties go by id. A
+    cursor only continues the order it was issued for.
+
+    `fields` returns only the listed fields of each movie. `include` embeds
+    the `director`, the `rating_stats` and/or the `reviews` of every movie
+    on the page, each fetched in one lookup. Only the 10 newest reviews of
+    a movie are embedded, with their total in `reviews_total`.
+    """
     try:
-        skip, limit = pagination_params
-        movies = list(db.movies.values())
+        if pagination_params.after is not None and pagination_params.order != query.sort:
+            raise ValueError("Cursor was issued for a different sort order")
         
-        if genre:
-            movies = [movie for movie in movies if movie.genre.lower() == genre.lower()]
-        if director_id:
-            if director_id not in db.directors:
+        cached_response = cache.hit()
+        if cached_response is not None:
+            return cached_response
+        
+        if query.director_id:
+            if not await db.exists("directors", query.director_id):
                 raise KeyError("Director not found")
-            movies = [movie for movie in movies if movie.director_id == director_id]
         
-        return movies[skip : skip + limit]
+        if fields is not None or include:
+            movies = await db.list_movies(pagination_params, query)
+            items = await shape_movies(db, movies, fields, include)
+            return cache.store_json(to_json(items), pagination_params.response)
+        
+        if db.fast_json:
+            rows = await db.list_movies_json(pagination_params, query)
+            return cache.store_json(json_array(rows), pagination_params.response)
+        
+        movies = await db.list_movies(pagination_params, query)
+        return cache.store(movies, pagination_params.response)
     
     except KeyError as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
@@ -37,16 +82,167 @@ async def read_movies(
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error")
 
+@router.get("/export")
+async def export_movies(
+    query: MovieQuery = Depends(movie_query),
+    export_format: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"),
+    db=Depends(get_db),
+    _: str = Depends(verify_api_key)
+):
+    """Stream every movie matching the `read_movies` filters, in its `sort` order, as NDJSON or CSV."""
+    try:
+        if query.director_id:
+            if not await db.exists("directors", query.director_id):
+                raise KeyError("Director not found")
+        
+        rows = db.iter_movies(query)
+        return export_response(rows, Movie, export_format, "movies")
+    
+    except KeyError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error")
+
+@router.get("/batch", response_model=BatchResult[Movie])
+async def read_movies_batch(
+    ids: List[int] = Depends(batch_ids),
+    fields: Optional[set[str]] = Depends(FieldSelection(Movie)),
+    include: tuple[str, ...] = Depends(Inclusion(*MOVIE_INCLUDES)),
+    db=Depends(get_db),
+    _: str = Depends(verify_api_key)
+):
+    """Up to 1000 movies by id (`ids=1,2,3`), in the order requested.
+
+    Ids with no movie are listed in `missing`. `fields` and `include`
+    work as in the movie list.
+    """
+    try:
+        return await batch_response(db, "movies", Movie, ids, fields, include)
+    
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error")
+
+@router.post("/batch", response_model=BatchResult[Movie])
+async def read_movies_batch_by_body(
+    request: BatchGet,
+    fields: Optional[set[str]] = Depends(FieldSelection(Movie)),
+    include: tuple[str, ...] = Depends(Inclusion(*MOVIE_INCLUDES)),
+    db=Depends(get_db),
+    _: str = Depends(verify_read_key)
+):
+    """`GET /movies/batch` with the ids in the body, for long lists; needs only the read scope."""
+    try:
+        return await batch_response(db, "movies", Movie, request.ids, fields, include)
+    
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error")
+
+@router.get("/top-rated", response_model=List[TopRatedMovie])
+async def read_top_rated_movies(
+    genre: Optional[str] = None,
+    min_reviews: int = Query(1, ge=1),
+    limit: int = Query(10, ge=1, le=50),
+    cache: CacheLookup = Depends(CachedResponse(List[TopRatedMovie], "movies", "reviews")),
+    db=Depends(get_db),
+    _: str = Depends(verify_api_key)
+):
+    """Best rated movies by average numeric rating, ties broken by review count."""
+    try:
+        cached_response = cache.hit()
+        if cached_response is not None:
+            return cached_response
+        
+        entries = rating_stats.top(genre=genre, min_reviews=min_reviews, limit=limit)
+        movies = await db.get_many("movies", [entry.movie_id for entry in entries])
+        top_rated = [
+            TopRatedMovie(
+                movie=movies[entry.movie_id],
+                average_rating=entry.average,
+                review_count=entry.count
+            )
+            for entry in entries
+            if entry.movie_id in movies
+        ]
+        return cache.store(top_rated)
+    
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error")
+
+@router.get("/{movie_id}/rating-stats", response_model=RatingStats)
+async def read_movie_rating_stats(
+    movie_id: int,
+    db=Depends(get_db),
+    _: str = Depends(verify_api_key)
+):
+    try:
+        if not await db.exists("movies", movie_id):
+            raise KeyError("Movie not found")
+        
+        return rating_stats.summary(movie_id)
+    
+    except KeyError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error")
+
+@router.get("/{movie_id}/similar", response_model=List[SimilarMovie])
+async def read_similar_movies(
+    movie_id: int,
+    limit: int = Query(10, ge=1, le=50),
+    db=Depends(get_db),
+    _: str = Depends(verify_api_key)
+):
+    """Movies often on the same watch lists as this one, best first.
+
+    Scored by watch list overlap, with a boost for the same director and
+    genre. At most `MOVIE_DB_SIMILAR_TOP_K` (default 20) are kept per movie.
+    """
+    try:
+        if not await db.exists("movies", movie_id):
+            raise KeyError("Movie not found")
+        
+        neighbours = similar_movies.similar(movie_id, limit)
+        movies = await db.get_many("movies", [other for other, _, _ in neighbours])
+        return [
+            SimilarMovie(movie=movies[other], score=score, shared_watchlists=shared)
+            for other, score, shared in neighbours
+            if other in movies
+        ]
+    
+    except KeyError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error")
+
 @router.get("/{movie_id}", response_model=Movie)
 async def read_movie(
     movie_id: int, 
+    fields: Optional[set[str]] = Depends(FieldSelection(Movie)),
+    include: tuple[str, ...] = Depends(Inclusion(*MOVIE_INCLUDES)),
+    cache: CacheLookup = Depends(CachedResponse(Movie, "movies", includes=MOVIE_INCLUDES)),
     db=Depends(get_db),
     _: str = Depends(verify_api_key)
 ):
+    """A movie; `fields` and `include` work as in the movie list."""
     try:
-        if movie_id not in db.movies:
+        cached_response = cache.hit()
+        if cached_response is not None:
+            return cached_response
+        
+        if fields is not None or include:
+            movie = await db.get("movies", movie_id)
+            if movie is None:
+                raise KeyError("Movie not found")
+            items = await shape_movies(db, [movie], fields, include)
+            return cache.store_json(to_json(items[0]))
+        
+        if db.fast_json:
+            movie = await db.get_json("movies", movie_id)
+        else:
+            movie = await db.get("movies", movie_id)
+        if movie is None:
             raise KeyError("Movie not found")
-        return db.movies[movie_id]
+        return cache.store_json(movie) if db.fast_json else cache.store(movie)
     
     except KeyError as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
@@ -60,17 +256,18 @@ async def create_movie(
     _: str = Depends(verify_api_key)
 ):
     try:
-        if movie.director_id not in db.directors:
+        if not await db.exists("directors", movie.director_id):
             raise KeyError("Director not found")
         
         if not movie.imdb_id.startswith('tt'):
             raise ValueError("Invalid IMDB ID format")
         
         new_movie = Movie(
-            id=len(db.movies) + 1,
+            id=await db.next_id("movies"),
             **movie.dict()
         )
-        db.movies[new_movie.id] = new_movie
+        with response_cache.writing("movies"):
+            await db.insert("movies", new_movie)
         return new_movie
     
     except KeyError as e:
@@ -80,6 +277,24 @@ async def create_movie(
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error")
 
+@router.post("/bulk", response_model=BulkImportResult)
+async def bulk_create_movies(
+    request: Request,
+    db=Depends(get_db),
+    _: str = Depends(verify_api_key)
+):
+    """Import movies from an NDJSON body, one `MovieCreate` object per line."""
+    try:
+        with response_cache.writing("movies"):
+            result = await bulk_import(
+                request.stream(), db, "movies", MovieCreate, Movie,
+                reference=("director_id", "directors")
+            )
+        return result
+    
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error")
+
 @router.delete("/{movie_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_movie(
     movie_id: int, 
@@ -87,30 +302,33 @@ async def delete_movie(
     _: str = Depends(verify_api_key)
 ):
     try:
-        if movie_id not in db.movies:
+        if not await db.exists("movies", movie_id):
             raise KeyError("Movie not found")
         
-        # Delete associated reviews
-        db.reviews = {
-            k: v for k, v in db.reviews.items()
-            if v.movie_id != movie_id
-        }
-        
-        # Remove from watchlists
-        for watchlist in db.watchlists.values():
-            if movie_id in watchlist.movie_ids:
-                watchlist.movie_ids.remove(movie_id)
-        
-        # Delete viewing history
-        db.viewing_history = {
-            k: v for k, v in db.viewing_history.items()
-            if v.movie_id != movie_id
-        }
-        
-        del db.movies[movie_id]
+        # Deletes associated reviews, viewing history and watchlist entries
+        with response_cache.writing("movies", "reviews", "watchlists", "viewing_history"):
+            await db.delete("movies", movie_id)
         return {"message": "Movie and related items deleted"}
     
     except KeyError as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error") 
\ No newline at end of file
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error")
+
+@router.delete("/", response_model=Job, status_code=status.HTTP_202_ACCEPTED)
+async def bulk_delete_movies(
+    request: BulkDelete,
+    db=Depends(get_db),
+    _: str = Depends(verify_api_key),
+    __: str = Depends(verify_admin_role)
+):
+    """Delete many movies, with their reviews, viewing history and watchlist
+    entries, in a background job. Poll `GET /jobs/{id}` for progress."""
+    try:
+        return jobs.start("delete_movies", len(request.ids), lambda job: bulk_delete(
+            db, "movies", request.ids, job,
+            tables=("movies", "reviews", "watchlists", "viewing_history")
+        ))
+    
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error")
@@ -1,40 +1,114 @@
-from fastapi import APIRouter, HTTPException, status, Depends
-from typing import List
+from fastapi import APIRouter, HTTPException, Query, Request, status, Depends
+from typing import List, Optional
 from ..schemas.reviews import Review, ReviewCreate
-from ..dependencies import get_db, verify_api_key
-from ..utils.pagination import pagination
+from ..schemas.batch import BatchGet, BatchResult
+from ..schemas.bulk import BulkImportResult
+from ..metrics import InstrumentedRoute
+from ..dependencies import get_db, verify_api_key, verify_read_key
+from ..utils.batch import batch_ids, batch_response
+from ..utils.bulk import bulk_import
+from ..utils.cache import CacheLookup, CachedResponse, response_cache
+from ..utils.export import export_response
+from ..utils.fast_json import json_array, json_response
+from ..utils.fields import FieldSelection, project_json
+from ..utils.pagination import PageParams, pagination
 
 router = APIRouter(
     prefix="/reviews",
-    tags=["reviews"]
+    tags=["reviews"],
+    route_class=InstrumentedRoute
 )
 
 @router.get("/", response_model=List[Review])
 async def read_reviews(
-    pagination_params: tuple[int, int] = Depends(pagination),
+    pagination_params: PageParams = Depends(pagination),
+    fields: Optional[set[str]] = Depends(FieldSelection(Review)),
+    cache: CacheLookup = Depends(CachedResponse(List[Review], "reviews")),
     db=Depends(get_db),
     _: str = Depends(verify_api_key)
 ):
     try:
-        skip, limit = pagination_params
-        reviews = list(db.reviews.values())
-        return reviews[skip : skip + limit]
+        cached_response = cache.hit()
+        if cached_response is not None:
+            return cached_response
+        
+        if fields is not None:
+            reviews = await db.list_rows("reviews", pagination_params)
+            return cache.store_json(project_json(reviews, fields), pagination_params.response)
+        
+        if db.fast_json:
+            rows = await db.list_rows_json("reviews", pagination_params)
+            return cache.store_json(json_array(rows), pagination_params.response)
+        
+        reviews = await db.list_rows("reviews", pagination_params)
+        return cache.store(reviews, pagination_params.response)
     
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error")
 
+@router.get("/export")
+async def export_reviews(
+    export_format: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"),
+    db=Depends(get_db),
+    _: str = Depends(verify_api_key)
+):
+    """Stream every review as NDJSON or CSV."""
+    try:
+        return export_response(db.iter_rows("reviews"), Review, export_format, "reviews")
+    
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error")
+
+@router.get("/batch", response_model=BatchResult[Review])
+async def read_reviews_batch(
+    ids: List[int] = Depends(batch_ids),
+    fields: Optional[set[str]] = Depends(FieldSelection(Review)),
+    db=Depends(get_db),
+    _: str = Depends(verify_api_key)
+):
+    """Up to 1000 reviews by id (`ids=1,2,3`), in the order requested.
+
+    Ids with no review are listed in `missing`.
+    """
+    try:
+        return await batch_response(db, "reviews", Review, ids, fields)
+    
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error")
+
+@router.post("/batch", response_model=BatchResult[Review])
+async def read_reviews_batch_by_body(
+    request: BatchGet,
+    fields: Optional[set[str]] = Depends(FieldSelection(Review)),
+    db=Depends(get_db),
+    _: str = Depends(verify_read_key)
+):
+    """`GET /reviews/batch` with the ids in the body, for long lists; needs only the read scope."""
+    try:
+        return await batch_response(db, "reviews", Review, request.ids, fields)
+    
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error")
+
 @router.get("/{review_id}", response_model=Review)
 async def read_review(
     review_id: int, 
+    fields: Optional[set[str]] = Depends(FieldSelection(Review)),
     db=Depends(get_db),
     _: str = Depends(verify_api_key)
 ):
     try:
-        if review_id not in db.reviews:
+        if db.fast_json and fields is None:
+            review = await db.get_json("reviews", review_id)
+        else:
+            review = await db.get("reviews", review_id)
+        if review is None:
             raise KeyError("Review not found")
-        return db.reviews[review_id]
+        if fields is not None:
+            return json_response(project_json(review, fields))
+        return json_response(review) if db.fast_json else review
     
     except KeyError as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
@@ -48,7 +122,7 @@ async def create_review(
     _: str = Depends(verify_api_key)
 ):
     try:
-        if review.movie_id not in db.movies:
+        if not await db.exists("movies", review.movie_id):
             raise KeyError("Movie not found")
         
         # Validate rating
@@ -56,10 +130,11 @@ async def create_review(
             raise ValueError("Rating must be between 1 and 5")
         
         new_review = Review(
-            id=len(db.reviews) + 1,
+            id=await db.next_id("reviews"),
             **review.dict()
         )
-        db.reviews[new_review.id] = new_review
+        with response_cache.writing("reviews"):
+            await db.insert("reviews", new_review)
         return new_review
     
     except KeyError as e:
@@ -69,6 +144,24 @@ async def create_review(
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error")
 
+@router.post("/bulk", response_model=BulkImportResult)
+async def bulk_create_reviews(
+    request: Request,
+    db=Depends(get_db),
+    _: str = Depends(verify_api_key)
+):
+    """Import reviews from an NDJSON body, one `ReviewCreate` object per line."""
+    try:
+        with response_cache.writing("reviews"):
+            result = await bulk_import(
+                request.stream(), db, "reviews", ReviewCreate, Review,
+                reference=("movie_id", "movies")
+            )
+        return result
+    
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error")
+
 @router.delete("/{review_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_review(
     review_id: int, 
@@ -76,9 +169,10 @@ async def delete_review(
     _: str = Depends(verify_api_key)
 ):
     try:
-        if review_id not in db.reviews:
+        if not await db.exists("reviews", review_id):
             raise KeyError("Review not found")
-        del db.reviews[review_id]
+        with response_cache.writing("reviews"):
+            await db.delete("reviews", review_id)
     
     except KeyError as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
@@ -0,0 +1,53 @@
+from fastapi import APIRouter, HTTPException, Query, status, Depends
+from typing import List, Optional
+from ..schemas.search import SearchHit
+from ..metrics import InstrumentedRoute
+from ..dependencies import get_db, verify_api_key
+from ..search import search_index
+from ..utils.cache import CacheLookup, CachedResponse
+from ..utils.pagination import PageParams, pagination
+
+router = APIRouter(
+    prefix="/search",
+    tags=["search"],
+    route_class=InstrumentedRoute
+)
+
+@router.get("/", response_model=List[SearchHit])
+async def search(
+    q: str = Query(..., min_length=1, max_length=200),
+    type: Optional[str] = Query(None, pattern="^(movies|directors)$"),
+    pagination_params: PageParams = Depends(pagination),
+    cache: CacheLookup = Depends(CachedResponse(List[SearchHit], "movies", "directors")),
+    db=Depends(get_db),
+    _: str = Depends(verify_api_key)
+):
+    """Search movie titles and descriptions and director names and bios.
+
+    Results are ranked by relevance and paginated with `skip`/`limit`.
+    """
+    try:
+        if pagination_params.after is not None:
+            raise ValueError("Search results are paginated with skip and limit, not cursors")
+        
+        cached_response = cache.hit()
+        if cached_response is not None:
+            return cached_response
+        
+        hits = []
+        for table, row_id, score in search_index.search(
+            q, table=type, skip=pagination_params.skip, limit=pagination_params.limit
+        ):
+            row = await db.get(table, row_id)
+            if row is None:
+                continue
+            if table == "movies":
+                hits.append(SearchHit(type="movie", id=row_id, score=score, movie=row))
+            else:
+                hits.append(SearchHit(type="director", id=row_id, score=score, director=row))
+        return cache.store(hits)
+    
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error")
\ No newline at end of file
@@ -1,30 +1,90 @@
-from fastapi import APIRouter, HTTPException, status, Depends
-from typing import List
-from ..schemas.viewing_history import ViewingHistory, ViewingHistoryCreate, ViewingStatus
-from ..dependencies import get_db, verify_api_key
-from ..utils.pagination import pagination
+from fastapi import APIRouter, HTTPException, Query, status, Depends
+from typing import List, Optional
+from ..schemas.viewing_history import ViewingHistory, ViewingHistoryCreate, ViewingProgress
+from ..schemas.batch import BatchGet, BatchResult
+from ..metrics import InstrumentedRoute
+from ..progress import progress_buffer
+from ..dependencies import get_db, verify_api_key, verify_read_key
+from ..utils.batch import batch_ids, batch_response
+from ..utils.cache import response_cache
+from ..utils.export import export_response
+from ..utils.fast_json import json_array, json_response
+from ..utils.fields import FieldSelection, project_json
+from ..utils.pagination import PageParams, pagination
 
 router = APIRouter(
     prefix="/viewing-history",
-    tags=["viewing history"]
+    tags=["viewing history"],
+    route_class=InstrumentedRoute
 )
 
 @router.get("/", response_model=List[ViewingHistory])
 async def get_all_history(
-    pagination_params: tuple[int, int] = Depends(pagination),
+    pagination_params: PageParams = Depends(pagination),
+    fields: Optional[set[str]] = Depends(FieldSelection(ViewingHistory)),
     db=Depends(get_db),
     _: str = Depends(verify_api_key)
 ):
     try:
-        skip, limit = pagination_params
-        history_entries = list(db.viewing_history.values())
-        return history_entries[skip : skip + limit]
+        if fields is not None:
+            history = await db.list_rows("viewing_history", pagination_params)
+            return json_response(project_json(history, fields), pagination_params.response)
+        
+        if db.fast_json:
+            rows = await db.list_rows_json("viewing_history", pagination_params)
+            return json_response(json_array(rows), pagination_params.response)
+        
+        return await db.list_rows("viewing_history", pagination_params)
     
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error")
 
+@router.get("/export")
+async def export_viewing_history(
+    export_format: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"),
+    db=Depends(get_db),
+    _: str = Depends(verify_api_key)
+):
+    """Stream every viewing history entry as NDJSON or CSV."""
+    try:
+        return export_response(db.iter_rows("viewing_history"), ViewingHistory, export_format, "viewing-history")
+    
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error")
+
+@router.get("/batch", response_model=BatchResult[ViewingHistory])
+async def read_history_batch(
+    ids: List[int] = Depends(batch_ids),
+    fields: Optional[set[str]] = Depends(FieldSelection(ViewingHistory)),
+    db=Depends(get_db),
+    _: str = Depends(verify_api_key)
+):
+    """Up to 1000 viewing history entries by id (`ids=1,2,3`), in the order requested.
+
+    Ids with no entry are listed in `missing`.
+    """
+    try:
+        return await batch_response(db, "viewing_history", ViewingHistory, ids, fields)
+    
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error")
+
+@router.post("/batch", response_model=BatchResult[ViewingHistory])
+async def read_history_batch_by_body(
+    request: BatchGet,
+    fields: Optional[set[str]] = Depends(FieldSelection(ViewingHistory)),
+    db=Depends(get_db),
+    _: str = Depends(verify_read_key)
+):
+    """`GET /viewing-history/batch` with the ids in the body, for long lists; needs only the read scope."""
+    try:
+        return await batch_response(db, "viewing_history", ViewingHistory, request.ids, fields)
+    
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error")
+
 @router.post("/", response_model=ViewingHistory)
 async def create_viewing_history(
     history: ViewingHistoryCreate, 
@@ -32,14 +92,15 @@ async def create_viewing_history(
     _: str = Depends(verify_api_key)
 ):
     try:
-        if history.movie_id not in db.movies:
+        if not await db.exists("movies", history.movie_id):
             raise KeyError("Movie not found")
         
         new_history = ViewingHistory(
-            id=len(db.viewing_history) + 1,
+            id=await db.next_id("viewing_history"),
             **history.dict()
         )
-        db.viewing_history[new_history.id] = new_history
+        with response_cache.writing("viewing_history"):
+            await db.insert("viewing_history", new_history)
         return new_history
     
     except KeyError as e:
@@ -47,18 +108,49 @@ async def create_viewing_history(
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error")
 
+@router.put("/progress", response_model=ViewingHistory)
+async def record_viewing_progress(
+    progress: ViewingProgress,
+    db=Depends(get_db),
+    _: str = Depends(verify_api_key)
+):
+    """Record where a viewer is in a movie.
+
+    Each viewer has one entry per movie, updated in place; frequent reports
+    are merged in memory and written to the store every few seconds
+    (`MOVIE_DB_PROGRESS_FLUSH_INTERVAL`). The movie's history shows the
+    latest report straight away.
+    """
+    try:
+        if not await db.exists("movies", progress.movie_id):
+            raise KeyError("Movie not found")
+        return await progress_buffer.update(db, progress)
+    
+    except KeyError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error")
+
 @router.get("/movies/{movie_id}", response_model=List[ViewingHistory])
 async def get_movie_history(
     movie_id: int,
+    fields: Optional[set[str]] = Depends(FieldSelection(ViewingHistory)),
     db=Depends(get_db),
     _: str = Depends(verify_api_key)
 ):
     try:
-        if movie_id not in db.movies:
+        if not await db.exists("movies", movie_id):
             raise KeyError("Movie not found")
         
-        history_entries = [h for h in db.viewing_history.values() if h.movie_id == movie_id]
-        return history_entries
+        if fields is not None or progress_buffer.staged(movie_id):
+            # Progress reports not written yet replace their stored entries
+            history = progress_buffer.overlay(movie_id, await db.history_for_movie(movie_id))
+            return json_response(project_json(history, fields))
+        
+        if db.fast_json:
+            return json_response(json_array(await db.history_for_movie_json(movie_id)))
+        
+        return await db.history_for_movie(movie_id)
     
     except KeyError as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
@@ -72,9 +164,10 @@ async def delete_viewing_history(
     _: str = Depends(verify_api_key)
 ):
     try:
-        if history_id not in db.viewing_history:
+        if not await db.exists("viewing_history", history_id):
             raise KeyError("Viewing history not found")
-        del db.viewing_history[history_id]
+        with response_cache.writing("viewing_history"):
+            await db.delete("viewing_history", history_id)
     
     except KeyError as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
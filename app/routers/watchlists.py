@@ -1,30 +1,89 @@
-from fastapi import APIRouter, HTTPException, status, Depends
-from typing import List
+from fastapi import APIRouter, HTTPException, Query, status, Depends
+from typing import List, Optional
 from ..schemas.watchlists import WatchList, WatchListCreate
-from ..dependencies import get_db, verify_api_key
-from ..utils.pagination import pagination
+from ..schemas.batch import BatchGet, BatchResult
+from ..metrics import InstrumentedRoute
+from ..dependencies import get_db, verify_api_key, verify_read_key
+from ..utils.batch import batch_ids, batch_response
+from ..utils.cache import response_cache
+from ..utils.export import export_response
+from ..utils.fast_json import json_array, json_response
+from ..utils.fields import FieldSelection, project_json
+from ..utils.pagination import PageParams, pagination
 
 router = APIRouter(
     prefix="/watchlists",
-    tags=["watchlists"]
+    tags=["watchlists"],
+    route_class=InstrumentedRoute
 )
 
 @router.get("/", response_model=List[WatchList])
 async def get_watchlists(
-    pagination_params: tuple[int, int] = Depends(pagination),
+    pagination_params: PageParams = Depends(pagination),
+    fields: Optional[set[str]] = Depends(FieldSelection(WatchList)),
     db=Depends(get_db),
     _: str = Depends(verify_api_key)
 ):
     try:
-        skip, limit = pagination_params
-        watchlists = list(db.watchlists.values())
-        return watchlists[skip : skip + limit]
+        if fields is not None:
+            watchlists = await db.list_rows("watchlists", pagination_params)
+            return json_response(project_json(watchlists, fields), pagination_params.response)
+        
+        if db.fast_json:
+            rows = await db.list_rows_json("watchlists", pagination_params)
+            return json_response(json_array(rows), pagination_params.response)
+        
+        return await db.list_rows("watchlists", pagination_params)
     
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error")
 
+@router.get("/export")
+async def export_watchlists(
+    export_format: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"),
+    db=Depends(get_db),
+    _: str = Depends(verify_api_key)
+):
+    """Stream every watchlist as NDJSON or CSV."""
+    try:
+        return export_response(db.iter_rows("watchlists"), WatchList, export_format, "watchlists")
+    
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error")
+
+@router.get("/batch", response_model=BatchResult[WatchList])
+async def read_watchlists_batch(
+    ids: List[int] = Depends(batch_ids),
+    fields: Optional[set[str]] = Depends(FieldSelection(WatchList)),
+    db=Depends(get_db),
+    _: str = Depends(verify_api_key)
+):
+    """Up to 1000 watch lists by id (`ids=1,2,3`), in the order requested.
+
+    Ids with no watch list are listed in `missing`.
+    """
+    try:
+        return await batch_response(db, "watchlists", WatchList, ids, fields)
+    
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error")
+
+@router.post("/batch", response_model=BatchResult[WatchList])
+async def read_watchlists_batch_by_body(
+    request: BatchGet,
+    fields: Optional[set[str]] = Depends(FieldSelection(WatchList)),
+    db=Depends(get_db),
+    _: str = Depends(verify_read_key)
+):
+    """`GET /watchlists/batch` with the ids in the body, for long lists; needs only the read scope."""
+    try:
+        return await batch_response(db, "watchlists", WatchList, request.ids, fields)
+    
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error")
+
 @router.post("/", response_model=WatchList)
 async def create_watchlist(
     watchlist: WatchListCreate, 
@@ -34,14 +93,15 @@ async def create_watchlist(
     try:
         # Validate that all movies exist
         for movie_id in watchlist.movie_ids:
-            if movie_id not in db.movies:
+            if not await db.exists("movies", movie_id):
                 raise KeyError(f"Movie with id {movie_id} not found")
         
         new_list = WatchList(
-            id=len(db.watchlists) + 1,
+            id=await db.next_id("watchlists"),
             **watchlist.dict()
         )
-        db.watchlists[new_list.id] = new_list
+        with response_cache.writing("watchlists"):
+            await db.insert("watchlists", new_list)
         return new_list
     
     except KeyError as e:
@@ -56,9 +116,10 @@ async def delete_watchlist(
     _: str = Depends(verify_api_key)
 ):
     try:
-        if list_id not in db.watchlists:
+        if not await db.exists("watchlists", list_id):
             raise KeyError("Watchlist not found")
-        del db.watchlists[list_id]
+        with response_cache.writing("watchlists"):
+            await db.delete("watchlists", list_id)
     
     except KeyError as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
@@ -4,9 +4,16 @@ from .reviews import Review, ReviewCreate, ReviewBase
 from .watchlists import WatchList, WatchListCreate, WatchListBase
 from .viewing_history import (
     ViewingHistory, ViewingHistoryCreate, ViewingHistoryBase,
-    ViewingStatus
+    ViewingProgress, ViewingStatus
 )
 from .base import TimeStampMixin
+from .bulk import BulkImportResult, BulkRowError
+from .ratings import RatingStats, TopRatedMovie
+from .recommendations import SimilarMovie
+from .search import SearchHit
+from .api_keys import ApiKey, ApiKeyCreate, ApiKeyCreated, ApiKeyScope
+from .jobs import BulkDelete, BulkDeleteResult, Job, JobStatus
+from .batch import BatchGet, BatchResult
 
 __all__ = [
     'Director',
@@ -24,6 +31,23 @@ __all__ = [
     'ViewingHistory',
     'ViewingHistoryCreate',
     'ViewingHistoryBase',
+    'ViewingProgress',
     'ViewingStatus',
     'TimeStampMixin',
+    'BulkImportResult',
+    'BulkRowError',
+    'RatingStats',
+    'TopRatedMovie',
+    'SimilarMovie',
+    'SearchHit',
+    'ApiKey',
+    'ApiKeyCreate',
+    'ApiKeyCreated',
+    'ApiKeyScope',
+    'BulkDelete',
+    'BulkDeleteResult',
+    'Job',
+    'JobStatus',
+    'BatchGet',
+    'BatchResult',
 ] 
\ No newline at end of file
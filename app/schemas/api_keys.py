@@ -0,0 +1,43 @@
+from datetime import datetime, timezone
+from pydantic import BaseModel, Field, field_validator
+from typing import List, Optional
+from enum import Enum
+
+class ApiKeyScope(str, Enum):
+    READ = "read"
+    WRITE = "write"
+    ADMIN = "admin"
+
+class ApiKeyBase(BaseModel):
+    tenant: str
+    scopes: List[ApiKeyScope] = Field(default_factory=lambda: [ApiKeyScope.READ])
+    expires_at: Optional[datetime] = None
+
+    @field_validator("tenant")
+    def validate_tenant(cls, v: str):
+        if len(v.strip()) < 2:
+            raise ValueError("Tenant must be at least 2 characters long")
+        return v.strip()
+
+    @field_validator("scopes")
+    def validate_scopes(cls, v: List[ApiKeyScope]):
+        if not v:
+            raise ValueError("At least one scope is required")
+        return sorted(set(v), key=list(ApiKeyScope).index)
+
+    @field_validator("expires_at")
+    def validate_expires_at(cls, v: Optional[datetime]):
+        # Stored naive in UTC, like the other timestamps
+        if v is not None and v.tzinfo is not None:
+            v = v.astimezone(timezone.utc).replace(tzinfo=None)
+        return v
+
+class ApiKeyCreate(ApiKeyBase):
+    pass
+
+class ApiKey(ApiKeyBase):
+    key_id: str
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+class ApiKeyCreated(ApiKey):
+    api_key: str = Field(description="The full key; it is only shown once")
\ No newline at end of file
@@ -0,0 +1,20 @@
+from pydantic import BaseModel, Field, field_validator
+from typing import Generic, List, TypeVar
+
+# As many ids as a watch list can hold
+MAX_BATCH_IDS = 1000
+
+T = TypeVar("T")
+
+class BatchGet(BaseModel):
+    ids: List[int] = Field(max_length=MAX_BATCH_IDS)
+
+    @field_validator("ids")
+    def validate_ids(cls, v: List[int]):
+        if not v:
+            raise ValueError("At least one id is required")
+        return list(dict.fromkeys(v))
+
+class BatchResult(BaseModel, Generic[T]):
+    items: List[T] = Field(description="Rows found, in the order their ids were requested")
+    missing: List[int] = Field(default_factory=list, description="Requested ids with no row")
@@ -0,0 +1,14 @@
+from pydantic import BaseModel, Field
+from typing import List
+
+class BulkRowError(BaseModel):
+    line: int
+    error: str
+
+class BulkImportResult(BaseModel):
+    inserted: int = 0
+    failed: int = 0
+    errors: List[BulkRowError] = Field(
+        default_factory=list,
+        description="Per-row errors; only the first ones are listed, see `failed` for the total"
+    )
\ No newline at end of file
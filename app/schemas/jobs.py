@@ -0,0 +1,38 @@
+from datetime import datetime
+from pydantic import BaseModel, Field, field_validator
+from typing import List, Optional
+from enum import Enum
+
+class JobStatus(str, Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+class BulkDelete(BaseModel):
+    ids: List[int] = Field(max_length=100_000)
+
+    @field_validator("ids")
+    def validate_ids(cls, v: List[int]):
+        if not v:
+            raise ValueError("At least one id is required")
+        return list(dict.fromkeys(v))
+
+class BulkDeleteResult(BaseModel):
+    deleted: int = 0
+    not_found: List[int] = Field(default_factory=list)
+    rejected: List[int] = Field(
+        default_factory=list,
+        description="Ids that exist but were kept, such as directors that still have movies"
+    )
+
+class Job(BaseModel):
+    id: int
+    type: str
+    status: JobStatus = JobStatus.PENDING
+    total: int
+    processed: int = 0
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    finished_at: Optional[datetime] = None
+    result: Optional[BulkDeleteResult] = None
+    error: Optional[str] = None
@@ -0,0 +1,15 @@
+from pydantic import BaseModel, Field
+from typing import Dict, Optional
+from .movies import Movie
+
+class RatingStats(BaseModel):
+    movie_id: int
+    review_count: int = Field(description="Number of numeric (1-5) ratings")
+    average_rating: Optional[float] = None
+    histogram: Dict[int, int] = Field(description="Number of ratings per star value")
+    text_rating_count: int = Field(description="Number of free-text ratings")
+
+class TopRatedMovie(BaseModel):
+    movie: Movie
+    average_rating: float
+    review_count: int
\ No newline at end of file
@@ -0,0 +1,7 @@
+from pydantic import BaseModel, Field
+from .movies import Movie
+
+class SimilarMovie(BaseModel):
+    movie: Movie
+    score: float
+    shared_watchlists: int = Field(description="Watch lists holding both movies")
@@ -0,0 +1,11 @@
+from pydantic import BaseModel
+from typing import Optional
+from .directors import Director
+from .movies import Movie
+
+class SearchHit(BaseModel):
+    type: str
+    id: int
+    score: float
+    movie: Optional[Movie] = None
+    director: Optional[Director] = None
\ No newline at end of file
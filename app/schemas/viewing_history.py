@@ -35,8 +35,18 @@ class ViewingHistoryBase(BaseModel):
 class ViewingHistoryCreate(ViewingHistoryBase):
     pass
 
+class ViewingProgress(BaseModel):
+    """A player's position in a movie, as reported every few seconds."""
+    viewer_id: str = Field(min_length=1, max_length=100)
+    movie_id: int
+    status: ViewingStatus = ViewingStatus.IN_PROGRESS
+    current_minute: Optional[int] = Field(None, ge=0)
+    runtime_minutes: Optional[int] = Field(None, ge=1)
+
 class ViewingHistory(ViewingHistoryBase, TimeStampMixin):
     id: int
+    # Set only on the entries kept by ``PUT /viewing-history/progress``
+    viewer_id: Optional[str] = Field(None, max_length=100)
     
     class Config:
         from_attributes = True 
\ No newline at end of file
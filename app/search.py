@@ -0,0 +1,386 @@
+"""Inverted index for full-text search over movies and directors.
+
+Movie titles and descriptions and director names and bios are tokenized
+into an in-memory inverted index (term -> documents with their term
+frequency) that is updated on every create and delete. Queries are ranked
+with BM25; the last query word also matches as a prefix, so results show up
+while the user is still typing. The index follows writes as a repository
+listener (see ``Repository.watch``).
+
+Queries stop early instead of scoring every posting. A term's postings are
+sorted by term frequency and, within one frequency, by document length,
+which for a given frequency is the BM25 order whatever the collection
+statistics are; a query therefore reads each word's postings best first.
+It reads the words in step, scores every new document in full from the
+terms stored with it, and stops once the k-th best score beats the sum of
+the scores last read from each word, which bounds every document not read
+yet (Fagin's threshold algorithm). Common words cost about as much as rare
+ones.
+
+Postings are packed one per int (frequency, length, document) into sorted
+``array('Q')`` runs. New postings are buffered and sorted into runs of
+geometrically growing size, so an update costs amortized O(log n) and a
+term has O(log n) runs. Deleting a document leaves its postings in place:
+reads skip them, and a term's runs are compacted once most of its postings
+are stale.
+
+``benchmarks/search.py`` measures indexing throughput and query latency.
+"""
+import heapq
+import math
+import re
+import sys
+from array import array
+from bisect import bisect_left, insort
+from collections import Counter
+from itertools import chain, islice
+from typing import Iterable, Iterator, Optional
+
+_TOKEN = re.compile(r"\w+")
+
+# Table -> (field, weight); title and name matches count double
+_FIELDS = {
+    "movies": (("title", 2), ("description", 1)),
+    "directors": (("name", 2), ("bio", 1)),
+}
+# Documents are keyed by an int: row id shifted left, table in the low bit
+_TABLE_BITS = {"movies": 0, "directors": 1}
+_TABLES = {bit: table for table, bit in _TABLE_BITS.items()}
+
+# A posting packs frequency << 52 | length << 36 | document key; larger
+# frequencies and lengths are capped, which only loosens the score bound
+# a posting is read with (see _impacts)
+_KEY_MASK = (1 << 36) - 1
+_LENGTH_SHIFT = 36
+_LENGTH_MAX = (1 << 16) - 1
+_FREQUENCY_SHIFT = 52
+_FREQUENCY_MAX = (1 << 12) - 1
+
+
+def tokenize(text: str) -> list[str]:
+    return _TOKEN.findall(text.casefold())
+
+
+def _pack(frequency: int, length: int, key: int) -> int:
+    return (
+        min(frequency, _FREQUENCY_MAX) << _FREQUENCY_SHIFT
+        | min(length, _LENGTH_MAX) << _LENGTH_SHIFT
+        | key
+    )
+
+
+class _Postings:
+    """The documents holding one term, per table, in sorted runs."""
+
+    __slots__ = ("count", "runs", "fresh", "stale")
+
+    # Postings buffered before they are sorted into a run
+    fresh_size = 64
+
+    def __init__(self):
+        # Documents holding the term, for its idf
+        self.count = 0
+        # Per table bit: sorted runs, largest first, and unsorted new postings
+        self.runs: tuple[list[array], list[array]] = ([], [])
+        self.fresh: tuple[list[int], list[int]] = ([], [])
+        # Postings of deleted or rewritten documents still in the runs
+        self.stale = 0
+
+    def __len__(self) -> int:
+        return self.count
+
+    def add(self, posting: int, bit: int):
+        self.count += 1
+        fresh = self.fresh[bit]
+        fresh.append(posting)
+        if len(fresh) >= self.fresh_size:
+            self.flush(bit)
+
+    def flush(self, bit: int):
+        """Sort the buffered postings into a run, merging runs of similar size."""
+        fresh = self.fresh[bit]
+        if not fresh:
+            return
+        runs = self.runs[bit]
+        run = array("Q", sorted(fresh))
+        fresh.clear()
+        while runs and len(runs[-1]) <= 2 * len(run):
+            run = array("Q", sorted(runs.pop() + run))
+        runs.append(run)
+
+    def sorted_runs(self, bit: int) -> list:
+        fresh = self.fresh[bit]
+        return self.runs[bit] + [sorted(fresh)] if fresh else self.runs[bit]
+
+
+def _scores(run, start: int, end: int, frequency: int, weight: float, base: float, per_length: float):
+    """``(-score, posting)`` of one frequency's postings in a run, best first."""
+    if frequency == _FREQUENCY_MAX:
+        # Capped: bounded by the BM25 limit for any frequency
+        for position in range(start, end):
+            yield -weight, run[position]
+        return
+    top = weight * frequency
+    for position in range(start, end):
+        posting = run[position]
+        # Computed as in SearchIndex._score, so a bound never undercuts it
+        length_part = base + per_length * (posting >> _LENGTH_SHIFT & _LENGTH_MAX)
+        yield -top / (frequency + length_part), posting
+
+
+class SearchIndex:
+    k1 = 1.2
+    b = 0.75
+    # Prefix matches considered per query, most common terms first
+    max_expansions = 50
+    # New terms are kept in a small sorted list and merged into the main
+    # vocabulary in bulk, so adding a term never shifts a huge list
+    merge_threshold = 4096
+
+    def __init__(self):
+        self.postings: dict[str, _Postings] = {}
+        self.lengths: dict[int, int] = {}
+        # Document key -> (its terms, their frequencies), to score it in full
+        self.documents: dict[int, tuple[tuple[str, ...], array]] = {}
+        self.total_length = 0
+        self._vocabulary: list[str] = []
+        self._new_terms: list[str] = []
+
+    def clear(self):
+        self.__init__()
+
+    def __len__(self) -> int:
+        return len(self.lengths)
+
+    # Updates
+
+    def add(self, table: str, row):
+        bit = _TABLE_BITS[table]
+        key = row.id << 1 | bit
+        if key > _KEY_MASK:
+            raise ValueError(f"Row id {row.id} is too large to index")
+        if key in self.lengths:
+            self._remove_key(key)
+
+        counts = Counter()
+        for field, weight in _FIELDS[table]:
+            text = getattr(row, field)
+            if text:
+                for term in tokenize(text):
+                    counts[term] += weight
+        if not counts:
+            return
+
+        length = sum(counts.values())
+        # Interned, so every document's term tuple shares the same strings
+        terms = tuple(map(sys.intern, counts))
+        postings = self.postings
+        for term, frequency in zip(terms, counts.values()):
+            documents = postings.get(term)
+            if documents is None:
+                documents = postings[term] = _Postings()
+                insort(self._new_terms, term)
+            documents.add(_pack(frequency, length, key), bit)
+        self.lengths[key] = length
+        self.total_length += length
+        self.documents[key] = (terms, array("I", counts.values()))
+
+        if len(self._new_terms) >= self.merge_threshold:
+            self._merge_vocabulary()
+
+    def on_put(self, table: str, rows: Iterable):
+        if table in _FIELDS:
+            for row in rows:
+                self.add(table, row)
+
+    def on_delete(self, table: str, row):
+        if table in _FIELDS:
+            self.remove(table, row.id)
+
+    def remove(self, table: str, row_id: int):
+        self._remove_key(row_id << 1 | _TABLE_BITS[table])
+
+    def _remove_key(self, key: int):
+        document = self.documents.pop(key, None)
+        if document is None:
+            return
+        self.total_length -= self.lengths.pop(key)
+        for term in document[0]:
+            documents = self.postings[term]
+            documents.count -= 1
+            if not documents.count:
+                # The term stays in the vocabulary lists until the next merge
+                del self.postings[term]
+                continue
+            documents.stale += 1
+            if documents.stale > documents.count:
+                self._compact(term, documents)
+
+    def _current(self, term: str, posting: int) -> bool:
+        """Whether ``posting`` is the one ``term`` has for its document now."""
+        key = posting & _KEY_MASK
+        document = self.documents.get(key)
+        if document is None or term not in document[0]:
+            return False
+        terms, frequencies = document
+        return _pack(frequencies[terms.index(term)], self.lengths[key], key) == posting
+
+    def _compact(self, term: str, documents: _Postings):
+        for bit in (0, 1):
+            postings = chain(*documents.runs[bit], documents.fresh[bit])
+            live = sorted({posting for posting in postings if self._current(term, posting)})
+            documents.runs[bit][:] = [array("Q", live)] if live else []
+            documents.fresh[bit].clear()
+        documents.stale = 0
+
+    def _merge_vocabulary(self):
+        postings = self.postings
+        merged = heapq.merge(self._vocabulary, self._new_terms)
+        self._vocabulary = [term for term in merged if term in postings]
+        self._new_terms = []
+
+    # Queries
+
+    def _expand(self, prefix: str) -> list[str]:
+        matches = set()
+        for terms in (self._vocabulary, self._new_terms):
+            for term in islice(terms, bisect_left(terms, prefix), None):
+                if not term.startswith(prefix):
+                    break
+                if term in self.postings:
+                    matches.add(term)
+        if len(matches) <= self.max_expansions:
+            return list(matches)
+        return heapq.nlargest(self.max_expansions, matches, key=lambda term: len(self.postings[term]))
+
+    def _weight(self, term: str) -> float:
+        """``idf * (k1 + 1)`` of a term, the most a document can score for it."""
+        count = len(self.lengths)
+        documents = len(self.postings[term])
+        return math.log(1 + (count - documents + 0.5) / (documents + 0.5)) * (self.k1 + 1)
+
+    def _impacts(self, term: str, bits, weight: float, base: float, per_length: float) -> Iterator:
+        """``(-score, posting)`` of a term's postings, best first.
+
+        Scores are upper bounds: exact for current postings, possibly
+        higher for stale or capped ones.
+        """
+        documents = self.postings[term]
+        streams = []
+        for bit in bits:
+            for run in documents.sorted_runs(bit):
+                start, end = 0, len(run)
+                while start < end:
+                    frequency = run[start] >> _FREQUENCY_SHIFT
+                    stop = bisect_left(run, (frequency + 1) << _FREQUENCY_SHIFT, start)
+                    streams.append(_scores(run, start, stop, frequency, weight, base, per_length))
+                    start = stop
+        return heapq.merge(*streams)
+
+    def _score(self, key: int, groups: list[dict[str, float]], base: float, per_length: float) -> float:
+        """Full score of a document: per group its best term, summed."""
+        document = self.documents.get(key)
+        if document is None:
+            return 0.0
+        terms, frequencies = document
+        length_part = base + per_length * self.lengths[key]
+        total = 0.0
+        for weights in groups:
+            best = 0.0
+            if len(weights) < len(terms):
+                matched = ((term, weight) for term, weight in weights.items() if term in terms)
+                for term, weight in matched:
+                    frequency = frequencies[terms.index(term)]
+                    best = max(best, weight * frequency / (frequency + length_part))
+            else:
+                for term, frequency in zip(terms, frequencies):
+                    weight = weights.get(term)
+                    if weight is not None:
+                        best = max(best, weight * frequency / (frequency + length_part))
+            total += best
+        return total
+
+    def search(
+        self,
+        query: str,
+        table: Optional[str] = None,
+        skip: int = 0,
+        limit: int = 25,
+    ) -> list[tuple[str, int, float]]:
+        """Rank documents for ``query`` and return ``(table, id, score)`` hits.
+
+        Query words are OR-ed together and their BM25 scores summed. Unless
+        the query ends in whitespace, the last word also matches every term
+        it prefixes (scored by its best match).
+        """
+        words = tokenize(query)
+        if not words or not self.lengths:
+            return []
+        average_length = self.total_length / len(self.lengths)
+        base = self.k1 * (1 - self.b)
+        per_length = self.k1 * self.b / average_length
+
+        words_terms = [[word] for word in dict.fromkeys(words[:-1])]
+        last = words[-1]
+        words_terms.append(self._expand(last) if _TOKEN.match(query[-1]) else [last])
+        groups = []
+        for terms in words_terms:
+            weights = {term: self._weight(term) for term in terms if term in self.postings}
+            if weights:
+                groups.append(weights)
+        if not groups:
+            return []
+
+        bits = (0, 1) if table is None else (_TABLE_BITS[table],)
+        streams = [
+            heapq.merge(*(
+                self._impacts(term, bits, weight, base, per_length)
+                for term, weight in weights.items()
+            ))
+            for weights in groups
+        ]
+        # Score last read from each group: no unread posting scores higher
+        bounds = [math.inf] * len(streams)
+        wanted = skip + limit
+        best: list[tuple[float, int]] = []
+        seen = set()
+        while True:
+            for position, stream in enumerate(streams):
+                if stream is None:
+                    continue
+                item = next(stream, None)
+                if item is None:
+                    streams[position] = None
+                    bounds[position] = 0.0
+                    continue
+                negated, posting = item
+                bounds[position] = -negated
+                key = posting & _KEY_MASK
+                if key in seen:
+                    continue
+                seen.add(key)
+                score = self._score(key, groups, base, per_length)
+                if not score:
+                    continue
+                if len(best) < wanted:
+                    heapq.heappush(best, (score, -key))
+                elif (score, -key) > best[0]:
+                    heapq.heapreplace(best, (score, -key))
+            if len(best) == wanted and best[0][0] > sum(bounds):
+                break
+            if not any(streams):
+                break
+
+        ranked = sorted(best, reverse=True)[skip:]
+        return [(_TABLES[-negated & 1], -negated >> 1, score) for score, negated in ranked]
+
+    async def rebuild(self, db):
+        """Index every movie and director in ``db``."""
+        self.clear()
+        for table in _FIELDS:
+            async for row in db.iter_rows(table):
+                self.add(table, row)
+        self._merge_vocabulary()
+
+
+search_index = SearchIndex()
@@ -0,0 +1,715 @@
+"""Immutable table snapshots in shared memory, and the owner socket protocol.
+
+In shared mode (``MOVIE_DB_BACKEND=shared``) one worker process owns the
+data and every other worker reads it from snapshot files mapped into
+memory. A published version is a base file and a delta file over it.
+
+``base-<version>.bin`` holds, per table, the sorted ids, an offsets array
+and the rows' encoded JSON back to back, plus the secondary indexes reads
+need: the id buckets (sorted keys, bucket starts and the ids) and the
+entries and keys by id of each ``OrderedIndex``.
+
+``snapshot-<version>.bin`` holds only what changed since its base: the
+changed rows (empty for deleted ones), the ids added to and removed from
+each table, bucket and ordered index, and the changed keys by id. Reads
+look a row up in the delta first and merge the added and removed ids into
+the base's in order (``SortedIds``). Publishing therefore writes the rows
+changed since the base, never the whole store; once enough have changed,
+the owner writes the latest version out as a new base in a background
+thread, from the published files rather than from its memory.
+
+Both files are laid out as
+
+    MAGIC | header offset | header length | sections ... | JSON header
+
+Sections are int64 arrays (or bytes) aligned to 8 bytes, so readers use
+them in place through ``memoryview`` casts, bisecting keys and ids where
+they lie; the small JSON header holds the sections' offsets and lengths
+and, per table, the version that last changed it, so readers only drop
+cached responses of tables that did change. Files are never modified. The
+8-byte ``current`` file holds the latest version; readers check it on each
+request and map the new delta (and base, if it moved on) when it changes.
+Unlinking an old file does not disturb readers that still have it mapped.
+
+Writes from reader workers go to the owner over a Unix socket as
+length-prefixed JSON messages (see ``app/repositories/shared.py``).
+"""
+import asyncio
+import heapq
+import json
+import mmap
+import os
+import struct
+from array import array
+from bisect import bisect_left, bisect_right
+from functools import partial
+from itertools import filterfalse, groupby, islice
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+from .query import COLUMN_KEYS, ID_MASK, entry, entry_bounds, probe_keys
+
+MAGIC = b"MDBSNAP2"
+POINTER_FILE = "current"
+SOCKET_FILE = "owner.sock"
+LOCK_FILE = "owner.lock"
+
+_PREAMBLE = struct.Struct("<8sqq")
+_POINTER = struct.Struct("<q")
+_LENGTH = struct.Struct("<I")
+
+TABLES = ("directors", "movies", "reviews", "watchlists", "viewing_history")
+# Secondary indexes of DummyDatabase that reads use -> (table, key of a row)
+INDEXES = {
+    "movies_by_director": ("movies", lambda movie: movie.director_id),
+    "movies_by_genre": ("movies", lambda movie: movie.genre.casefold()),
+    "history_by_movie": ("viewing_history", lambda history: history.movie_id),
+    "reviews_by_movie": ("reviews", lambda review: review.movie_id),
+}
+# Indexes keyed by strings; the others are keyed by ints
+STRING_KEYS = {"movies_by_genre"}
+
+
+def snapshot_path(directory: Path, version: int) -> Path:
+    return directory / f"snapshot-{version:012d}.bin"
+
+
+def base_path(directory: Path, version: int) -> Path:
+    return directory / f"base-{version:012d}.bin"
+
+
+# Writing (owner)
+
+class _SectionWriter:
+    def __init__(self, output):
+        self.output = output
+        self.position = _PREAMBLE.size
+
+    def _align(self):
+        padding = -self.position % 8
+        if padding:
+            self.output.write(b"\0" * padding)
+            self.position += padding
+
+    def write(self, data) -> list[int]:
+        """Write an int64 array or bytes; returns ``[offset, length]``."""
+        self._align()
+        offset = self.position
+        self.output.write(data)
+        self.position += len(data) * (data.itemsize if isinstance(data, array) else 1)
+        return [offset, len(data)]
+
+    def rows(self, ids: array, rows: Iterable[bytes]) -> dict:
+        """Encoded rows of ``ids``, in order, streamed to the file."""
+        self._align()
+        offset = self.position
+        offsets = array("q", [0])
+        for row in rows:
+            self.output.write(row)
+            self.position += len(row)
+            offsets.append(self.position - offset)
+        return {
+            "data": [offset, offsets[-1]],
+            "ids": self.write(ids),
+            "offsets": self.write(offsets),
+        }
+
+    def keys(self, keys: list, strings: bool) -> dict:
+        if not strings:
+            return {"keys": self.write(array("q", keys))}
+        encoded = [key.encode() for key in keys]
+        offsets = array("q", [0])
+        for key in encoded:
+            offsets.append(offsets[-1] + len(key))
+        return {"keys": self.write(offsets), "key_data": self.write(b"".join(encoded))}
+
+    def buckets(self, buckets: Iterable[Iterable[int]]) -> dict:
+        starts = array("q", [0])
+        ids = array("q")
+        for bucket in buckets:
+            ids.extend(bucket)
+            starts.append(len(ids))
+        return {"starts": self.write(starts), "ids": self.write(ids)}
+
+
+def _write_file(path: Path, header: dict, write_sections):
+    temporary = path.with_name(path.name + ".tmp")
+    with open(temporary, "wb") as output:
+        output.write(b"\0" * _PREAMBLE.size)
+        sections = _SectionWriter(output)
+        write_sections(sections)
+        encoded_header = json.dumps(header, separators=(",", ":")).encode()
+        header_offset = sections.write(encoded_header)[0]
+        output.seek(0)
+        output.write(_PREAMBLE.pack(MAGIC, header_offset, len(encoded_header)))
+    os.replace(temporary, path)
+
+
+def database_contents(db) -> tuple:
+    """What a base needs from ``db``, as ``write_base`` takes it."""
+    tables = {table: (db.ordered_ids[table], partial(db.row_json, table)) for table in TABLES}
+    indexes = {name: sorted(getattr(db, name).items()) for name in INDEXES}
+    orders = {column: (index.entries(), index.keys) for column, index in db.movie_orders.items()}
+    return tables, indexes, orders
+
+
+def write_base(path: Path, version: int, seq: int, contents: tuple):
+    """Write a full snapshot.
+
+    ``contents`` is ``(tables, indexes, orders)``: per table its ids in
+    order and a function returning a row's JSON, per index its non-empty
+    ``(key, ids)`` buckets in key order, and per ordered index column its
+    entries in order and its keys by id (see ``database_contents`` and
+    ``SnapshotView.contents``).
+    """
+    tables, indexes, orders = contents
+    header = {"version": version, "seq": seq, "tables": {}, "indexes": {}, "orders": {}}
+
+    def write_sections(sections):
+        for table, (ids, row_json) in tables.items():
+            ids = array("q", ids)
+            header["tables"][table] = sections.rows(ids, map(row_json, ids))
+        for name, buckets in indexes.items():
+            buckets = list(buckets)
+            header["indexes"][name] = {
+                **sections.keys([key for key, _ in buckets], name in STRING_KEYS),
+                "buckets": sections.buckets(ids for _, ids in buckets),
+            }
+        for column, (entries, keys) in orders.items():
+            header["orders"][column] = {
+                "entries": sections.write(array("q", entries)),
+                "keys": sections.write(array("q", keys)),
+            }
+
+    _write_file(path, header, write_sections)
+
+
+def capture_changes(db, changed: dict[str, dict]) -> dict:
+    """Rows a delta needs from ``db``; call on the event loop.
+
+    ``changed`` maps each table to the ids changed since the base and their
+    rows in the base (``None`` for new ones). Only those rows are looked
+    up, so this costs O(changes), not O(rows).
+    """
+    captured = {}
+    for table, previous in changed.items():
+        rows = getattr(db, table)
+        current = {}
+        for row_id in previous:
+            row = rows.get(row_id)
+            current[row_id] = None if row is None else (row, db.row_json(table, row_id))
+        captured[table] = (dict(previous), current)
+    return captured
+
+
+def _key_changes(previous: dict, current: dict, key) -> Iterator[tuple]:
+    """``(id, old key, new key)`` of the rows whose key changed, in id order."""
+    for row_id in sorted(previous):
+        old, new = previous[row_id], current[row_id]
+        old_key = None if old is None else key(old)
+        new_key = None if new is None else key(new[0])
+        if old_key != new_key:
+            yield row_id, old_key, new_key
+
+
+def write_delta(path: Path, version: int, seq: int, base: int, table_versions: dict, captured: dict):
+    """Write the changes of ``captured`` (see ``capture_changes``) over ``base``."""
+    header = {
+        "version": version,
+        "seq": seq,
+        "base": base,
+        "table_versions": table_versions,
+        "tables": {},
+        "indexes": {},
+        "orders": {},
+    }
+    empty = ({}, {})
+
+    def write_sections(sections):
+        for table in TABLES:
+            previous, current = captured.get(table, empty)
+            # Rows added and deleted again since the base are left out
+            ids = array("q", sorted(
+                row_id for row_id in previous
+                if previous[row_id] is not None or current[row_id] is not None
+            ))
+            header["tables"][table] = {
+                **sections.rows(ids, (current[row_id][1] if current[row_id] else b"" for row_id in ids)),
+                "added": sections.write(array("q", (i for i in ids if previous[i] is None))),
+                "removed": sections.write(array("q", (i for i in ids if current[i] is None))),
+            }
+
+        for name, (table, key) in INDEXES.items():
+            added, removed = {}, {}
+            for row_id, old_key, new_key in _key_changes(*captured.get(table, empty), key):
+                if old_key is not None:
+                    removed.setdefault(old_key, []).append(row_id)
+                if new_key is not None:
+                    added.setdefault(new_key, []).append(row_id)
+            keys = sorted(added.keys() | removed.keys())
+            header["indexes"][name] = {
+                **sections.keys(keys, name in STRING_KEYS),
+                "added": sections.buckets(added.get(key, ()) for key in keys),
+                "removed": sections.buckets(removed.get(key, ()) for key in keys),
+            }
+
+        for column, key in COLUMN_KEYS.items():
+            added, removed, changed, keys = [], [], array("q"), array("q")
+            for row_id, old_key, new_key in _key_changes(*captured.get("movies", empty), key):
+                if old_key is not None:
+                    removed.append(entry(old_key, row_id))
+                if new_key is not None:
+                    added.append(entry(new_key, row_id))
+                changed.append(row_id)
+                keys.append(-1 if new_key is None else new_key)
+            header["orders"][column] = {
+                "added": sections.write(array("q", sorted(added))),
+                "removed": sections.write(array("q", sorted(removed))),
+                "changed": sections.write(changed),
+                "keys": sections.write(keys),
+            }
+
+    _write_file(path, header, write_sections)
+
+
+class VersionPointer:
+    """The mapped ``current`` file holding the latest snapshot version."""
+
+    def __init__(self, directory: Path, create: bool = False):
+        path = directory / POINTER_FILE
+        if create and not path.exists():
+            path.write_bytes(_POINTER.pack(0))
+        with open(path, "r+b" if create else "rb") as pointer:
+            access = mmap.ACCESS_WRITE if create else mmap.ACCESS_READ
+            self._map = mmap.mmap(pointer.fileno(), _POINTER.size, access=access)
+
+    def read(self) -> int:
+        return _POINTER.unpack_from(self._map, 0)[0]
+
+    def write(self, version: int):
+        # A single aligned 8-byte store, so readers never see half of it
+        _POINTER.pack_into(self._map, 0, version)
+
+    def close(self):
+        self._map.close()
+
+
+# Reading (every worker)
+
+_NO_INTS = memoryview(array("q"))
+
+
+def _ints(buffer: memoryview, spec: list) -> memoryview:
+    offset, count = spec
+    return buffer[offset : offset + 8 * count].cast("q")
+
+
+def _bytes(buffer: memoryview, spec: list) -> memoryview:
+    offset, length = spec
+    return buffer[offset : offset + length]
+
+
+def _find(values, value) -> Optional[int]:
+    """Position of ``value`` in the sorted ``values``, or ``None``."""
+    position = bisect_left(values, value)
+    if position < len(values) and values[position] == value:
+        return position
+    return None
+
+
+class SortedIds:
+    """Read-only ``SortedIdSet`` over int64 buffers.
+
+    The set is ``ids`` without ``removed``, plus ``added``: a base's ids
+    with a delta's changes, ``removed`` being a subset of ``ids`` and
+    ``added`` disjoint from them (both empty for a plain buffer). Ranks
+    and positions are bisected in all three, so seeking stays O(log n)
+    whatever the delta holds.
+    """
+
+    __slots__ = ("_ids", "_added", "_removed", "_plain", "_dropped", "_size")
+
+    def __init__(self, ids: memoryview, added: memoryview = _NO_INTS, removed: memoryview = _NO_INTS):
+        self._ids = ids
+        self._added = added
+        self._removed = removed
+        self._plain = not (len(added) or len(removed))
+        # set(removed), built on the first walk
+        self._dropped: Optional[set] = None
+        self._size = len(ids) - len(removed) + len(added)
+
+    def rank(self, value: int) -> int:
+        """Number of ids below ``value``."""
+        rank = bisect_left(self._ids, value)
+        if not self._plain:
+            rank += bisect_left(self._added, value) - bisect_left(self._removed, value)
+        return rank
+
+    def select(self, position: int) -> Optional[int]:
+        """The id at ``position`` in order, or ``None`` past the end."""
+        if not 0 <= position < self._size:
+            return None
+        ids, added, removed = self._ids, self._added, self._removed
+        if self._plain:
+            return ids[position]
+        # Added ids before ``position``: an added id's position is its
+        # index plus the number of kept base ids below it
+        low, high = 0, len(added)
+        while low < high:
+            middle = (low + high) // 2
+            value = added[middle]
+            if middle + bisect_left(ids, value) - bisect_left(removed, value) < position:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(added):
+            value = added[low]
+            if low + bisect_left(ids, value) - bisect_left(removed, value) == position:
+                return value
+        # Otherwise it is the kept base id with ``wanted`` kept ids before it
+        wanted = position - low
+        low, high = 0, len(ids)
+        while low < high:
+            middle = (low + high) // 2
+            if middle + 1 - bisect_right(removed, ids[middle]) > wanted:
+                high = middle
+            else:
+                low = middle + 1
+        return ids[low]
+
+    def between(
+        self,
+        low: Optional[int] = None,
+        high: Optional[int] = None,
+        descending: bool = False,
+    ) -> Iterator[int]:
+        """Ids with ``low <= id < high`` (unbounded for ``None``), in order."""
+        ids = self._ids
+        start = 0 if low is None else bisect_left(ids, low)
+        stop = len(ids) if high is None else bisect_left(ids, high)
+        kept = ids[start:stop]
+        if descending:
+            kept = reversed(kept)
+        if self._plain:
+            return iter(kept)
+        if self._dropped is None:
+            self._dropped = set(self._removed)
+        kept = filterfalse(self._dropped.__contains__, kept)
+        added = self._added
+        start = 0 if low is None else bisect_left(added, low)
+        stop = len(added) if high is None else bisect_left(added, high)
+        extra = added[start:stop]
+        return heapq.merge(kept, reversed(extra) if descending else extra, reverse=descending)
+
+    def position_after(self, item_id: Optional[int]) -> int:
+        if item_id is None:
+            return 0
+        return self.rank(item_id + 1)
+
+    def slice_after(self, item_id: Optional[int], skip: int, count: int) -> list[int]:
+        start = self.position_after(item_id) + skip
+        if self._plain:
+            return self._ids[start : start + count].tolist()
+        first = self.select(start)
+        if first is None:
+            return []
+        return list(islice(self.between(first), count))
+
+    def iter_after(self, item_id: Optional[int]) -> Iterator[int]:
+        return self.between(None if item_id is None else item_id + 1)
+
+    def iter_before(self, item_id: Optional[int]) -> Iterator[int]:
+        return self.between(None, item_id, descending=True)
+
+    def __contains__(self, item_id: int) -> bool:
+        if not self._plain:
+            if _find(self._added, item_id) is not None:
+                return True
+            if _find(self._removed, item_id) is not None:
+                return False
+        return _find(self._ids, item_id) is not None
+
+    def __getitem__(self, position: int) -> int:
+        item_id = self.select(position + self._size if position < 0 else position)
+        if item_id is None:
+            raise IndexError("id position out of range")
+        return item_id
+
+    def __iter__(self) -> Iterator[int]:
+        return self.between()
+
+    def __len__(self) -> int:
+        return self._size
+
+
+_NO_IDS = SortedIds(_NO_INTS)
+
+
+class _Rows:
+    """Encoded rows by id: sorted ids, offsets and the JSON back to back."""
+
+    __slots__ = ("ids", "_offsets", "_data")
+
+    def __init__(self, buffer: memoryview, spec: dict):
+        self.ids = _ints(buffer, spec["ids"])
+        self._offsets = _ints(buffer, spec["offsets"])
+        self._data = _bytes(buffer, spec["data"])
+
+    def get(self, row_id: int) -> Optional[bytes]:
+        ids = self.ids
+        position = bisect_left(ids, row_id)
+        if position == len(ids) or ids[position] != row_id:
+            return None
+        offsets = self._offsets
+        return bytes(self._data[offsets[position] : offsets[position + 1]])
+
+
+class _StringKeys:
+    """Sorted string keys, UTF-8 back to back, bisected in place."""
+
+    __slots__ = ("_offsets", "_data")
+
+    def __init__(self, buffer: memoryview, spec: dict):
+        self._offsets = _ints(buffer, spec["keys"])
+        self._data = _bytes(buffer, spec["key_data"])
+
+    def __getitem__(self, position: int) -> str:
+        return str(self._data[self._offsets[position] : self._offsets[position + 1]], "utf-8")
+
+    def __iter__(self) -> Iterator[str]:
+        return map(self.__getitem__, range(len(self)))
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+
+class _Buckets:
+    """Sorted id lists of sorted keys, back to back with their starts."""
+
+    __slots__ = ("keys", "_starts", "_ids")
+
+    def __init__(self, keys, buffer: memoryview, spec: dict):
+        self.keys = keys
+        self._starts = _ints(buffer, spec["starts"])
+        self._ids = _ints(buffer, spec["ids"])
+
+    def find(self, key) -> Optional[memoryview]:
+        position = _find(self.keys, key)
+        if position is None:
+            return None
+        return self._ids[self._starts[position] : self._starts[position + 1]]
+
+
+def _keys(buffer: memoryview, spec: dict):
+    return _StringKeys(buffer, spec) if "key_data" in spec else _ints(buffer, spec["keys"])
+
+
+class TableView:
+    def __init__(self, base: _Rows, changes: _Rows, added: memoryview, removed: memoryview):
+        self._base = base
+        self._changes = changes
+        self.ids = SortedIds(base.ids, added, removed)
+        if not len(changes.ids):
+            # Nothing changed since the base: skip the delta on every read
+            self.row_json = base.get
+
+    def row_json(self, row_id: int) -> Optional[bytes]:
+        data = self._changes.get(row_id)
+        if data is not None:
+            # Deleted rows are empty in the delta
+            return data or None
+        return self._base.get(row_id)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+
+class IndexView:
+    """Read-only ``dict[key, SortedIdSet]`` over a base's buckets and a delta's changes."""
+
+    def __init__(self, base: _Buckets, added: _Buckets, removed: _Buckets):
+        self._base = base
+        self._added = added
+        self._removed = removed
+
+    def get(self, key) -> SortedIds:
+        ids = self._base.find(key)
+        added = self._added.find(key)
+        if added is None:
+            return _NO_IDS if ids is None else SortedIds(ids)
+        return SortedIds(_NO_INTS if ids is None else ids, added, self._removed.find(key))
+
+    def __contains__(self, key) -> bool:
+        return len(self.get(key)) > 0
+
+    def items(self) -> Iterator[tuple]:
+        """Non-empty ``(key, ids)`` buckets in key order."""
+        for key, _ in groupby(heapq.merge(self._base.keys, self._added.keys)):
+            ids = self.get(key)
+            if ids:
+                yield key, ids
+
+
+class _ChangedKeys:
+    """Keys by id of a base's ordered index, with a delta's changed ones."""
+
+    __slots__ = ("_base", "_ids", "_keys", "_size")
+
+    def __init__(self, base: memoryview, ids: memoryview, keys: memoryview):
+        self._base = base
+        self._ids = ids
+        self._keys = keys
+        self._size = max(len(base), ids[-1] + 1 if len(ids) else 0)
+
+    def __getitem__(self, item_id: int) -> int:
+        position = _find(self._ids, item_id)
+        if position is not None:
+            return self._keys[position]
+        return self._base[item_id] if item_id < len(self._base) else -1
+
+    def __len__(self) -> int:
+        return self._size
+
+    def to_array(self) -> array:
+        keys = array("q", self._base)
+        keys.extend([-1] * (self._size - len(keys)))
+        for item_id, key in zip(self._ids, self._keys):
+            keys[item_id] = key
+        return keys
+
+
+class OrderedIndexView:
+    """Read-only ``OrderedIndex`` over its entries and its keys by id."""
+
+    def __init__(self, entries: SortedIds, keys):
+        self.entries = entries
+        self._keys = keys
+
+    def key(self, item_id: int) -> Optional[int]:
+        keys = self._keys
+        if 0 <= item_id < len(keys) and keys[item_id] >= 0:
+            return keys[item_id]
+        return None
+
+    def count(self, low: Optional[int] = None, high: Optional[int] = None) -> int:
+        lo, hi = entry_bounds(low, high)
+        entries = self.entries
+        stop = len(entries) if hi is None else entries.rank(hi)
+        return max(0, stop - (0 if lo is None else entries.rank(lo)))
+
+    def walk(self, low=None, high=None, position=None, descending=False) -> Iterator[int]:
+        lo, hi = entry_bounds(low, high)
+        if position is not None:
+            if descending:
+                hi = position if hi is None else min(hi, position)
+            else:
+                lo = position + 1 if lo is None else max(lo, position + 1)
+        return map(ID_MASK.__and__, self.entries.between(lo, hi, descending))
+
+    def probe(self, low: Optional[int], high: Optional[int]):
+        return probe_keys(self._keys, low, high)
+
+    def keys_array(self) -> array:
+        keys = self._keys
+        return keys.to_array() if isinstance(keys, _ChangedKeys) else array("q", keys)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
+def _map(path: Path) -> tuple[mmap.mmap, memoryview, dict]:
+    with open(path, "rb") as snapshot:
+        mapped = mmap.mmap(snapshot.fileno(), 0, access=mmap.ACCESS_READ)
+    buffer = memoryview(mapped)
+    magic, header_offset, header_length = _PREAMBLE.unpack_from(buffer, 0)
+    if magic != MAGIC:
+        raise ValueError(f"Not a snapshot file: {path}")
+    return mapped, buffer, json.loads(bytes(buffer[header_offset : header_offset + header_length]))
+
+
+class BaseView:
+    """One mapped base file, shared by the snapshots over it."""
+
+    def __init__(self, path: Path):
+        self._map, buffer, header = _map(path)
+        self.version: int = header["version"]
+        self.rows = {table: _Rows(buffer, spec) for table, spec in header["tables"].items()}
+        self.buckets = {
+            name: _Buckets(_keys(buffer, spec), buffer, spec["buckets"])
+            for name, spec in header["indexes"].items()
+        }
+        self.orders = {
+            column: (_ints(buffer, spec["entries"]), _ints(buffer, spec["keys"]))
+            for column, spec in header["orders"].items()
+        }
+
+
+class SnapshotView:
+    """One published version; stays valid for as long as it is referenced.
+
+    ``previous`` is the view this one replaces: its base is reused when
+    both are over the same one.
+    """
+
+    def __init__(self, path: Path, previous: Optional["SnapshotView"] = None):
+        self._map, buffer, header = _map(path)
+        self.version: int = header["version"]
+        self.seq: int = header["seq"]
+        self.table_versions: dict[str, int] = header["table_versions"]
+        if previous is not None and previous.base.version == header["base"]:
+            self.base = previous.base
+        else:
+            self.base = BaseView(base_path(path.parent, header["base"]))
+
+        self.tables = {}
+        for table, spec in header["tables"].items():
+            self.tables[table] = TableView(
+                self.base.rows[table],
+                _Rows(buffer, spec),
+                _ints(buffer, spec["added"]),
+                _ints(buffer, spec["removed"]),
+            )
+        self.indexes = {}
+        for name, spec in header["indexes"].items():
+            keys = _keys(buffer, spec)
+            self.indexes[name] = IndexView(
+                self.base.buckets[name],
+                _Buckets(keys, buffer, spec["added"]),
+                _Buckets(keys, buffer, spec["removed"]),
+            )
+        self.orders = {}
+        for column, spec in header["orders"].items():
+            entries, keys = self.base.orders[column]
+            changed = _ints(buffer, spec["changed"])
+            if len(changed):
+                keys = _ChangedKeys(keys, changed, _ints(buffer, spec["keys"]))
+            self.orders[column] = OrderedIndexView(
+                SortedIds(entries, _ints(buffer, spec["added"]), _ints(buffer, spec["removed"])),
+                keys,
+            )
+
+    def movie_key(self, column: str, movie_id: int) -> Optional[int]:
+        return self.orders[column].key(movie_id)
+
+    def contents(self) -> tuple:
+        """Everything in this version, as ``write_base`` takes it."""
+        tables = {table: (view.ids, view.row_json) for table, view in self.tables.items()}
+        indexes = {name: index.items() for name, index in self.indexes.items()}
+        orders = {column: (index.entries, index.keys_array()) for column, index in self.orders.items()}
+        return tables, indexes, orders
+
+
+# Socket protocol
+
+async def read_message(reader: asyncio.StreamReader) -> Optional[dict]:
+    """Next message, or ``None`` once the peer has closed the connection."""
+    try:
+        (length,) = _LENGTH.unpack(await reader.readexactly(_LENGTH.size))
+        return json.loads(await reader.readexactly(length))
+    except asyncio.IncompleteReadError:
+        return None
+
+
+def write_message(writer: asyncio.StreamWriter, message: dict):
+    data = json.dumps(message, separators=(",", ":")).encode()
+    writer.write(_LENGTH.pack(len(data)) + data)
@@ -1,3 +1,11 @@
-from .pagination import Pagination, pagination
+from .cache import CachedResponse, ResponseCache, response_cache
+from .pagination import Pagination, PageParams, pagination
 
-__all__ = ['Pagination', 'pagination'] 
\ No newline at end of file
+__all__ = [
+    'CachedResponse',
+    'ResponseCache',
+    'response_cache',
+    'Pagination',
+    'PageParams',
+    'pagination',
+]
\ No newline at end of file
@@ -0,0 +1,54 @@
+"""Many rows by id in one request: ``GET`` and ``POST /<resource>/batch``.
+
+The rows come from one ``Repository.get_many`` lookup and are encoded in
+one pass, in the order their ids were requested; ids with no row are
+listed under ``missing`` instead of failing the request.
+"""
+from typing import Optional
+
+from fastapi import HTTPException, Query, Response, status
+from pydantic import BaseModel, ValidationError
+from pydantic_core import to_json
+
+from ..schemas.batch import MAX_BATCH_IDS, BatchGet, BatchResult
+from .fast_json import json_response
+from .fields import project, shape_movies
+
+
+async def batch_ids(
+    ids: str = Query(..., description=f"Comma-separated ids, at most {MAX_BATCH_IDS}"),
+) -> list[int]:
+    """Dependency parsing the ``ids`` of ``GET /<resource>/batch``."""
+    try:
+        parsed = [int(part) for part in ids.split(",") if part.strip()]
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="ids must be comma-separated integers"
+        )
+    try:
+        return BatchGet(ids=parsed).ids
+    except ValidationError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=e.errors()[0]["msg"])
+
+
+async def batch_response(
+    db,
+    table: str,
+    model: type[BaseModel],
+    ids: list[int],
+    fields: Optional[set[str]] = None,
+    include: tuple[str, ...] = (),
+) -> Response:
+    """The ``BatchResult`` for ``ids``; ``include`` applies to movies only."""
+    rows = await db.get_many(table, ids)
+    items = [rows[row_id] for row_id in ids if row_id in rows]
+    missing = [row_id for row_id in ids if row_id not in rows]
+    if include:
+        shaped = await shape_movies(db, items, fields, include)
+        return json_response(to_json({"items": shaped, "missing": missing}))
+    if fields is not None:
+        shaped = [project(row, fields) for row in items]
+        return json_response(to_json({"items": shaped, "missing": missing}))
+    result = BatchResult[model](items=items, missing=missing)
+    return json_response(result.__pydantic_serializer__.to_json(result))
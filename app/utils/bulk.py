@@ -0,0 +1,167 @@
+import asyncio
+from typing import AsyncIterator, Awaitable, Callable, Optional
+
+from pydantic import BaseModel, ValidationError
+
+from ..schemas.bulk import BulkImportResult, BulkRowError
+from ..schemas.jobs import BulkDeleteResult, Job
+from .cache import response_cache
+
+BATCH_SIZE = 500
+MAX_LINE_BYTES = 1 << 20
+MAX_REPORTED_ERRORS = 1000
+
+# Referenced table -> error message, matching the single-row endpoints
+_NOT_FOUND = {
+    "directors": "Director not found",
+    "movies": "Movie not found",
+}
+
+
+async def ndjson_batches(
+    stream: AsyncIterator[bytes],
+    batch_size: int = BATCH_SIZE,
+) -> AsyncIterator[list[tuple[int, Optional[bytes]]]]:
+    """Group the lines of a streamed NDJSON body into batches.
+
+    Items are ``(line number, line)``; blank lines are skipped and a line
+    longer than ``MAX_LINE_BYTES`` comes back as ``None`` so the caller can
+    report it without the buffer ever holding more than one line.
+    """
+    buffer = b""
+    line_number = 0
+    oversized = False
+    batch = []
+
+    async for chunk in stream:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line_number += 1
+            if oversized:
+                batch.append((line_number, None))
+                oversized = False
+            elif line.strip():
+                batch.append((line_number, line))
+        if len(buffer) > MAX_LINE_BYTES:
+            buffer = b""
+            oversized = True
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+
+    if oversized or buffer.strip():
+        line_number += 1
+        batch.append((line_number, None if oversized else buffer))
+    if batch:
+        yield batch
+
+
+def _describe(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in detail['loc']) or 'row'}: {detail['msg']}"
+        for detail in error.errors()
+    )
+
+
+def _record_error(result: BulkImportResult, line: int, message: str):
+    result.failed += 1
+    if len(result.errors) < MAX_REPORTED_ERRORS:
+        result.errors.append(BulkRowError(line=line, error=message))
+
+
+async def bulk_import(
+    stream: AsyncIterator[bytes],
+    db,
+    table: str,
+    create_model: type[BaseModel],
+    model: type[BaseModel],
+    reference: Optional[tuple[str, str]] = None,
+) -> BulkImportResult:
+    """Validate and insert an NDJSON upload batch by batch.
+
+    ``reference`` is ``(field, table)`` for a foreign key that must exist;
+    it is checked once per batch. Invalid rows are reported and skipped,
+    the rest of the upload still goes in.
+    """
+    result = BulkImportResult()
+
+    async for batch in ndjson_batches(stream):
+        valid = []
+        for line, raw in batch:
+            if raw is None:
+                _record_error(result, line, f"Line exceeds {MAX_LINE_BYTES} bytes")
+                continue
+            try:
+                valid.append((line, create_model.model_validate_json(raw)))
+            except ValidationError as e:
+                _record_error(result, line, _describe(e))
+
+        if reference and valid:
+            field, target = reference
+            existing = await db.existing_ids(target, {getattr(item, field) for _, item in valid})
+            checked = []
+            for line, item in valid:
+                if getattr(item, field) in existing:
+                    checked.append((line, item))
+                else:
+                    _record_error(result, line, _NOT_FOUND[target])
+            valid = checked
+
+        if valid:
+            ids = await db.allocate_ids(table, len(valid))
+            rows = [
+                model(id=row_id, **item.dict())
+                for row_id, (_, item) in zip(ids, valid)
+            ]
+            await db.insert_many(table, rows)
+            result.inserted += len(rows)
+
+    return result
+
+
+async def bulk_delete(
+    db,
+    table: str,
+    ids: list[int],
+    job: Job,
+    tables: tuple[str, ...],
+    delete: Optional[Callable[[list[int]], Awaitable[list[int]]]] = None,
+) -> BulkDeleteResult:
+    """Delete ``ids`` from ``table`` batch by batch, as a background job.
+
+    Each batch is one write with a single merged cascade. ``delete``
+    replaces ``db.delete_many`` for tables whose rows may refuse to go;
+    rows it leaves in place are reported as rejected. Cached responses
+    built from ``tables`` are dropped around every batch, and
+    ``job.processed`` tracks progress.
+    """
+    result = BulkDeleteResult()
+    if delete is None:
+        delete = lambda batch: db.delete_many(table, batch)
+
+    for start in range(0, len(ids), BATCH_SIZE):
+        batch = ids[start : start + BATCH_SIZE]
+        existing = await db.existing_ids(table, batch)
+        doomed = [row_id for row_id in batch if row_id in existing]
+        result.not_found.extend(row_id for row_id in batch if row_id not in existing)
+
+        if doomed:
+            with response_cache.writing(*tables):
+                deleted = await delete(doomed)
+            result.deleted += len(deleted)
+            left = set(doomed).difference(deleted)
+            if left:
+                # Kept by ``delete``, or deleted by someone else since the
+                # existence check
+                kept = await db.existing_ids(table, left)
+                for row_id in doomed:
+                    if row_id in kept:
+                        result.rejected.append(row_id)
+                    elif row_id in left:
+                        result.not_found.append(row_id)
+        job.processed += len(batch)
+        # The memory store never suspends, so let requests in between batches
+        await asyncio.sleep(0)
+
+    return result
@@ -0,0 +1,179 @@
+import hashlib
+from collections import OrderedDict, defaultdict
+from contextlib import contextmanager
+from typing import Any, Optional
+
+from fastapi import Request, Response, status
+from pydantic import TypeAdapter
+
+from ..compression import compression, weak_etag
+from .pagination import page_headers
+
+
+class CacheEntry:
+    __slots__ = ("etag", "body", "headers", "_gzipped")
+
+    def __init__(self, etag: str, body: bytes, headers: dict[str, str]):
+        self.etag = etag
+        self.body = body
+        self.headers = headers
+        self._gzipped: Optional[bytes] = None
+
+    def gzipped(self) -> bytes:
+        """The body gzip-compressed, computed on first use and kept."""
+        if self._gzipped is None:
+            self._gzipped = compression.compress(self.body)
+        return self._gzipped
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+class ResponseCache:
+    """LRU cache of serialized GET responses keyed by table versions.
+
+    Every write bumps the version of the tables it touches, so entries
+    built from older data are never looked up again and simply age out.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self.versions: defaultdict[str, int] = defaultdict(int)
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[tuple, CacheEntry] = OrderedDict()
+
+    def bump(self, *tables: str):
+        for table in tables:
+            self.versions[table] += 1
+
+    @contextmanager
+    def writing(self, *tables: str):
+        """Bump ``tables`` both before and after the write made in this block.
+
+        A response built while the write is in flight may hold the old data
+        or part of the new; it is cached under the version the first bump
+        opened, which the second one retires.
+        """
+        self.bump(*tables)
+        try:
+            yield
+        finally:
+            self.bump(*tables)
+
+    def key(self, request: Request, tables: tuple[str, ...]) -> tuple:
+        return (
+            request.url.path,
+            tuple(sorted(request.query_params.multi_items())),
+            tuple(self.versions[table] for table in tables),
+        )
+
+    def get(self, key: tuple) -> Optional[CacheEntry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: tuple, body: bytes, headers: dict[str, str]) -> CacheEntry:
+        etag = '"%s"' % hashlib.blake2b(body, digest_size=16).hexdigest()
+        entry = CacheEntry(etag, body, headers)
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return entry
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict[str, int]:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+response_cache = ResponseCache()
+
+
+class CacheLookup:
+    """Per-request handle returned by the ``CachedResponse`` dependency."""
+
+    def __init__(self, request: Request, key: tuple, adapter: TypeAdapter):
+        self.request = request
+        self.key = key
+        self.adapter = adapter
+
+    def _respond(self, entry: CacheEntry) -> Response:
+        # Large enough to be sent compressed to the clients that accept it
+        varies = compression.enabled and compression.worth_compressing(entry.body)
+        gzipped = varies and compression.accepts(self.request.headers.get("accept-encoding"))
+        headers = dict(entry.headers, ETag=weak_etag(entry.etag) if gzipped else entry.etag)
+        if varies:
+            headers["Vary"] = "Accept-Encoding"
+        if _etag_matches(self.request.headers.get("if-none-match"), entry.etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        if gzipped:
+            headers["Content-Encoding"] = "gzip"
+            return Response(content=entry.gzipped(), media_type="application/json", headers=headers)
+        return Response(content=entry.body, media_type="application/json", headers=headers)
+
+    def hit(self) -> Optional[Response]:
+        entry = response_cache.get(self.key)
+        return None if entry is None else self._respond(entry)
+
+    def store(self, content: Any, response: Optional[Response] = None) -> Response:
+        """Serialize ``content``, cache it and build the response.
+
+        ``response`` is the sub-response the handler's dependencies wrote
+        headers to (such as the pagination cursor); those are kept with
+        the body.
+        """
+        return self.store_json(self.adapter.dump_json(content), response)
+
+    def store_json(self, body: bytes, response: Optional[Response] = None) -> Response:
+        """Like ``store`` for a body that is already encoded."""
+        headers = page_headers(response) if response is not None else {}
+        entry = response_cache.put(self.key, body, headers)
+        return self._respond(entry)
+
+
+class CachedResponse:
+    """Dependency that looks a GET response up in ``response_cache``.
+
+    ``tables`` are the tables the response is built from; the cache key
+    includes their current versions. ``includes`` maps each ``?include=``
+    name the endpoint accepts to the extra tables the embedded rows read,
+    and ``filters`` each query parameter to the tables it is checked
+    against (a filter on a director that must exist reads ``directors``).
+    """
+
+    def __init__(
+        self,
+        response_type: Any,
+        *tables: str,
+        includes: Optional[dict[str, tuple[str, ...]]] = None,
+        filters: Optional[dict[str, tuple[str, ...]]] = None,
+    ):
+        self.adapter = TypeAdapter(response_type)
+        self.tables = tables
+        self.includes = includes or {}
+        self.filters = filters or {}
+
+    async def __call__(self, request: Request) -> CacheLookup:
+        tables = self.tables
+        include = request.query_params.get("include") if self.includes else None
+        if include:
+            for name in include.split(","):
+                tables += self.includes.get(name.strip(), ())
+        for name, filtered in self.filters.items():
+            if request.query_params.get(name):
+                tables += filtered
+        return CacheLookup(request, response_cache.key(request, tables), self.adapter)
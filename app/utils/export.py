@@ -0,0 +1,65 @@
+import csv
+import io
+import json
+from typing import AsyncIterator
+
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+EXPORT_FORMATS = ("ndjson", "csv")
+
+# Rows are grouped into one write per this many rows
+_ROWS_PER_CHUNK = 256
+
+_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+async def _ndjson(rows: AsyncIterator[BaseModel]) -> AsyncIterator[bytes]:
+    lines = []
+    async for row in rows:
+        lines.append(row.model_dump_json().encode())
+        if len(lines) >= _ROWS_PER_CHUNK:
+            yield b"\n".join(lines) + b"\n"
+            lines = []
+    if lines:
+        yield b"\n".join(lines) + b"\n"
+
+
+def _csv_value(value):
+    # Lists (watchlist movie_ids) are written as JSON inside the cell
+    return json.dumps(value) if isinstance(value, list) else value
+
+
+async def _csv(rows: AsyncIterator[BaseModel], model: type[BaseModel]) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=list(model.model_fields))
+    writer.writeheader()
+    count = 0
+    async for row in rows:
+        data = row.model_dump(mode="json")
+        writer.writerow({key: _csv_value(value) for key, value in data.items()})
+        count += 1
+        if count % _ROWS_PER_CHUNK == 0:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def export_response(
+    rows: AsyncIterator[BaseModel],
+    model: type[BaseModel],
+    export_format: str,
+    name: str,
+) -> StreamingResponse:
+    """Stream ``rows`` as an NDJSON or CSV attachment."""
+    body = _ndjson(rows) if export_format == "ndjson" else _csv(rows, model)
+    return StreamingResponse(
+        body,
+        media_type=_MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{name}.{export_format}"'},
+    )
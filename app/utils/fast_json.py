@@ -0,0 +1,20 @@
+from typing import Optional
+
+from fastapi import Response
+
+from .pagination import page_headers
+
+
+def json_array(parts: list[bytes]) -> bytes:
+    """Join already-encoded JSON values into a JSON array."""
+    return b"[" + b",".join(parts) + b"]"
+
+
+def json_response(body: bytes, response: Optional[Response] = None) -> Response:
+    """Send pre-encoded JSON, skipping ``response_model`` serialization.
+
+    Headers that dependencies set on ``response`` (the pagination cursor)
+    are copied over, since FastAPI drops them for a returned ``Response``.
+    """
+    headers = page_headers(response) if response is not None else None
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,118 @@
+"""Sparse fieldsets (``?fields=``) and embedded related rows (``?include=``).
+
+``?fields=id,title,genre`` keeps only the listed fields of each row.
+``?include=director,rating_stats,reviews`` (movie endpoints) adds related
+rows to each movie under those keys. They are fetched with one batched
+lookup per response (``Repository.get_many``,
+``Repository.reviews_for_movies``), never one per row, so a page of movies
+with their directors costs one request instead of N + 1.
+
+``reviews`` embeds at most the ``EMBEDDED_REVIEWS`` newest reviews of each
+movie, newest first, and their total under ``reviews_total``; the rest
+are listed by ``GET /reviews/``.
+
+Shaped responses no longer match the endpoint's ``response_model``, so
+they are encoded here and returned as prebuilt JSON.
+"""
+from typing import Optional, Union
+
+from fastapi import HTTPException, Query, status
+from pydantic import BaseModel
+from pydantic_core import to_json
+
+from ..ratings import rating_stats
+
+# ?include= name on the movie endpoints -> tables the embedded rows come from
+MOVIE_INCLUDES = {
+    "director": ("directors",),
+    "rating_stats": ("reviews",),
+    "reviews": ("reviews",),
+}
+
+# Reviews embedded per movie by ?include=reviews
+EMBEDDED_REVIEWS = 10
+
+
+def _names(value: str) -> list[str]:
+    return [name.strip() for name in value.split(",") if name.strip()]
+
+
+class FieldSelection:
+    """Dependency parsing ``?fields=`` against the fields of ``model``.
+
+    Returns ``None`` when the parameter is absent, so handlers keep their
+    usual serialization.
+    """
+
+    def __init__(self, model: type[BaseModel]):
+        self.fields = tuple(model.model_fields)
+
+    async def __call__(
+        self,
+        fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. `id,title`"),
+    ) -> Optional[set[str]]:
+        if fields is None:
+            return None
+        selected = set(_names(fields))
+        unknown = sorted(selected.difference(self.fields))
+        if unknown or not selected:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unknown fields: {', '.join(unknown) or '(none given)'}; "
+                       f"available: {', '.join(self.fields)}"
+            )
+        return selected
+
+
+class Inclusion:
+    """Dependency parsing ``?include=`` against the related rows ``names``."""
+
+    def __init__(self, *names: str):
+        self.names = names
+
+    async def __call__(
+        self,
+        include: Optional[str] = Query(None, description="Comma-separated related rows to embed"),
+    ) -> tuple[str, ...]:
+        if include is None:
+            return ()
+        requested = _names(include)
+        unknown = [name for name in requested if name not in self.names]
+        if unknown:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Cannot include: {', '.join(unknown)}; available: {', '.join(self.names)}"
+            )
+        return tuple(dict.fromkeys(requested))
+
+
+def project(row: BaseModel, fields: Optional[set[str]]) -> dict:
+    return row.model_dump(include=fields)
+
+
+def project_json(content: Union[BaseModel, list[BaseModel]], fields: Optional[set[str]]) -> bytes:
+    """JSON of a row, or a list of rows, keeping only ``fields``."""
+    if isinstance(content, list):
+        return to_json([project(row, fields) for row in content])
+    return to_json(project(content, fields))
+
+
+async def shape_movies(db, movies: list, fields: Optional[set[str]], include: tuple[str, ...]) -> list[dict]:
+    """Project ``movies`` and embed the ``include`` rows, one lookup per kind."""
+    items = [project(movie, fields) for movie in movies]
+    if "director" in include:
+        directors = await db.get_many("directors", {movie.director_id for movie in movies})
+        for movie, item in zip(movies, items):
+            director = directors.get(movie.director_id)
+            item["director"] = None if director is None else director.model_dump()
+    if "rating_stats" in include:
+        for movie, item in zip(movies, items):
+            item["rating_stats"] = rating_stats.summary(movie.id).model_dump()
+    if "reviews" in include:
+        reviews = await db.reviews_for_movies([movie.id for movie in movies])
+        for movie, item in zip(movies, items):
+            rows = reviews.get(movie.id, ())
+            # In id order, so the newest are last
+            item["reviews"] = [review.model_dump() for review in reversed(rows[-EMBEDDED_REVIEWS:])]
+            item["reviews_total"] = len(rows)
+    return items
@@ -0,0 +1,39 @@
+"""Filter and sort parameters of the movie list and export."""
+from datetime import date
+from typing import Callable, Optional
+
+from fastapi import Query
+
+from ..query import SORTS, MovieQuery
+from .pagination import encode_cursor
+
+SORT_PATTERN = f"^-?({'|'.join(SORTS)})$"
+
+
+async def movie_query(
+    genre: Optional[str] = None,
+    director_id: Optional[int] = None,
+    released_from: Optional[date] = Query(None, description="Earliest release date, inclusive"),
+    released_to: Optional[date] = Query(None, description="Latest release date, inclusive"),
+    min_runtime: Optional[int] = Query(None, ge=1, description="Shortest runtime in minutes, inclusive"),
+    max_runtime: Optional[int] = Query(None, ge=1, description="Longest runtime in minutes, inclusive"),
+    sort: str = Query(
+        "id",
+        pattern=SORT_PATTERN,
+        description=f"One of {', '.join(f'`{name}`' for name in SORTS)}; prefix `-` for descending",
+    ),
+) -> MovieQuery:
+    return MovieQuery(genre, director_id, released_from, released_to, min_runtime, max_runtime, sort)
+
+
+def movie_cursor(query: MovieQuery, key: Callable[[str, int], Optional[int]]) -> Callable[[int], str]:
+    """Encoder of the next-page cursor for ``query``'s order.
+
+    ``key(column, movie_id)`` looks up a movie's sort key in the store.
+    """
+    column, descending = query.order
+    if column != "id":
+        return lambda last_id: encode_cursor(last_id, query.sort, key(column, last_id))
+    if descending:
+        return lambda last_id: encode_cursor(last_id, query.sort)
+    return encode_cursor
@@ -1,4 +1,81 @@
-from fastapi import Query
+import base64
+import binascii
+from itertools import islice
+from typing import Callable, Iterable, NamedTuple, Optional
+
+from fastapi import HTTPException, Query, Response, status
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(last_id: int, order: str = "id", key: Optional[int] = None) -> str:
+    """Cursor resuming ``order`` after the row ``last_id``, whose sort key is ``key``."""
+    raw = f"{order}:{last_id}" if key is None else f"{order}:{key}:{last_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_position(cursor: str) -> tuple[str, Optional[int], int]:
+    """``(order, key, last id)`` of a cursor; the key is ``None`` for id orders."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        order, *values = base64.urlsafe_b64decode(padded).decode().split(":")
+        if len(values) != (1 if order.lstrip("-") == "id" else 2):
+            raise ValueError
+        *key, last_id = map(int, values)
+        return order, key[0] if key else None, last_id
+    except (ValueError, UnicodeDecodeError, binascii.Error):
+        raise ValueError("Invalid cursor")
+
+
+def page_headers(response: Response) -> dict[str, str]:
+    """Pagination headers set on ``response``, to copy onto a prebuilt response."""
+    if NEXT_CURSOR_HEADER in response.headers:
+        return {NEXT_CURSOR_HEADER: response.headers[NEXT_CURSOR_HEADER]}
+    return {}
+
+
+class PageParams(NamedTuple):
+    skip: int
+    limit: int
+    after: Optional[int]
+    response: Response
+    # Order the cursor was issued for, and the sort key of its last row
+    order: str = "id"
+    after_key: Optional[int] = None
+
+    def take(self, ids: Iterable[int], cursor: Callable[[int], str] = encode_cursor) -> list[int]:
+        """Cut the requested page out of ``ids``.
+
+        ``ids`` is either a sorted id set (anything with ``slice_after``), which
+        is seeked directly, or an iterator already positioned past the cursor.
+        When more rows follow, the opaque cursor for the next page is sent in
+        the ``X-Next-Cursor`` response header.
+        """
+        count = self.limit + 1
+        if hasattr(ids, "slice_after"):
+            window = ids.slice_after(self.after, self.skip, count)
+        else:
+            window = list(islice(ids, self.skip, self.skip + count))
+        return self.finish(window, cursor=cursor)
+
+    def finish(
+        self,
+        window: list,
+        key: Optional[Callable] = None,
+        cursor: Callable[[int], str] = encode_cursor,
+    ) -> list:
+        """Trim a window of up to ``limit + 1`` items fetched past the cursor.
+
+        ``key`` maps an item to its id when the window holds rows, not ids;
+        ``cursor`` encodes the next cursor from the last id, for orders
+        other than by id.
+        """
+        page = window[:self.limit]
+        if len(window) > self.limit:
+            last = page[-1] if key is None else key(page[-1])
+            self.response.headers[NEXT_CURSOR_HEADER] = cursor(last)
+        return page
+
 
 class Pagination:
     def __init__(self, maximum_limit: int = 100):
@@ -6,10 +83,18 @@ class Pagination:
 
     async def __call__(
         self,
+        response: Response,
         skip: int = Query(0, ge=0),
         limit: int = Query(25, ge=1),
-    ) -> tuple[int, int]:
+        cursor: Optional[str] = Query(None),
+    ) -> PageParams:
         capped_limit = min(self.maximum_limit, limit)
-        return (skip, capped_limit)
+        after, order, after_key = None, "id", None
+        if cursor is not None:
+            try:
+                order, after_key, after = decode_position(cursor)
+            except ValueError as e:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        return PageParams(skip, capped_limit, after, response, order, after_key)
 
-pagination = Pagination(maximum_limit=50)
\ No newline at end of file
+pagination = Pagination(maximum_limit=50)
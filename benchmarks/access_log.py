@@ -0,0 +1,88 @@
+"""Request latency added by access logging.
+
+Usage: python -m benchmarks.access_log [--requests N] [--reader-delay SECONDS]
+
+Compares the old ``print()`` on the event loop with ``AccessLog.record``.
+Both write to a pipe whose reader drains 4 KiB at a time with a delay in
+between, like a log shipper that cannot keep up, so the pipe fills and
+blocking writes stall the caller.
+"""
+import argparse
+import io
+import os
+import threading
+import time
+
+from app.access_log import AccessLog
+
+
+def slow_reader(fd: int, delay: float, stop: threading.Event):
+    while not stop.is_set():
+        if not os.read(fd, 4096):
+            break
+        time.sleep(delay)
+
+
+def measure(log_call, requests: int) -> list[float]:
+    timings = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        log_call()
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return timings
+
+
+def report(name: str, timings: list[float]):
+    print(
+        f"{name:14s} p50 {timings[len(timings) // 2] * 1e6:9.1f} us"
+        f"   p99 {timings[int(len(timings) * 0.99)] * 1e6:9.1f} us"
+        f"   max {timings[-1] * 1e3:8.2f} ms"
+    )
+
+
+def run(name: str, requests: int, delay: float, make_logger):
+    read_fd, write_fd = os.pipe()
+    stop = threading.Event()
+    reader = threading.Thread(target=slow_reader, args=(read_fd, delay, stop), daemon=True)
+    reader.start()
+    pipe = io.TextIOWrapper(os.fdopen(write_fd, "wb", buffering=0), line_buffering=True)
+    log_call, finish = make_logger(pipe)
+    report(name, measure(log_call, requests))
+    finish()
+    stop.set()
+    pipe.close()
+    reader.join()
+    os.close(read_fd)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--reader-delay", type=float, default=0.001)
+    args = parser.parse_args()
+    api_key, user_agent = "your-secret-key", "benchmark/1.0"
+
+    def print_logger(pipe):
+        def log_call():
+            print(f"Request from: {user_agent} with API key: {api_key}", file=pipe)
+        return log_call, lambda: None
+
+    def access_logger(pipe):
+        access_log = AccessLog(destination=pipe)
+        access_log.start()
+
+        def log_call():
+            access_log.record("GET", "/movies/", user_agent, api_key)
+
+        def finish():
+            access_log.close()
+            print(f"{'':14s} written {access_log.written}, dropped {access_log.dropped}")
+        return log_call, finish
+
+    run("print()", args.requests, args.reader_delay, print_logger)
+    run("AccessLog", args.requests, args.reader_delay, access_logger)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Bytes saved and CPU spent by gzip response compression.
+
+Usage: python -m benchmarks.compression [--scale small|medium|large] [--requests N]
+           [--levels 0 1 6 9]
+
+Needs httpx, from ``requirements-dev.txt``.
+
+Loads a seeded dataset (``benchmarks/datasets.py``), then fetches list
+pages and a streamed export through the app in process, once per gzip
+level (0 is compression off). For each endpoint it reports the average
+bytes on the wire, the saving against level 0 and the CPU time per
+request. Cacheable pages are fetched twice: the first pass compresses
+every page, the second is served the compressed copy kept in the response
+cache. CPU time covers the whole request, client side included; compare
+levels against level 0 rather than reading the numbers alone.
+"""
+import argparse
+import asyncio
+import os
+import time
+
+# Per-request access logging would dominate the measurements
+os.environ.setdefault("MOVIE_DB_ACCESS_LOG", "off")
+
+import httpx
+
+from app.api_keys import DEVELOPMENT_KEY
+from app.compression import compression
+from app.utils.cache import response_cache
+from app.utils.pagination import encode_cursor
+
+from .datasets import SCALES, load
+
+# (name, path for the n-th request, cached by the response cache)
+ENDPOINTS = [
+    ("movies page", lambda n: f"/movies/?limit=50&cursor={encode_cursor(n * 50)}", True),
+    ("reviews page", lambda n: f"/reviews/?limit=50&cursor={encode_cursor(n * 50)}", True),
+    ("history page", lambda n: f"/viewing-history/?limit=50&cursor={encode_cursor(n * 50)}", False),
+    ("movies + reviews", lambda n: f"/movies/?limit=25&include=reviews&cursor={encode_cursor(n * 25)}", True),
+    ("movies export", lambda n: "/movies/export", False),
+]
+EXPORT_REQUESTS = 3
+
+
+async def measure(client: httpx.AsyncClient, path, requests: int) -> tuple[float, float]:
+    """Average wire bytes and CPU microseconds per request."""
+    wire = 0
+    started = time.process_time()
+    for n in range(requests):
+        async with client.stream("GET", path(n)) as response:
+            async for _ in response.aiter_raw():
+                pass
+            wire += response.num_bytes_downloaded
+    cpu = time.process_time() - started
+    return wire / requests, cpu / requests * 1e6
+
+
+async def run(args):
+    from app.dependencies import repository
+    from app.main import app
+
+    await repository.open()
+    await load(repository, SCALES[args.scale], seed=42)
+    await repository.close()
+
+    headers = {"api-key": DEVELOPMENT_KEY, "user-agent": "benchmarks.compression", "accept-encoding": "gzip"}
+    transport = httpx.ASGITransport(app=app)
+    print(f"{args.scale} dataset, minimum size {compression.minimum_size} bytes")
+    print(f"{'endpoint':18s} {'level':>5s} {'bytes':>10s} {'saved':>7s} {'cpu us':>10s} {'cached us':>10s}")
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", headers=headers) as client:
+            for name, path, cached in ENDPOINTS:
+                requests = EXPORT_REQUESTS if name.endswith("export") else args.requests
+                baseline = None
+                # Untimed, so the first level measured does not pay for warm-up
+                await measure(client, path, min(requests, 20))
+                for level in args.levels:
+                    compression.level = level
+                    response_cache.clear()
+                    size, cpu = await measure(client, path, requests)
+                    cached_cpu = (await measure(client, path, requests))[1] if cached else None
+                    baseline = baseline or size
+                    print(
+                        f"{name:18s} {level:5d} {size:10,.0f} {1 - size / baseline:7.1%} {cpu:10,.0f}"
+                        + (f" {cached_cpu:10,.0f}" if cached_cpu is not None else f" {'-':>10s}")
+                    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--levels", type=int, nargs="+", default=[0, 1, 6, 9])
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
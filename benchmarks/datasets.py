@@ -0,0 +1,168 @@
+"""Seeded synthetic datasets at several scales, loaded straight into a store.
+
+Usage: python -m benchmarks.datasets [--scale small|medium|large] [--seed N]
+
+The same scale and seed always produce the same rows, so two runs of the
+load suite (``benchmarks/load.py``) measure the same data. Rows are built
+with ``model_construct`` and written through ``Repository.insert_many`` in
+large batches, which skips request validation but keeps every index the
+store maintains. Run without the app started, so listeners (ratings,
+search) are rebuilt once from the loaded rows instead of row by row.
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import date, datetime, timedelta
+from itertools import islice
+from typing import Iterator, NamedTuple
+
+from app.schemas.directors import Director
+from app.schemas.movies import Movie
+from app.schemas.reviews import Review
+from app.schemas.viewing_history import ViewingHistory, ViewingStatus
+from app.schemas.watchlists import WatchList
+
+GENRES = ["Drama", "Comedy", "Horror", "Action", "Documentary", "Animation", "Thriller"]
+STATUSES = list(ViewingStatus)
+WORDS = (
+    "love war night city river last first dark light house road dream star king "
+    "queen secret story time world summer winter ghost blood fire water stone "
+    "garden machine heart silent broken golden hidden lost wild young old"
+).split()
+
+LOAD_BATCH_SIZE = 10_000
+_EPOCH = datetime(2020, 1, 1)
+
+
+class Scale(NamedTuple):
+    directors: int
+    movies: int
+    reviews: int
+    viewing_history: int
+    watchlists: int
+
+
+SCALES = {
+    "small": Scale(directors=1_000, movies=10_000, reviews=100_000, viewing_history=100_000, watchlists=1_000),
+    "medium": Scale(directors=5_000, movies=100_000, reviews=1_000_000, viewing_history=1_000_000, watchlists=10_000),
+    "large": Scale(directors=10_000, movies=1_000_000, reviews=10_000_000, viewing_history=10_000_000, watchlists=100_000),
+}
+
+
+def _timestamp(rng: random.Random) -> datetime:
+    return _EPOCH + timedelta(seconds=rng.randrange(5 * 365 * 86400))
+
+
+def _text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choices(WORDS, k=words))
+
+
+def generate(scale: Scale, seed: int = 42) -> Iterator[tuple[str, object]]:
+    """Yield ``(table, row)`` for every row of the dataset, parents first."""
+    rng = random.Random(seed)
+
+    for director_id in range(1, scale.directors + 1):
+        created = _timestamp(rng)
+        yield "directors", Director.model_construct(
+            id=director_id,
+            name=f"{_text(rng, 1).title()} Director {director_id}",
+            bio=_text(rng, 12),
+            created_at=created,
+            updated_at=created,
+        )
+
+    for movie_id in range(1, scale.movies + 1):
+        created = _timestamp(rng)
+        yield "movies", Movie.model_construct(
+            id=movie_id,
+            title=_text(rng, 3).title(),
+            description=_text(rng, 20),
+            imdb_id=f"tt{movie_id:07d}",
+            release_date=date(1950 + rng.randrange(75), 1 + rng.randrange(12), 1 + rng.randrange(28)),
+            genre=rng.choice(GENRES),
+            # A few prolific directors and a long tail, like real catalogues
+            director_id=min(scale.directors, 1 + int(rng.paretovariate(1.2)) % scale.directors),
+            runtime_minutes=rng.randint(70, 200),
+            created_at=created,
+            updated_at=created,
+        )
+
+    for review_id in range(1, scale.reviews + 1):
+        created = _timestamp(rng)
+        yield "reviews", Review.model_construct(
+            id=review_id,
+            rating=rng.randint(1, 5) if rng.random() < 0.95 else rng.choice(["great", "meh"]),
+            comment=_text(rng, 8),
+            movie_id=rng.randint(1, scale.movies),
+            created_at=created,
+            updated_at=created,
+        )
+
+    for history_id in range(1, scale.viewing_history + 1):
+        created = _timestamp(rng)
+        status = rng.choice(STATUSES)
+        yield "viewing_history", ViewingHistory.model_construct(
+            id=history_id,
+            movie_id=rng.randint(1, scale.movies),
+            status=status,
+            current_minute=rng.randint(0, 120) if status == ViewingStatus.IN_PROGRESS else None,
+            runtime_minutes=None,
+            notes=None,
+            created_at=created,
+            updated_at=created,
+        )
+
+    for list_id in range(1, scale.watchlists + 1):
+        created = _timestamp(rng)
+        yield "watchlists", WatchList.model_construct(
+            id=list_id,
+            name=f"List {list_id}",
+            description=None,
+            movie_ids=rng.sample(range(1, scale.movies + 1), k=min(scale.movies, rng.randint(1, 50))),
+            created_at=created,
+            updated_at=created,
+        )
+
+
+async def load(repository, scale: Scale, seed: int = 42) -> dict[str, int]:
+    """Insert the dataset into ``repository``; returns row counts per table."""
+    counts: dict[str, int] = {}
+    rows = generate(scale, seed)
+    while True:
+        batch = list(islice(rows, LOAD_BATCH_SIZE))
+        if not batch:
+            return counts
+        # Batches never mix tables by much; group them to keep one write per table
+        by_table: dict[str, list] = {}
+        for table, row in batch:
+            by_table.setdefault(table, []).append(row)
+        for table, table_rows in by_table.items():
+            await repository.insert_many(table, table_rows)
+            counts[table] = counts.get(table, 0) + len(table_rows)
+
+
+async def run(scale_name: str, seed: int):
+    from app.dependencies import repository
+
+    await repository.open()
+    started = time.perf_counter()
+    counts = await load(repository, SCALES[scale_name], seed)
+    elapsed = time.perf_counter() - started
+    await repository.close()
+    total = sum(counts.values())
+    print(f"loaded {total:,} rows in {elapsed:.1f}s ({total / elapsed:,.0f} rows/s)")
+    for table, count in counts.items():
+        print(f"  {table:16s} {count:12,}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    asyncio.run(run(args.scale, args.seed))
+
+
+if __name__ == "__main__":
+    main()
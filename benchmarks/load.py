@@ -0,0 +1,322 @@
+"""Load test of every endpoint against a synthetic dataset.
+
+Usage: python -m benchmarks.load [--scale small|medium|large] [--seed N]
+           [--requests N] [--concurrency C] [--warmup N] [--traced N]
+           [--only NAME ...] [--output results.json] [--baseline baseline.json]
+           [--tolerance 0.1]
+
+Needs httpx, from ``requirements-dev.txt``.
+
+Loads a seeded dataset (``benchmarks/datasets.py``) into the store selected
+by the usual ``MOVIE_DB_*`` variables, starts the app in process and drives
+each endpoint through an ASGI client with C concurrent clients until N
+requests are done. Reported per endpoint: throughput, p50/p95/p99 latency,
+errors and the peak Python memory allocated while serving it. The memory
+is measured by tracemalloc over a separate pass of ``--traced`` requests
+at the same concurrency, before the timed ones, so tracing does not slow
+the timed requests down; it counts the endpoint's own allocations, above
+what the process already held.
+
+``--output`` writes the results as JSON. ``--baseline`` compares them with
+a saved run: an endpoint regresses when its throughput drops, or its p99
+grows, by more than ``--tolerance``; the exit status is 1 if any did.
+Compare runs made with the same scale, seed, requests and concurrency on
+the same machine.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import resource
+import sys
+import time
+import tracemalloc
+from typing import Callable, NamedTuple, Optional
+
+# Per-request access logging would dominate the measurements
+os.environ.setdefault("MOVIE_DB_ACCESS_LOG", "off")
+
+import httpx
+
+from app.api_keys import DEVELOPMENT_KEY
+from app.utils.pagination import encode_cursor
+
+from .datasets import SCALES, WORDS, Scale, load
+
+# Requests made by the export scenarios, each of which streams a whole table
+EXPORT_REQUESTS = 3
+
+
+class Scenario(NamedTuple):
+    name: str
+    method: str
+    # (rng, scale, state) -> (path, json body or None)
+    request: Callable[[random.Random, Scale, dict], tuple[str, Optional[dict]]]
+    expected: int = 200
+    export: bool = False
+
+
+def _cursor(rng: random.Random, count: int) -> str:
+    return encode_cursor(rng.randint(0, max(0, count - 50)))
+
+
+def _next_id(state: dict, table: str) -> int:
+    """Consecutive seeded ids, so delete scenarios always hit an existing row."""
+    state[table] = state.get(table, 0) + 1
+    return state[table]
+
+
+SCENARIOS = [
+    Scenario("root", "GET", lambda rng, scale, state: ("/", None)),
+    Scenario("list directors", "GET", lambda rng, scale, state: (
+        f"/directors/?limit=50&cursor={_cursor(rng, scale.directors)}", None)),
+    Scenario("list movies", "GET", lambda rng, scale, state: (
+        f"/movies/?limit=50&cursor={_cursor(rng, scale.movies)}", None)),
+    Scenario("list movies by genre", "GET", lambda rng, scale, state: (
+        f"/movies/?genre=drama&limit=50&cursor={_cursor(rng, scale.movies)}", None)),
+    Scenario("list movies by director", "GET", lambda rng, scale, state: (
+        f"/movies/?director_id={rng.randint(1, scale.directors)}&limit=50", None)),
+    Scenario("get movie", "GET", lambda rng, scale, state: (
+        f"/movies/{rng.randint(1, scale.movies)}", None)),
+    Scenario("top rated", "GET", lambda rng, scale, state: (
+        f"/movies/top-rated?genre={rng.choice(['Drama', 'Comedy', 'Horror'])}&min_reviews={rng.randint(1, 5)}", None)),
+    Scenario("rating stats", "GET", lambda rng, scale, state: (
+        f"/movies/{rng.randint(1, scale.movies)}/rating-stats", None)),
+    Scenario("list reviews", "GET", lambda rng, scale, state: (
+        f"/reviews/?limit=50&cursor={_cursor(rng, scale.reviews)}", None)),
+    Scenario("get review", "GET", lambda rng, scale, state: (
+        f"/reviews/{rng.randint(1, scale.reviews)}", None)),
+    Scenario("list watchlists", "GET", lambda rng, scale, state: (
+        f"/watchlists/?limit=50&cursor={_cursor(rng, scale.watchlists)}", None)),
+    Scenario("list history", "GET", lambda rng, scale, state: (
+        f"/viewing-history/?limit=50&cursor={_cursor(rng, scale.viewing_history)}", None)),
+    Scenario("history for movie", "GET", lambda rng, scale, state: (
+        f"/viewing-history/movies/{rng.randint(1, scale.movies)}", None)),
+    Scenario("search", "GET", lambda rng, scale, state: (
+        f"/search/?q={'+'.join(rng.sample(WORDS, 2))}", None)),
+    Scenario("search prefix", "GET", lambda rng, scale, state: (
+        f"/search/?q={rng.choice(WORDS)[:3]}", None)),
+    Scenario("create movie", "POST", lambda rng, scale, state: ("/movies/", {
+        "title": " ".join(rng.sample(WORDS, 3)),
+        "description": " ".join(rng.choices(WORDS, k=20)),
+        "imdb_id": f"tt{rng.randrange(10**8):08d}",
+        "release_date": "2001-02-03",
+        "genre": "Drama",
+        "director_id": rng.randint(1, scale.directors),
+        "runtime_minutes": rng.randint(70, 200),
+    })),
+    Scenario("create review", "POST", lambda rng, scale, state: ("/reviews/", {
+        "rating": rng.randint(1, 5),
+        "comment": " ".join(rng.choices(WORDS, k=8)),
+        "movie_id": rng.randint(1, scale.movies),
+    })),
+    Scenario("create history", "POST", lambda rng, scale, state: ("/viewing-history/", {
+        "movie_id": rng.randint(1, scale.movies),
+        "status": "in_progress",
+        "current_minute": rng.randint(0, 120),
+    })),
+    Scenario("create watchlist", "POST", lambda rng, scale, state: ("/watchlists/", {
+        "name": "Benchmark list",
+        "movie_ids": rng.sample(range(1, scale.movies + 1), k=min(scale.movies, 20)),
+    })),
+    Scenario("delete review", "DELETE", lambda rng, scale, state: (
+        f"/reviews/{_next_id(state, 'reviews')}", None), expected=204),
+    Scenario("delete history", "DELETE", lambda rng, scale, state: (
+        f"/viewing-history/{_next_id(state, 'viewing_history')}", None), expected=204),
+    # Runs after the other read scenarios: each deleted movie cascades
+    Scenario("delete movie", "DELETE", lambda rng, scale, state: (
+        f"/movies/{_next_id(state, 'movies')}", None), expected=204),
+    Scenario("export movies", "GET", lambda rng, scale, state: ("/movies/export", None), export=True),
+    Scenario("export reviews csv", "GET", lambda rng, scale, state: ("/reviews/export?format=csv", None), export=True),
+]
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / 1024
+
+
+def percentile(samples: list[float], fraction: float) -> float:
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+async def issue(
+    client: httpx.AsyncClient,
+    scenario: Scenario,
+    planned: list[tuple[str, Optional[dict]]],
+    concurrency: int,
+) -> tuple[list[float], int]:
+    """Send ``planned`` from ``concurrency`` clients; returns latencies and errors."""
+    latencies: list[float] = []
+    errors = 0
+    position = 0
+
+    async def client_loop():
+        nonlocal errors, position
+        while position < len(planned):
+            path, body = planned[position]
+            position += 1
+            started = time.perf_counter()
+            response = await client.request(scenario.method, path, json=body)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code != scenario.expected:
+                errors += 1
+
+    await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+    return latencies, errors
+
+
+async def drive(
+    client: httpx.AsyncClient,
+    scenario: Scenario,
+    scale: Scale,
+    requests: int,
+    concurrency: int,
+    seed: int,
+    warmup: int = 0,
+    traced: int = 0,
+) -> dict:
+    rng = random.Random(f"{seed}:{scenario.name}")
+    state: dict = {}
+    # Requests are drawn up front so the same run sends the same requests
+    planned = [scenario.request(rng, scale, state) for _ in range(warmup + traced + requests)]
+    # Untimed, so cold caches (API key verification, encoded rows) settle
+    for path, body in planned[:warmup]:
+        await client.request(scenario.method, path, json=body)
+
+    peak_alloc = 0
+    if traced:
+        tracemalloc.start()
+        held = tracemalloc.get_traced_memory()[0]
+        await issue(client, scenario, planned[warmup : warmup + traced], concurrency)
+        peak_alloc = tracemalloc.get_traced_memory()[1] - held
+        tracemalloc.stop()
+
+    started = time.perf_counter()
+    latencies, errors = await issue(client, scenario, planned[warmup + traced :], concurrency)
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1e3, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1e3, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1e3, 3),
+        "peak_alloc_mb": round(peak_alloc / (1 << 20), 2),
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Print the change against ``baseline``; returns the regressed endpoints."""
+    regressed = []
+    print(f"\ncompared with baseline (tolerance {tolerance:.0%}):")
+    for name, current in results["endpoints"].items():
+        previous = baseline.get("endpoints", {}).get(name)
+        if previous is None:
+            print(f"  {name:26s} new")
+            continue
+        throughput = current["throughput_rps"] / previous["throughput_rps"] - 1
+        p99 = current["p99_ms"] / previous["p99_ms"] - 1 if previous["p99_ms"] else 0.0
+        worse = throughput < -tolerance or p99 > tolerance
+        if worse:
+            regressed.append(name)
+        print(
+            f"  {name:26s} throughput {throughput:+7.1%}   p99 {p99:+7.1%}"
+            f"{'   REGRESSION' if worse else ''}"
+        )
+    return regressed
+
+
+async def run(args) -> dict:
+    from app.dependencies import repository
+    from app.main import app
+
+    scale = SCALES[args.scale]
+    # Loaded before startup, so listeners are built once from all the rows
+    await repository.open()
+    started = time.perf_counter()
+    counts = await load(repository, scale, args.seed)
+    load_seconds = time.perf_counter() - started
+    await repository.close()
+
+    results = {
+        "meta": {
+            "scale": args.scale,
+            "seed": args.seed,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "warmup": args.warmup,
+            "backend": os.environ.get("MOVIE_DB_BACKEND", "memory"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "dataset": {
+            "rows": counts,
+            "load_seconds": round(load_seconds, 2),
+            "peak_rss_mb": round(peak_rss_mb(), 1),
+        },
+        "endpoints": {},
+    }
+    print(f"{args.scale}: {sum(counts.values()):,} rows loaded in {load_seconds:.1f}s")
+
+    transport = httpx.ASGITransport(app=app)
+    headers = {"api-key": args.api_key, "user-agent": "benchmarks.load"}
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", headers=headers) as client:
+            for scenario in SCENARIOS:
+                if args.only and scenario.name not in args.only:
+                    continue
+                if scenario.export:
+                    stats = await drive(
+                        client, scenario, scale, EXPORT_REQUESTS, 1, args.seed, traced=1
+                    )
+                else:
+                    stats = await drive(
+                        client, scenario, scale, args.requests, args.concurrency, args.seed,
+                        warmup=args.warmup, traced=args.traced
+                    )
+                results["endpoints"][scenario.name] = stats
+                print(
+                    f"{scenario.name:26s} {stats['throughput_rps']:10,.0f} req/s"
+                    f"   p50 {stats['p50_ms']:8.2f}   p95 {stats['p95_ms']:8.2f}"
+                    f"   p99 {stats['p99_ms']:8.2f} ms   alloc {stats['peak_alloc_mb']:8.2f} MB"
+                    + (f"   {stats['errors']} errors" if stats["errors"] else "")
+                )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--requests", type=int, default=2_000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--warmup", type=int, default=50, help="Untimed requests per scenario")
+    parser.add_argument(
+        "--traced", type=int, default=200, help="Requests per scenario traced for memory"
+    )
+    parser.add_argument("--only", nargs="*", help="Scenario names to run")
+    parser.add_argument("--api-key", default=DEVELOPMENT_KEY)
+    parser.add_argument("--output")
+    parser.add_argument("--baseline")
+    parser.add_argument("--tolerance", type=float, default=0.10)
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2)
+    if args.baseline:
+        with open(args.baseline) as baseline:
+            regressed = compare(results, json.load(baseline), args.tolerance)
+        if regressed:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
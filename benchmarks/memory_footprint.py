@@ -0,0 +1,110 @@
+"""Memory used by the movie and viewing history tables in each layout.
+
+Usage: python -m benchmarks.memory_footprint [--movies N] [--history N]
+
+Each layout is loaded in its own subprocess and the growth of its peak
+resident set size is reported. The defaults (1M movies, 10M history rows)
+need several GB for the dict-of-models layout; pass smaller counts for a
+quick run.
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+from app.columnar import MovieTable, ViewingHistoryTable
+from app.schemas.movies import Movie
+from app.schemas.viewing_history import ViewingHistory, ViewingStatus
+
+GENRES = ["Drama", "Comedy", "Horror", "Action", "Documentary", "Animation", "Thriller"]
+STATUSES = list(ViewingStatus)
+
+
+def peak_rss_bytes() -> int:
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def make_movie(movie_id: int, now: datetime) -> Movie:
+    return Movie.model_construct(
+        created_at=now + timedelta(microseconds=movie_id),
+        updated_at=now + timedelta(microseconds=movie_id),
+        title=f"Movie title {movie_id}",
+        description=f"Plot summary for movie {movie_id}, with a few more words.",
+        imdb_id=f"tt{movie_id:07d}",
+        release_date=date(1950 + movie_id % 70, 1 + movie_id % 12, 1 + movie_id % 28),
+        genre=GENRES[movie_id % len(GENRES)],
+        director_id=1 + movie_id % 10_000,
+        runtime_minutes=80 + movie_id % 100,
+        id=movie_id,
+    )
+
+
+def make_history(history_id: int, movies: int, now: datetime) -> ViewingHistory:
+    return ViewingHistory.model_construct(
+        created_at=now + timedelta(microseconds=history_id),
+        updated_at=now + timedelta(microseconds=history_id),
+        movie_id=1 + history_id % movies,
+        status=STATUSES[history_id % len(STATUSES)],
+        current_minute=history_id % 120,
+        runtime_minutes=None,
+        notes=None,
+        id=history_id,
+    )
+
+
+def load(layout: str, movies: int, history: int) -> dict:
+    baseline = peak_rss_bytes()
+    if layout == "compact":
+        movie_table, history_table = MovieTable(), ViewingHistoryTable()
+    else:
+        movie_table, history_table = {}, {}
+
+    now = datetime.utcnow()
+    started = time.perf_counter()
+    for movie_id in range(1, movies + 1):
+        movie_table[movie_id] = make_movie(movie_id, now)
+    for history_id in range(1, history + 1):
+        history_table[history_id] = make_history(history_id, movies, now)
+    elapsed = time.perf_counter() - started
+
+    grown = peak_rss_bytes() - baseline
+    rows = movies + history
+    return {
+        "layout": layout,
+        "rows": rows,
+        "rss_mb": grown / 2**20,
+        "bytes_per_row": grown / rows,
+        "load_seconds": elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--movies", type=int, default=1_000_000)
+    parser.add_argument("--history", type=int, default=10_000_000)
+    parser.add_argument("--layout", choices=["dict", "compact"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.layout:
+        print(json.dumps(load(args.layout, args.movies, args.history)))
+        return
+
+    for layout in ("dict", "compact"):
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.memory_footprint",
+             "--movies", str(args.movies), "--history", str(args.history), "--layout", layout],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        result = json.loads(output)
+        print(
+            f"{result['layout']:>7}: {result['rss_mb']:9.1f} MB  "
+            f"{result['bytes_per_row']:7.1f} bytes/row  load {result['load_seconds']:.1f} s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""Latency of filtered and sorted movie pages, planned against scanned.
+
+Usage: python -m benchmarks.movie_queries [--scale small|medium|large] [--seed N]
+           [--queries N] [--baseline-queries N]
+
+Loads the movies of a seeded dataset (``benchmarks/datasets.py``) into a
+``DummyDatabase`` and times, for a range of ``read_movies`` queries, one
+50-row page as ``DummyDatabase.movie_ids`` plans it (first page, and a
+page 100 pages in resumed from its cursor) against the same page cut from
+filtering and sorting every movie, which is what serving the query without
+ordered indexes costs. Also reports how long building the ordered indexes
+takes and what adding and deleting a movie costs with them in place.
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import date
+from itertools import islice, takewhile
+
+from app.database import DummyDatabase
+from app.query import COLUMN_KEYS, MovieQuery, OrderedIndex
+
+from .datasets import SCALES, generate
+from .similar import percentile
+
+PAGE = 50
+DEEP_PAGES = 100
+
+
+def queries(db: DummyDatabase) -> list[tuple[str, MovieQuery]]:
+    """Queries from broad to narrow; the directors are picked from the data."""
+    by_size = sorted(db.movies_by_director, key=lambda director_id: len(db.movies_by_director[director_id]))
+    prolific, rare = by_size[-1], by_size[len(by_size) // 2]
+    nineties = {"released_from": date(1990, 1, 1), "released_to": date(1999, 12, 31)}
+    return [
+        ("newest first", MovieQuery(sort="-release_date")),
+        ("1990s by date", MovieQuery(**nineties, sort="release_date")),
+        ("drama 90-100 min", MovieQuery(genre="drama", min_runtime=90, max_runtime=100, sort="-runtime_minutes")),
+        ("prolific director", MovieQuery(director_id=prolific, released_from=date(2000, 1, 1))),
+        ("rare director", MovieQuery(director_id=rare, sort="-release_date")),
+        ("two ranges", MovieQuery(released_from=date(1950, 1, 1), released_to=date(1955, 12, 31), max_runtime=75)),
+        ("comedy, longest", MovieQuery(genre="comedy", sort="-runtime_minutes")),
+    ]
+
+
+def page(db: DummyDatabase, query: MovieQuery, after=None, after_key=None) -> list[int]:
+    return list(islice(db.movie_ids(query, after, after_key, PAGE + 1), PAGE + 1))
+
+
+def scanned_page(db: DummyDatabase, query: MovieQuery) -> list[int]:
+    column, descending = query.order
+    if column == "id":
+        def key(movie):
+            return movie.id
+    else:
+        column_key = COLUMN_KEYS[column]
+
+        def key(movie):
+            return column_key(movie), movie.id
+    rows = sorted((movie for movie in db.movies.values() if query.matches(movie)), key=key, reverse=descending)
+    return [movie.id for movie in rows[:PAGE + 1]]
+
+
+def cursor_after(db: DummyDatabase, query: MovieQuery, pages: int):
+    """``(after, after_key)`` of the page ``pages`` pages in, or ``None`` if there are fewer."""
+    ids = list(islice(db.movie_ids(query), pages * PAGE))
+    if len(ids) < pages * PAGE:
+        return None
+    column = query.order[0]
+    return ids[-1], None if column == "id" else db.movie_key(column, ids[-1])
+
+
+def timed(call, runs: int) -> list[float]:
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        call()
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def index_bytes(index: OrderedIndex) -> int:
+    return (
+        sum(sys.getsizeof(block) for block in index.blocks)
+        + sys.getsizeof(index.blocks) + sys.getsizeof(index.maxes) + sys.getsizeof(index.keys)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", choices=sorted(SCALES), default="medium")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--baseline-queries", type=int, default=5)
+    args = parser.parse_args()
+
+    scale = SCALES[args.scale]
+    db = DummyDatabase()
+    started = time.perf_counter()
+    rows = takewhile(lambda item: item[0] in ("directors", "movies"), generate(scale, args.seed))
+    for table, row in rows:
+        db.insert(table, row)
+    print(f"loaded {len(db.movies):,} movies in {time.perf_counter() - started:.1f}s, indexes included")
+
+    for column, key in COLUMN_KEYS.items():
+        index = OrderedIndex()
+        started = time.perf_counter()
+        for movie in db.movies.values():
+            index.add(key(movie), movie.id)
+        print(
+            f"  {column} index: built in {time.perf_counter() - started:.2f}s,"
+            f" {index_bytes(index) / (1 << 20):,.1f} MB"
+        )
+
+    print(f"{'query':20s} {'rows':>9s} {'first p50':>10s} {'p99':>9s} {'deep p50':>9s} {'scanned':>10s}  (ms)")
+    for name, query in queries(db):
+        assert page(db, query) == scanned_page(db, query), name
+        matching = sum(1 for _ in db.movie_ids(query))
+        first = timed(lambda: page(db, query), args.queries)
+        cursor = cursor_after(db, query, DEEP_PAGES)
+        deep = timed(lambda: page(db, query, *cursor), args.queries) if cursor else None
+        scanned = timed(lambda: scanned_page(db, query), args.baseline_queries)
+        print(
+            f"{name:20s} {matching:9,d} {percentile(first, 0.50) * 1e3:10.3f}"
+            f" {percentile(first, 0.99) * 1e3:9.3f}"
+            + (f" {percentile(deep, 0.50) * 1e3:9.3f}" if deep else f" {'-':>9s}")
+            + f" {percentile(scanned, 0.50) * 1e3:10.1f}"
+        )
+
+    rng = random.Random(args.seed)
+    movies = rng.sample(list(db.movies.values()), min(args.queries, len(db.movies)))
+    first_new = max(db.movies) + 1
+    new_movies = [
+        movie.model_copy(update={"id": first_new + n}) for n, movie in enumerate(movies)
+    ]
+    new_ids = [movie.id for movie in new_movies]
+    adds = timed(lambda: db.insert("movies", new_movies.pop()), len(new_movies))
+    deletes = timed(lambda: db.delete("movies", new_ids.pop()), len(new_ids))
+    print(
+        f"add movie p50 {percentile(adds, 0.50) * 1e6:,.1f} us, p99 {percentile(adds, 0.99) * 1e6:,.1f} us;"
+        f" delete p50 {percentile(deletes, 0.50) * 1e6:,.1f} us, p99 {percentile(deletes, 0.99) * 1e6:,.1f} us"
+    )
+
+
+if __name__ == "__main__":
+    main()
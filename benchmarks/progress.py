@@ -0,0 +1,174 @@
+"""Writes and memory saved by coalescing viewing progress reports.
+
+Usage: python -m benchmarks.progress [--scale small|medium|large] [--seed N]
+           [--viewers N] [--movies-per-viewer N] [--events N] [--concurrency C]
+           [--flush-interval SECONDS] [--warmup N]
+
+Needs httpx, from ``requirements-dev.txt``.
+
+Loads a seeded dataset (``benchmarks/datasets.py``), then replays the same
+synthetic stream of progress reports (N viewers, each watching a few
+movies and reporting their minute again and again) two ways:
+
+* ``put``: ``PUT /viewing-history/progress``, merged per (viewer, movie)
+  and written every ``--flush-interval`` seconds;
+* ``post``: one ``POST /viewing-history/`` per report, a new row each time.
+
+Reported per way: throughput, p99 latency, row writes reaching the store
+per report (the write amplification), rows added to the table, and the
+Python memory allocated at the peak and still held afterwards
+(tracemalloc, which also slows both ways down; compare them with each
+other).
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+import tracemalloc
+
+# Per-request access logging would dominate the measurements
+os.environ.setdefault("MOVIE_DB_ACCESS_LOG", "off")
+
+import httpx
+
+from app.api_keys import DEVELOPMENT_KEY
+from app.progress import progress_buffer
+
+from .datasets import SCALES, load
+from .load import percentile
+
+
+class WriteCounter:
+    """Repository listener counting the viewing history rows written."""
+
+    def __init__(self):
+        self.rows = 0
+
+    async def rebuild(self, db):
+        pass
+
+    def on_put(self, table: str, rows: list):
+        if table == "viewing_history":
+            self.rows += len(rows)
+
+    def on_delete(self, table: str, row):
+        pass
+
+
+def progress_reports(count: int, viewers: int, movies_per_viewer: int, movies: int, seed: int) -> list[dict]:
+    """``count`` reports, each moving a random session on by one minute."""
+    rng = random.Random(seed)
+    minutes: dict[int, int] = {}
+    reports = []
+    for _ in range(count):
+        session = rng.randrange(viewers * movies_per_viewer)
+        minutes[session] = minutes.get(session, 0) + 1
+        reports.append({
+            "viewer_id": f"viewer-{session // movies_per_viewer}",
+            # Spread the sessions over the catalogue, deterministically
+            "movie_id": 1 + session * 7919 % movies,
+            "status": "in_progress",
+            "current_minute": minutes[session],
+        })
+    return reports
+
+
+async def replay(client: httpx.AsyncClient, method: str, path: str, reports: list[dict], concurrency: int) -> dict:
+    latencies: list[float] = []
+    errors = 0
+    position = 0
+
+    async def client_loop():
+        nonlocal errors, position
+        while position < len(reports):
+            body = reports[position]
+            position += 1
+            started = time.perf_counter()
+            response = await client.request(method, path, json=body)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                errors += 1
+            # In process a request can finish without ever suspending, which
+            # would keep the flush timer from running until the end
+            await asyncio.sleep(0)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "throughput_rps": len(latencies) / elapsed,
+        "p99_ms": percentile(latencies, 0.99) * 1e3,
+        "errors": errors,
+    }
+
+
+async def run(args):
+    from app.dependencies import repository
+    from app.main import app
+
+    scale = SCALES[args.scale]
+    await repository.open()
+    await load(repository, scale, seed=args.seed)
+    await repository.close()
+
+    reports = progress_reports(args.events, args.viewers, args.movies_per_viewer, scale.movies, args.seed)
+    ways = [
+        ("put", "PUT", "/viewing-history/progress"),
+        ("post", "POST", "/viewing-history/"),
+    ]
+    progress_buffer.flush_interval = args.flush_interval
+    counter = WriteCounter()
+    sessions = args.viewers * args.movies_per_viewer
+    print(
+        f"{args.events:,} reports from {sessions:,} (viewer, movie) sessions, "
+        f"flushed every {args.flush_interval}s"
+    )
+    print(f"{'way':5s} {'req/s':>9s} {'p99 ms':>8s} {'writes':>9s} {'per report':>11s} {'rows added':>11s}"
+          f" {'kept KB':>10s} {'peak KB':>10s}")
+
+    transport = httpx.ASGITransport(app=app)
+    headers = {"api-key": DEVELOPMENT_KEY, "user-agent": "benchmarks.progress"}
+    tracemalloc.start()
+    async with app.router.lifespan_context(app):
+        await repository.watch(counter)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", headers=headers) as client:
+            # Untimed, since the first writes after loading pay for warming up
+            await replay(client, "POST", "/viewing-history/", reports[:args.warmup], args.concurrency)
+            for name, method, path in ways:
+                rows_before = await repository.count("viewing_history")
+                writes_before = counter.rows
+                memory_before = tracemalloc.get_traced_memory()[0]
+                tracemalloc.reset_peak()
+                stats = await replay(client, method, path, reports, args.concurrency)
+                await progress_buffer.flush()
+                writes = counter.rows - writes_before
+                rows_added = await repository.count("viewing_history") - rows_before
+                memory, peak = (value - memory_before for value in tracemalloc.get_traced_memory())
+                print(
+                    f"{name:5s} {stats['throughput_rps']:9,.0f} {stats['p99_ms']:8.2f}"
+                    f" {writes:9,d} {writes / args.events:11.3f} {rows_added:11,d}"
+                    f" {memory / 1024:10,.0f} {peak / 1024:10,.0f}"
+                    + (f"   {stats['errors']} errors" if stats["errors"] else "")
+                )
+    tracemalloc.stop()
+    print(f"buffer: {progress_buffer.stats()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--viewers", type=int, default=200)
+    parser.add_argument("--movies-per-viewer", type=int, default=2)
+    parser.add_argument("--events", type=int, default=20_000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--flush-interval", type=float, default=2.0)
+    parser.add_argument("--warmup", type=int, default=200, help="Untimed reports sent first")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
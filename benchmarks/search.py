@@ -0,0 +1,108 @@
+"""Indexing throughput and query latency of the full-text search index.
+
+Usage: python -m benchmarks.search [--documents N] [--queries N]
+
+Indexes synthetic movies whose words follow a Zipf-like distribution (a
+few very common words, a long tail of rare ones), then times single-word,
+multi-word and prefix queries against the index. Run with
+``--documents 1000000`` to see that common words stay cheap as the
+catalog grows.
+"""
+import argparse
+import random
+import resource
+import statistics
+import sys
+import time
+from datetime import date
+from itertools import accumulate
+
+from app.schemas.movies import Movie
+from app.search import SearchIndex
+
+VOCABULARY_SIZE = 50_000
+
+
+def make_words(rng: random.Random) -> list[str]:
+    alphabet = "abcdefghijklmnopqrstuvwxyz"
+    words = set()
+    while len(words) < VOCABULARY_SIZE:
+        words.add("".join(rng.choices(alphabet, k=rng.randint(3, 10))))
+    return sorted(words)
+
+
+def make_movies(count: int, words: list[str], rng: random.Random):
+    cum_weights = list(accumulate(1 / rank for rank in range(1, len(words) + 1)))
+    for movie_id in range(1, count + 1):
+        text = rng.choices(words, cum_weights=cum_weights, k=40)
+        yield Movie.model_construct(
+            id=movie_id,
+            title=" ".join(text[:4]),
+            description=" ".join(text[4:]),
+            imdb_id=f"tt{movie_id:08d}",
+            release_date=date(2000, 1, 1),
+            genre="Drama",
+            director_id=1,
+            runtime_minutes=100,
+        )
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / 1024
+
+
+def percentile(samples: list[float], fraction: float) -> float:
+    return sorted(samples)[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+def time_queries(index: SearchIndex, queries: list[str]) -> list[float]:
+    timings = []
+    for query in queries:
+        started = time.perf_counter()
+        index.search(query, limit=25)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--documents", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    words = make_words(rng)
+    rss_before = peak_rss_mb()
+
+    # Documents are generated as they are indexed, so only the index stays
+    # in memory; only add() is timed
+    index = SearchIndex()
+    elapsed = 0.0
+    for movie in make_movies(args.documents, words, rng):
+        started = time.perf_counter()
+        index.add("movies", movie)
+        elapsed += time.perf_counter() - started
+    print(f"indexed {args.documents:,} documents in {elapsed:.2f}s ({args.documents / elapsed:,.0f} docs/s)")
+    print(f"vocabulary: {len(index.postings):,} terms; peak rss +{peak_rss_mb() - rss_before:,.0f} MB")
+
+    # Rare words are what users mostly type; the head words appear in
+    # nearly every document and are the worst case
+    tail = words[1000:]
+    suites = {
+        "rare word": [rng.choice(tail) for _ in range(args.queries)],
+        "two words": [f"{rng.choice(tail)} {rng.choice(tail)}" for _ in range(args.queries)],
+        "prefix": [rng.choice(tail)[:4] for _ in range(args.queries)],
+        "common word": [rng.choice(words[:20]) for _ in range(args.queries // 10 or 1)],
+    }
+    for name, queries in suites.items():
+        timings = time_queries(index, queries)
+        print(
+            f"{name:12s} p50 {statistics.median(timings) * 1e3:8.2f} ms"
+            f"   p99 {percentile(timings, 0.99) * 1e3:8.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Response serialization cost for a 50-item movie page.
+
+Usage: python -m benchmarks.serialization [--rounds N]
+
+Compares FastAPI's ``response_model`` path (validate, serialize, then
+``json.dumps`` in ``JSONResponse``) with the fast path that joins JSON
+bytes cached when each movie was stored, and checks both produce the
+same body.
+"""
+import argparse
+import asyncio
+import time
+from datetime import date
+from typing import List
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+from app.schemas.movies import Movie
+from app.utils.fast_json import json_array
+
+PAGE_SIZE = 50
+
+
+def make_page() -> list[Movie]:
+    return [
+        Movie(
+            id=movie_id,
+            title=f"Movie {movie_id}",
+            description="A long description of the plot " * 8,
+            imdb_id=f"tt{movie_id:07d}",
+            release_date=date(1990 + movie_id % 30, 1 + movie_id % 12, 1),
+            genre="Drama",
+            director_id=1 + movie_id % 17,
+            runtime_minutes=80 + movie_id % 90,
+        )
+        for movie_id in range(1, PAGE_SIZE + 1)
+    ]
+
+
+async def response_model_body(field, movies) -> bytes:
+    content = await serialize_response(field=field, response_content=movies)
+    return JSONResponse(content).body
+
+
+async def run(rounds: int):
+    movies = make_page()
+    field = create_model_field(name="Response_read_movies", type_=List[Movie], mode="serialization")
+    encoded = [movie.__pydantic_serializer__.to_json(movie) for movie in movies]
+
+    expected = await response_model_body(field, movies)
+    assert json_array(encoded) == expected, "fast path output differs"
+
+    started = time.perf_counter()
+    for _ in range(rounds):
+        await response_model_body(field, movies)
+    slow = (time.perf_counter() - started) / rounds
+
+    started = time.perf_counter()
+    for _ in range(rounds):
+        json_array(encoded)
+    fast = (time.perf_counter() - started) / rounds
+
+    print(f"response_model path: {slow * 1e6:8.1f} us per {PAGE_SIZE}-item page")
+    print(f"cached bytes path:   {fast * 1e6:8.1f} us per {PAGE_SIZE}-item page")
+    print(f"speedup:             {slow / fast:8.1f}x  ({len(expected)} bytes, identical)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=2000)
+    args = parser.parse_args()
+    asyncio.run(run(args.rounds))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Read throughput of the shared-memory store with 1..N reader processes.
+
+Usage: python -m benchmarks.shared_reads [--movies N] [--max-workers N] [--seconds S]
+
+Seeds an owner with synthetic movies, then starts 1, 2, ... ``--max-workers``
+reader processes that each fetch random movies and 50-movie pages straight
+from the mapped snapshot for ``--seconds``. Reads take no lock and share no
+state, so total throughput should grow with the number of workers until
+the machine runs out of cores (``os.cpu_count()`` is printed for that
+reason).
+
+That scaling is unverified: so far this has only run on a single core,
+where one worker already uses the whole CPU and more workers stay flat at
+about 21k reads/s with 100k movies.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+import time
+from datetime import date
+from pathlib import Path
+
+from fastapi import Response
+
+from app.database import DummyDatabase
+from app.query import MovieQuery
+from app.repositories.shared import SharedOwnerRepository, SharedReaderRepository
+from app.schemas.movies import Movie
+from app.utils.pagination import PageParams
+
+BATCH_SIZE = 1000
+PAGE_SIZE = 50
+
+
+def make_movies(count: int):
+    for movie_id in range(1, count + 1):
+        yield Movie(
+            id=movie_id,
+            title=f"Movie {movie_id}",
+            description="A long description of the plot " * 4,
+            imdb_id=f"tt{movie_id:07d}",
+            release_date=date(1990 + movie_id % 30, 1 + movie_id % 12, 1),
+            genre=("Drama", "Comedy", "Horror")[movie_id % 3],
+            director_id=1 + movie_id % 17,
+            runtime_minutes=80 + movie_id % 90,
+        )
+
+
+async def read_for(directory: Path, movies: int, seconds: float, start_at: float) -> int:
+    repository = SharedReaderRepository(directory)
+    await repository.open()
+    rng = random.Random(os.getpid())
+    reads = 0
+    while time.time() < start_at:
+        await asyncio.sleep(0.001)
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        for _ in range(100):
+            await repository.get_json("movies", rng.randint(1, movies))
+            page = PageParams(skip=0, limit=PAGE_SIZE, after=rng.randint(0, movies), response=Response())
+            await repository.list_movies_json(page, MovieQuery(genre="drama"))
+        reads += 200
+    await repository.close()
+    return reads
+
+
+def reader(directory, movies, seconds, start_at, results):
+    results.put(asyncio.run(read_for(directory, movies, seconds, start_at)))
+
+
+async def run(movies: int, max_workers: int, seconds: float):
+    directory = Path(tempfile.mkdtemp(prefix="movie-db-bench-"))
+    owner = SharedOwnerRepository(DummyDatabase(), directory, lock_file=None)
+    await owner.open()
+    batch = []
+    for movie in make_movies(movies):
+        batch.append(movie)
+        if len(batch) == BATCH_SIZE:
+            await owner.insert_many("movies", batch)
+            batch = []
+    if batch:
+        await owner.insert_many("movies", batch)
+    await owner._wait_published(owner.seq)
+    await owner.wait_compacted()
+    print(f"{movies} movies, {os.cpu_count()} cores")
+
+    context = multiprocessing.get_context("spawn")
+    baseline = None
+    for workers in range(1, max_workers + 1):
+        results = context.Queue()
+        start_at = time.time() + 2.0
+        processes = [
+            context.Process(target=reader, args=(directory, movies, seconds, start_at, results))
+            for _ in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        # The owner keeps serving its socket while the readers run
+        total = 0
+        for _ in processes:
+            total += await asyncio.to_thread(results.get)
+        for process in processes:
+            await asyncio.to_thread(process.join)
+        rate = total / seconds
+        baseline = baseline or rate
+        print(f"{workers:3d} workers  {rate:12,.0f} reads/s   x{rate / baseline:.2f}")
+
+    await owner.close()
+    shutil.rmtree(directory)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--movies", type=int, default=100_000)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    args = parser.parse_args()
+    asyncio.run(run(args.movies, args.max_workers, args.seconds))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Build time and query latency of the similar movies index.
+
+Usage: python -m benchmarks.similar [--watchlists N] [--movies N] [--queries N]
+
+Fills a ``SimilarMovies`` index with synthetic movies and watch lists
+(1 to ``--max-list`` movies each, popular movies far more often, like real
+watch lists), then times:
+
+* loading the incidence matrix, as at startup;
+* precomputing the top lists of every movie, which the background task
+  does after startup;
+* lookups of precomputed lists, which is what a request does;
+* computing one movie's list from the matrix, for a popular and a typical
+  movie (a dirty or never requested movie);
+* adding and deleting one watch list.
+"""
+import argparse
+import random
+import resource
+import sys
+import time
+from itertools import accumulate
+
+from app.recommendations import SimilarMovies
+
+GENRES = ["Drama", "Comedy", "Horror", "Action", "Documentary", "Animation", "Thriller"]
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / 1024
+
+
+def percentile(samples: list[float], fraction: float) -> float:
+    return sorted(samples)[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+def report(name: str, timings: list[float]):
+    print(
+        f"{name:28s} p50 {percentile(timings, 0.50) * 1e6:10,.1f} us"
+        f"   p99 {percentile(timings, 0.99) * 1e6:10,.1f} us"
+    )
+
+
+def make_lists(count: int, movies: int, max_list: int, rng: random.Random):
+    # Movie popularity falls off like 1 / rank
+    cumulative = list(accumulate(1 / rank for rank in range(1, movies + 1)))
+    ids = range(1, movies + 1)
+    for list_id in range(1, count + 1):
+        yield list_id, rng.choices(ids, cum_weights=cumulative, k=rng.randint(1, max_list))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--watchlists", type=int, default=1_000_000)
+    parser.add_argument("--movies", type=int, default=100_000)
+    parser.add_argument("--max-list", type=int, default=30)
+    parser.add_argument("--queries", type=int, default=1_000)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    index = SimilarMovies()
+    rss_before = peak_rss_mb()
+
+    started = time.perf_counter()
+    for movie_id in range(1, args.movies + 1):
+        director = 1 + int(rng.paretovariate(1.2)) % max(1, args.movies // 10)
+        index.add_movie(movie_id, director, rng.choice(GENRES))
+    entries = 0
+    for list_id, movie_ids in make_lists(args.watchlists, args.movies, args.max_list, rng):
+        index.add_list(list_id, movie_ids)
+        entries += len(movie_ids)
+    elapsed = time.perf_counter() - started
+    print(
+        f"loaded {args.movies:,} movies and {args.watchlists:,} watch lists ({entries:,} entries)"
+        f" in {elapsed:.1f}s, generation included; peak rss +{peak_rss_mb() - rss_before:,.0f} MB"
+    )
+
+    started = time.perf_counter()
+    dirty = len(index.dirty)
+    while index.dirty:
+        index.refresh(index.dirty.pop())
+    elapsed = time.perf_counter() - started
+    print(
+        f"precomputed {dirty:,} top lists in {elapsed:.1f}s ({dirty / elapsed:,.0f} movies/s);"
+        f" peak rss +{peak_rss_mb() - rss_before:,.0f} MB"
+    )
+
+    # Ids are ranked by popularity, so the low ones are the head
+    popular = [rng.randint(1, 10) for _ in range(min(args.queries, 100))]
+    typical = [rng.randint(1, args.movies) for _ in range(args.queries)]
+
+    def timed(call, arguments) -> list[float]:
+        timings = []
+        for argument in arguments:
+            started = time.perf_counter()
+            call(argument)
+            timings.append(time.perf_counter() - started)
+        return timings
+
+    report("lookup", timed(lambda movie_id: index.similar(movie_id, 10), typical))
+    report("compute, popular movie", timed(index.neighbours, popular))
+    report("compute, typical movie", timed(index.neighbours, typical))
+
+    new_lists = [
+        (args.watchlists + n, movie_ids)
+        for n, (_, movie_ids) in enumerate(make_lists(args.queries, args.movies, args.max_list, rng), 1)
+    ]
+    report("add watch list", timed(lambda item: index.add_list(*item), new_lists))
+    marked = len(index.dirty)
+    started = time.perf_counter()
+    while index.dirty:
+        index.refresh(index.dirty.pop())
+    print(f"{'recompute after adds':28s} {marked:,} movies in {time.perf_counter() - started:.2f}s")
+    report("delete watch list", timed(lambda item: index.remove_list(item[0]), new_lists))
+
+
+if __name__ == "__main__":
+    main()
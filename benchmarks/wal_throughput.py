@@ -0,0 +1,63 @@
+"""Write throughput of the write-ahead log in each durability mode.
+
+Usage: python -m benchmarks.wal_throughput [--writes N] [--concurrency C]
+
+Each of C concurrent writers appends a review-sized record and waits for
+it to be acknowledged, the same way a create handler does.
+"""
+import argparse
+import asyncio
+import tempfile
+import time
+
+from app.persistence import DURABILITY_MODES, WriteAheadLog
+from app.schemas.reviews import Review
+
+
+async def run_mode(mode: str, writes: int, concurrency: int) -> dict:
+    review = Review(id=1, rating=4, comment="Great pacing and cast", movie_id=1)
+    latencies = []
+
+    with tempfile.TemporaryDirectory() as directory:
+        wal = WriteAheadLog(directory, mode=mode)
+        wal.start(0)
+
+        async def writer(count: int):
+            for _ in range(count):
+                started = time.perf_counter()
+                lsn = wal.append({"op": "put", "table": "reviews", "data": review})
+                await wal.wait(lsn)
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        per_writer = writes // concurrency
+        await asyncio.gather(*(writer(per_writer) for _ in range(concurrency)))
+        wal.flush()
+        elapsed = time.perf_counter() - started
+        wal.close()
+
+    latencies.sort()
+    return {
+        "mode": mode,
+        "writes_per_second": len(latencies) / elapsed,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99)] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--writes", type=int, default=20_000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    args = parser.parse_args()
+
+    for mode in DURABILITY_MODES:
+        result = asyncio.run(run_mode(mode, args.writes, args.concurrency))
+        print(
+            f"{result['mode']:>6}: {result['writes_per_second']:>10.0f} writes/s  "
+            f"p50 {result['p50_ms']:.3f} ms  p99 {result['p99_ms']:.3f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+import os
+
+# Before the app is imported: keep the test output free of access log lines
+os.environ.setdefault("MOVIE_DB_ACCESS_LOG", "off")
+os.environ.setdefault("MOVIE_DB_BACKEND", "memory")
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.database import DummyDatabase
+from app.repositories import MemoryRepository, SharedOwnerRepository, SharedReaderRepository, SQLiteRepository
+from app.utils.cache import response_cache
+
+from .factories import HEADERS
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture(params=["memory", "sqlite", "shared"])
+async def repository(request, tmp_path):
+    """Each backend in turn, opened on an empty store.
+
+    ``shared`` is a reader worker, writing through an owner in the same
+    process that compacts its snapshots every few rows.
+    """
+    owner = None
+    if request.param == "memory":
+        repository = MemoryRepository(DummyDatabase())
+    elif request.param == "sqlite":
+        repository = SQLiteRepository(str(tmp_path / "movies.sqlite3"), pool_size=2)
+    else:
+        owner = SharedOwnerRepository(DummyDatabase(), tmp_path, None, publish_interval=0, compact_after=8)
+        await owner.open()
+        repository = SharedReaderRepository(tmp_path)
+    await repository.open()
+    yield repository
+    await repository.close()
+    if owner is not None:
+        await owner.close()
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """The app on an empty memory store, with the development key sent by default."""
+    from app.dependencies import repository
+    from app.main import app
+
+    monkeypatch.setattr(repository, "database", DummyDatabase())
+    monkeypatch.setattr(repository, "listeners", ())
+    monkeypatch.setattr(repository, "_sequences", None)
+    response_cache.clear()
+    with TestClient(app, headers=HEADERS) as client:
+        yield client
+    response_cache.clear()
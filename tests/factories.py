@@ -0,0 +1,68 @@
+"""Rows and request bodies for the tests."""
+from datetime import date
+
+from fastapi import Response
+
+from app.schemas.directors import Director
+from app.schemas.movies import Movie
+from app.schemas.reviews import Review
+from app.schemas.viewing_history import ViewingHistory, ViewingStatus
+from app.schemas.watchlists import WatchList
+from app.utils.pagination import PageParams
+
+HEADERS = {"api-key": "your-secret-key", "user-agent": "tests"}
+
+
+def director(director_id: int, name: str = "", bio: str = "") -> Director:
+    return Director(id=director_id, name=name or f"Director {director_id}", bio=bio or None)
+
+
+def movie(
+    movie_id: int,
+    director_id: int = 1,
+    genre: str = "Drama",
+    released: date = date(2000, 1, 1),
+    runtime: int = 100,
+    title: str = "",
+    description: str = "",
+) -> Movie:
+    return Movie(
+        id=movie_id,
+        title=title or f"Movie {movie_id}",
+        description=description or None,
+        imdb_id="tt%07d" % movie_id,
+        release_date=released,
+        genre=genre,
+        director_id=director_id,
+        runtime_minutes=runtime,
+    )
+
+
+def review(review_id: int, movie_id: int, rating: int | str = 4, comment: str = "") -> Review:
+    return Review(id=review_id, movie_id=movie_id, rating=rating, comment=comment or None)
+
+
+def watchlist(list_id: int, movie_ids: list[int]) -> WatchList:
+    return WatchList(id=list_id, name=f"List {list_id}", movie_ids=movie_ids)
+
+
+def history(history_id: int, movie_id: int, status: ViewingStatus = ViewingStatus.COMPLETED) -> ViewingHistory:
+    return ViewingHistory(id=history_id, movie_id=movie_id, status=status)
+
+
+def page(limit: int = 25, skip: int = 0, after=None, order: str = "id", after_key=None) -> PageParams:
+    return PageParams(skip, limit, after, Response(), order, after_key)
+
+
+def movie_body(number: int, director_id: int, genre: str = "Drama", **fields) -> dict:
+    """``POST /movies/`` body."""
+    return {
+        "title": f"Movie {number}",
+        "description": "A film about things",
+        "imdb_id": "tt%07d" % number,
+        "release_date": "2000-01-01",
+        "genre": genre,
+        "director_id": director_id,
+        "runtime_minutes": 100,
+        **fields,
+    }
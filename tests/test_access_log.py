@@ -0,0 +1,45 @@
+import io
+import json
+
+import pytest
+
+from app.access_log import AccessLog, redact_key
+
+
+def test_entries_are_written_as_json_lines(tmp_path):
+    path = tmp_path / "access.log"
+    log = AccessLog(str(path), flush_interval=0.01)
+    log.start()
+    for number in range(3):
+        log.record("GET", f"/movies/{number}", "tests", "your-secret-key")
+    log.close()
+
+    entries = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [entry["path"] for entry in entries] == ["/movies/0", "/movies/1", "/movies/2"]
+    assert entries[0]["method"] == "GET" and entries[0]["user_agent"] == "tests"
+    assert entries[0]["api_key"] == redact_key("your-secret-key")
+    assert "your-secret-key" not in path.read_text()
+    assert log.stats() == {"queued": 0, "written": 3, "dropped": 0}
+
+
+def test_a_full_queue_drops_entries_instead_of_blocking():
+    # Never started, so nothing drains the queue
+    log = AccessLog(io.StringIO(), capacity=2)
+    for _ in range(5):
+        log.record("GET", "/", "tests", "key")
+    assert log.stats() == {"queued": 2, "written": 0, "dropped": 3}
+
+
+def test_sampling_and_switching_off():
+    sampled = AccessLog(io.StringIO(), sample_rate=0.0)
+    sampled.record("GET", "/", "tests", "key")
+    off = AccessLog(None)
+    off.record("GET", "/", "tests", "key")
+    assert sampled.stats()["queued"] == off.stats()["queued"] == 0
+    with pytest.raises(ValueError):
+        AccessLog(sample_rate=1.5)
+
+
+def test_key_fingerprints_tell_keys_apart():
+    assert redact_key("one") == redact_key("one") != redact_key("two")
+    assert redact_key("one").startswith("key:")
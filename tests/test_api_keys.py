@@ -0,0 +1,79 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.api_keys import ApiKeyRegistry, VerificationCache
+from app.schemas.api_keys import ApiKeyCreate, ApiKeyScope
+
+from .factories import HEADERS
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_keys_verify_until_revoked(tmp_path):
+    registry = ApiKeyRegistry(str(tmp_path / "keys.jsonl"))
+    created = registry.create(ApiKeyCreate(tenant="tests", scopes=["write", "read"]))
+    assert created.scopes == [ApiKeyScope.READ, ApiKeyScope.WRITE]
+    assert created.api_key not in (tmp_path / "keys.jsonl").read_text()
+
+    assert (await registry.verify(created.api_key)).key_id == created.key_id
+    # Answered from the cache the second time
+    assert len(registry.cache) == 1
+    assert (await registry.verify(created.api_key)).tenant == "tests"
+    assert await registry.verify(created.api_key[:-1] + "?") is None
+    assert await registry.verify("unknown-key-value") is None
+
+    assert registry.revoke(created.key_id)
+    assert await registry.verify(created.api_key) is None
+    assert not registry.revoke(created.key_id)
+
+
+async def test_keys_are_stored_but_bootstrap_keys_are_not(tmp_path):
+    path = str(tmp_path / "keys.jsonl")
+    registry = ApiKeyRegistry(path)
+    created = registry.create(ApiKeyCreate(tenant="tests"))
+    registry.register("bootstrap-admin-key", "admin", list(ApiKeyScope), persist=False)
+
+    reloaded = ApiKeyRegistry(path)
+    reloaded.load()
+    assert [key.key_id for key in reloaded.list_keys()] == [created.key_id]
+    assert (await reloaded.verify(created.api_key)).scopes == [ApiKeyScope.READ]
+
+
+async def test_expired_keys_are_refused():
+    registry = ApiKeyRegistry()
+    registry.register("expired-key-value", "tests", [ApiKeyScope.READ], datetime.utcnow() - timedelta(seconds=1))
+    assert await registry.verify("expired-key-value") is None
+    # Same key id, the first eight characters
+    with pytest.raises(ValueError):
+        registry.register("expired-other", "tests", [ApiKeyScope.READ])
+    with pytest.raises(ValueError):
+        registry.register("short", "tests", [ApiKeyScope.READ])
+
+
+def test_verification_cache_is_bounded():
+    cache = VerificationCache(max_entries=2, ttl=60)
+    for number in range(3):
+        cache.put(bytes([number]), f"key{number}")
+    assert len(cache) == 2 and cache.get(bytes([0])) is None
+    cache.evict_key("key1")
+    assert cache.get(bytes([1])) is None and cache.get(bytes([2])) == "key2"
+
+    expired = VerificationCache(ttl=0)
+    expired.put(b"digest", "key")
+    assert expired.get(b"digest") is None
+
+
+def test_scopes_are_enforced_per_method(client):
+    reader = client.post("/api-keys/", json={"tenant": "tests"}).json()
+    headers = dict(HEADERS, **{"api-key": reader["api_key"]})
+    try:
+        assert client.get("/directors/", headers=headers).status_code == 200
+        response = client.post("/directors/", json={"name": "Kelly Reichardt"}, headers=headers)
+        assert response.status_code == 403
+        assert response.json()["detail"] == "API key lacks the 'write' scope"
+        assert client.get("/api-keys/", headers=headers).status_code == 403
+        assert client.get("/directors/", headers=dict(HEADERS, **{"api-key": "wrong-key-value"})).status_code == 401
+    finally:
+        assert client.delete(f"/api-keys/{reader['key_id']}").status_code == 204
+    assert client.get("/directors/", headers=headers).status_code == 401
@@ -0,0 +1,57 @@
+import pytest
+
+from app.schemas.batch import MAX_BATCH_IDS
+
+from .factories import movie_body
+
+
+def _catalog(client) -> tuple[int, list[int]]:
+    director_id = client.post("/directors/", json={"name": "Hirokazu Kore-eda"}).json()["id"]
+    movie_ids = [client.post("/movies/", json=movie_body(number, director_id)).json()["id"] for number in range(3)]
+    return director_id, movie_ids
+
+
+def test_rows_come_back_in_the_requested_order(client):
+    _, (first, _, third) = _catalog(client)
+    response = client.get("/movies/batch", params={"ids": f"{third},999,{first},{third}"})
+    assert response.status_code == 200
+    body = response.json()
+    assert [movie["id"] for movie in body["items"]] == [third, first]
+    assert body["missing"] == [999]
+
+
+@pytest.mark.parametrize("resource", ["directors", "movies", "reviews", "watchlists", "viewing-history"])
+def test_every_resource_has_batch_lookups(client, resource):
+    director_id, movie_ids = _catalog(client)
+    created = {
+        "directors": lambda: director_id,
+        "movies": lambda: movie_ids[0],
+        "reviews": lambda: client.post("/reviews/", json={"rating": 3, "movie_id": movie_ids[0]}).json()["id"],
+        "watchlists": lambda: client.post("/watchlists/", json={"name": "Later", "movie_ids": movie_ids}).json()["id"],
+        "viewing-history": lambda: client.post(
+            "/viewing-history/", json={"movie_id": movie_ids[1], "status": "completed"}
+        ).json()["id"],
+    }[resource]()
+
+    by_query = client.get(f"/{resource}/batch", params={"ids": f"{created},12345"}).json()
+    by_body = client.post(f"/{resource}/batch", json={"ids": [created, 12345]}).json()
+    assert by_query == by_body
+    assert [row["id"] for row in by_query["items"]] == [created]
+    assert by_query["missing"] == [12345]
+
+
+def test_fields_and_includes_apply_to_batches(client):
+    director_id, movie_ids = _catalog(client)
+    body = client.post(
+        "/movies/batch?fields=id&include=director", json={"ids": movie_ids[:2]}
+    ).json()
+    assert body["items"] == [
+        {"id": movie_id, "director": body["items"][0]["director"]} for movie_id in movie_ids[:2]
+    ]
+    assert body["items"][0]["director"]["id"] == director_id
+
+
+def test_bad_batches_are_rejected(client):
+    assert client.get("/movies/batch", params={"ids": "1,two"}).status_code == 400
+    assert client.get("/movies/batch", params={"ids": ","}).status_code == 400
+    assert client.post("/movies/batch", json={"ids": list(range(MAX_BATCH_IDS + 1))}).status_code == 422
@@ -0,0 +1,62 @@
+import json
+
+import pytest
+
+from app.utils.bulk import MAX_LINE_BYTES, ndjson_batches
+
+from .factories import movie_body
+
+pytestmark = pytest.mark.anyio
+
+
+async def _chunks(*chunks: bytes):
+    for chunk in chunks:
+        yield chunk
+
+
+async def _lines(*chunks: bytes, batch_size: int = 2) -> list:
+    return [batch async for batch in ndjson_batches(_chunks(*chunks), batch_size)]
+
+
+async def test_lines_split_across_chunks_are_joined():
+    assert await _lines(b'{"a"', b': 1}\n\n{"b": 2}\n{"c"', b": 3}") == [
+        [(1, b'{"a": 1}'), (3, b'{"b": 2}')],
+        [(4, b'{"c": 3}')],
+    ]
+
+
+async def test_oversized_lines_come_back_empty():
+    batches = await _lines(b"x" * (MAX_LINE_BYTES + 1), b"\n{}\n", batch_size=10)
+    assert batches == [[(1, None), (2, b"{}")]]
+    assert await _lines(b"{}\n", b"y" * (MAX_LINE_BYTES + 1)) == [[(1, b"{}"), (2, None)]]
+
+
+def _ndjson(*rows) -> str:
+    return "\n".join(row if isinstance(row, str) else json.dumps(row) for row in rows) + "\n"
+
+
+def test_bulk_import_inserts_valid_rows_and_reports_the_rest(client):
+    director_id = client.post("/directors/", json={"name": "Wong Kar-wai"}).json()["id"]
+    body = _ndjson(
+        movie_body(1, director_id),
+        movie_body(2, 9999),
+        "{not json",
+        movie_body(3, director_id, runtime_minutes=-5),
+        movie_body(4, director_id),
+    )
+
+    response = client.post("/movies/bulk", content=body, headers={"content-type": "application/x-ndjson"})
+    assert response.status_code == 200
+    result = response.json()
+    assert (result["inserted"], result["failed"]) == (2, 3)
+    errors = {error["line"]: error["error"] for error in result["errors"]}
+    assert sorted(errors) == [2, 3, 4]
+    assert errors[2] == "Director not found"
+    assert errors[4].startswith("runtime_minutes")
+    assert [movie["title"] for movie in client.get("/movies/").json()] == ["Movie 1", "Movie 4"]
+
+
+def test_bulk_imported_rows_get_fresh_ids(client):
+    client.post("/directors/bulk", content=_ndjson({"name": "Lucrecia Martel"}, {"name": "Claire Denis"}))
+    first = client.post("/directors/", json={"name": "Chantal Akerman"}).json()["id"]
+    assert [row["id"] for row in client.get("/directors/").json()] == [first - 2, first - 1, first]
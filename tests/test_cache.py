@@ -0,0 +1,71 @@
+from fastapi import Request
+
+from app.utils.cache import ResponseCache
+
+from .factories import movie_body
+
+
+def _request(path: str, query: str = "") -> Request:
+    return Request({"type": "http", "path": path, "query_string": query.encode(), "headers": []})
+
+
+def test_repeated_reads_revalidate_with_the_etag(client):
+    director = client.post("/directors/", json={"name": "Chantal Akerman"}).json()
+    client.post("/movies/", json=movie_body(1, director["id"]))
+
+    first = client.get("/movies/")
+    etag = first.headers["etag"]
+    assert client.get("/movies/").json() == first.json()
+    unchanged = client.get("/movies/", headers={"if-none-match": etag})
+    assert unchanged.status_code == 304
+    assert unchanged.headers["etag"] == etag
+
+    client.post("/movies/", json=movie_body(2, director["id"]))
+    changed = client.get("/movies/", headers={"if-none-match": etag})
+    assert changed.status_code == 200
+    assert [row["id"] for row in changed.json()] == [1, 2]
+    assert changed.headers["etag"] != etag
+
+
+def test_director_filtered_pages_follow_the_director(client):
+    director = client.post("/directors/", json={"name": "Claire Denis"}).json()
+    assert client.get(f"/movies/?director_id={director['id']}").json() == []
+
+    client.delete(f"/directors/{director['id']}", headers={"role": "admin"})
+    assert client.get(f"/movies/?director_id={director['id']}").status_code == 404
+
+
+def test_query_parameter_order_does_not_matter():
+    cache = ResponseCache()
+    assert cache.key(_request("/movies/", "genre=drama&limit=5"), ("movies",)) == cache.key(
+        _request("/movies/", "limit=5&genre=drama"), ("movies",)
+    )
+
+
+def test_responses_built_during_a_write_are_never_served_after_it():
+    cache = ResponseCache()
+    request = _request("/movies/")
+    with cache.writing("movies"):
+        # A read racing the write caches what it saw under the open version
+        cache.put(cache.key(request, ("movies",)), b"[]", {})
+    assert cache.get(cache.key(request, ("movies",))) is None
+
+
+def test_writes_retire_the_versions_of_their_tables_only():
+    cache = ResponseCache()
+    request = _request("/reviews/")
+    cache.put(cache.key(request, ("reviews",)), b"[]", {})
+    with cache.writing("movies"):
+        pass
+    assert cache.get(cache.key(request, ("reviews",))).body == b"[]"
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = ResponseCache(max_entries=2)
+    for path in ("/a", "/b"):
+        cache.put(cache.key(_request(path), ()), path.encode(), {})
+    cache.get(cache.key(_request("/a"), ()))
+    cache.put(cache.key(_request("/c"), ()), b"/c", {})
+    assert cache.get(cache.key(_request("/b"), ())) is None
+    assert cache.get(cache.key(_request("/a"), ())).body == b"/a"
+
@@ -0,0 +1,72 @@
+import gzip
+
+import pytest
+
+from app.compression import Compression, _accepts_gzip
+
+from .factories import movie_body
+
+
+@pytest.mark.parametrize("header, accepted", [
+    ("gzip", True),
+    ("deflate, gzip;q=0.5", True),
+    ("*", True),
+    ("gzip;q=0", False),
+    ("identity", False),
+    ("br, deflate", False),
+])
+def test_accept_encoding_is_negotiated(header, accepted):
+    assert _accepts_gzip(header) is accepted
+    assert Compression(level=0).accepts(header) is False
+
+
+def test_compressed_bodies_are_deterministic():
+    settings = Compression(level=6, minimum_size=10)
+    body = b'{"title": "Movie"}' * 100
+    assert settings.compress(body) == settings.compress(body)
+    assert gzip.decompress(settings.compress(body)) == body
+    assert not settings.worth_compressing(b"{}")
+    with pytest.raises(ValueError):
+        Compression(level=10)
+
+
+def _catalog(client):
+    director_id = client.post("/directors/", json={"name": "Abbas Kiarostami"}).json()["id"]
+    for number in range(40):
+        client.post("/movies/", json=movie_body(number, director_id))
+
+
+def test_large_lists_are_gzipped_for_clients_that_accept_it(client):
+    _catalog(client)
+    plain = client.get("/movies/?limit=40", headers={"accept-encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+
+    compressed = client.get("/movies/?limit=40", headers={"accept-encoding": "gzip"})
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert "accept-encoding" in compressed.headers["vary"].lower()
+    assert compressed.headers["etag"] == "W/" + plain.headers["etag"]
+    assert compressed.json() == plain.json()
+    assert int(compressed.headers["content-length"]) < len(plain.content)
+
+    revalidated = client.get(
+        "/movies/?limit=40",
+        headers={"accept-encoding": "gzip", "if-none-match": compressed.headers["etag"]},
+    )
+    assert revalidated.status_code == 304
+
+
+def test_small_bodies_are_sent_as_they_are(client):
+    director_id = client.post("/directors/", json={"name": "Jafar Panahi"}).json()["id"]
+    response = client.get(f"/movies/?director_id={director_id}", headers={"accept-encoding": "gzip"})
+    assert response.json() == []
+    assert "content-encoding" not in response.headers
+
+
+def test_streamed_exports_are_gzipped_chunk_by_chunk(client):
+    _catalog(client)
+    plain = client.get("/movies/export", headers={"accept-encoding": "identity"})
+    response = client.get("/movies/export", headers={"accept-encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert response.content == plain.content
+    assert len(plain.content.splitlines()) == 40
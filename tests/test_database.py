@@ -0,0 +1,121 @@
+import random
+from collections import defaultdict
+
+import pytest
+
+from app.database import DummyDatabase, SortedIdSet
+
+from .factories import director, history, movie, review, watchlist
+
+
+def _expected_indexes(database: DummyDatabase) -> dict:
+    """Every secondary index, rebuilt from the rows."""
+    indexes = {name: defaultdict(list) for name in (
+        "movies_by_director", "movies_by_genre", "reviews_by_movie", "history_by_movie", "watchlists_by_movie"
+    )}
+    for row in database.movies.values():
+        indexes["movies_by_director"][row.director_id].append(row.id)
+        indexes["movies_by_genre"][row.genre.casefold()].append(row.id)
+    for row in database.reviews.values():
+        indexes["reviews_by_movie"][row.movie_id].append(row.id)
+    for row in database.viewing_history.values():
+        indexes["history_by_movie"][row.movie_id].append(row.id)
+    for row in database.watchlists.values():
+        for movie_id in set(row.movie_ids):
+            indexes["watchlists_by_movie"][movie_id].append(row.id)
+    return {name: {key: sorted(ids) for key, ids in index.items()} for name, index in indexes.items()}
+
+
+def _assert_indexes_match(database: DummyDatabase):
+    for name, expected in _expected_indexes(database).items():
+        assert {key: list(ids) for key, ids in getattr(database, name).items()} == expected, name
+    for table in ("directors", "movies", "reviews", "watchlists", "viewing_history"):
+        assert list(database.ordered_ids[table]) == sorted(getattr(database, table))
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_indexes_follow_inserts_updates_and_deletes(seed):
+    rng = random.Random(seed)
+    database = DummyDatabase()
+    for director_id in range(1, 6):
+        database.insert("directors", director(director_id))
+    for _ in range(600):
+        movies = list(database.movies)
+        action = rng.random()
+        if action < 0.35 or not movies:
+            database.insert("movies", movie(
+                rng.randint(1, 60), rng.randint(1, 5), rng.choice(["Drama", "drama", "Comedy", "Horror"])
+            ))
+        elif action < 0.55:
+            database.insert("reviews", review(rng.randint(1, 100), rng.choice(movies)))
+        elif action < 0.65:
+            database.insert("viewing_history", history(rng.randint(1, 60), rng.choice(movies)))
+        elif action < 0.75:
+            database.insert("watchlists", watchlist(rng.randint(1, 10), rng.sample(movies, min(3, len(movies)))))
+        elif action < 0.9:
+            database.delete_many("movies", rng.sample(movies, min(2, len(movies))))
+        else:
+            table = rng.choice(["reviews", "viewing_history", "watchlists"])
+            if getattr(database, table):
+                database.delete(table, rng.choice(list(getattr(database, table))))
+    _assert_indexes_match(database)
+
+
+def test_deleting_a_movie_cascades_through_the_indexes():
+    database = DummyDatabase()
+    database.insert("directors", director(1))
+    database.insert("movies", movie(1))
+    database.insert("movies", movie(2))
+    database.insert("reviews", review(1, 1))
+    database.insert("viewing_history", history(1, 1))
+    database.insert("watchlists", watchlist(1, [1, 2]))
+
+    database.delete("movies", 1)
+    assert database.reviews == {} and database.viewing_history == {}
+    assert database.watchlists[1].movie_ids == [2]
+    assert database.reviews_for_movie(1) == [] and database.history_for_movie(1) == []
+    assert database.director_has_movies(1)
+    database.delete("movies", 2)
+    assert not database.director_has_movies(1)
+    assert "drama" not in database.movies_by_genre
+    _assert_indexes_match(database)
+
+
+def test_sorted_id_set_seeks_by_id():
+    ids = SortedIdSet([5, 1, 9, 3, 5])
+    assert list(ids) == [1, 3, 5, 9]
+    ids.add(4)
+    ids.discard(9)
+    ids.discard(42)
+    assert list(ids) == [1, 3, 4, 5]
+    assert 4 in ids and 9 not in ids
+    assert list(ids.iter_after(3)) == [4, 5]
+    assert list(ids.iter_before(4)) == [3, 1]
+    assert ids.slice_after(None, 1, 2) == [3, 4]
+    assert ids.slice_after(4, 0, 10) == [5]
+
+
+def test_sorted_id_set_matches_a_set_between_reads():
+    rng = random.Random(1)
+    ids, expected = SortedIdSet(), set()
+    for step in range(2000):
+        item_id = rng.randint(1, 200)
+        # Removed ids are re-added both before and after they are dropped
+        if rng.random() < 0.45:
+            ids.discard(item_id)
+            expected.discard(item_id)
+        else:
+            ids.add(item_id)
+            expected.add(item_id)
+        assert len(ids) == len(expected)
+        assert (item_id in ids) == (item_id in expected)
+        if step % 50 == 0:
+            assert list(ids) == sorted(expected)
+
+    # A walk already started keeps going over the ids it began with
+    walk = ids.iter_after(None)
+    first = next(walk)
+    ids.discard(first)
+    ids.discard(max(expected))
+    assert list(ids.iter_before(None)) == sorted(expected - {first, max(expected)}, reverse=True)
+    assert [first, *walk] == sorted(expected)
@@ -0,0 +1,55 @@
+import pytest
+
+from app.database import DummyDatabase
+from app.repositories import MemoryRepository
+from app.repositories.base import MODELS
+from benchmarks.datasets import Scale, generate, load
+from benchmarks.load import compare
+
+pytestmark = pytest.mark.anyio
+
+TINY = Scale(directors=5, movies=40, reviews=100, viewing_history=60, watchlists=8)
+
+
+def _dumps(seed: int) -> list:
+    return [(table, row.model_dump()) for table, row in generate(TINY, seed)]
+
+
+def test_a_seed_always_gives_the_same_rows():
+    assert _dumps(7) == _dumps(7)
+    assert _dumps(7) != _dumps(8)
+
+
+def test_rows_are_valid_and_reference_existing_rows():
+    rows = {table: {} for table in MODELS}
+    for table, row in generate(TINY, 3):
+        MODELS[table].model_validate(row.model_dump())
+        rows[table][row.id] = row
+    assert {table: len(found) for table, found in rows.items()} == TINY._asdict()
+    assert all(movie.director_id in rows["directors"] for movie in rows["movies"].values())
+    for table in ("reviews", "viewing_history"):
+        assert all(row.movie_id in rows["movies"] for row in rows[table].values())
+    assert all(set(row.movie_ids) <= set(rows["movies"]) for row in rows["watchlists"].values())
+
+
+async def test_loading_fills_every_table():
+    repository = MemoryRepository(DummyDatabase())
+    counts = await load(repository, TINY, 3)
+    assert counts == TINY._asdict()
+    for table, count in counts.items():
+        assert await repository.count(table) == count
+    assert await repository.next_id("movies") > TINY.movies
+
+
+def test_compare_flags_slower_endpoints(capsys):
+    baseline = {"endpoints": {
+        "get movie": {"throughput_rps": 1000, "p99_ms": 2.0},
+        "list movies": {"throughput_rps": 500, "p99_ms": 4.0},
+    }}
+    results = {"endpoints": {
+        "get movie": {"throughput_rps": 950, "p99_ms": 2.1},
+        "list movies": {"throughput_rps": 400, "p99_ms": 4.0},
+        "search": {"throughput_rps": 300, "p99_ms": 5.0},
+    }}
+    assert compare(results, baseline, 0.1) == ["list movies"]
+    assert "search" in capsys.readouterr().out
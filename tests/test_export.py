@@ -0,0 +1,44 @@
+import csv
+import io
+import json
+
+from .factories import movie_body
+
+
+def _catalog(client):
+    director = client.post("/directors/", json={"name": "Jane Campion"}).json()
+    for number in range(1, 301):
+        genre = "Drama" if number % 3 else "Comedy"
+        client.post("/movies/", json=movie_body(number, director["id"], genre))
+
+
+def test_ndjson_export_streams_every_row(client):
+    _catalog(client)
+    response = client.get("/movies/export")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert response.headers["content-disposition"] == 'attachment; filename="movies.ndjson"'
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["id"] for row in rows] == list(range(1, 301))
+
+
+def test_csv_export_has_a_header_and_one_line_per_row(client):
+    _catalog(client)
+    client.post("/watchlists/", json={"name": "Picks", "movie_ids": [1, 2]})
+    response = client.get("/movies/export?format=csv")
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert len(rows) == 300
+    assert rows[0]["title"] == "Movie 1"
+    assert rows[0]["director_id"] == "1"
+
+
+def test_movie_export_applies_the_list_filters(client):
+    _catalog(client)
+    response = client.get("/movies/export?genre=comedy")
+    ids = [json.loads(line)["id"] for line in response.text.splitlines()]
+    assert ids == list(range(3, 301, 3))
+
+
+def test_export_rejects_unknown_formats(client):
+    assert client.get("/directors/export?format=xml").status_code == 422
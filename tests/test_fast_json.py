@@ -0,0 +1,66 @@
+import pytest
+
+from app.dependencies import repository
+from app.utils.cache import response_cache
+
+from .factories import movie_body
+
+PATHS = [
+    "/directors/?limit=2",
+    "/movies/?limit=2",
+    "/movies/?genre=comedy",
+    "/movies/1",
+    "/reviews/",
+    "/reviews/1",
+    "/watchlists/",
+    "/viewing-history/",
+    "/viewing-history/movies/1",
+]
+
+
+def _catalog(client):
+    director_id = client.post("/directors/", json={"name": "Mira Nair"}).json()["id"]
+    client.post("/directors/", json={"name": "Deepa Mehta"})
+    client.post("/directors/", json={"name": "Ritwik Ghatak"})
+    for number, genre in enumerate(["Drama", "Comedy", "Drama"], 1):
+        client.post("/movies/", json=movie_body(number, director_id, genre))
+    client.post("/reviews/", json={"rating": "great", "comment": "Lovely colours", "movie_id": 1})
+    client.post("/viewing-history/", json={"movie_id": 1, "status": "completed"})
+    client.post("/watchlists/", json={"name": "Weekend", "movie_ids": [1, 2]})
+
+
+def _responses(client) -> list:
+    response_cache.clear()
+    return [
+        (response.status_code, response.json(), response.headers.get("x-next-cursor"))
+        for response in map(client.get, PATHS)
+    ]
+
+
+@pytest.fixture
+def fast_json(monkeypatch):
+    def switch_on():
+        monkeypatch.setattr(repository, "fast_json", True)
+        monkeypatch.setattr(repository.database, "encode_rows", True)
+    return switch_on
+
+
+def test_fast_responses_match_the_validated_ones(client, fast_json):
+    _catalog(client)
+    expected = _responses(client)
+    assert all(status == 200 for status, _, _ in expected)
+    fast_json()
+    assert _responses(client) == expected
+    # Movies 1 and 2 were served from their encoded rows
+    assert set(repository.database.encoded["movies"]) == {1, 2}
+
+
+def test_cached_encodings_follow_writes(client, fast_json):
+    fast_json()
+    _catalog(client)
+    assert client.get("/watchlists/").json()[0]["movie_ids"] == [1, 2]
+
+    client.delete("/movies/1")
+    response_cache.clear()
+    assert client.get("/watchlists/").json()[0]["movie_ids"] == [2]
+    assert client.get("/reviews/").json() == []
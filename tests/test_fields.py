@@ -0,0 +1,43 @@
+from app.utils.fields import EMBEDDED_REVIEWS
+
+from .factories import movie_body
+
+
+def _catalog(client) -> tuple[int, int]:
+    director_id = client.post("/directors/", json={"name": "Satyajit Ray"}).json()["id"]
+    movie_id = client.post("/movies/", json=movie_body(1, director_id)).json()["id"]
+    return director_id, movie_id
+
+
+def test_fields_keep_only_the_listed_fields(client):
+    _, movie_id = _catalog(client)
+    assert client.get("/movies/?fields=id,genre").json() == [{"id": movie_id, "genre": "Drama"}]
+    assert client.get(f"/movies/{movie_id}?fields=title").json() == {"title": "Movie 1"}
+
+    response = client.get("/movies/?fields=id,budget")
+    assert response.status_code == 400
+    assert "budget" in response.json()["detail"]
+
+
+def test_include_embeds_related_rows(client):
+    director_id, movie_id = _catalog(client)
+    client.post("/reviews/", json={"rating": 4, "comment": "Quietly great", "movie_id": movie_id})
+
+    [item] = client.get("/movies/?fields=id&include=director,rating_stats,reviews").json()
+    assert item["director"]["id"] == director_id
+    assert item["rating_stats"]["review_count"] == 1
+    assert [review["comment"] for review in item["reviews"]] == ["Quietly great"]
+    assert item["reviews_total"] == 1
+    assert client.get("/movies/?include=budget").status_code == 400
+
+
+def test_embedded_reviews_are_capped_to_the_newest(client):
+    _, movie_id = _catalog(client)
+    ids = [
+        client.post("/reviews/", json={"rating": 3, "movie_id": movie_id}).json()["id"]
+        for _ in range(EMBEDDED_REVIEWS + 5)
+    ]
+
+    item = client.get(f"/movies/{movie_id}?fields=id&include=reviews").json()
+    assert [review["id"] for review in item["reviews"]] == ids[::-1][:EMBEDDED_REVIEWS]
+    assert item["reviews_total"] == EMBEDDED_REVIEWS + 5
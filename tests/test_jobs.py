@@ -0,0 +1,79 @@
+import asyncio
+import time
+
+import pytest
+
+from app.database import DummyDatabase
+from app.jobs import JobRegistry
+from app.repositories import MemoryRepository
+from app.utils.bulk import BATCH_SIZE, bulk_delete
+
+from .factories import HEADERS, movie, movie_body
+
+pytestmark = pytest.mark.anyio
+
+
+def _finished(client, job: dict) -> dict:
+    for _ in range(200):
+        job = client.get(f"/jobs/{job['id']}").json()
+        if job["status"] in ("completed", "failed"):
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"Job still {job['status']}")
+
+
+def test_bulk_movie_delete_needs_the_admin_scope(client):
+    writer = client.post("/api-keys/", json={"tenant": "tests", "scopes": ["read", "write"]}).json()
+    headers = dict(HEADERS, **{"api-key": writer["api_key"]})
+    director_id = client.post("/directors/", json={"name": "Agnès Varda"}).json()["id"]
+    movie_id = client.post("/movies/", json=movie_body(1, director_id)).json()["id"]
+
+    response = client.request("DELETE", "/movies/", json={"ids": [movie_id]}, headers=headers)
+    assert response.status_code == 403
+    assert client.get(f"/movies/{movie_id}").status_code == 200
+
+    response = client.request("DELETE", "/movies/", json={"ids": [movie_id, 999]})
+    assert response.status_code == 202
+    job = _finished(client, response.json())
+    assert job["result"] == {"deleted": 1, "not_found": [999], "rejected": []}
+    assert client.get(f"/movies/{movie_id}").status_code == 404
+
+
+def test_bulk_director_delete_keeps_directors_with_movies(client):
+    busy = client.post("/directors/", json={"name": "Jacques Demy"}).json()["id"]
+    idle = client.post("/directors/", json={"name": "Chris Marker"}).json()["id"]
+    client.post("/movies/", json=movie_body(1, busy))
+
+    response = client.request("DELETE", "/directors/", json={"ids": [busy, idle, 999]})
+    job = _finished(client, response.json())
+    assert job["result"] == {"deleted": 1, "not_found": [999], "rejected": [busy]}
+    assert [row["id"] for row in client.get("/directors/").json()] == [busy]
+
+
+def test_single_director_delete_keeps_directors_with_movies(client):
+    busy = client.post("/directors/", json={"name": "Éric Rohmer"}).json()["id"]
+    idle = client.post("/directors/", json={"name": "Jean Eustache"}).json()["id"]
+    client.post("/movies/", json=movie_body(1, busy))
+
+    assert client.delete(f"/directors/{busy}").status_code == 400
+    assert client.delete(f"/directors/{idle}").status_code == 204
+    assert client.delete(f"/directors/{idle}").status_code == 404
+    assert [row["id"] for row in client.get("/directors/").json()] == [busy]
+
+
+async def test_bulk_deletes_let_other_tasks_run_between_batches():
+    repository = MemoryRepository(DummyDatabase())
+    total = 4 * BATCH_SIZE
+    await repository.insert_many("movies", [movie(n) for n in range(1, total + 1)])
+    registry = JobRegistry()
+    job = registry.start("delete_movies", total, lambda job: bulk_delete(
+        repository, "movies", list(range(1, total + 1)), job, tables=("movies",)
+    ))
+
+    seen = []
+    while job.processed < total:
+        seen.append(job.processed)
+        await asyncio.sleep(0)
+    await registry.close()
+    assert set(seen) >= {BATCH_SIZE, 2 * BATCH_SIZE, 3 * BATCH_SIZE}
+    assert job.result.deleted == total and await repository.count("movies") == 0
@@ -0,0 +1,38 @@
+import re
+
+from .factories import movie_body
+
+
+def _value(text: str, sample: str) -> float:
+    match = re.search(rf"^{re.escape(sample)} (\S+)$", text, re.MULTILINE)
+    return float(match.group(1)) if match else 0.0
+
+
+def test_scrapes_need_no_api_key(client):
+    director_id = client.post("/directors/", json={"name": "Ousmane Sembène"}).json()["id"]
+    client.post("/movies/", json=movie_body(1, director_id))
+    client.get("/movies/")
+    client.headers.clear()
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert _value(response.text, 'movie_db_table_rows{table="movies"}') == 1
+    assert _value(response.text, 'movie_db_requests_total{method="GET",route="/movies/",status="200"}') >= 1
+    assert 'movie_db_request_duration_seconds_count{method="GET",route="/movies/",phase="total"}' in response.text
+
+
+def test_requests_are_counted_by_status(client):
+    sample = 'movie_db_requests_total{method="GET",route="/movies/{movie_id}",status="404"}'
+    before = _value(client.get("/metrics").text, sample)
+    client.get("/movies/12345")
+    assert _value(client.get("/metrics").text, sample) == before + 1
+
+
+def test_a_metrics_token_is_required_once_set(client, monkeypatch):
+    monkeypatch.setenv("MOVIE_DB_METRICS_TOKEN", "scrape-secret")
+    client.headers.clear()
+
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"authorization": "Bearer wrong"}).status_code == 401
+    assert client.get("/metrics", headers={"authorization": "Bearer scrape-secret"}).status_code == 200
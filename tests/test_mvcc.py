@@ -0,0 +1,124 @@
+import random
+from contextlib import asynccontextmanager
+from datetime import date
+
+import pytest
+from fastapi import Request
+
+from app import dependencies
+
+from app.database import DummyDatabase
+from app.query import MovieQuery
+from app.repositories import MemoryRepository
+
+from .factories import director, movie, page, review
+
+pytestmark = pytest.mark.anyio
+
+QUERIES = [
+    MovieQuery(),
+    MovieQuery(genre="drama"),
+    MovieQuery(director_id=2),
+    MovieQuery(sort="-release_date"),
+    MovieQuery(min_runtime=90, max_runtime=140, sort="runtime_minutes"),
+]
+
+
+def _live(database: DummyDatabase) -> dict:
+    """What a reader sees now: rows, reviews, movie queries and the last id."""
+    return {
+        "movies": dict(database.movies),
+        "reviews": {movie_id: database.reviews_for_movie(movie_id) for movie_id in range(1, 41)},
+        "queries": [list(database.movie_ids(query)) for query in QUERIES],
+        "max_id": max(database.movies, default=0),
+    }
+
+
+def _seen(snapshot) -> dict:
+    """The same, read through a snapshot."""
+    return {
+        "movies": {row_id: snapshot.get("movies", row_id) for row_id in snapshot.ids_after("movies")},
+        "reviews": {movie_id: snapshot.reviews_for_movie(movie_id) for movie_id in range(1, 41)},
+        "queries": [list(snapshot.movie_ids(query)) for query in QUERIES],
+        "max_id": snapshot.max_id("movies"),
+    }
+
+
+def _write(database: DummyDatabase, rng: random.Random):
+    movies = list(database.movies)
+    if rng.random() < 0.6 or not movies:
+        database.insert("movies", movie(
+            rng.randint(1, 40),
+            rng.randint(1, 3),
+            rng.choice(["Drama", "Comedy"]),
+            date(1980 + rng.randint(0, 40), 1, 1),
+            rng.randint(80, 160),
+        ))
+    elif rng.random() < 0.5:
+        database.insert("reviews", review(rng.randint(1, 200), rng.choice(movies)))
+    else:
+        database.delete_many("movies", rng.sample(movies, min(3, len(movies))))
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_snapshots_keep_the_state_they_pinned(seed):
+    rng = random.Random(seed)
+    database = DummyDatabase()
+    for director_id in range(1, 4):
+        database.insert("directors", director(director_id))
+
+    readers = []
+    for step in range(300):
+        _write(database, rng)
+        if step % 25 == 0:
+            snapshot = database.snapshot()
+            readers.append((snapshot, _live(database)))
+        if readers and rng.random() < 0.02:
+            snapshot, _ = readers.pop(rng.randrange(len(readers)))
+            snapshot.release()
+        for snapshot, expected in readers[-2:]:
+            assert snapshot.count("movies") == len(expected["movies"])
+    for snapshot, expected in readers:
+        assert _seen(snapshot) == expected
+        assert snapshot.count("movies") == len(expected["movies"])
+
+    assert database.versions.stats()["undo_entries"] > 0
+    for snapshot, _ in readers:
+        snapshot.release()
+    assert database.versions.stats() == {"version": database.versions.version, "readers": 0, "undo_entries": 0}
+
+
+def test_nothing_is_kept_without_readers():
+    database = DummyDatabase()
+    for number in range(1, 20):
+        database.insert("movies", movie(number))
+    database.delete("movies", 3)
+    assert database.versions.stats()["undo_entries"] == 0
+
+
+async def test_a_request_reads_one_version_and_its_own_writes():
+    repository = MemoryRepository(DummyDatabase())
+    await repository.insert_many("movies", [movie(1), movie(2)])
+
+    async with repository.snapshot():
+        # Another request deletes a movie while this one is reading
+        repository.database.delete("movies", 1)
+        assert [row.id for row in await repository.list_movies(page())] == [1, 2]
+        assert await repository.count("movies") == 2
+
+        await repository.insert("movies", movie(3))
+        assert [row.id for row in await repository.list_movies(page())] == [2, 3]
+    assert repository.database.versions.stats()["undo_entries"] == 0
+
+
+@pytest.mark.parametrize("method, pinned", [("GET", True), ("DELETE", False)])
+async def test_only_reads_are_pinned_to_a_snapshot(monkeypatch, method, pinned):
+    repository = MemoryRepository(DummyDatabase())
+    await repository.insert("directors", director(1))
+    monkeypatch.setattr(dependencies, "repository", repository)
+
+    request = Request({"type": "http", "method": method, "headers": []})
+    async with asynccontextmanager(dependencies.get_db)(request) as db:
+        # Another request adds a movie while this one is authenticated
+        repository.database.insert("movies", movie(1, director_id=1))
+        assert await db.director_has_movies(1) is not pinned
@@ -0,0 +1,83 @@
+import pytest
+
+from app.database import DummyDatabase
+from app.persistence import DURABILITY_MODES, SNAPSHOT_FILE
+from app.repositories import MemoryRepository
+
+from .factories import director, movie, review
+
+pytestmark = pytest.mark.anyio
+
+
+async def _open(directory, **options) -> MemoryRepository:
+    repository = MemoryRepository(DummyDatabase(), data_dir=str(directory), **options)
+    await repository.open()
+    return repository
+
+
+def _rows(repository) -> dict:
+    return {
+        table: dict(getattr(repository.database, table))
+        for table in ("directors", "movies", "reviews")
+    }
+
+
+async def _write_catalog(repository):
+    await repository.reserve_ids("movies", 10)
+    await repository.insert_many("directors", [director(1), director(2)])
+    await repository.insert_many("movies", [movie(number, 1 + number % 2) for number in range(1, 11)])
+    await repository.insert("reviews", review(1, 3))
+    await repository.insert("movies", movie(4, 2, "Comedy"))
+    await repository.delete("movies", 7)
+    await repository.delete_many("directors", [99])
+
+
+@pytest.mark.parametrize("mode", DURABILITY_MODES)
+async def test_writes_survive_a_restart(tmp_path, mode):
+    repository = await _open(tmp_path, durability=mode)
+    await _write_catalog(repository)
+    expected = _rows(repository)
+    await repository.close()
+
+    reopened = await _open(tmp_path, durability=mode)
+    try:
+        assert _rows(reopened) == expected
+        assert reopened.database.movies[4].genre == "Comedy"
+        # Reserved ids are never handed out again
+        assert await reopened.reserve_ids("movies", 1) > 10
+    finally:
+        await reopened.close()
+
+
+async def test_snapshots_replace_the_log_they_cover(tmp_path):
+    repository = await _open(tmp_path, snapshot_every=5)
+    await _write_catalog(repository)
+    for number in range(11, 31):
+        await repository.insert("movies", movie(number))
+    expected = _rows(repository)
+    await repository.close()
+
+    assert (tmp_path / SNAPSHOT_FILE).exists()
+    assert len(list(tmp_path.glob("wal-*.log"))) <= 2
+    reopened = await _open(tmp_path)
+    try:
+        assert _rows(reopened) == expected
+    finally:
+        await reopened.close()
+
+
+async def test_a_torn_record_ends_the_replay(tmp_path):
+    repository = await _open(tmp_path, durability="fsync")
+    await repository.insert("directors", director(1))
+    await repository.insert("directors", director(2))
+    await repository.close()
+
+    [segment] = tmp_path.glob("wal-*.log")
+    with open(segment, "ab") as log:
+        log.write(b'0badc0de {"op":"put","table":"directors"')
+
+    reopened = await _open(tmp_path)
+    try:
+        assert sorted(reopened.database.directors) == [1, 2]
+    finally:
+        await reopened.close()
@@ -0,0 +1,131 @@
+import pytest
+
+from app.database import DummyDatabase
+from app.progress import ProgressBuffer
+from app.repositories import MemoryRepository
+from app.schemas.viewing_history import ViewingProgress, ViewingStatus
+
+from .factories import history, movie, movie_body
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def store():
+    repository = MemoryRepository(DummyDatabase())
+    await repository.insert_many("movies", [movie(1), movie(2)])
+    buffer = ProgressBuffer(flush_interval=60)
+    await repository.watch(buffer)
+    buffer.start(repository)
+    yield repository, buffer
+    await buffer.close()
+
+
+def _report(viewer: str, movie_id: int, minute: int, status=ViewingStatus.IN_PROGRESS) -> ViewingProgress:
+    return ViewingProgress(viewer_id=viewer, movie_id=movie_id, current_minute=minute, status=status)
+
+
+async def test_reports_of_a_viewer_coalesce_into_one_entry(store):
+    repository, buffer = store
+    for minute in range(10):
+        await buffer.update(repository, _report("ana", 1, minute))
+    await buffer.update(repository, _report("ben", 1, 3))
+    assert await repository.count("viewing_history") == 0
+
+    assert await buffer.flush() == 2
+    entries = await repository.history_for_movie(1)
+    assert [(entry.viewer_id, entry.current_minute) for entry in entries] == [("ana", 9), ("ben", 3)]
+    assert buffer.stats() == {"pending": 0, "received": 11, "written": 2, "flushes": 1}
+
+    # Later reports update the stored entry in place
+    await buffer.update(repository, _report("ana", 1, 80, ViewingStatus.COMPLETED))
+    await buffer.flush()
+    entries = await repository.history_for_movie(1)
+    assert len(entries) == 2 and entries[0].status == ViewingStatus.COMPLETED
+
+
+async def test_reads_see_waiting_reports(store):
+    repository, buffer = store
+    await repository.insert("viewing_history", history(50, 2))
+    await buffer.update(repository, _report("ana", 2, 12))
+
+    stored = await repository.history_for_movie(2)
+    seen = buffer.overlay(2, stored)
+    assert [entry.id for entry in stored] == [50]
+    assert [(entry.id == 50, entry.current_minute) for entry in seen] == [(True, None), (False, 12)]
+    assert buffer.staged(2) and not buffer.staged(1)
+
+
+async def test_entries_are_found_again_after_a_restart(store):
+    repository, buffer = store
+    await buffer.update(repository, _report("ana", 1, 5))
+    await buffer.flush()
+    [entry] = await repository.history_for_movie(1)
+
+    restarted = ProgressBuffer(flush_interval=60)
+    await restarted.rebuild(repository)
+    restarted.start(repository)
+    try:
+        await restarted.update(repository, _report("ana", 1, 6))
+        await restarted.flush()
+    finally:
+        await restarted.close()
+    assert [(row.id, row.current_minute) for row in await repository.history_for_movie(1)] == [(entry.id, 6)]
+
+
+async def test_deleting_a_movie_drops_its_waiting_reports(store):
+    repository, buffer = store
+    await buffer.update(repository, _report("ana", 1, 5))
+    await buffer.update(repository, _report("ana", 2, 5))
+    await repository.delete("movies", 1)
+
+    assert buffer.stats()["pending"] == 1
+    assert await buffer.flush() == 1
+    assert await repository.count("viewing_history") == 1
+    assert ("ana", 1) not in buffer.entries
+
+
+async def test_a_movie_deleted_during_a_flush_gets_no_entries(store, monkeypatch):
+    repository, buffer = store
+    monkeypatch.setattr("app.progress.FLUSH_BATCH", 1)
+    await buffer.update(repository, _report("ana", 1, 5))
+    await buffer.update(repository, _report("ana", 2, 5))
+
+    insert_many = repository.insert_many
+
+    async def insert_then_delete(table, rows):
+        await insert_many(table, rows)
+        # Another request deletes the second movie between batches
+        if await repository.exists("movies", 2):
+            await repository.delete("movies", 2)
+    monkeypatch.setattr(repository, "insert_many", insert_then_delete)
+
+    assert await buffer.flush() == 1
+    assert [entry.movie_id for entry in await repository.history_for_movie(1)] == [1]
+    assert await repository.count("viewing_history") == 1
+
+
+def test_progress_endpoint(client):
+    director_id = client.post("/directors/", json={"name": "Lynne Ramsay"}).json()["id"]
+    movie_id = client.post("/movies/", json=movie_body(1, director_id)).json()["id"]
+    body = {"viewer_id": "ana", "movie_id": movie_id, "current_minute": 10}
+    first = client.put("/viewing-history/progress", json=body).json()
+    second = client.put("/viewing-history/progress", json=dict(body, current_minute=11)).json()
+    assert first["id"] == second["id"] and second["current_minute"] == 11
+    assert [entry["current_minute"] for entry in client.get(f"/viewing-history/movies/{movie_id}").json()] == [11]
+    assert client.put("/viewing-history/progress", json=dict(body, movie_id=999)).status_code == 404
+
+
+def test_plain_entries_never_take_over_a_viewers_entry(client):
+    director_id = client.post("/directors/", json={"name": "Kelly Reichardt"}).json()["id"]
+    movie_id = client.post("/movies/", json=movie_body(1, director_id)).json()["id"]
+    kept = client.put("/viewing-history/progress", json={"viewer_id": "ana", "movie_id": movie_id}).json()
+
+    posted = client.post(
+        "/viewing-history/", json={"viewer_id": "ana", "movie_id": movie_id, "status": "completed"}
+    ).json()
+    assert posted["viewer_id"] is None
+    again = client.put(
+        "/viewing-history/progress", json={"viewer_id": "ana", "movie_id": movie_id, "current_minute": 5}
+    ).json()
+    assert again["id"] == kept["id"] != posted["id"]
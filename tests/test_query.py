@@ -0,0 +1,182 @@
+import json
+import random
+import sqlite3
+from datetime import date
+
+import pytest
+
+from app.database import DummyDatabase
+from app.query import COLUMN_KEYS, MovieQuery, OrderedIndex, entry
+from app.repositories import SQLiteRepository
+from app.utils.pagination import NEXT_CURSOR_HEADER
+
+from .factories import movie, movie_body, page
+
+pytestmark = pytest.mark.anyio
+
+
+def test_ordered_index_matches_a_sorted_list():
+    rng = random.Random(5)
+    # A small load so blocks split and empty out
+    index, keys = OrderedIndex(load=4), {}
+    for _ in range(600):
+        item_id = rng.randint(1, 120)
+        if rng.random() < 0.3:
+            index.discard(item_id)
+            keys.pop(item_id, None)
+        else:
+            keys[item_id] = rng.randint(0, 30)
+            index.add(keys[item_id], item_id)
+    ordered = sorted((key, item_id) for item_id, key in keys.items())
+    assert list(index.entries()) == [entry(key, item_id) for key, item_id in ordered]
+    assert len(index) == len(keys) and index.key(999) is None
+
+    for low, high in ((None, None), (5, 20), (None, 0), (25, None), (40, 50)):
+        inside = [(key, item_id) for key, item_id in ordered
+                  if (low is None or key >= low) and (high is None or key <= high)]
+        assert index.count(low, high) == len(inside)
+        assert list(index.walk(low, high)) == [item_id for _, item_id in inside]
+        assert list(index.walk(low, high, descending=True)) == [item_id for _, item_id in reversed(inside)]
+        # Resuming from any row continues with the one after it
+        for at in range(0, len(inside), 7):
+            position = entry(*inside[at])
+            assert list(index.walk(low, high, position)) == [item_id for _, item_id in inside[at + 1:]]
+            assert list(index.walk(low, high, position, True)) == [item_id for _, item_id in reversed(inside[:at])]
+
+
+def _catalog(rng: random.Random) -> DummyDatabase:
+    database = DummyDatabase()
+    for movie_id in rng.sample(range(1, 400), 250):
+        database.insert("movies", movie(
+            movie_id,
+            rng.randint(1, 5),
+            rng.choice(["Drama", "Comedy", "Horror"]),
+            date(1970 + rng.randint(0, 50), rng.randint(1, 12), 1),
+            rng.randint(60, 200),
+        ))
+    return database
+
+
+QUERIES = [
+    MovieQuery(),
+    MovieQuery(sort="-id"),
+    MovieQuery(genre="drama", director_id=3),
+    MovieQuery(director_id=2, sort="-id"),
+    MovieQuery(sort="-release_date"),
+    MovieQuery(released_from=date(1990, 1, 1), released_to=date(1999, 12, 1), sort="release_date"),
+    MovieQuery(min_runtime=90, max_runtime=140, sort="-release_date"),
+    MovieQuery(genre="horror", min_runtime=180, sort="runtime_minutes"),
+    MovieQuery(director_id=4, released_to=date(1975, 1, 1), sort="-runtime_minutes"),
+    MovieQuery(min_runtime=300),
+]
+
+
+def _expected(database: DummyDatabase, query: MovieQuery) -> list[int]:
+    column, descending = query.order
+    key = (lambda row: row.id) if column == "id" else (lambda row: (COLUMN_KEYS[column](row), row.id))
+    return [row.id for row in sorted(filter(query.matches, database.movies.values()), key=key, reverse=descending)]
+
+
+@pytest.mark.parametrize("limit", [5, None])
+def test_plans_match_a_full_scan_page_by_page(limit):
+    database = _catalog(random.Random(2))
+    for query in QUERIES:
+        column = query.order[0]
+        if limit is None:
+            assert list(database.movie_ids(query)) == _expected(database, query), query
+            continue
+        found, after, after_key = [], None, None
+        while True:
+            ids = page(limit, after=after).take(database.movie_ids(query, after, after_key, limit + 1))
+            found += ids
+            if len(ids) < limit:
+                break
+            after = ids[-1]
+            after_key = None if column == "id" else database.movie_key(column, after)
+        assert found == _expected(database, query), query
+
+    with pytest.raises(ValueError):
+        database.movie_ids(MovieQuery(sort="release_date"), after=3)
+
+
+def _key(row, column: str):
+    return row.id if column == "id" else COLUMN_KEYS[column](row)
+
+
+async def test_sorted_pages_resume_on_every_backend(repository):
+    rng = random.Random(4)
+    rows = [
+        movie(movie_id, 1, "Drama", date(2000 + rng.randint(0, 3), 1, 1), rng.choice([90, 100, 110]))
+        for movie_id in range(1, 31)
+    ]
+    await repository.insert_many("movies", rows)
+    database = DummyDatabase()
+    for row in rows:
+        database.insert("movies", row)
+
+    for query in (MovieQuery(sort="-release_date"), MovieQuery(min_runtime=95, sort="runtime_minutes")):
+        column = query.order[0]
+        found, last = [], None
+        while True:
+            request = page(4) if last is None else page(4, after=last.id, order=query.sort, after_key=_key(last, column))
+            listed = await repository.list_movies(request, query)
+            if not listed:
+                break
+            found += [row.id for row in listed]
+            last = listed[-1]
+        assert found == _expected(database, query)
+
+
+async def test_sqlite_fills_in_columns_missing_from_older_files(tmp_path):
+    path = str(tmp_path / "movies.sqlite3")
+    with sqlite3.connect(path) as connection:
+        connection.execute(
+            "CREATE TABLE movies (id INTEGER PRIMARY KEY, director_id INTEGER NOT NULL,"
+            " genre_key TEXT NOT NULL, data TEXT NOT NULL)"
+        )
+        for row in (movie(1, runtime=150), movie(2, released=date(2010, 5, 1), runtime=80)):
+            connection.execute(
+                "INSERT INTO movies VALUES (?, ?, ?, ?)",
+                (row.id, row.director_id, "drama", json.dumps(row.model_dump(mode="json"))),
+            )
+    connection.close()
+
+    repository = SQLiteRepository(path, pool_size=1)
+    await repository.open()
+    try:
+        latest = await repository.list_movies(page(), MovieQuery(sort="-release_date"))
+        short = await repository.list_movies(page(), MovieQuery(max_runtime=100))
+    finally:
+        await repository.close()
+    assert [row.id for row in latest] == [2, 1]
+    assert [row.id for row in short] == [2]
+
+
+def test_movie_list_sorts_and_filters_by_range(client):
+    director_id = client.post("/directors/", json={"name": "Chantal Akerman"}).json()["id"]
+    for number in range(9):
+        client.post("/movies/", json=movie_body(
+            number, director_id,
+            release_date=f"{2001 + number % 3}-01-01", runtime_minutes=80 + 10 * number,
+        ))
+
+    params = {"sort": "-release_date", "min_runtime": 90, "max_runtime": 150, "limit": 2}
+    seen, cursor = [], None
+    while True:
+        response = client.get("/movies/", params=params if cursor is None else dict(params, cursor=cursor))
+        assert response.status_code == 200
+        seen += [(row["release_date"], row["runtime_minutes"]) for row in response.json()]
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if cursor is None:
+            break
+    assert seen == [
+        # Ties on the date go by id, descending too
+        ("2003-01-01", 130), ("2003-01-01", 100),
+        ("2002-01-01", 150), ("2002-01-01", 120), ("2002-01-01", 90),
+        ("2001-01-01", 140), ("2001-01-01", 110),
+    ]
+
+    first = client.get("/movies/", params=params)
+    other_order = {"sort": "runtime_minutes", "cursor": first.headers[NEXT_CURSOR_HEADER]}
+    assert client.get("/movies/", params=other_order).status_code == 400
+    assert client.get("/movies/", params={"sort": "title"}).status_code == 422
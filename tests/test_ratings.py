@@ -0,0 +1,92 @@
+import random
+
+from app.ratings import RankedList, RatingAggregates
+
+from .factories import movie, movie_body, review
+
+
+def _aggregates(reviews_per_movie: dict[int, list[int]], genres: dict[int, str] = {}) -> RatingAggregates:
+    aggregates = RatingAggregates()
+    aggregates.on_put("movies", [movie(movie_id, genre=genres.get(movie_id, "Drama")) for movie_id in reviews_per_movie])
+    review_id = 0
+    for movie_id, ratings in reviews_per_movie.items():
+        for rating in ratings:
+            review_id += 1
+            aggregates.on_put("reviews", [review(review_id, movie_id, rating)])
+    return aggregates
+
+
+def _brute_force_top(reviews_per_movie, min_reviews, limit):
+    scored = [
+        (-sum(ratings) / len(ratings), -len(ratings), movie_id)
+        for movie_id, ratings in reviews_per_movie.items()
+        if len(ratings) >= min_reviews
+    ]
+    return [movie_id for _, _, movie_id in sorted(scored)[:limit]]
+
+
+def test_ranked_list_stays_sorted_across_block_splits():
+    ranked = RankedList(load=4)
+    rng = random.Random(7)
+    keys = [(-rng.randint(1, 5), -rng.randint(1, 9), movie_id) for movie_id in range(200)]
+    for key in keys:
+        ranked.add(key)
+    for key in keys[::3]:
+        ranked.remove(key)
+    ranked.remove((0, 0, 10_000))
+    expected = sorted(set(keys) - set(keys[::3]))
+    assert list(ranked) == expected
+    assert len(ranked) == len(expected)
+
+
+def test_summary_counts_numeric_and_text_ratings():
+    aggregates = _aggregates({1: [5, 4, 4]})
+    aggregates.on_put("reviews", [review(99, 1, "masterpiece")])
+    stats = aggregates.summary(1)
+    assert stats.review_count == 3
+    assert stats.average_rating == 13 / 3
+    assert stats.histogram == {1: 0, 2: 0, 3: 0, 4: 2, 5: 1}
+    assert stats.text_rating_count == 1
+    assert aggregates.summary(2).review_count == 0
+
+
+def test_top_matches_a_full_sort_for_every_threshold():
+    rng = random.Random(3)
+    reviews_per_movie = {
+        movie_id: [rng.randint(1, 5) for _ in range(rng.choice([1, 2, 3, 7, 16, 40]))]
+        for movie_id in range(1, 301)
+    }
+    aggregates = _aggregates(reviews_per_movie)
+    for min_reviews in (1, 2, 3, 4, 7, 8, 15, 16, 17, 40, 41):
+        found = [entry.movie_id for entry in aggregates.top(min_reviews=min_reviews, limit=20)]
+        assert found == _brute_force_top(reviews_per_movie, min_reviews, 20), min_reviews
+
+
+def test_top_by_genre_and_after_deletes():
+    aggregates = _aggregates({1: [5], 2: [4, 4], 3: [3, 5, 5]}, genres={1: "Drama", 2: "Comedy", 3: "drama"})
+    assert [entry.movie_id for entry in aggregates.top(genre="DRAMA")] == [1, 3]
+    assert [entry.movie_id for entry in aggregates.top(min_reviews=2)] == [3, 2]
+
+    aggregates.on_delete("reviews", review(1, 1, 5))
+    aggregates.on_delete("movies", movie(3))
+    assert [entry.movie_id for entry in aggregates.top()] == [2]
+    assert aggregates.top(genre="drama") == []
+    assert aggregates.ranked_by_genre.keys() == {"comedy"}
+    assert aggregates.top(min_reviews=4) == []
+
+
+def test_rating_stats_and_top_rated_endpoints(client):
+    director = client.post("/directors/", json={"name": "Mira Nair"}).json()
+    for number in (1, 2, 3):
+        client.post("/movies/", json=movie_body(number, director["id"], "Drama" if number < 3 else "Comedy"))
+    for movie_id, rating in ((1, 3), (1, 5), (2, 5), (3, 4), (3, "fine")):
+        client.post("/reviews/", json={"movie_id": movie_id, "rating": rating})
+
+    stats = client.get("/movies/1/rating-stats").json()
+    assert stats["average_rating"] == 4.0 and stats["review_count"] == 2
+    assert client.get("/movies/42/rating-stats").status_code == 404
+
+    top = client.get("/movies/top-rated").json()
+    assert [(row["movie"]["id"], row["average_rating"]) for row in top] == [(2, 5.0), (1, 4.0), (3, 4.0)]
+    top = client.get("/movies/top-rated?genre=drama&min_reviews=2").json()
+    assert [row["movie"]["id"] for row in top] == [1]
@@ -0,0 +1,98 @@
+import math
+import random
+from typing import Iterable
+
+import pytest
+
+from app.recommendations import SimilarMovies
+
+from .factories import movie_body
+
+
+def _brute_force(movies: dict, lists: dict, movie_id: int) -> list:
+    """Every other movie scored the way ``SimilarMovies`` documents it."""
+    holding = {movie: {list_id for list_id, members in lists.items() if movie in members} for movie in movies}
+    director, genre = movies[movie_id]
+    scored = []
+    for other, (other_director, other_genre) in movies.items():
+        shared = len(holding[movie_id] & holding[other])
+        same = other_director == director and other_genre == genre
+        if other == movie_id or not (shared or same):
+            continue
+        score = shared / math.sqrt(len(holding[movie_id]) * len(holding[other])) if shared else 0.0
+        score += 0.2 * (other_director == director) + 0.1 * (other_genre == genre)
+        scored.append((other, score, shared))
+    scored.sort(key=lambda item: (-item[1], -item[2], item[0]))
+    return scored
+
+
+def _random_catalog(rng: random.Random):
+    movies = {movie_id: (rng.randint(1, 4), rng.choice(["drama", "comedy"])) for movie_id in range(1, 61)}
+    lists = {list_id: rng.sample(sorted(movies), rng.randint(1, 8)) for list_id in range(1, 41)}
+    return movies, lists
+
+
+def _assert_matches(similar: SimilarMovies, movies: dict, lists: dict, movie_ids: Iterable[int]):
+    for movie_id in movie_ids:
+        ranked = _brute_force(movies, lists, movie_id)
+        expected = ranked[:similar.top_k]
+        got = similar.similar(movie_id, similar.top_k)
+        assert [score for _, score, _ in got] == pytest.approx([score for _, score, _ in expected])
+        # Neighbours with equal scores may come back in either order
+        for hit, wanted in zip(got, expected):
+            if not any(other[1] == pytest.approx(hit[1]) for other in ranked if other is not wanted):
+                assert hit == (wanted[0], pytest.approx(wanted[1]), wanted[2])
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_neighbours_match_brute_force(seed):
+    movies, lists = _random_catalog(random.Random(seed))
+    similar = SimilarMovies(top_k=5)
+    for movie_id, (director_id, genre) in movies.items():
+        similar.add_movie(movie_id, director_id, genre)
+    for list_id, members in lists.items():
+        similar.add_list(list_id, members)
+    _assert_matches(similar, movies, lists, movies)
+
+
+def test_dirty_movies_catch_up_with_writes():
+    rng = random.Random(9)
+    movies, lists = _random_catalog(rng)
+    similar = SimilarMovies(top_k=5)
+    for movie_id, (director_id, genre) in movies.items():
+        similar.add_movie(movie_id, director_id, genre)
+    for list_id, members in lists.items():
+        similar.add_list(list_id, members)
+    for movie_id in list(similar.dirty):
+        similar.refresh(movie_id)
+
+    for list_id in rng.sample(sorted(lists), 10):
+        similar.remove_list(list_id)
+        del lists[list_id]
+    for movie_id in rng.sample(sorted(movies), 5):
+        similar.remove_movie(movie_id)
+        del movies[movie_id]
+        lists = {list_id: [other for other in members if other != movie_id] for list_id, members in lists.items()}
+        lists = {list_id: members for list_id, members in lists.items() if members}
+    similar.add_list(100, rng.sample(sorted(movies), 6))
+    lists[100] = list(similar.lists[100])
+
+    # Only movies on the changed lists are recomputed
+    dirty = set(similar.dirty)
+    assert dirty and dirty <= set(movies)
+    for movie_id in dirty:
+        similar.refresh(movie_id)
+    _assert_matches(similar, movies, lists, dirty)
+
+
+def test_similar_endpoint(client):
+    director_id = client.post("/directors/", json={"name": "Céline Sciamma"}).json()["id"]
+    ids = [client.post("/movies/", json=movie_body(n, director_id, "Drama" if n < 3 else "Horror")).json()["id"]
+           for n in range(4)]
+    client.post("/watchlists/", json={"name": "A", "movie_ids": [ids[0], ids[3]]})
+    client.post("/watchlists/", json={"name": "B", "movie_ids": [ids[0], ids[3], ids[1]]})
+
+    response = client.get(f"/movies/{ids[0]}/similar", params={"limit": 2})
+    assert response.status_code == 200
+    assert [(hit["movie"]["id"], hit["shared_watchlists"]) for hit in response.json()] == [(ids[3], 2), (ids[1], 1)]
+    assert client.get("/movies/999/similar").status_code == 404
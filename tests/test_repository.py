@@ -0,0 +1,185 @@
+"""The same ``Repository`` contract, run against every backend."""
+from datetime import date
+
+import pytest
+
+from app.query import MovieQuery
+from app.utils.pagination import NEXT_CURSOR_HEADER, decode_position
+
+from .factories import director, history, movie, page, review, watchlist
+
+pytestmark = pytest.mark.anyio
+
+
+async def _catalog(repository):
+    """Two directors, six movies, reviews, history and two watch lists."""
+    await repository.insert_many("directors", [director(1), director(2)])
+    await repository.insert_many("movies", [
+        movie(1, 1, "Drama", date(1999, 5, 1), 120),
+        movie(2, 1, "Comedy", date(2001, 3, 1), 90),
+        movie(3, 2, "drama", date(1995, 7, 1), 150),
+        movie(4, 2, "Horror", date(2010, 1, 1), 85),
+        movie(5, 1, "DRAMA", date(2005, 2, 1), 95),
+        movie(6, 2, "Comedy", date(1995, 7, 1), 110),
+    ])
+    await repository.insert_many("reviews", [review(1, 1, 5), review(2, 1, 3), review(3, 2, 4)])
+    await repository.insert_many("viewing_history", [history(1, 1), history(2, 3)])
+    await repository.insert_many("watchlists", [watchlist(1, [1, 2, 3]), watchlist(2, [1])])
+
+
+async def _walk(list_page, limit: int, **query) -> list[int]:
+    """Every id of a listing, following the next-page cursors."""
+    ids, after, after_key = [], None, None
+    while True:
+        params = page(limit=limit, after=after, after_key=after_key)
+        rows = await list_page(params, **query)
+        ids += [row.id for row in rows]
+        cursor = params.response.headers.get(NEXT_CURSOR_HEADER)
+        if cursor is None:
+            return ids
+        _, after_key, after = decode_position(cursor)
+
+
+async def test_insert_get_and_delete(repository):
+    await repository.insert("directors", director(1, "Agnes Varda"))
+    assert (await repository.get("directors", 1)).name == "Agnes Varda"
+    assert b'"Agnes Varda"' in await repository.get_json("directors", 1)
+    assert await repository.exists("directors", 1)
+    assert await repository.get("directors", 2) is None
+    assert await repository.get_json("directors", 2) is None
+
+    await repository.insert("directors", director(1, "Agnes Varda", "Photographer"))
+    assert (await repository.get("directors", 1)).bio == "Photographer"
+    assert await repository.count("directors") == 1
+
+    await repository.delete("directors", 1)
+    assert not await repository.exists("directors", 1)
+    assert await repository.count("directors") == 0
+    assert await repository.max_id("directors") == 0
+
+
+async def test_deleting_a_movie_cascades(repository):
+    await _catalog(repository)
+    await repository.delete("movies", 1)
+
+    assert await repository.get("reviews", 1) is None
+    assert await repository.get("reviews", 2) is None
+    assert await repository.get("reviews", 3) is not None
+    assert await repository.history_for_movie(1) == []
+    assert [row.id for row in await repository.history_for_movie(3)] == [2]
+    assert (await repository.get("watchlists", 1)).movie_ids == [2, 3]
+    assert (await repository.get("watchlists", 2)).movie_ids == []
+
+
+async def test_delete_many_cascades_once_and_reports_deleted_ids(repository):
+    await _catalog(repository)
+    assert sorted(await repository.delete_many("movies", [3, 1, 99, 1])) == [1, 3]
+    assert await repository.count("movies") == 4
+    assert await repository.count("reviews") == 1
+    assert await repository.count("viewing_history") == 0
+    assert (await repository.get("watchlists", 1)).movie_ids == [2]
+
+
+async def test_director_has_movies(repository):
+    await _catalog(repository)
+    await repository.insert("directors", director(3))
+    assert await repository.director_has_movies(1)
+    assert not await repository.director_has_movies(3)
+
+
+async def test_delete_directors_without_movies_keeps_the_others(repository):
+    await _catalog(repository)
+    await repository.insert_many("directors", [director(3), director(4)])
+    assert sorted(await repository.delete_directors_without_movies([1, 3, 4, 99])) == [3, 4]
+    assert await repository.existing_ids("directors", [1, 2, 3, 4]) == {1, 2}
+    assert await repository.count("movies") == 6
+
+
+async def test_pages_follow_cursors(repository):
+    await repository.insert_many("directors", [director(n) for n in range(1, 12)])
+    assert await _walk(lambda params: repository.list_rows("directors", params), 4) == list(range(1, 12))
+
+    params = page(limit=3, skip=2)
+    assert [row.id for row in await repository.list_rows("directors", params)] == [3, 4, 5]
+    assert NEXT_CURSOR_HEADER in params.response.headers
+
+    params = page(limit=25, after=9)
+    assert [row.id for row in await repository.list_rows("directors", params)] == [10, 11]
+    assert NEXT_CURSOR_HEADER not in params.response.headers
+
+    encoded = await repository.list_rows_json("directors", page(limit=2))
+    assert [row.startswith(b"{") for row in encoded] == [True, True]
+
+
+@pytest.mark.parametrize("query, expected", [
+    (MovieQuery(), [1, 2, 3, 4, 5, 6]),
+    (MovieQuery(genre="drama"), [1, 3, 5]),
+    (MovieQuery(genre="Drama", director_id=1), [1, 5]),
+    (MovieQuery(released_from=date(1999, 1, 1), released_to=date(2005, 12, 31)), [1, 2, 5]),
+    (MovieQuery(min_runtime=95, max_runtime=120), [1, 5, 6]),
+    (MovieQuery(sort="-id"), [6, 5, 4, 3, 2, 1]),
+    (MovieQuery(sort="release_date"), [3, 6, 1, 2, 5, 4]),
+    (MovieQuery(sort="-release_date"), [4, 5, 2, 1, 6, 3]),
+    (MovieQuery(director_id=2, sort="-runtime_minutes"), [3, 6, 4]),
+    (MovieQuery(genre="comedy", max_runtime=100, sort="runtime_minutes"), [2]),
+])
+async def test_movie_queries_page_through_in_order(repository, query, expected):
+    await _catalog(repository)
+    for limit in (1, 2, 25):
+        assert await _walk(repository.list_movies, limit, query=query) == expected
+    assert [movie.id async for movie in repository.iter_movies(query)] == expected
+
+
+async def test_get_many_and_existing_ids(repository):
+    await _catalog(repository)
+    found = await repository.get_many("movies", [5, 1, 42])
+    assert sorted(found) == [1, 5]
+    assert found[5].genre == "DRAMA"
+    assert await repository.existing_ids("movies", [1, 2, 42]) == {1, 2}
+    reviews = await repository.reviews_for_movies([1, 4])
+    assert [row.id for row in reviews[1]] == [1, 2]
+    assert reviews[4] == []
+
+
+async def test_exports_every_row_in_id_order(repository):
+    await repository.insert_many("directors", [director(n) for n in range(1, 1502)])
+    ids = [row.id async for row in repository.iter_rows("directors")]
+    assert ids == list(range(1, 1502))
+
+
+async def test_reserved_ids_are_never_handed_out_again(repository):
+    await repository.insert("directors", director(7))
+    first = await repository.reserve_ids("directors", 10)
+    assert first >= 8
+    assert await repository.reserve_ids("directors", 1) == first + 10
+    allocated = await repository.allocate_ids("directors", 3)
+    assert len(allocated) == 3 and allocated[0] > first + 10
+
+
+async def test_listeners_follow_writes(repository):
+    class Recorder:
+        def __init__(self):
+            self.events = []
+
+        async def rebuild(self, repository):
+            self.events.append("rebuild")
+
+        def on_put(self, table, rows):
+            self.events.append(("put", table, [row.id for row in rows]))
+
+        def on_delete(self, table, row):
+            self.events.append(("delete", table, row.id))
+
+    recorder = Recorder()
+    await repository.watch(recorder)
+    await repository.insert("directors", director(1))
+    await repository.insert("movies", movie(1))
+    await repository.insert("reviews", review(1, 1))
+    await repository.delete("movies", 1)
+    assert recorder.events == [
+        "rebuild",
+        ("put", "directors", [1]),
+        ("put", "movies", [1]),
+        ("put", "reviews", [1]),
+        ("delete", "movies", 1),
+    ]
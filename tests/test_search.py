@@ -0,0 +1,157 @@
+import math
+import random
+from collections import Counter
+
+import pytest
+
+from app.search import SearchIndex, _Postings, tokenize
+
+from .factories import director, movie
+
+pytestmark = pytest.mark.anyio
+
+WORDS = [f"w{number}" for number in range(60)] + ["water", "wave", "wax", "war"]
+
+
+def _brute_force(index: SearchIndex, rows: dict, query: str, table=None):
+    """Every document scored the way ``SearchIndex.search`` documents it."""
+    counts = {}
+    for (name, row_id), row in rows.items():
+        fields = (("title", 2), ("description", 1)) if name == "movies" else (("name", 2), ("bio", 1))
+        counter = Counter()
+        for field, weight in fields:
+            for term in tokenize(getattr(row, field) or ""):
+                counter[term] += weight
+        if counter:
+            counts[name, row_id] = counter
+    total = sum(sum(counter.values()) for counter in counts.values())
+    average = total / len(counts)
+    frequency = Counter(term for counter in counts.values() for term in counter)
+
+    words = tokenize(query)
+    groups = [[word] for word in dict.fromkeys(words[:-1])]
+    groups.append(index._expand(words[-1]) if query[-1].isalnum() else [words[-1]])
+    k1, b = index.k1, index.b
+    scores = {}
+    for document, counter in counts.items():
+        if table and document[0] != table:
+            continue
+        length = sum(counter.values())
+        score = 0.0
+        for terms in groups:
+            best = 0.0
+            for term in terms:
+                if term in counter:
+                    idf = math.log(1 + (len(counts) - frequency[term] + 0.5) / (frequency[term] + 0.5))
+                    tf = counter[term]
+                    best = max(best, idf * (k1 + 1) * tf / (tf + k1 * (1 - b + b * length / average)))
+            score += best
+        if score:
+            scores[document] = score
+    return sorted(scores.items(), key=lambda item: (-item[1], item[0][1] << 1 | (item[0][0] == "directors")))
+
+
+def _assert_matches(index, rows, query, table=None, skip=0, limit=10):
+    hits = index.search(query, table=table, skip=skip, limit=limit)
+    expected = _brute_force(index, rows, query, table)[skip:skip + limit]
+    assert [score for _, _, score in hits] == pytest.approx([score for _, score in expected])
+    # Documents with equal scores may come back in either order
+    for (name, row_id, score), (document, expected_score) in zip(hits, expected):
+        if not any(
+            other == pytest.approx(score)
+            for other in (item[1] for item in expected if item[0] != document)
+        ):
+            assert (name, row_id) == document
+
+
+def _text(rng, count):
+    # Skewed, so a few words are in most documents
+    return " ".join(rng.choices(WORDS, weights=[1 / (rank + 1) for rank in range(len(WORDS))], k=count))
+
+
+@pytest.fixture
+def catalog():
+    rng = random.Random(7)
+    index = SearchIndex()
+    rows = {}
+    for movie_id in range(1, 401):
+        row = movie(movie_id, title=_text(rng, 2), description=_text(rng, rng.randint(0, 30)))
+        index.add("movies", row)
+        rows["movies", movie_id] = row
+    for director_id in range(1, 81):
+        row = director(director_id, name=_text(rng, 2), bio=_text(rng, rng.randint(0, 10)))
+        index.add("directors", row)
+        rows["directors", director_id] = row
+    return index, rows
+
+
+@pytest.mark.parametrize("query", ["w0", "w0 w1", "w1 w59 w0", "w3 w", "wa", "war ", "unknown", "w2 unknown"])
+@pytest.mark.parametrize("table", [None, "movies", "directors"])
+def test_search_matches_brute_force(catalog, query, table):
+    index, rows = catalog
+    _assert_matches(index, rows, query, table)
+    _assert_matches(index, rows, query, table, skip=15, limit=20)
+
+
+def test_search_after_deletes_and_rewrites(catalog):
+    index, rows = catalog
+    rng = random.Random(11)
+    for movie_id in rng.sample(range(1, 401), 250):
+        index.remove("movies", movie_id)
+        del rows["movies", movie_id]
+    for movie_id in rng.sample(range(1, 401), 100):
+        row = movie(movie_id, title=_text(rng, 3), description=_text(rng, 5))
+        index.add("movies", row)
+        rows["movies", movie_id] = row
+    for query in ("w0", "w0 w4", "w1 wa", "w"):
+        _assert_matches(index, rows, query)
+        _assert_matches(index, rows, query, "movies", skip=5)
+
+
+def test_deleting_most_documents_compacts_postings(catalog):
+    index, rows = catalog
+    for movie_id in range(1, 381):
+        index.remove("movies", movie_id)
+        del rows["movies", movie_id]
+    documents = index.postings["w0"]
+    stored = sum(map(len, documents.runs[0] + documents.runs[1])) + len(documents.fresh[0] + documents.fresh[1])
+    assert documents.stale <= documents.count
+    assert stored == documents.count + documents.stale
+    _assert_matches(index, rows, "w0 w1")
+
+
+def test_terms_without_documents_are_dropped():
+    index = SearchIndex()
+    index.add("movies", movie(1, title="Solaris"))
+    index.add("movies", movie(2, title="Stalker"))
+    index.remove("movies", 1)
+    assert "solaris" not in index.postings
+    assert index.search("sol") == []
+    assert index.search("Stalker") == [("movies", 2, pytest.approx(index.search("stalker")[0][2]))]
+
+
+def test_postings_merge_into_few_runs():
+    postings = _Postings()
+    for key in range(10_000):
+        postings.add(key, 0)
+    runs = postings.runs[0]
+    assert len(runs) <= 2 * math.log2(10_000 / _Postings.fresh_size) + 1
+    assert all(list(run) == sorted(run) for run in runs)
+    assert sorted(key for run in runs for key in run) + sorted(postings.fresh[0]) == list(range(10_000))
+
+
+def test_ids_beyond_the_posting_key_are_rejected():
+    with pytest.raises(ValueError):
+        SearchIndex().add("movies", movie(1 << 36))
+
+
+async def test_search_endpoint(client):
+    from .factories import movie_body
+
+    director_id = client.post("/directors/", json={"name": "Andrei Tarkovsky"}).json()["id"]
+    client.post("/movies/", json=movie_body(1, director_id, title="Solaris"))
+    client.post("/movies/", json=movie_body(2, director_id, title="Stalker"))
+
+    response = client.get("/search/", params={"q": "sta"})
+    assert response.status_code == 200
+    assert [hit["id"] for hit in response.json()] == [2]
@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+
+from app.database import DummyDatabase, IdSequence, Sequences
+
+from .factories import director
+
+pytestmark = pytest.mark.anyio
+
+
+def _store():
+    """A table counter whose reservations take a while, like a round trip."""
+    database = DummyDatabase()
+    calls = []
+
+    async def reserve(table: str, count: int) -> int:
+        calls.append(count)
+        await asyncio.sleep(0.001)
+        return database.reserve_ids(table, count)
+    return database, reserve, calls
+
+
+async def test_concurrent_allocations_get_distinct_increasing_ids():
+    _, reserve, calls = _store()
+    sequence = IdSequence(lambda count: reserve("movies", count), block_size=8)
+
+    ids = await asyncio.gather(*(sequence.allocate() for _ in range(50)))
+    flat = [row_id for block in ids for row_id in block]
+    assert flat == list(range(1, 51))
+    # One reservation per block, not per id
+    assert len(calls) == 7
+
+
+async def test_large_allocations_get_their_own_block():
+    _, reserve, _ = _store()
+    sequence = IdSequence(lambda count: reserve("movies", count), block_size=8)
+    first = await sequence.allocate(2)
+    bulk = await sequence.allocate(100)
+    after = await sequence.allocate()
+    assert list(first) == [1, 2]
+    assert list(bulk) == list(range(9, 109))
+    # The rest of the first block is skipped, so ids keep increasing
+    assert after[0] > bulk[-1]
+
+
+async def test_workers_sharing_a_store_never_collide():
+    database, reserve, _ = _store()
+    workers = [Sequences(reserve, block_size=4) for _ in range(3)]
+
+    async def insert_many(worker: Sequences, count: int) -> list[int]:
+        ids = []
+        for _ in range(count):
+            ids += await worker.allocate("directors")
+        return ids
+
+    handed_out = await asyncio.gather(*(insert_many(worker, 30) for worker in workers))
+    every_id = [row_id for ids in handed_out for row_id in ids]
+    assert len(set(every_id)) == 90
+    assert all(ids == sorted(ids) for ids in handed_out)
+    assert database.next_ids["directors"] > max(every_id)
+
+
+def test_rows_with_explicit_ids_move_the_sequence_past_them():
+    database = DummyDatabase()
+    database.insert("directors", director(41))
+    assert database.reserve_ids("directors", 2) == 42
+    database.restore_sequence("directors", 10)
+    assert database.reserve_ids("directors", 1) == 44
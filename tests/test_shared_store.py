@@ -0,0 +1,151 @@
+import random
+from array import array
+from datetime import date
+
+import pytest
+
+from app.database import DummyDatabase
+from app.query import MovieQuery
+from app.repositories import SharedOwnerRepository, SharedReaderRepository
+from app.shared_store import SortedIds, base_path, snapshot_path
+from app.utils.cache import response_cache
+
+from .factories import director, history, movie, page, review
+
+pytestmark = pytest.mark.anyio
+
+
+def _ints(values) -> memoryview:
+    return memoryview(array("q", sorted(values)))
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_sorted_ids_merge_a_delta_in_order(seed):
+    rng = random.Random(seed)
+    base = set(rng.sample(range(1, 2000), 300))
+    removed = set(rng.sample(sorted(base), rng.randint(0, 100)))
+    added = set(rng.sample(sorted(set(range(1, 2100)) - base), rng.randint(0, 100)))
+    expected = sorted(base - removed | added)
+    ids = SortedIds(_ints(base), _ints(added), _ints(removed))
+
+    assert len(ids) == len(expected)
+    assert list(ids) == expected
+    assert [ids[position] for position in range(len(expected))] == expected
+    assert ids[-1] == expected[-1]
+    for value in rng.sample(range(0, 2200), 100):
+        assert (value in ids) == (value in expected)
+        assert list(ids.iter_after(value)) == [v for v in expected if v > value]
+        assert list(ids.iter_before(value)) == [v for v in reversed(expected) if v < value]
+        skip = rng.randint(0, 50)
+        assert ids.slice_after(value, skip, 7) == [v for v in expected if v > value][skip : skip + 7]
+    assert ids.slice_after(None, len(expected), 5) == []
+
+
+async def _open(directory, **options):
+    owner = SharedOwnerRepository(DummyDatabase(), directory, None, publish_interval=0, **options)
+    await owner.open()
+    reader = SharedReaderRepository(directory)
+    await reader.open()
+    return owner, reader
+
+
+async def _movie_pages(repository, query: MovieQuery) -> list[int]:
+    return [row.id for row in await repository.list_movies(page(limit=100), query)]
+
+
+async def test_readers_see_the_owner_across_compactions(tmp_path):
+    owner, reader = await _open(tmp_path, compact_after=20)
+    rng = random.Random(3)
+    try:
+        await reader.insert_many("directors", [director(number) for number in range(1, 6)])
+        for round_number in range(12):
+            movies = [
+                movie(
+                    rng.randint(1, 80),
+                    rng.randint(1, 5),
+                    rng.choice(["Drama", "Comedy", "Horror"]),
+                    date(1990 + rng.randint(0, 30), 1, 1),
+                    rng.randint(80, 180),
+                )
+                for _ in range(10)
+            ]
+            await reader.insert_many("movies", movies)
+            present = list(owner.database.movies)
+            await reader.insert_many("reviews", [
+                review(round_number * 10 + number, rng.choice(present)) for number in range(5)
+            ])
+            await reader.insert_many("viewing_history", [history(round_number, rng.choice(present))])
+            await reader.delete_many("movies", rng.sample(present, 3))
+
+            for query in (
+                MovieQuery(),
+                MovieQuery(genre="drama"),
+                MovieQuery(director_id=2, sort="-release_date"),
+                MovieQuery(min_runtime=100, max_runtime=150, sort="runtime_minutes"),
+            ):
+                assert await _movie_pages(reader, query) == await _movie_pages(owner, query)
+            present = list(owner.database.movies)
+            assert await reader.reviews_for_movies(present) == await owner.reviews_for_movies(present)
+            for movie_id in present:
+                assert await reader.history_for_movie(movie_id) == await owner.history_for_movie(movie_id)
+            for director_id in range(1, 6):
+                assert await reader.director_has_movies(director_id) == await owner.director_has_movies(director_id)
+        assert owner.base_version > 1
+    finally:
+        await reader.close()
+        await owner.close()
+
+
+async def test_publishing_writes_only_the_changes(tmp_path):
+    owner, reader = await _open(tmp_path, compact_after=100)
+    try:
+        await owner.insert_many("movies", [movie(number) for number in range(1, 3001)])
+        await owner._wait_published(owner.seq)
+        # 3000 changed rows: the snapshot is written out as the new base
+        await owner._compactor
+        await reader.insert("movies", movie(3001))
+
+        delta = snapshot_path(tmp_path, owner.version).stat().st_size
+        base = base_path(tmp_path, owner.base_version).stat().st_size
+        assert delta < 4096 < base
+        assert (await reader.get("movies", 3001)).id == 3001
+        assert await reader.count("movies") == 3001
+    finally:
+        await reader.close()
+        await owner.close()
+
+
+async def test_readers_drop_cached_responses_of_changed_tables_only(tmp_path):
+    owner, reader = await _open(tmp_path)
+    try:
+        await owner.insert("movies", movie(1))
+        await owner._wait_published(owner.seq)
+        await reader.count("movies")
+        before = dict(response_cache.versions)
+
+        await owner.insert("reviews", review(1, 1))
+        await owner._wait_published(owner.seq)
+        await reader.count("reviews")
+        assert response_cache.versions["reviews"] == before.get("reviews", 0) + 1
+        assert response_cache.versions["movies"] == before.get("movies", 0)
+
+        # Deleting a movie changes its reviews too
+        await owner.delete("movies", 1)
+        await owner._wait_published(owner.seq)
+        await reader.count("movies")
+        assert response_cache.versions["movies"] == before.get("movies", 0) + 1
+        assert response_cache.versions["reviews"] == before.get("reviews", 0) + 2
+        assert response_cache.versions["directors"] == before.get("directors", 0)
+    finally:
+        await reader.close()
+        await owner.close()
+
+
+async def test_failed_forwarded_writes_raise(tmp_path):
+    owner, reader = await _open(tmp_path)
+    try:
+        with pytest.raises(RuntimeError, match="KeyError"):
+            await reader.delete("movies", 1)
+    finally:
+        await reader.close()
+        await owner.close()
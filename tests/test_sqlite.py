@@ -0,0 +1,48 @@
+"""Behaviour specific to the SQLite backend."""
+import asyncio
+
+import pytest
+
+from app.repositories import SQLiteRepository
+
+from .factories import director
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def sqlite_repository(tmp_path):
+    repository = SQLiteRepository(str(tmp_path / "movies.sqlite3"), pool_size=2)
+    await repository.open()
+    yield repository
+    await repository.close()
+
+
+async def test_exports_never_starve_pooled_reads(sqlite_repository):
+    await sqlite_repository.insert_many("directors", [director(n) for n in range(1, 3001)])
+
+    async def export():
+        count = 0
+        async for _ in sqlite_repository.iter_rows("directors"):
+            count += 1
+            if count % 500 == 0:
+                await asyncio.sleep(0.01)
+        return count
+
+    # As many exports as the pool has connections, then reads on top
+    exports = [asyncio.create_task(export()) for _ in range(sqlite_repository.pool_size)]
+    await asyncio.sleep(0.005)
+    reads = [asyncio.create_task(sqlite_repository.get("directors", n)) for n in (1, 2)]
+    done = await asyncio.wait_for(asyncio.gather(*exports, *reads), 10)
+    assert done[:2] == [3000, 3000]
+    assert [row.id for row in done[2:]] == [1, 2]
+
+
+async def test_export_reads_one_snapshot(sqlite_repository):
+    await sqlite_repository.insert_many("directors", [director(n) for n in range(1, 1201)])
+    rows = sqlite_repository.iter_rows("directors")
+    first = await anext(rows)
+    await sqlite_repository.insert("directors", director(5000))
+    await sqlite_repository.delete("directors", 1100)
+    rest = [row.id async for row in rows]
+    assert [first.id] + rest == list(range(1, 1201))